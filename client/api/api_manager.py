@@ -37,9 +37,9 @@ class APIManager:
         """设置服务器URL"""
         self.http_client.base_url = url.rstrip('/')
     
-    def login(self, username: str, password: str, device_info: dict) -> dict:
+    def login(self, username: str, password: str, device_info: dict, lean: bool = False) -> dict:
         """用户登录"""
-        result = self.auth.login(username, password, device_info)
+        result = self.auth.login(username, password, device_info, lean=lean)
         
         if result.get("success"):
             self.current_user = username
@@ -61,6 +61,10 @@ class APIManager:
         self.current_token = None
         self.current_device_id = None
         
+        # 清除上一个用户的ETag缓存
+        self.clipboard.etags.clear()
+        self.device.etags.clear()
+        
         return result
     
     def is_logged_in(self) -> bool:
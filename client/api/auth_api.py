@@ -12,13 +12,21 @@ class AuthAPI:
     def __init__(self, http_client: HTTPClient):
         self.client = http_client
     
-    def login(self, username: str, password: str, device_info: Dict[str, Any]) -> Dict[str, Any]:
-        """用户登录"""
+    def login(self, username: str, password: str, device_info: Dict[str, Any],
+              lean: bool = False) -> Dict[str, Any]:
+        """
+        用户登录
+        
+        Args:
+            lean: 精简模式，只返回token和同步版本号/水位线，设备和历史需另行获取
+        """
         data = {
             "username": username,
             "password": password,
             "device_info": device_info
         }
+        if lean:
+            data["lean"] = True
         return self.client.post("/login", data)
     
     def register(self, username: str, password: str) -> Dict[str, Any]:
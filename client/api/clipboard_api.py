@@ -2,8 +2,9 @@
 BeeSyncClip 剪贴板API客户端
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from .http_client import HTTPClient
+from .etag_cache import ETagCache
 
 
 class ClipboardAPI:
@@ -11,10 +12,14 @@ class ClipboardAPI:
     
     def __init__(self, http_client: HTTPClient):
         self.client = http_client
+        self.etags = ETagCache()
     
     def get_clipboards(self, username: str) -> Dict[str, Any]:
-        """获取用户剪贴板内容"""
-        return self.client.get("/get_clipboards", params={"username": username})
+        """获取用户剪贴板内容（自动发送If-None-Match，未变化时返回上次的结果）"""
+        params = {"username": username}
+        headers = self.etags.request_headers(username)
+        result = self.client.get("/get_clipboards", params=params, headers=headers)
+        return self.etags.resolve(username, result)
     
     def add_clipboard(self, username: str, content: str, device_id: str, 
                      content_type: str = "text/plain") -> Dict[str, Any]:
@@ -27,6 +32,19 @@ class ClipboardAPI:
         }
         return self.client.post("/add_clipboard", data)
     
+    def add_clipboards_batch(self, device_id: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        批量添加剪贴板内容（需要已登录的token）
+        
+        items 每项包含 content，可选 content_type、client_id、created_at；
+        返回结果中的 results 与 items 顺序一致
+        """
+        data = {
+            "device_id": device_id,
+            "items": items
+        }
+        return self.client.post("/clipboard/batch", data)
+    
     def delete_clipboard(self, username: str, clip_id: str) -> Dict[str, Any]:
         """删除剪贴板内容"""
         data = {
@@ -4,6 +4,7 @@ BeeSyncClip 设备API客户端
 
 from typing import Dict, Any, List
 from .http_client import HTTPClient
+from .etag_cache import ETagCache
 
 
 class DeviceAPI:
@@ -11,10 +12,14 @@ class DeviceAPI:
     
     def __init__(self, http_client: HTTPClient):
         self.client = http_client
+        self.etags = ETagCache()
     
     def get_devices(self, username: str) -> Dict[str, Any]:
-        """获取用户设备列表"""
-        return self.client.get("/get_devices", params={"username": username})
+        """获取用户设备列表（自动发送If-None-Match，未变化时返回上次的结果）"""
+        params = {"username": username}
+        headers = self.etags.request_headers(username)
+        result = self.client.get("/get_devices", params=params, headers=headers)
+        return self.etags.resolve(username, result)
     
     def update_device_label(self, username: str, device_id: str, new_label: str) -> Dict[str, Any]:
         """更新设备标签"""
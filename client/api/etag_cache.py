@@ -0,0 +1,38 @@
+"""
+BeeSyncClip ETag缓存
+保存轮询接口的ETag和上次响应，服务器返回304时直接复用上次响应
+"""
+
+from typing import Dict, Any, Optional, Tuple
+
+
+class ETagCache:
+    """按请求键（如用户名）保存 (ETag, 响应)"""
+    
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    
+    def request_headers(self, key: str) -> Optional[Dict[str, str]]:
+        """返回条件请求头，没有缓存时返回None"""
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        return {"If-None-Match": entry[0]}
+    
+    def resolve(self, key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """处理响应：304时返回缓存的响应，成功且带ETag时更新缓存"""
+        if result.get("not_modified"):
+            entry = self._entries.get(key)
+            if entry:
+                return entry[1]
+            return result
+        
+        if result.get("success") and result.get("etag"):
+            self._entries[key] = (result["etag"], result)
+        else:
+            self._entries.pop(key, None)
+        return result
+    
+    def clear(self):
+        """清空缓存（如切换用户时）"""
+        self._entries.clear()
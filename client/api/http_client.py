@@ -8,6 +8,8 @@ import json
 from typing import Dict, Any, Optional
 from urllib.parse import urljoin
 
+from urllib3.util.request import ACCEPT_ENCODING
+
 
 class HTTPClient:
     """HTTP客户端基础类"""
@@ -28,7 +30,9 @@ class HTTPClient:
         # 设置请求头
         self.session.headers.update({
             'Content-Type': 'application/json',
-            'User-Agent': 'BeeSyncClip-Client/1.0'
+            'User-Agent': 'BeeSyncClip-Client/1.0',
+            # 声明当前环境能解码的全部压缩格式（安装brotli/zstandard后包含br/zstd）
+            'Accept-Encoding': ACCEPT_ENCODING
         })
     
     def _make_url(self, endpoint: str) -> str:
@@ -38,8 +42,20 @@ class HTTPClient:
     def _handle_response(self, response: requests.Response) -> Dict[str, Any]:
         """处理HTTP响应"""
         try:
+            # 条件请求命中：内容未变化，没有响应体
+            if response.status_code == 304:
+                return {
+                    "success": True,
+                    "not_modified": True,
+                    "status": 304,
+                    "etag": response.headers.get('ETag')
+                }
+            
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            if isinstance(result, dict) and response.headers.get('ETag'):
+                result['etag'] = response.headers['ETag']
+            return result
         except requests.exceptions.HTTPError as e:
             # 尝试解析错误响应
             try:
@@ -64,11 +80,12 @@ class HTTPClient:
                 "status": 0
             }
     
-    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """发送GET请求"""
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """发送GET请求（headers 为本次请求附加的请求头，如 If-None-Match）"""
         url = self._make_url(endpoint)
         try:
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
             return self._handle_response(response)
         except Exception as e:
             return {
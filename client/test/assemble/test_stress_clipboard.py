@@ -2,111 +2,105 @@
 # -*- coding: utf-8 -*-
 """
 批量多用户压力测试脚本（含注册）
-场景：先批量注册 testuser1…testuser100，再登录各设备并发写入剪贴板，统计延迟。
+场景：先批量注册 testuser1…testuser100 并各登录一台设备，再以 CONCURRENCY 个虚拟用户并发写入剪贴板，统计延迟。
+基于 tests/loadgen 的asyncio负载生成器（单线程、共享连接池），客户端自身不再先于服务器饱和；
+更多场景和开环模式见 python -m tests.loadgen --help。
+
+用法（在项目根目录）:
+    python -m client.test.assemble.test_stress_clipboard
 """
+import asyncio
 import time
 import uuid
-import random
-import string
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from client.api.api_manager import APIManager
+
+from tests.loadgen.client import LoadClient
+from tests.loadgen.runner import LoadResults, create_users, execute, run_closed_loop
+from tests.loadgen.scenarios import Scenario, Session
 
 # —— 配置区域 —— #
 BASE_URL         = "http://47.110.154.99:8000"  # 后端服务地址
 USERNAME_PREFIX  = "testuser"                   # 账号名前缀
 PASSWORD         = "testpass"                   # 统一密码
 TOTAL_USERS      = 100                          # 注册数量：testuser1…testuser100
-CONCURRENCY      = 50                           # 并发线程数
-REQUESTS_PER_JOB = 100                          # 每线程写入次数
+CONCURRENCY      = 50                           # 并发虚拟用户数
+REQUESTS_PER_JOB = 100                          # 每个虚拟用户写入次数
+SETUP_INTERVAL   = 1.0                          # 注册/登录的间隔（秒），避免触发服务器限流
 # —————————— #
 
-def random_text(length=20):
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+WRITE_ONLY = Scenario("stress", "连续写入", {"add": 1.0}, 0)
 
-def worker(manager: APIManager, username: str, device_id: str, n: int):
-    latencies = []
-    successes = 0
-    for _ in range(n):
-        content = random_text(50)
-        t0 = time.time()
-        resp = manager.clipboard.add_clipboard(username, content, device_id)
-        t1 = time.time()
-        latencies.append((t1 - t0) * 1000)
-        if resp.get("success"):
-            successes += 1
-    # 最后拉取列表
-    manager.clipboard.get_clipboards(username)
-    return successes, latencies
 
-if __name__ == "__main__":
-    # 1. 批量注册
+async def prepare(client: LoadClient):
+    # 1. 批量注册（已存在的账号直接使用）
     print(f"开始批量注册 {TOTAL_USERS} 个用户…")
     for i in range(1, TOTAL_USERS + 1):
-        time.sleep(1)
         username = f"{USERNAME_PREFIX}{i}"
-        mgr_reg = APIManager(BASE_URL)
-        res = mgr_reg.auth.register(username, PASSWORD)
-        if res.get("success"):
-            print(f"[OK] 注册成功：{username}")
-        else:
-            msg = res.get("message")
-            print(f"[WARN] 注册失败{username}：{msg}")
+        try:
+            await client.register(username, PASSWORD)
+            print(f"[OK] 注册成功或已存在：{username}")
+        except Exception as e:
+            print(f"[WARN] 注册失败{username}：{e}")
+        await asyncio.sleep(SETUP_INTERVAL)
     print("注册阶段结束\n")
 
-    time.sleep(2)
     # 2. 批量登录
-    logged_in = []
-    print(f"开始登录用户…")
+    sessions = []
+    print("开始登录用户…")
     for i in range(1, TOTAL_USERS + 1):
-        time.sleep(1)
         username = f"{USERNAME_PREFIX}{i}"
-        mgr = APIManager(BASE_URL)
-        device_info = {"device_id": str(uuid.uuid4()), "device_name": f"Device_{username}"}
-        res = mgr.login(username, PASSWORD, device_info)
-        # print(res)
-        if res.get("success"):
-            dev = "Testdevice{i}"
-            logged_in.append((mgr, username, dev))
-            print(f"[OK] 登录成功：{username} (device_id={dev})")
-        else:
-            print(f"[WARN] 登录失败：{username} -> {res.get('message')}")
-    if not logged_in:
-        print("无可用账号，退出测试。")
-        exit(1)
+        device_id = str(uuid.uuid4())
+        try:
+            result = await client.login(username, PASSWORD, device_id)
+            sessions.append(Session(username, PASSWORD, result["user_id"], device_id, result["token"]))
+            print(f"[OK] 登录成功：{username} (device_id={device_id})")
+        except Exception as e:
+            print(f"[WARN] 登录失败：{username} -> {e}")
+        await asyncio.sleep(SETUP_INTERVAL)
+    return sessions
 
-    print(f"共 {len(logged_in)} 个账号可用，开始并发压力测试…\n")
 
-    # 3. 并发压测
-    all_latencies = []
-    total_success = 0
-    start = time.time()
-    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
-        futures = []
-        for idx in range(CONCURRENCY):
-            mgr, user, dev = logged_in[idx % len(logged_in)]
-            futures.append(executor.submit(worker, mgr, user, dev, REQUESTS_PER_JOB))
-        for fut in as_completed(futures):
-            succ, lats = fut.result()
-            total_success += succ
-            all_latencies.extend(lats)
-    duration = time.time() - start
+async def main():
+    async with LoadClient(BASE_URL, max_connections=CONCURRENCY) as client:
+        sessions = await prepare(client)
+        if not sessions:
+            print("无可用账号，退出测试。")
+            return
+        print(f"共 {len(sessions)} 个账号可用，开始并发压力测试…\n")
 
-    # 4. 结果统计
-    count = len(all_latencies)
-    avg   = sum(all_latencies) / count if count else 0
-    sorted_l = sorted(all_latencies)
-    p50   = sorted_l[int(0.50 * count)]
-    p95   = sorted_l[int(0.95 * count)]
-    p99   = sorted_l[int(0.99 * count)]
+        # 3. 并发压测：每个虚拟用户连续写入 REQUESTS_PER_JOB 次，最后拉取一次列表
+        users = create_users(sessions, CONCURRENCY, 0)
+        results = LoadResults()
+        await run_closed_loop(client, users, WRITE_ONLY, results, duration=0, warmup=0, think_time=0,
+                              iterations=REQUESTS_PER_JOB)
+        list_results = LoadResults()
+        list_results.start()
+        await asyncio.gather(*(execute(client, vu, "list", time.perf_counter(), list_results, True) for vu in users))
+        list_results.stop()
 
+    # 4. 结果统计
+    metrics = results.metrics()
+    latency = metrics["latency_ms"]
     print("—— 多用户压力测试结果 ——")
-    print(f"总账号数       : {len(logged_in)}")
-    print(f"并发线程数     : {CONCURRENCY}")
-    print(f"每线程请求数   : {REQUESTS_PER_JOB}")
+    print(f"总账号数       : {len(sessions)}")
+    print(f"并发虚拟用户数 : {CONCURRENCY}")
+    print(f"每用户请求数   : {REQUESTS_PER_JOB}")
     print(f"总请求数       : {CONCURRENCY * REQUESTS_PER_JOB}")
-    print(f"写入成功次数   : {total_success}")
-    print(f"总耗时         : {duration:.2f}s")
-    print(f"平均延时(写)   : {avg:.2f}ms")
-    print(f"P50 延时       : {p50:.2f}ms")
-    print(f"P95 延时       : {p95:.2f}ms")
-    print(f"P99 延时       : {p99:.2f}ms")
+    print(f"写入成功次数   : {metrics['completed']}")
+    print(f"写入失败次数   : {metrics['failed']}")
+    print(f"总耗时         : {metrics['elapsed_s']:.2f}s")
+    print(f"吞吐量         : {metrics['throughput']:.1f} 次/s")
+    if latency["count"]:
+        print(f"平均延时(写)   : {latency['mean']:.2f}ms")
+        print(f"P50 延时       : {latency['p50']:.2f}ms")
+        print(f"P90 延时       : {latency['p90']:.2f}ms")
+        print(f"P99 延时       : {latency['p99']:.2f}ms")
+        print(f"P99.9 延时     : {latency['p999']:.2f}ms")
+    for error, count in metrics["errors"].items():
+        print(f"错误 {error}: {count}")
+    list_latency = list_results.metrics()["latency_ms"]
+    if list_latency["count"]:
+        print(f"拉取列表 P50   : {list_latency['p50']:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
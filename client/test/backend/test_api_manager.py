@@ -118,7 +118,7 @@ class TestAPIManager(unittest.TestCase):
         self.assertEqual(self.api_manager.current_user, username)
         self.assertEqual(self.api_manager.current_token, "test_token")
         self.assertEqual(self.api_manager.current_device_id, "device1")
-        mock_login.assert_called_with(username, password, device_info)
+        mock_login.assert_called_with(username, password, device_info, lean=False)
         mock_set_token.assert_called_with("test_token")
 
     @patch('client.api.auth_api.AuthAPI.logout')
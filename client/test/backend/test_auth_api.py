@@ -119,6 +119,31 @@ class TestAuthAPI(unittest.TestCase):
             }
         )
 
+    def test_login_lean(self):
+        self.http_client.post.return_value = {
+            "success": True,
+            "token": "test_token",
+            "versions": {"clipboard": 3, "devices": 1},
+            "watermarks": {"clipboard_total": 3, "latest_clip_id": "clip3"}
+        }
+        username = "testuser"
+        password = "testpass"
+        device_info = {"device_id": "device1"}
+
+        result = self.auth_api.login(username, password, device_info, lean=True)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["versions"]["clipboard"], 3)
+        self.http_client.post.assert_called_with(
+            "/login",
+            {
+                "username": username,
+                "password": password,
+                "device_info": device_info,
+                "lean": True
+            }
+        )
+
     def test_register_success(self):
         self.http_client.post.return_value = {"success": True, "message": "User registered"}
         username = "newuser"
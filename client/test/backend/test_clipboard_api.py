@@ -118,7 +118,8 @@ class TestClipboardAPI(unittest.TestCase):
         self.assertEqual(len(result["clipboards"]), 1)
         self.http_client.get.assert_called_with(
             "/get_clipboards",
-            params={"username": username}
+            params={"username": username},
+            headers=None
         )
 
     def test_get_clipboards_empty_username(self):
@@ -131,7 +132,8 @@ class TestClipboardAPI(unittest.TestCase):
         self.assertFalse(result["success"])
         self.http_client.get.assert_called_with(
             "/get_clipboards",
-            params={"username": ""}
+            params={"username": ""},
+            headers=None
         )
 
     def test_get_clipboards_server_error(self):
@@ -145,6 +147,53 @@ class TestClipboardAPI(unittest.TestCase):
         self.assertFalse(result["success"])
         self.assertEqual(result["status"], 500)
 
+    def test_get_clipboards_sends_etag(self):
+        self.http_client.get.return_value = {
+            "success": True,
+            "clipboards": [{"clip_id": "clip1", "content": "Hello"}],
+            "etag": 'W/"abc-clipboard-3"'
+        }
+        username = "testuser"
+        first = self.clipboard_api.get_clipboards(username)
+        self.http_client.get.assert_called_with(
+            "/get_clipboards",
+            params={"username": username},
+            headers=None
+        )
+
+        self.http_client.get.return_value = {
+            "success": True,
+            "not_modified": True,
+            "status": 304,
+            "etag": 'W/"abc-clipboard-3"'
+        }
+        result = self.clipboard_api.get_clipboards(username)
+        self.http_client.get.assert_called_with(
+            "/get_clipboards",
+            params={"username": username},
+            headers={"If-None-Match": 'W/"abc-clipboard-3"'}
+        )
+        self.assertEqual(result, first)
+        self.assertEqual(len(result["clipboards"]), 1)
+
+    def test_get_clipboards_etag_updated(self):
+        username = "testuser"
+        self.http_client.get.return_value = {"success": True, "clipboards": [], "etag": 'W/"v1"'}
+        self.clipboard_api.get_clipboards(username)
+        self.http_client.get.return_value = {
+            "success": True,
+            "clipboards": [{"clip_id": "clip2", "content": "New"}],
+            "etag": 'W/"v2"'
+        }
+        result = self.clipboard_api.get_clipboards(username)
+        self.assertEqual(result["clipboards"][0]["clip_id"], "clip2")
+        self.clipboard_api.get_clipboards(username)
+        self.http_client.get.assert_called_with(
+            "/get_clipboards",
+            params={"username": username},
+            headers={"If-None-Match": 'W/"v2"'}
+        )
+
     def test_add_clipboard_success(self):
         self.http_client.post.return_value = {
             "success": True,
@@ -166,6 +215,21 @@ class TestClipboardAPI(unittest.TestCase):
             }
         )
 
+    def test_add_clipboards_batch(self):
+        self.http_client.post.return_value = {
+            "success": True,
+            "results": [{"index": 0, "client_id": "q1", "success": True, "clip_id": "clip1"}],
+            "saved": 1,
+            "failed": 0
+        }
+        items = [{"content": "queued", "client_id": "q1", "created_at": "2024-01-01T12:00:00"}]
+        result = self.clipboard_api.add_clipboards_batch("device1", items)
+        self.assertEqual(result["saved"], 1)
+        self.http_client.post.assert_called_with(
+            "/clipboard/batch",
+            {"device_id": "device1", "items": items}
+        )
+
     def test_add_clipboard_empty_content(self):
         self.http_client.post.return_value = {
             "success": False,
@@ -113,7 +113,27 @@ class TestDeviceAPI(unittest.TestCase):
         self.assertEqual(len(result["devices"]), 1)
         self.http_client.get.assert_called_with(
             "/get_devices",
-            params={"username": username}
+            params={"username": username},
+            headers=None
+        )
+
+    def test_get_devices_not_modified(self):
+        self.http_client.get.return_value = {
+            "success": True,
+            "devices": [{"device_id": "device1", "label": "Test Device"}],
+            "etag": 'W/"abc-devices-2-0000"'
+        }
+        username = "testuser"
+        first = self.device_api.get_devices(username)
+
+        self.http_client.get.return_value = {"success": True, "not_modified": True, "status": 304}
+        result = self.device_api.get_devices(username)
+
+        self.assertEqual(result, first)
+        self.http_client.get.assert_called_with(
+            "/get_devices",
+            params={"username": username},
+            headers={"If-None-Match": 'W/"abc-devices-2-0000"'}
         )
 
     def test_update_device_label(self):
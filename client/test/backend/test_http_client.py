@@ -102,6 +102,7 @@ class TestHTTPClient(unittest.TestCase):
     def test_get_success(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = {"success": True, "data": "test"}
         mock_get.return_value = mock_response
 
@@ -112,6 +113,7 @@ class TestHTTPClient(unittest.TestCase):
         mock_get.assert_called_with(
             "http://testserver/test_endpoint",
             params={"key": "value"},
+            headers=None,
             timeout=30
         )
 
@@ -119,6 +121,7 @@ class TestHTTPClient(unittest.TestCase):
     def test_post_success(self, mock_post):
         mock_response = Mock()
         mock_response.status_code = 201
+        mock_response.headers = {}
         mock_response.json.return_value = {"success": True, "message": "created"}
         mock_post.return_value = mock_response
         data = {"key": "value"}
@@ -133,6 +136,38 @@ class TestHTTPClient(unittest.TestCase):
             timeout=30
         )
 
+    @patch('requests.Session.get')
+    def test_get_not_modified(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 304
+        mock_response.headers = {"ETag": 'W/"v1"'}
+        mock_get.return_value = mock_response
+
+        result = self.client.get("/get_clipboards", params={"username": "u"},
+                                 headers={"If-None-Match": 'W/"v1"'})
+
+        self.assertTrue(result["not_modified"])
+        self.assertEqual(result["etag"], 'W/"v1"')
+        mock_response.json.assert_not_called()
+        mock_get.assert_called_with(
+            "http://testserver/get_clipboards",
+            params={"username": "u"},
+            headers={"If-None-Match": 'W/"v1"'},
+            timeout=30
+        )
+
+    @patch('requests.Session.get')
+    def test_get_returns_etag(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"ETag": 'W/"v2"'}
+        mock_response.json.return_value = {"success": True, "clipboards": []}
+        mock_get.return_value = mock_response
+
+        result = self.client.get("/get_clipboards", params={"username": "u"})
+
+        self.assertEqual(result["etag"], 'W/"v2"')
+
     @patch('requests.Session.get')
     def test_get_http_error(self, mock_get):
         mock_response = Mock()
@@ -199,7 +199,11 @@ class ClipboardDialog(QtWidgets.QDialog, Ui_Dialog):
 
         content_widget = QtWidgets.QWidget()
         content_widget_layout = QtWidgets.QVBoxLayout(content_widget)
-        content_label = QtWidgets.QLabel(record.get('content', '无内容'))
+        # 预览模式的记录只有截断的预览，完整内容在复制时再读取
+        preview_text = record.get('content', record.get('preview')) or '无内容'
+        if record.get('truncated') and 'content' not in record:
+            preview_text += '…'
+        content_label = QtWidgets.QLabel(preview_text)
         content_label.setWordWrap(True)
         content_widget_layout.addWidget(content_label)
         scroll_area.setWidget(content_widget)
@@ -211,7 +215,7 @@ class ClipboardDialog(QtWidgets.QDialog, Ui_Dialog):
         content_copy_btn = QtWidgets.QPushButton("复制")
         content_copy_btn.setFixedSize(80, 30)
         content_copy_btn.setStyleSheet("background-color: #4CAF50; color: white;")
-        content_copy_btn.clicked.connect(lambda: self.copy_content_only(record.get('content', '')))
+        content_copy_btn.clicked.connect(lambda: self.copy_record(record))
         btn_layout.addWidget(content_copy_btn)
 
         delete_btn = QtWidgets.QPushButton("删除")
@@ -225,6 +229,46 @@ class ClipboardDialog(QtWidgets.QDialog, Ui_Dialog):
         self.listWidget.addItem(item)
         self.listWidget.setItemWidget(item, widget)
 
+    def copy_record(self, record):
+        """复制记录内容：预览未截断时直接使用，否则从服务器读取完整内容（读取后缓存在记录中）"""
+        if 'content' not in record:
+            if record.get('truncated'):
+                content = self.fetch_full_content(record.get('clip_id'))
+                if content is None:
+                    return
+                record['content'] = content
+            else:
+                record['content'] = record.get('preview', '')
+        self.copy_content_only(record['content'])
+
+    def fetch_full_content(self, record_id):
+        """GET /clipboard/{clip_id}/content 读取完整内容，失败时返回None"""
+        if not self.api_url or not record_id or not self.token:
+            self.update_status("错误：无法读取内容，API信息不完整")
+            return None
+
+        try:
+            self.update_status("正在读取完整内容...")
+            url = f"{self.api_url.rstrip('/')}/clipboard/{record_id}/content"
+            headers = {'Authorization': f'Bearer {self.token}'}
+            response = requests.get(url, headers=headers, timeout=30)
+
+            if response.status_code != 200:
+                self.update_status(f"读取内容失败: {response.status_code}")
+                return None
+            if not response.headers.get('content-type', '').startswith('application/json'):
+                # 上传到磁盘的图片和文件以原始字节返回
+                self.update_status("该记录为文件，暂不支持复制为文本")
+                return None
+            return response.json().get('clipboard', {}).get('content', '')
+        except requests.exceptions.ConnectionError:
+            self.update_status("错误：无法连接到服务器")
+        except requests.exceptions.Timeout:
+            self.update_status("错误：请求超时，请检查网络连接")
+        except Exception as e:
+            self.update_status(f"读取内容时出错: {str(e)}")
+        return None
+
     def copy_content_only(self, content):
         # 设置忽略标志
         self.ignore_clipboard_change = True  # <-- 设置标志位
@@ -291,7 +335,8 @@ class ClipboardDialog(QtWidgets.QDialog, Ui_Dialog):
             self.update_status("正在从云端加载...")
             url = f"{self.api_url.rstrip('/')}/get_clipboards"
             headers = {'Authorization': f'Bearer {self.token}'}
-            response = requests.get(url, headers=headers, params={'username': self.username})
+            # 预览模式：列表只包含截断的预览，完整内容在复制时按需读取
+            response = requests.get(url, headers=headers, params={'username': self.username, 'fields': 'preview'})
 
             if response.status_code == 200:
                 result = response.json()
@@ -3,7 +3,7 @@
 """
 
 from fastapi import APIRouter, HTTPException, Request, Depends, status
-from fastapi.responses import JSONResponse
+from server.api.responses import FastJSONResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 from loguru import logger
@@ -13,7 +13,7 @@ from server.security import security_middleware, encryption_manager, token_manag
 from shared.utils import get_device_info
 
 
-auth_router = APIRouter(prefix="/auth", tags=["认证"])
+auth_router = APIRouter(prefix="/auth", tags=["认证"], default_response_class=FastJSONResponse)
 
 
 class LoginRequest(BaseModel):
@@ -35,14 +35,14 @@ class KeyExchangeRequest(BaseModel):
     encrypted_session_key: str  # 用服务器公钥加密的会话密钥
 
 
-def success_response(data: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+def success_response(data: Dict[str, Any], status_code: int = 200) -> FastJSONResponse:
     """返回成功响应"""
-    return JSONResponse(content=data, status_code=status_code)
+    return FastJSONResponse(content=data, status_code=status_code)
 
 
-def error_response(message: str, status_code: int = 400) -> JSONResponse:
+def error_response(message: str, status_code: int = 400) -> FastJSONResponse:
     """返回错误响应"""
-    return JSONResponse(content={"error": message}, status_code=status_code)
+    return FastJSONResponse(content={"error": message}, status_code=status_code)
 
 
 @auth_router.get("/public-key")
@@ -91,11 +91,6 @@ async def key_exchange(request: KeyExchangeRequest, req: Request):
 async def register(request: RegisterRequest, req: Request):
     """用户注册"""
     try:
-        # 验证速率限制
-        client_ip = req.client.host if req.client else "unknown"
-        if not security_middleware.check_rate_limit(client_ip):
-            return error_response("请求过于频繁，请稍后再试", 429)
-        
         # 验证输入
         if len(request.username) < 3:
             return error_response("用户名至少需要3个字符")
@@ -134,11 +129,6 @@ async def register(request: RegisterRequest, req: Request):
 async def login(request: LoginRequest, req: Request):
     """用户登录"""
     try:
-        # 验证速率限制
-        client_ip = req.client.host if req.client else "unknown"
-        if not security_middleware.check_rate_limit(client_ip):
-            return error_response("请求过于频繁，请稍后再试", 429)
-        
         # 如果没有提供设备信息，使用服务器检测的信息
         if not request.device_info:
             request.device_info = get_device_info()
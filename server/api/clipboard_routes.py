@@ -2,20 +2,45 @@
 剪切板相关的API路由
 """
 
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from server.api.responses import FastJSONResponse
+from pydantic import BaseModel, ValidationError
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from typing import Dict, Any, Optional, List, Tuple
+import asyncio
+import base64
+import re
 import time
+import uuid
+from datetime import datetime
 from loguru import logger
 
 from server.security import security_middleware, encryption_manager
 from server.redis_manager import redis_manager
+from server.api.ingest import (
+    PayloadTooLarge, max_batch_request_bytes, max_content_bytes, max_request_bytes, measure_content, receive_body
+)
+from server.api.compression import request_decoder
+from server.api.transfer import (
+    NDJSON_MEDIA_TYPE, decoded_stream, encode_lines, export_record, ndjson_lines, parse_import_line
+)
+from server.blobs import BlobTooLarge, blob_store
+from server.history_cache import COMPAT_TIME_FORMAT
+from server.records import blob_fields, preview_fields
 from shared.models import ClipboardItem, ClipboardType
-from shared.utils import calculate_checksum
+from shared.utils import config_manager
 
 
-clipboard_router = APIRouter(prefix="/clipboard", tags=["剪切板"])
+# 导入时保留的原条目ID格式（与生成的UUID兼容）
+ITEM_ID_PATTERN = re.compile(r"[0-9A-Za-z_-]{1,64}")
+
+# 导入响应中最多列出的失败行数
+IMPORT_MAX_ERRORS = 100
+
+
+clipboard_router = APIRouter(prefix="/clipboard", tags=["剪切板"], default_response_class=FastJSONResponse)
 
 
 class AddClipboardRequest(BaseModel):
@@ -26,6 +51,12 @@ class AddClipboardRequest(BaseModel):
     data: Optional[Dict[str, Any]] = None
 
 
+class BatchClipboardRequest(BaseModel):
+    device_id: str
+    # 每项: content, content_type, encrypted, data, client_id, created_at（逐项校验，单项错误不影响其他项）
+    items: List[Any]
+
+
 class DeleteClipboardRequest(BaseModel):
     clip_id: str
 
@@ -34,14 +65,14 @@ class ClearClipboardsRequest(BaseModel):
     pass
 
 
-def success_response(data: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+def success_response(data: Dict[str, Any], status_code: int = 200) -> FastJSONResponse:
     """返回成功响应"""
-    return JSONResponse(content=data, status_code=status_code)
+    return FastJSONResponse(content=data, status_code=status_code)
 
 
-def error_response(message: str, status_code: int = 400) -> JSONResponse:
+def error_response(message: str, status_code: int = 400) -> FastJSONResponse:
     """返回错误响应"""
-    return JSONResponse(content={"error": message}, status_code=status_code)
+    return FastJSONResponse(content={"error": message}, status_code=status_code)
 
 
 async def require_auth(request: Request) -> Dict[str, Any]:
@@ -52,9 +83,45 @@ async def require_auth(request: Request) -> Dict[str, Any]:
     return user_payload
 
 
+async def _parse_add_request(req: Request) -> Tuple[AddClipboardRequest, Optional[str], Optional[int]]:
+    """
+    接收单条写入的请求体（在线校验大小）
+    
+    JSON请求体解析为 AddClipboardRequest；text/* 请求体即内容本身（device_id 取自查询参数），
+    接收时已得到字节数和校验和，不再对内容做第二遍扫描
+    
+    Returns:
+        (请求, 校验和, 字节数)，JSON请求的校验和与字节数为None
+    """
+    request_type = req.headers.get('content-type', '')
+    if request_type.startswith('text/'):
+        body = await receive_body(req, max_content_bytes(), checksum=True)
+        try:
+            content = body.data.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ValueError("内容不是有效的UTF-8文本")
+        device_id = req.query_params.get('device_id')
+        if not device_id:
+            raise ValueError("缺少device_id参数")
+        request = AddClipboardRequest(
+            content=content,
+            device_id=device_id,
+            content_type=request_type.split(';')[0].strip()
+        )
+        return request, body.checksum, body.size
+    
+    body = await receive_body(req, max_request_bytes())
+    return AddClipboardRequest.model_validate_json(body.data), None, None
+
+
 @clipboard_router.post("/add")
-async def add_clipboard(request: AddClipboardRequest, req: Request):
-    """添加剪切板内容"""
+async def add_clipboard(req: Request):
+    """
+    添加剪切板内容
+    
+    请求体为 AddClipboardRequest 的JSON，或 text/* 原始文本（device_id 通过查询参数传递）；
+    先认证，再按块接收请求体，超过大小限制时立即返回413
+    """
     try:
         # 认证用户
         user_payload = await security_middleware.authenticate_request(req)
@@ -64,6 +131,15 @@ async def add_clipboard(request: AddClipboardRequest, req: Request):
         user_id = user_payload['user_id']
         username = user_payload['username']
         
+        try:
+            request, checksum, size = await _parse_add_request(req)
+        except PayloadTooLarge as e:
+            return error_response(str(e), 413)
+        except ValidationError as e:
+            return FastJSONResponse(content={"detail": e.errors(include_url=False, include_context=False)}, status_code=422)
+        except ValueError as e:
+            return error_response(str(e))
+        
         # 处理加密数据
         if request.encrypted and request.data:
             try:
@@ -74,9 +150,12 @@ async def add_clipboard(request: AddClipboardRequest, req: Request):
         else:
             content = request.content
         
-        # 验证内容长度
-        if len(content) > 10 * 1024 * 1024:  # 10MB限制
-            return error_response("内容过大，超过10MB限制", 413)
+        # 验证内容大小（按UTF-8字节计算，原始文本请求体在接收时已完成）
+        if checksum is None:
+            try:
+                size, checksum = measure_content(content)
+            except PayloadTooLarge as e:
+                return error_response(str(e), 413)
         
         # 兼容原始API：直接使用MIME类型，不转换为枚举
         # 这样保持与前端和原始服务器的完全兼容
@@ -88,10 +167,10 @@ async def add_clipboard(request: AddClipboardRequest, req: Request):
                 "encrypted": request.encrypted,
                 "original_content_type": request.content_type  # 保存原始content_type
             },
-            size=len(content.encode('utf-8')),
+            size=size,
             device_id=request.device_id,
             user_id=user_id,
-            checksum=calculate_checksum(content)
+            checksum=checksum
         )
         
         # 保存到Redis
@@ -103,12 +182,12 @@ async def add_clipboard(request: AddClipboardRequest, req: Request):
                     "clip_id": clipboard_item.id,
                     "content": content,
                     "content_type": request.content_type,
-                    "created_at": clipboard_item.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    "created_at": clipboard_item.created_at.strftime(COMPAT_TIME_FORMAT),
                     "device_id": request.device_id,
                     "checksum": clipboard_item.checksum
                 },
                 "source_device": request.device_id,
-                "timestamp": clipboard_item.created_at.isoformat()
+                "timestamp": clipboard_item.created_at
             }
             
             redis_manager.publish_clipboard_sync(user_id, sync_message['action'], sync_message['data'], sync_message.get('source_device'))
@@ -128,9 +207,622 @@ async def add_clipboard(request: AddClipboardRequest, req: Request):
         return error_response("添加剪切板内容失败", 500)
 
 
+# multipart请求体中边界和字段头的额外字节上限（Content-Length预检查时放宽）
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class _MultipartUpload:
+    """
+    从请求体流中增量解析 multipart/form-data，只取第一个文件字段的内容
+    
+    文件内容边接收边交给 blob_store.save_stream（写入时检查大小限制），不先缓存整个请求体；
+    字段头和其他字段的内容丢弃，总量超过 MULTIPART_OVERHEAD 时按内容过大处理
+    """
+    
+    def __init__(self, req: Request, boundary: bytes):
+        self.req = req
+        self.found = False
+        self.content_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+        self._file_done = False
+        self._pending: List[bytes] = []
+        self._overhead = 0
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+    
+    def _on_part_begin(self):
+        self._headers = {}
+    
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+        self._overhead += end - start
+    
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+        self._overhead += end - start
+    
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+    
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        if not self.found and b"filename" in options:
+            self.found = self._in_file = True
+            self.filename = options[b"filename"].decode("utf-8", "replace") or None
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+    
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._pending.append(data[start:end])
+        else:
+            self._overhead += end - start
+    
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+    
+    async def chunks(self):
+        """按块产生文件字段的内容，文件字段结束后不再读取请求体"""
+        async for data in self.req.stream():
+            self._parser.write(data)
+            if self._overhead > MULTIPART_OVERHEAD:
+                raise BlobTooLarge(f"multipart字段头和其他字段超过 {MULTIPART_OVERHEAD} 字节")
+            pending, self._pending = self._pending, []
+            for chunk in pending:
+                yield chunk
+            if self._file_done:
+                return
+        if self.found:
+            # 请求体在文件字段结束前中断，不能把截断的内容保存下来
+            raise MultipartParseError("multipart请求体不完整")
+
+
+@clipboard_router.post("/upload")
+async def upload_clipboard_blob(req: Request, device_id: str, content_type: Optional[str] = None,
+                                filename: Optional[str] = None):
+    """
+    流式上传图片或文件（请求体为原始字节，或只含一个文件字段的 multipart/form-data）
+    
+    内容按块写入磁盘并增量计算SHA-256，不经过JSON和base64；剪贴板项只保存元数据，
+    其他设备通过 GET /clipboard/{clip_id}/blob 下载
+    """
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        if not blob_store.enabled:
+            return error_response("服务器未启用文件上传", 404)
+        
+        user_id = user_payload['user_id']
+        request_type = req.headers.get('content-type', '')
+        is_multipart = request_type.startswith('multipart/form-data')
+        
+        # 声明的长度已超限时不读取请求体
+        declared = req.headers.get('content-length', '')
+        if declared.isdigit() and int(declared) > blob_store.max_size + (MULTIPART_OVERHEAD if is_multipart else 0):
+            return error_response(f"内容过大，超过{blob_store.max_size}字节限制", 413)
+        
+        upload = None
+        if is_multipart:
+            _, options = parse_options_header(request_type)
+            if not options.get(b"boundary"):
+                return error_response("无效的multipart请求体")
+            upload = _MultipartUpload(req, options[b"boundary"])
+            chunks = upload.chunks()
+        else:
+            content_type = content_type or request_type
+            chunks = req.stream()
+        
+        try:
+            blob_id, size = await blob_store.save_stream(chunks)
+        except BlobTooLarge:
+            return error_response(f"内容过大，超过{blob_store.max_size}字节限制", 413)
+        except MultipartParseError as e:
+            logger.warning(f"multipart请求体解析失败: {e}")
+            return error_response("无效的multipart请求体")
+        
+        if upload is not None:
+            if not upload.found:
+                return error_response("缺少文件字段")
+            content_type = content_type or upload.content_type
+            filename = filename or upload.filename
+        
+        if size == 0:
+            return error_response("内容不能为空")
+        
+        content_type = content_type or 'application/octet-stream'
+        clipboard_item = ClipboardItem(
+            type=ClipboardType.IMAGE if content_type.startswith('image/') else ClipboardType.FILE,
+            content="",  # 内容在磁盘上，通过 blob_id 下载
+            metadata={
+                "source": "upload",
+                "original_content_type": content_type,
+                "blob_id": blob_id,
+                "filename": filename or ""
+            },
+            size=size,
+            device_id=device_id,
+            user_id=user_id,
+            checksum=blob_id
+        )
+        
+        # 先记录引用再保存条目，回收任务不会删除已被条目引用的内容
+        if not redis_manager.add_blob_ref(user_id, clipboard_item.id, blob_id) \
+                or not redis_manager.save_clipboard_item(clipboard_item):
+            return error_response("保存剪切板内容失败", 500)
+        
+        logger.info(f"剪切板文件已上传: user={user_payload['username']}, size={size}, blob={blob_id[:12]}")
+        return success_response({
+            "success": True,
+            "clip_id": clipboard_item.id,
+            "blob_id": blob_id,
+            "size": size,
+            "checksum": blob_id,
+            "message": "剪切板内容已添加"
+        })
+        
+    except Exception as e:
+        logger.error(f"上传剪切板文件失败: {e}")
+        return error_response("上传剪切板文件失败", 500)
+
+
+@clipboard_router.get("/{clip_id}/blob")
+async def download_clipboard_blob(clip_id: str, req: Request):
+    """下载剪切板项的图片或文件内容（支持Range断点续传，内容不可变，可长期缓存）"""
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        
+        user_id = user_payload['user_id']
+        item = await asyncio.to_thread(redis_manager.get_clipboard_item, clip_id, user_id=user_id, with_content=False)
+        if not item or item.user_id != user_id or not item.metadata.get('blob_id'):
+            return error_response("内容不存在", 404)
+        
+        return _blob_response(item)
+        
+    except Exception as e:
+        logger.error(f"下载剪切板文件失败: {e}")
+        return error_response("下载剪切板文件失败", 500)
+
+
+def _blob_response(item: ClipboardItem):
+    """磁盘内容的流式响应（支持Range），文件不存在时返回404"""
+    blob_id = item.metadata['blob_id']
+    if not blob_store.exists(blob_id):
+        return error_response("内容不存在", 404)
+    
+    response = FileResponse(
+        blob_store.blob_path(blob_id),
+        media_type=item.metadata.get('original_content_type') or 'application/octet-stream',
+        filename=item.metadata.get('filename') or None,
+        headers={"Cache-Control": "private, max-age=31536000, immutable", "ETag": f'"{blob_id}"'}
+    )
+    response.chunk_size = blob_store.chunk_size
+    return response
+
+
+@clipboard_router.get("/{clip_id}/content")
+async def get_clipboard_content(clip_id: str, req: Request, encrypted: bool = False):
+    """
+    获取单个剪切板项的完整内容（预览模式的列表在用户复制时按需读取）
+    
+    上传到磁盘的图片和文件直接流式返回（同 /clipboard/{clip_id}/blob），其他条目返回JSON；
+    ETag为内容校验和，客户端可用 If-None-Match 避免重复下载
+    """
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        
+        user_id = user_payload['user_id']
+        item = await asyncio.to_thread(redis_manager.get_clipboard_item, clip_id, user_id=user_id)
+        if not item or item.user_id != user_id:
+            return error_response("内容不存在", 404)
+        
+        if item.metadata.get('blob_id'):
+            return _blob_response(item)
+        
+        content = item.content
+        headers = {}
+        if encrypted:
+            try:
+                content = encryption_manager.encrypt_clipboard_content(content, user_id)
+            except Exception as e:
+                logger.error(f"加密剪切板内容失败: {e}")
+                return error_response("数据加密失败", 500)
+        elif item.checksum:
+            etag = f'"{item.checksum}"'
+            if etag in [value.strip() for value in req.headers.get('if-none-match', '').split(',')]:
+                return Response(status_code=304, headers={"ETag": etag})
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        
+        return FastJSONResponse(content={
+            "success": True,
+            "clipboard": {
+                "id": item.id,
+                "content": content,
+                "content_type": item.metadata.get('original_content_type', 'text/plain'),
+                "timestamp": item.created_at,
+                "device_id": item.device_id,
+                "size": item.size,
+                "checksum": item.checksum,
+                "encrypted": encrypted
+            }
+        }, headers=headers)
+        
+    except Exception as e:
+        logger.error(f"获取剪切板内容失败: {e}")
+        return error_response("获取剪切板内容失败", 500)
+
+
+def _encode_cursor(score: float, item_id: str) -> str:
+    """分页游标：最后一条的 (时间戳分数, 条目ID)，base64url编码"""
+    return base64.urlsafe_b64encode(f"{score!r}:{item_id}".encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Optional[Tuple[float, str]]:
+    """解析分页游标，格式错误时返回None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        score, item_id = raw.split(':', 1)
+        return float(score), item_id
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _parse_client_time(value: Any, now: datetime) -> datetime:
+    """解析客户端记录的复制时间（ISO字符串或Unix时间戳），不晚于服务器当前时间"""
+    if value is None or value == "":
+        return now
+    if isinstance(value, (int, float)):
+        parsed = datetime.fromtimestamp(value)
+    else:
+        parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return min(parsed, now)
+
+
+def ingest_clipboard_batch(entries: List[Dict[str, Any]], user_id: str, device_id: str, source: str,
+                           keep_origin: bool = False) -> Dict[str, Any]:
+    """
+    批量写入剪切板项（HTTP /clipboard/batch、/clipboard/import 与 WebSocket clipboard_sync_batch 共用）
+    
+    逐项校验和解密，合法项一次pipeline写入并合并发布一条同步事件。
+    keep_origin 为True时（导入），条目沿用记录中的 id（格式无效时分配新ID），原 device_id 保存在
+    metadata.origin_device_id；条目本身归属执行导入的设备（原设备通常不在当前用户的设备集合中，
+    归属它的条目会被索引修复任务当作孤儿删除）
+    
+    Returns:
+        逐项结果（与输入顺序一致）、成功/失败数和写入后的同步版本号
+    """
+    now = datetime.now()
+    items = []
+    results = []
+    
+    for index, entry in enumerate(entries):
+        result = {"index": index, "client_id": entry.get("client_id") if isinstance(entry, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError("条目格式无效")
+            
+            if entry.get("encrypted") and entry.get("data"):
+                try:
+                    content = encryption_manager.decrypt_clipboard_content(entry["data"], user_id)
+                except Exception as e:
+                    logger.error(f"解密剪切板内容失败: {e}")
+                    raise ValueError("数据解密失败")
+            else:
+                content = entry.get("content")
+            
+            if not isinstance(content, str) or not content:
+                raise ValueError("内容不能为空")
+            size, checksum = measure_content(content)
+            
+            try:
+                created_at = _parse_client_time(entry.get("created_at"), now)
+            except (TypeError, ValueError, OverflowError, OSError):
+                raise ValueError("created_at 格式无效")
+            
+        except (ValueError, PayloadTooLarge) as e:
+            result.update({"success": False, "error": str(e)})
+            continue
+        
+        metadata = {
+            "source": source,
+            "encrypted": bool(entry.get("encrypted")),
+            "original_content_type": entry.get("content_type") or "text/plain"
+        }
+        item_id = None
+        if keep_origin:
+            if isinstance(entry.get("id"), str) and ITEM_ID_PATTERN.fullmatch(entry["id"]):
+                item_id = entry["id"]
+            if isinstance(entry.get("device_id"), str) and entry["device_id"]:
+                metadata["origin_device_id"] = entry["device_id"]
+        
+        clipboard_item = ClipboardItem(
+            id=item_id or str(uuid.uuid4()),
+            type=ClipboardType.TEXT,  # 与单条接口一致，原始类型保存在metadata
+            content=content,
+            metadata=metadata,
+            size=size,
+            created_at=created_at,
+            updated_at=created_at,
+            device_id=device_id,
+            user_id=user_id,
+            checksum=checksum
+        )
+        result["clip_id"] = clipboard_item.id
+        items.append((result, clipboard_item))
+    
+    saved, version = redis_manager.save_clipboard_items(user_id, [item for _, item in items], source_device=device_id)
+    for (result, _), ok in zip(items, saved):
+        result["success"] = ok
+        if not ok:
+            result.pop("clip_id", None)
+            result["error"] = "保存剪切板内容失败"
+    
+    saved_count = sum(1 for result in results if result["success"])
+    return {
+        "results": results,
+        "saved": saved_count,
+        "failed": len(results) - saved_count,
+        "version": version
+    }
+
+
+@clipboard_router.post("/batch")
+async def add_clipboard_batch(req: Request):
+    """批量添加剪切板内容（离线恢复后回放队列等场景），请求体为 BatchClipboardRequest 的JSON"""
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        
+        try:
+            body = await receive_body(req, max_batch_request_bytes())
+            request = BatchClipboardRequest.model_validate_json(body.data)
+        except PayloadTooLarge as e:
+            return error_response(str(e), 413)
+        except ValidationError as e:
+            return FastJSONResponse(content={"detail": e.errors(include_url=False, include_context=False)}, status_code=422)
+        
+        max_items = config_manager.get('clipboard.batch_max_items', 500)
+        if not request.items:
+            return error_response("批量内容不能为空")
+        if len(request.items) > max_items:
+            return error_response(f"单次批量最多 {max_items} 条", 413)
+        
+        batch = ingest_clipboard_batch(request.items, user_payload['user_id'], request.device_id, "api_batch")
+        return success_response({
+            "success": batch["failed"] == 0,
+            **batch
+        })
+        
+    except Exception as e:
+        logger.error(f"批量添加剪切板内容失败: {e}")
+        return error_response("批量添加剪切板内容失败", 500)
+
+
+def _export_chunks(user_id: str, position: Optional[Tuple[float, str]], limit: Optional[int]):
+    """
+    逐页读取并编码导出内容（同步生成器，由StreamingResponse在线程池中迭代，不阻塞事件循环）
+    
+    最后一行为 {"type": "end"}；读取出错时以 {"type": "error"} 结束，cursor 为已导出的最后一条
+    """
+    page_size = config_manager.get('clipboard.export_page_size', 200)
+    exported = 0
+    last_cursor = None
+    try:
+        for items, _ in redis_manager.iter_clipboard_pages(user_id, position, page_size, with_content=True):
+            if limit is not None:
+                items = items[:limit - exported]
+            records = [export_record(item, _encode_cursor(item.created_at.timestamp(), item.id)) for item in items]
+            if records:
+                exported += len(records)
+                last_cursor = records[-1]["cursor"]
+                yield encode_lines(records)
+            if limit is not None and exported >= limit:
+                yield encode_lines([{"type": "end", "exported": exported, "next_cursor": last_cursor}])
+                return
+        yield encode_lines([{"type": "end", "exported": exported, "next_cursor": None}])
+    except Exception as e:
+        logger.error(f"导出剪切板历史失败: {e}")
+        yield encode_lines([{"type": "error", "message": "导出剪切板历史失败", "exported": exported, "cursor": last_cursor}])
+
+
+@clipboard_router.get("/export")
+async def export_clipboards(req: Request, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    以NDJSON流导出剪切板历史（从新到旧，每行一条，跨越Redis和归档）
+    
+    每条记录带 cursor：下载中断后用最后收到的 cursor 继续导出。limit 限制本次导出的条数，
+    结束行的 next_cursor 不为空时表示还有更多。响应按 Accept-Encoding 压缩
+    """
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        
+        position = None
+        if cursor:
+            position = _decode_cursor(cursor)
+            if position is None:
+                return error_response("无效的分页游标")
+        
+        logger.info(f"导出剪切板历史: user={user_payload['username']}")
+        return StreamingResponse(
+            _export_chunks(user_payload['user_id'], position, limit if limit and limit > 0 else None),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": 'attachment; filename="clipboard-export.ndjson"',
+                "Cache-Control": "no-store"
+            }
+        )
+        
+    except Exception as e:
+        logger.error(f"导出剪切板历史失败: {e}")
+        return error_response("导出剪切板历史失败", 500)
+
+
+def _import_error(summary: Dict[str, Any], line_no: int, message: str):
+    """记录导入失败的行（最多 IMPORT_MAX_ERRORS 条）"""
+    if len(summary["errors"]) < IMPORT_MAX_ERRORS:
+        summary["errors"].append({"line": line_no, "error": message})
+
+
+async def _import_chunk(chunk: List[Tuple[int, Dict[str, Any]]], user_id: str, device_id: str,
+                        summary: Dict[str, Any]):
+    """
+    写入一块导入记录（一次pipeline）
+    
+    已在当前用户历史中（热数据或归档）的记录跳过，中断后重传同一文件不会产生重复条目；
+    ID属于其他用户时改用由 (用户, 原ID) 派生的固定ID，重复导入同样可以识别。
+    启用归档时写入不裁剪，随后把超出热数据上限的条目迁移到归档；否则按 max_history 裁剪，
+    裁剪掉的条目计入 dropped 并删除其哈希。imported 只统计写入后仍在历史中的条目
+    """
+    ids = []
+    originals = [str(entry.get("id") or "") for _, entry in chunk]
+    for original, owner in zip(originals, redis_manager.get_item_owners(originals)):
+        if original and owner is not None and owner != user_id:
+            original = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_id}/{original}"))
+        ids.append(original)
+    # 归档索引可能需要从磁盘加载，在线程中检查
+    retained = await asyncio.to_thread(redis_manager.get_retained_items, user_id, ids)
+    pending = []
+    for (line_no, entry), item_id, kept in zip(chunk, ids, retained):
+        if item_id and kept:
+            summary["skipped"] += 1
+            continue
+        pending.append((line_no, {**entry, "id": item_id} if item_id else entry))
+    if not pending:
+        return
+    
+    # 在事件循环中写入（块大小有上限）：写入会更新进程内的历史缓存，不能放到线程中
+    batch = ingest_clipboard_batch([entry for _, entry in pending], user_id, device_id, "import", keep_origin=True)
+    if redis_manager.archive.enabled:
+        # 迁移只读写Redis和归档文件，不涉及历史缓存
+        await asyncio.to_thread(redis_manager.archive_user_history, user_id)
+    
+    saved_ids = []
+    for result in batch["results"]:
+        if result["success"]:
+            saved_ids.append(result["clip_id"])
+        else:
+            _import_error(summary, pending[result["index"]][0], result["error"])
+    retained = await asyncio.to_thread(redis_manager.get_retained_items, user_id, saved_ids)
+    dropped = [item_id for item_id, kept in zip(saved_ids, retained) if not kept]
+    redis_manager.unlink_clipboard_items(dropped)
+    summary["imported"] += len(saved_ids) - len(dropped)
+    summary["dropped"] += len(dropped)
+    summary["failed"] += batch["failed"]
+    if batch["version"] is not None:
+        summary["version"] = batch["version"]
+
+
+@clipboard_router.post("/import")
+async def import_clipboards(req: Request, device_id: str):
+    """
+    导入NDJSON格式的剪切板历史（GET /clipboard/export 的输出，或每行一个含 content 的JSON对象）
+    
+    请求体按块接收和解析（Content-Encoding 支持 gzip/deflate），
+    每 import_chunk_items 条或 import_chunk_bytes 字节写入一次，内存占用与导入总量无关。
+    记录沿用原 id（同一服务器上原ID属于其他用户时使用派生ID），归属 device_id 指定的设备，原设备ID保存在 metadata.origin_device_id；磁盘上的图片和文件不随导出传输，跳过。
+    启用归档时超出热数据上限的条目随即迁移到归档；未启用时遵循与普通写入相同的 clipboard.max_history 保留规则，
+    被裁剪的条目计入 dropped，imported 为导入后仍在历史中的条目数。
+    出错时已写入的块保留，响应的 lines 为已处理到的行号，重传整个文件即可继续
+    """
+    try:
+        # 认证用户
+        user_payload = await security_middleware.authenticate_request(req)
+        if not user_payload:
+            return error_response("未认证的请求", 401)
+        
+        try:
+            decoder = request_decoder(req.headers.get('content-encoding', ''))
+        except ValueError as e:
+            return error_response(str(e), 415)
+        
+        user_id = user_payload['user_id']
+        chunk_items = config_manager.get('clipboard.import_chunk_items', 200)
+        chunk_bytes = config_manager.get('clipboard.import_chunk_bytes', 4 * 1024 * 1024)
+        summary = {"imported": 0, "skipped": 0, "dropped": 0, "failed": 0, "lines": 0, "errors": [],
+                   "version": None}
+        chunk = []
+        pending_bytes = 0
+        line_no = 0
+        
+        try:
+            async for line_no, line in ndjson_lines(decoded_stream(req, decoder), max_request_bytes()):
+                try:
+                    entry = parse_import_line(line)
+                except ValueError as e:
+                    summary["failed"] += 1
+                    _import_error(summary, line_no, str(e))
+                    continue
+                if entry is None:
+                    continue
+                if entry.get("blob_id"):
+                    summary["skipped"] += 1
+                    _import_error(summary, line_no, "磁盘上的图片和文件不随导出传输，已跳过")
+                    continue
+                
+                chunk.append((line_no, entry))
+                pending_bytes += len(line)
+                if len(chunk) >= chunk_items or pending_bytes >= chunk_bytes:
+                    await _import_chunk(chunk, user_id, device_id, summary)
+                    summary["lines"] = line_no
+                    chunk = []
+                    pending_bytes = 0
+            
+            if chunk:
+                await _import_chunk(chunk, user_id, device_id, summary)
+            summary["lines"] = line_no
+            
+        except (PayloadTooLarge, ValueError) as e:
+            return FastJSONResponse(
+                content={"success": False, "error": str(e), **summary},
+                status_code=413 if isinstance(e, PayloadTooLarge) else 400
+            )
+        
+        logger.info(f"导入剪切板历史: user={user_payload['username']}, imported={summary['imported']}, "
+                    f"skipped={summary['skipped']}, dropped={summary['dropped']}, failed={summary['failed']}")
+        return success_response({"success": summary["failed"] == 0, **summary})
+        
+    except Exception as e:
+        logger.error(f"导入剪切板历史失败: {e}")
+        return error_response("导入剪切板历史失败", 500)
+
+
 @clipboard_router.get("/list")
-async def get_clipboards(req: Request, encrypted: bool = False):
-    """获取剪切板历史"""
+async def get_clipboards(req: Request, encrypted: bool = False, cursor: Optional[str] = None, limit: int = 50,
+                         fields: Optional[str] = None):
+    """
+    获取剪切板历史
+    
+    第一页不带cursor；响应中的 next_cursor 不为空时，带上它读取下一页（历史跨越Redis和归档时同样适用）。
+    fields=preview 时只读取元数据，每条用截断的 preview 代替 content，完整内容通过 GET /clipboard/{id}/content 读取
+    """
     try:
         # 认证用户
         user_payload = await security_middleware.authenticate_request(req)
@@ -139,45 +831,62 @@ async def get_clipboards(req: Request, encrypted: bool = False):
         
         user_id = user_payload['user_id']
         username = user_payload['username']
+        limit = max(1, min(limit, 200))
+        preview = fields == "preview"
         
         # 获取剪切板历史
-        history = redis_manager.get_user_clipboard_history(user_id, page=1, per_page=50)
+        if cursor:
+            position = _decode_cursor(cursor)
+            if position is None:
+                return error_response("无效的分页游标")
+            # 游标页可能落在归档中（读取和解压数据块），在线程中执行
+            items, next_position = await asyncio.to_thread(
+                redis_manager.get_clipboard_page, user_id, position, limit, with_content=not preview
+            )
+            total = None
+        else:
+            history = await redis_manager.fetch_user_clipboard_history(user_id, page=1, per_page=limit, with_content=not preview)
+            items, total = history.items, history.total
+            next_position = None
+            if len(items) == limit and total > limit:
+                next_position = (items[-1].created_at.timestamp(), items[-1].id)
         
-        # 处理加密
+        # 处理加密（条目可能来自共享的历史缓存，不能原地修改）
+        entries = {item.id: preview_fields(item) if preview else {"content": item.content} for item in items}
+        text_field = "preview" if preview else "content"
         if encrypted:
             try:
-                # 加密每个剪切板项的内容
-                for item in history.items:
-                    if hasattr(item, 'content'):
-                        encrypted_content = encryption_manager.encrypt_clipboard_content(
-                            item.content, user_id
-                        )
-                        item.content = encrypted_content
-                        item.encrypted = True
+                # 加密每个剪切板项的内容（预览模式下加密预览）
+                for item in items:
+                    entries[item.id][text_field] = encryption_manager.encrypt_clipboard_content(
+                        entries[item.id][text_field], user_id
+                    )
             except Exception as e:
                 logger.error(f"加密剪切板内容失败: {e}")
                 return error_response("数据加密失败", 500)
         
-        logger.debug(f"获取剪切板历史: user={username}, count={len(history.items)}")
+        logger.debug(f"获取剪切板历史: user={username}, count={len(items)}")
         
         return success_response({
             "success": True,
             "clipboards": [
                 {
                     "id": item.id,
-                    "content": item.content,
                     "content_type": item.metadata.get('original_content_type', 'text/plain'),
-                    "timestamp": item.created_at.isoformat(),
+                    "timestamp": item.created_at,
                     "device_id": item.device_id,
                     "size": item.size,
                     "checksum": item.checksum,
-                    "encrypted": getattr(item, 'encrypted', False)
+                    "encrypted": encrypted,
+                    **blob_fields(item),
+                    **entries[item.id]
                 }
-                for item in history.items
+                for item in items
             ],
-            "total": history.total,
-            "page": history.page,
-            "per_page": history.per_page
+            "total": total,
+            "page": 1 if not cursor else None,
+            "per_page": limit,
+            "next_cursor": _encode_cursor(*next_position) if next_position else None
         })
         
     except Exception as e:
@@ -197,7 +906,7 @@ async def get_latest_clipboard(req: Request, encrypted: bool = False):
         user_id = user_payload['user_id']
         
         # 获取最新的剪切板项
-        latest_item = redis_manager.get_latest_clipboard_item(user_id)
+        latest_item = await redis_manager.fetch_latest_clipboard_item(user_id)
         
         if not latest_item:
             return success_response({
@@ -227,11 +936,12 @@ async def get_latest_clipboard(req: Request, encrypted: bool = False):
                 "id": latest_item.id,
                 "content": content,
                 "content_type": latest_item.type.value,
-                "timestamp": latest_item.created_at.isoformat(),
+                "timestamp": latest_item.created_at,
                 "device_id": latest_item.device_id,
                 "size": latest_item.size,
                 "checksum": latest_item.checksum,
-                "encrypted": is_encrypted
+                "encrypted": is_encrypted,
+                **blob_fields(latest_item)
             }
         })
         
@@ -253,7 +963,7 @@ async def delete_clipboard(clip_id: str, req: Request):
         username = user_payload['username']
         
         # 删除剪切板项
-        success = redis_manager.delete_clipboard_item(clip_id)
+        success = await redis_manager.remove_clipboard_item(clip_id, user_id=user_id)
         
         if success:
             # 发布同步消息
@@ -292,20 +1002,10 @@ async def clear_clipboards(req: Request):
         user_id = user_payload['user_id']
         username = user_payload['username']
         
-        # 清空剪切板
-        success = redis_manager.clear_user_clipboard_history(user_id)
+        # 清空剪切板（同步消息由 clear_user_clipboard_history 随版本号一起发布）
+        success = redis_manager.clear_user_clipboard_history(user_id, user_payload['device_id'])
         
         if success:
-            # 发布同步消息
-            sync_message = {
-                "action": "clear",
-                "data": {},
-                "source_device": user_payload['device_id'],
-                "timestamp": str(int(time.time()))
-            }
-            
-            redis_manager.publish_clipboard_sync(user_id, sync_message['action'], sync_message['data'], sync_message.get('source_device'))
-            
             logger.info(f"剪切板已清空: user={username}")
             
             return success_response({
@@ -332,7 +1032,7 @@ async def get_clipboard_stats(req: Request):
         user_id = user_payload['user_id']
         
         # 获取统计信息
-        stats = redis_manager.get_user_clipboard_stats(user_id)
+        stats = await asyncio.to_thread(redis_manager.get_user_clipboard_stats, user_id)
         
         return success_response({
             "success": True,
@@ -0,0 +1,306 @@
+"""
+HTTP响应压缩中间件
+按请求的 Accept-Encoding 协商 zstd / br / gzip（zstandard、brotli 未安装时只提供gzip），
+跳过小响应体、已压缩的内容类型（图片、压缩包等）和支持Range的文件下载。
+完整响应体超过 offload_size 时在线程中压缩，不阻塞事件循环；流式响应逐块压缩并立即刷出。
+请求体（如 /clipboard/import 的NDJSON流）按 Content-Encoding 增量解压，只接受gzip/deflate（输出大小可控）。
+"""
+
+import asyncio
+import gzip
+import zlib
+from typing import Callable, Dict, Iterator, Optional
+
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from shared.utils import config_manager
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+# 默认不压缩的内容类型前缀（本身已压缩，再压缩只浪费CPU）
+DEFAULT_EXCLUDED_TYPES = [
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip", "application/zstd",
+    "application/x-7z-compressed", "application/x-rar-compressed", "application/octet-stream",
+    "text/event-stream"
+]
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+        self._stream = None
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def start(self):
+        self._stream = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._stream.compress(data) + self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._stream.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self.quality = quality
+        self._stream = None
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.quality)
+
+    def start(self):
+        self._stream = brotli.Compressor(quality=self.quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._stream.process(data) + self._stream.flush()
+
+    def finish(self) -> bytes:
+        return self._stream.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self.level = level
+        self._stream = None
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def start(self):
+        self._stream = zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._stream.compress(data) + self._stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._stream.flush()
+
+
+class ZlibDecoder:
+    """gzip/deflate请求体的增量解压，每次输出不超过max_output字节（压缩炸弹不会一次性占满内存）"""
+
+    def __init__(self):
+        self._stream = zlib.decompressobj(47)  # 自动识别gzip和zlib头
+
+    def decompress(self, data: bytes, max_output: int) -> Iterator[bytes]:
+        try:
+            while data and not self._stream.eof:
+                output = self._stream.decompress(data, max_output)
+                data = self._stream.unconsumed_tail
+                if output:
+                    yield output
+        except zlib.error as e:
+            raise ValueError(f"请求体解压失败: {e}")
+
+    def flush(self) -> bytes:
+        return self._stream.flush()
+
+
+def request_decoder(content_encoding: str):
+    """
+    按请求的 Content-Encoding 创建解压器，未压缩时返回None，不支持的编码抛出 ValueError
+
+    请求体只接受gzip/deflate：brotli、zstandard的增量解压接口不能限制单次调用的输出大小，
+    很小的请求体可能一次解压出数GB
+    """
+    encoding = content_encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        return ZlibDecoder()
+    raise ValueError(f"不支持的请求体编码: {content_encoding}")
+
+
+def available_encodings(config: Dict) -> Dict[str, Callable[[], object]]:
+    """当前环境可用的编码 -> 编码器工厂"""
+    encodings = {"gzip": lambda: GzipEncoder(config.get('gzip_level', 6))}
+    if BROTLI_AVAILABLE:
+        encodings["br"] = lambda: BrotliEncoder(config.get('brotli_quality', 5))
+    if ZSTD_AVAILABLE:
+        encodings["zstd"] = lambda: ZstdEncoder(config.get('zstd_level', 3))
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 编码 -> q值"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 协商压缩响应体的ASGI中间件"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        config = config_manager.get('compression', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.minimum_size = config.get('minimum_size', 1024)  # 小于该字节数的响应体不压缩
+        self.offload_size = config.get('offload_size', 256 * 1024)  # 超过该字节数的响应体在线程中压缩
+        self.excluded_types = config.get('excluded_types') or DEFAULT_EXCLUDED_TYPES
+        encodings = available_encodings(config)
+        # 服务器偏好顺序，只保留当前环境可用的编码
+        self.preference = [name for name in config.get('preference', ["zstd", "br", "gzip"]) if name in encodings]
+        self.encodings = encodings
+
+    def select_encoding(self, header: str) -> Optional[str]:
+        """在客户端接受的编码中选择服务器最偏好的一种，都不接受时返回None"""
+        if not header:
+            return None
+        accepted = parse_accept_encoding(header)
+        wildcard = accepted.get("*", 0.0)
+        for name in self.preference:
+            if accepted.get(name, wildcard) > 0:
+                return name
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.enabled or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+    def compressible(self, headers: Headers, status: int) -> bool:
+        """响应是否适合压缩（不看大小）"""
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        # 文件下载支持Range，压缩后字节范围不再对应原文件
+        if headers.get("accept-ranges", "none") != "none":
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return not any(content_type.startswith(prefix) for prefix in self.excluded_types)
+
+
+class CompressionResponder:
+    """包装单个请求的send：缓存响应头直到收到第一块响应体，再决定是否压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            # http.response.pathsend 等扩展消息原样转发
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        if self.start_message is not None:
+            await self._start(message)
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            await self._send_chunk(message)
+
+    async def _start(self, message: Message):
+        """处理第一块响应体：决定直接转发、整体压缩或流式压缩"""
+        start, self.start_message = self.start_message, None
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        middleware = self.middleware
+
+        if not middleware.compressible(headers, start["status"]):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is None or (not more_body and len(body) < middleware.minimum_size):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        self.encoder = middleware.encodings[self.encoding]()
+        headers["Content-Encoding"] = self.encoding
+        if not more_body:
+            # 完整响应体：一次压缩，较大时放到线程中
+            try:
+                if len(body) >= middleware.offload_size:
+                    compressed = await asyncio.to_thread(self.encoder.compress, body)
+                else:
+                    compressed = self.encoder.compress(body)
+            except Exception as e:
+                logger.error(f"压缩响应失败: {e}")
+                del headers["Content-Encoding"]
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # 流式响应：长度未知，逐块压缩
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        self.encoder.start()
+        await self.send(start)
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message: Message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if len(body) >= self.middleware.offload_size:
+            data = await asyncio.to_thread(self.encoder.chunk, body)
+        else:
+            data = self.encoder.chunk(body) if body else b""
+        if not more_body:
+            data += self.encoder.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
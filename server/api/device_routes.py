@@ -3,7 +3,7 @@
 """
 
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from server.api.responses import FastJSONResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from loguru import logger
@@ -13,7 +13,7 @@ from server.auth import auth_manager
 from server.redis_manager import redis_manager
 
 
-device_router = APIRouter(prefix="/devices", tags=["设备管理"])
+device_router = APIRouter(prefix="/devices", tags=["设备管理"], default_response_class=FastJSONResponse)
 
 
 class UpdateDeviceLabelRequest(BaseModel):
@@ -25,14 +25,14 @@ class RemoveDeviceRequest(BaseModel):
     device_id: str
 
 
-def success_response(data: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+def success_response(data: Dict[str, Any], status_code: int = 200) -> FastJSONResponse:
     """返回成功响应"""
-    return JSONResponse(content=data, status_code=status_code)
+    return FastJSONResponse(content=data, status_code=status_code)
 
 
-def error_response(message: str, status_code: int = 400) -> JSONResponse:
+def error_response(message: str, status_code: int = 400) -> FastJSONResponse:
     """返回错误响应"""
-    return JSONResponse(content={"error": message}, status_code=status_code)
+    return FastJSONResponse(content={"error": message}, status_code=status_code)
 
 
 @device_router.get("/list")
@@ -50,6 +50,9 @@ async def get_devices(req: Request):
         # 获取用户设备列表
         devices = auth_manager.get_user_devices(user_id)
         
+        # 一次读取所有设备的在线状态
+        presence = redis_manager.get_devices_presence(user_id)
+        
         # 格式化设备信息
         device_list = []
         for device in devices:
@@ -58,14 +61,13 @@ async def get_devices(req: Request):
                 "label": device.label,
                 "device_type": device.device_type,
                 "os_info": device.os_info,
-                "last_seen": device.last_seen.isoformat() if device.last_seen else None,
+                "last_seen": device.last_seen,
                 "is_current": device.id == user_payload['device_id'],
-                "created_at": device.created_at.isoformat() if device.created_at else None
+                "created_at": device.created_at
             }
             
             # 检查设备在线状态
-            is_online = redis_manager.is_device_online(user_id, device.id)
-            device_info["is_online"] = is_online
+            device_info["is_online"] = device.id in presence
             
             device_list.append(device_info)
         
@@ -197,9 +199,9 @@ async def get_device_status(device_id: str, req: Request):
                 "label": device.label,
                 "device_type": device.device_type,
                 "os_info": device.os_info,
-                "last_seen": device.last_seen.isoformat() if device.last_seen else None,
+                "last_seen": device.last_seen,
                 "is_online": is_online,
-                "created_at": device.created_at.isoformat() if device.created_at else None,
+                "created_at": device.created_at,
                 "stats": stats
             }
         })
@@ -227,10 +229,11 @@ async def get_devices_stats(req: Request):
         total_devices = len(devices)
         online_devices = 0
         device_types = {}
+        presence = redis_manager.get_devices_presence(user_id)
         
         for device in devices:
             # 检查在线状态
-            if redis_manager.is_device_online(user_id, device.id):
+            if device.id in presence:
                 online_devices += 1
             
             # 统计设备类型
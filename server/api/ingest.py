@@ -0,0 +1,95 @@
+"""
+请求体接收层
+在接收过程中执行大小限制：先检查 Content-Length，再按块读取，累计超限时立即中止，
+超大或恶意的请求体不会在被拒绝之前占满内存。
+原始字节请求体在接收的同时增量计算字节数和SHA-256，内容不需要第二遍扫描。
+"""
+
+import hashlib
+from typing import Tuple
+
+from fastapi import Request
+
+from shared.utils import config_manager
+
+
+class PayloadTooLarge(Exception):
+    """请求体或消息超过大小限制"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"内容过大，超过{limit // (1024 * 1024)}MB限制")
+        self.limit = limit
+
+
+# JSON请求中base64编码和转义会放大内容，请求体上限在内容上限基础上留出的余量
+JSON_OVERHEAD = 64 * 1024
+
+
+def max_content_bytes() -> int:
+    """单条剪贴板内容的字节上限（UTF-8编码后）"""
+    return config_manager.get('clipboard.max_data_size', 10 * 1024 * 1024)
+
+
+def max_request_bytes() -> int:
+    """单条写入的JSON请求体字节上限"""
+    return config_manager.get('clipboard.max_request_size') or max_content_bytes() * 4 // 3 + JSON_OVERHEAD
+
+
+def max_batch_request_bytes() -> int:
+    """批量写入的JSON请求体字节上限"""
+    return config_manager.get('clipboard.max_batch_request_size', 64 * 1024 * 1024)
+
+
+def max_websocket_message_bytes() -> int:
+    """WebSocket单条消息的字节上限（同时作为ASGI服务器的 ws_max_size）"""
+    return config_manager.get('websocket.max_message_size') or max_request_bytes()
+
+
+class ReceivedBody:
+    """已接收的请求体"""
+
+    __slots__ = ('data', 'size', 'checksum')
+
+    def __init__(self, data: bytes, size: int, checksum: str = None):
+        self.data = data
+        self.size = size
+        self.checksum = checksum
+
+
+async def receive_body(request: Request, limit: int, checksum: bool = False) -> ReceivedBody:
+    """
+    按块接收请求体，超过limit字节时抛出 PayloadTooLarge（不再继续读取）
+
+    Args:
+        checksum: 是否在接收时增量计算SHA-256（与 calculate_checksum 对UTF-8文本的结果一致）
+    """
+    declared = request.headers.get('content-length', '')
+    if declared.isdigit() and int(declared) > limit:
+        raise PayloadTooLarge(limit)
+
+    digest = hashlib.sha256() if checksum else None
+    buffer = bytearray()
+    async for chunk in request.stream():
+        if len(buffer) + len(chunk) > limit:
+            raise PayloadTooLarge(limit)
+        buffer += chunk
+        if digest is not None:
+            digest.update(chunk)
+    return ReceivedBody(bytes(buffer), len(buffer), digest.hexdigest() if digest is not None else None)
+
+
+def measure_content(content: str, limit: int = None) -> Tuple[int, str]:
+    """
+    检查文本内容的UTF-8字节数并计算校验和（只编码一次），超过limit时抛出 PayloadTooLarge
+
+    Returns:
+        (字节数, SHA-256十六进制摘要)
+    """
+    limit = limit or max_content_bytes()
+    # 字符数不超过字节数：字符数已超限时无需编码
+    if len(content) > limit:
+        raise PayloadTooLarge(limit)
+    encoded = content.encode('utf-8')
+    if len(encoded) > limit:
+        raise PayloadTooLarge(limit)
+    return len(encoded), hashlib.sha256(encoded).hexdigest()
@@ -0,0 +1,15 @@
+"""
+API响应类
+"""
+
+from typing import Any
+from fastapi.responses import JSONResponse
+
+from shared import serialization
+
+
+class FastJSONResponse(JSONResponse):
+    """使用共享序列化层编码的JSON响应，datetime等类型可直接放入响应内容"""
+
+    def render(self, content: Any) -> bytes:
+        return serialization.dumps(content)
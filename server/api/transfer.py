@@ -0,0 +1,106 @@
+"""
+剪切板历史导出/导入的NDJSON流处理
+导出按页读取存储，每页编码为一块NDJSON输出；导入按块接收和解压请求体，逐行解析。
+两个方向都不在内存中保留完整历史，内存占用只取决于页/块大小。
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+
+from server.api.ingest import PayloadTooLarge
+from shared import serialization
+from shared.models import ClipboardItem
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# 解压时单次输出的字节上限
+DECOMPRESS_CHUNK = 256 * 1024
+
+
+def export_record(item: ClipboardItem, cursor: str) -> Dict[str, Any]:
+    """导出文件中的一条记录（cursor 为从这条之后继续导出的游标）"""
+    record = {
+        "type": "clipboard",
+        "id": item.id,
+        "content": item.content,
+        "content_type": item.metadata.get('original_content_type', 'text/plain'),
+        "created_at": item.created_at,
+        "device_id": item.metadata.get('origin_device_id', item.device_id),  # 导入的条目保留最初的设备
+        "size": item.size,
+        "checksum": item.checksum,
+        "cursor": cursor
+    }
+    if item.metadata.get('blob_id'):
+        # 磁盘上的图片和文件只导出元数据，内容通过 GET /clipboard/{id}/blob 下载
+        record["blob_id"] = item.metadata['blob_id']
+        record["filename"] = item.metadata.get('filename', "")
+    return record
+
+
+def encode_lines(records: Iterable[Dict[str, Any]]) -> bytes:
+    """把一批记录编码为NDJSON（每条一行，以换行结尾）"""
+    return b"".join(serialization.dumps(record) + b"\n" for record in records)
+
+
+async def decoded_stream(request: Request, decoder) -> AsyncIterator[bytes]:
+    """按块接收请求体，有 Content-Encoding 时增量解压"""
+    async for chunk in request.stream():
+        if decoder is None:
+            if chunk:
+                yield chunk
+            continue
+        for output in decoder.decompress(chunk, DECOMPRESS_CHUNK):
+            yield output
+    if decoder is not None:
+        tail = decoder.flush()
+        if tail:
+            yield tail
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    把字节流切分为行，逐行产出 (行号, 内容)，行号从1开始（空行也计数）
+
+    单行超过 max_line 字节时抛出 PayloadTooLarge，不等待这一行接收完整
+    """
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            if end - start > max_line:
+                raise PayloadTooLarge(max_line)
+            line_no += 1
+            yield line_no, bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line:
+            raise PayloadTooLarge(max_line)
+    if buffer.strip():
+        yield line_no + 1, bytes(buffer)
+
+
+def parse_import_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """
+    解析导入文件的一行，返回剪切板记录；空行和导出的控制行（结束、错误）返回None
+
+    Raises:
+        ValueError: 不是JSON对象
+    """
+    if not line.strip():
+        return None
+    try:
+        entry = serialization.loads(line)
+    except ValueError:
+        raise ValueError("JSON格式无效")
+    if not isinstance(entry, dict):
+        raise ValueError("条目格式无效")
+    if entry.get("type", "clipboard") != "clipboard":
+        return None
+    return entry
@@ -4,15 +4,17 @@ WebSocket相关的路由
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from typing import Dict, Any, Set
-import json
 import asyncio
 import time
 from loguru import logger
 
 from server.security import security_middleware, token_manager, encryption_manager
 from server.redis_manager import redis_manager
+from server.api.clipboard_routes import ingest_clipboard_batch
+from server.api.ingest import PayloadTooLarge, max_websocket_message_bytes, measure_content
 from shared.models import ClipboardItem, ClipboardType
-from shared.utils import calculate_checksum
+from shared.utils import config_manager
+from shared.ws_protocol import MsgpackCodec, MSGPACK_AVAILABLE, JSON_CODEC, select_codec, content_to_base64
 
 
 websocket_router = APIRouter(tags=["WebSocket"])
@@ -25,19 +27,39 @@ class WebSocketManager:
         self.connections: Dict[str, Set[WebSocket]] = {}  # user_id -> set of websockets
         self.user_connections: Dict[int, str] = {}  # websocket_id -> user_id
         self.device_connections: Dict[int, str] = {}  # websocket_id -> device_id
+        self.connection_codecs: Dict[int, Any] = {}  # websocket_id -> 协商的编解码器
         self.redis_listener_task = None
+        self.presence_flush_task = None
         self.redis_listener_started = False
+        
+        # 二进制子协议（未安装msgpack或关闭时只提供JSON文本帧）
+        ws_config = config_manager.get('websocket', {}) or {}
+        self.msgpack_codec = None
+        if ws_config.get('msgpack_enabled', True) and MSGPACK_AVAILABLE:
+            self.msgpack_codec = MsgpackCodec(compress_threshold=ws_config.get('compress_threshold', 4096))
 
     def start_redis_listener(self):
         """启动Redis消息监听器"""
         if not self.redis_listener_started and not self.redis_listener_task:
             try:
                 self.redis_listener_task = asyncio.create_task(self._redis_message_listener())
+                self.presence_flush_task = asyncio.create_task(redis_manager.presence_flush_loop())
                 self.redis_listener_started = True
                 logger.info("Redis消息监听器已启动")
             except RuntimeError:
                 logger.debug("暂无事件循环，Redis监听器将在首次WebSocket连接时启动")
 
+    async def stop_redis_listener(self):
+        """停止Redis消息监听器和心跳写入任务（须在关闭Redis连接之前调用）"""
+        tasks = [task for task in (self.redis_listener_task, self.presence_flush_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.redis_listener_task = None
+        self.presence_flush_task = None
+        self.redis_listener_started = False
+        logger.info("Redis消息监听器已停止")
+
     async def _redis_message_listener(self):
         """Redis消息监听器"""
         try:
@@ -68,8 +90,9 @@ class WebSocketManager:
             logger.error(f"处理Redis同步消息失败: {e}")
 
     async def connect(self, websocket: WebSocket, user_id: str, device_id: str):
-        """建立WebSocket连接"""
-        await websocket.accept()
+        """建立WebSocket连接（按客户端提供的子协议协商消息编码）"""
+        codec = select_codec(websocket.scope.get('subprotocols', []), self.msgpack_codec)
+        await websocket.accept(subprotocol=codec.subprotocol)
         
         # 确保Redis监听器已启动
         if not self.redis_listener_started:
@@ -82,6 +105,7 @@ class WebSocketManager:
         ws_id = id(websocket)
         self.user_connections[ws_id] = user_id
         self.device_connections[ws_id] = device_id
+        self.connection_codecs[ws_id] = codec
         
         # 订阅Redis同步消息
         redis_manager.subscribe_clipboard_sync(user_id, self._handle_redis_sync_message)
@@ -106,6 +130,7 @@ class WebSocketManager:
         
         self.user_connections.pop(ws_id, None)
         self.device_connections.pop(ws_id, None)
+        self.connection_codecs.pop(ws_id, None)
         
         # 设置设备离线状态
         if user_id and device_id:
@@ -113,12 +138,56 @@ class WebSocketManager:
         
         logger.info(f"WebSocket连接断开: user={user_id}, device={device_id}")
 
+    def _encode(self, websocket: WebSocket, message: dict, frames: Dict[str, Any] = None):
+        """按连接协商的协议编码消息；frames 用于广播时每种协议只编码一次"""
+        codec = self.connection_codecs.get(id(websocket), JSON_CODEC)
+        if frames is None:
+            return codec.encode(message)
+        if codec.name not in frames:
+            frames[codec.name] = codec.encode(message)
+        return frames[codec.name]
+
+    async def _send_frame(self, websocket: WebSocket, frame):
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """向单个连接发送消息"""
+        await self._send_frame(websocket, self._encode(websocket, message))
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        """
+        接收并解码一条消息，二进制内容转换为base64文本
+        
+        解码前检查帧大小，超过 websocket.max_message_size 时抛出 PayloadTooLarge
+        （ASGI服务器的 ws_max_size 已在协议层拒绝超大帧，这里兜底未配置该参数的部署）
+        """
+        event = await websocket.receive()
+        if event['type'] == 'websocket.disconnect':
+            raise WebSocketDisconnect(event.get('code', 1000))
+        
+        limit = max_websocket_message_bytes()
+        if event.get('bytes') is not None:
+            if len(event['bytes']) > limit:
+                raise PayloadTooLarge(limit)
+            codec = self.connection_codecs.get(id(websocket), JSON_CODEC)
+            message = codec.decode(event['bytes'])
+        else:
+            # 文本帧的字符数不超过其UTF-8字节数，字符数超限时一定超限
+            if len(event['text']) > limit:
+                raise PayloadTooLarge(limit)
+            # 协商二进制协议的客户端仍可发送JSON文本帧
+            message = JSON_CODEC.decode(event['text'])
+        return content_to_base64(message)
+
     async def broadcast_to_user(self, user_id: str, message: dict, exclude_device: str = None):
         """向用户的所有设备广播消息（可排除指定设备）"""
         if user_id not in self.connections:
             return
         
-        message_json = json.dumps(message)
+        frames = {}
         disconnected = set()
         
         for websocket in self.connections[user_id]:
@@ -130,7 +199,7 @@ class WebSocketManager:
                 if exclude_device and device_id == exclude_device:
                     continue
                 
-                await websocket.send_text(message_json)
+                await self._send_frame(websocket, self._encode(websocket, message, frames))
                 logger.debug(f"消息已发送到设备: {device_id}")
                 
             except Exception as e:
@@ -146,13 +215,11 @@ class WebSocketManager:
         if user_id not in self.connections:
             return False
         
-        message_json = json.dumps(message)
-        
         for websocket in self.connections[user_id]:
             ws_id = id(websocket)
             if self.device_connections.get(ws_id) == device_id:
                 try:
-                    await websocket.send_text(message_json)
+                    await self.send(websocket, message)
                     return True
                 except Exception as e:
                     logger.error(f"向设备发送消息失败: {e}")
@@ -192,8 +259,14 @@ async def websocket_endpoint(
         try:
             while True:
                 # 接收消息
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                try:
+                    message = await websocket_manager.receive(websocket)
+                except PayloadTooLarge as e:
+                    await websocket_manager.send(websocket, {
+                        "type": "error",
+                        "message": str(e)
+                    })
+                    continue
                 
                 # 处理消息
                 await handle_websocket_message(websocket, message, payload)
@@ -223,16 +296,21 @@ async def handle_websocket_message(websocket: WebSocket, message: dict, user_pay
         logger.debug(f"收到WebSocket消息: type={message_type}, user={user_id}")
         
         if message_type == "ping":
-            # 心跳响应
-            await websocket.send_text(json.dumps({
+            # 心跳响应（在线状态由后台任务批量写入Redis）
+            redis_manager.touch_device(user_id, device_id)
+            await websocket_manager.send(websocket, {
                 "type": "pong",
                 "timestamp": str(int(time.time()))
-            }))
+            })
             
         elif message_type == "clipboard_sync":
             # 剪切板同步
             await handle_websocket_clipboard_sync(websocket, message, user_id, device_id)
             
+        elif message_type == "clipboard_sync_batch":
+            # 批量剪切板同步（离线恢复后回放队列）
+            await handle_websocket_clipboard_sync_batch(websocket, message, user_id, device_id)
+            
         elif message_type == "request_history":
             # 请求历史记录
             await handle_websocket_history_request(websocket, user_id)
@@ -243,17 +321,17 @@ async def handle_websocket_message(websocket: WebSocket, message: dict, user_pay
             
         else:
             logger.warning(f"未知WebSocket消息类型: {message_type}")
-            await websocket.send_text(json.dumps({
+            await websocket_manager.send(websocket, {
                 "type": "error",
                 "message": "未知消息类型"
-            }))
+            })
             
     except Exception as e:
         logger.error(f"处理WebSocket消息失败: {e}")
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "error",
             "message": "消息处理失败"
-        }))
+        })
 
 
 async def handle_websocket_clipboard_sync(websocket: WebSocket, message: dict, user_id: str, device_id: str):
@@ -269,34 +347,38 @@ async def handle_websocket_clipboard_sync(websocket: WebSocket, message: dict, u
                 )
             except Exception as e:
                 logger.error(f"解密剪切板内容失败: {e}")
-                await websocket.send_text(json.dumps({
+                await websocket_manager.send(websocket, {
                     "type": "error",
                     "message": "数据解密失败"
-                }))
+                })
                 return
         else:
             content = clipboard_data.get("content", "")
         
-        # 验证内容大小
-        if len(content) > 10 * 1024 * 1024:  # 10MB限制
-            await websocket.send_text(json.dumps({
+        # 验证内容大小（按UTF-8字节计算），同时得到校验和
+        try:
+            size, checksum = measure_content(content)
+        except PayloadTooLarge as e:
+            await websocket_manager.send(websocket, {
                 "type": "error",
-                "message": "内容过大，超过10MB限制"
-            }))
+                "message": str(e)
+            })
             return
         
-        # 创建剪切板项
+        # 创建剪切板项（与HTTP接口一致：内部统一使用TEXT，原始MIME类型保存在metadata）
+        content_type = clipboard_data.get("content_type", "text/plain")
         clipboard_item = ClipboardItem(
-            type=ClipboardType(clipboard_data.get("content_type", "text/plain")),
+            type=ClipboardType.TEXT,
             content=content,
             metadata={
                 "source": "websocket",
-                "encrypted": clipboard_data.get("encrypted", False)
+                "encrypted": clipboard_data.get("encrypted", False),
+                "original_content_type": content_type
             },
-            size=len(content.encode('utf-8')),
+            size=size,
             device_id=device_id,
             user_id=user_id,
-            checksum=calculate_checksum(content)
+            checksum=checksum
         )
         
         # 保存到Redis
@@ -307,51 +389,79 @@ async def handle_websocket_clipboard_sync(websocket: WebSocket, message: dict, u
                 "data": {
                     "id": clipboard_item.id,
                     "content": content,
-                    "content_type": clipboard_data.get("content_type", "text/plain"),
-                    "timestamp": clipboard_item.timestamp.isoformat(),
+                    "content_type": content_type,
+                    "timestamp": clipboard_item.created_at,
                     "device_id": device_id,
                     "checksum": clipboard_item.checksum
                 },
                 "source_device": device_id,
-                "timestamp": clipboard_item.timestamp.isoformat()
+                "timestamp": clipboard_item.created_at
             }
             
             redis_manager.publish_clipboard_sync(user_id, sync_message['action'], sync_message['data'], sync_message.get('source_device'))
             
             # 确认消息
-            await websocket.send_text(json.dumps({
+            await websocket_manager.send(websocket, {
                 "type": "sync_success",
                 "clip_id": clipboard_item.id
-            }))
+            })
             
             logger.info(f"WebSocket剪切板同步成功: user={user_id}, size={clipboard_item.size}")
         else:
-            await websocket.send_text(json.dumps({
+            await websocket_manager.send(websocket, {
                 "type": "error",
                 "message": "保存剪切板内容失败"
-            }))
+            })
             
     except Exception as e:
         logger.error(f"WebSocket剪切板同步失败: {e}")
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "error",
             "message": "剪切板同步失败"
-        }))
+        })
+
+
+async def handle_websocket_clipboard_sync_batch(websocket: WebSocket, message: dict, user_id: str, device_id: str):
+    """处理批量剪切板同步，逐项结果在一条 sync_batch_result 消息中返回"""
+    try:
+        entries = (message.get("data") or {}).get("items") or []
+        max_items = config_manager.get('clipboard.batch_max_items', 500)
+        if not entries or len(entries) > max_items:
+            await websocket_manager.send(websocket, {
+                "type": "error",
+                "message": f"批量条目数必须在 1 到 {max_items} 之间"
+            })
+            return
+        
+        batch = ingest_clipboard_batch(entries, user_id, device_id, "websocket_batch")
+        await websocket_manager.send(websocket, {
+            "type": "sync_batch_result",
+            "data": batch
+        })
+        
+        logger.info(f"WebSocket批量同步: user={user_id}, saved={batch['saved']}, failed={batch['failed']}")
+        
+    except Exception as e:
+        logger.error(f"WebSocket批量同步失败: {e}")
+        await websocket_manager.send(websocket, {
+            "type": "error",
+            "message": "批量同步失败"
+        })
 
 
 async def handle_websocket_history_request(websocket: WebSocket, user_id: str):
     """处理历史记录请求"""
     try:
         # 获取剪切板历史
-        history = redis_manager.get_user_clipboard_history(user_id, page=1, per_page=20)
+        history = await redis_manager.fetch_user_clipboard_history(user_id, page=1, per_page=20, with_content=True)
         
         # 格式化历史记录
         history_data = [
             {
                 "id": item.id,
                 "content": item.content,
-                "content_type": item.type.value,
-                "timestamp": item.timestamp.isoformat(),
+                "content_type": item.metadata.get('original_content_type', 'text/plain'),
+                "timestamp": item.created_at,
                 "device_id": item.device_id,
                 "size": item.size,
                 "checksum": item.checksum
@@ -359,7 +469,7 @@ async def handle_websocket_history_request(websocket: WebSocket, user_id: str):
             for item in history.items
         ]
         
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "history_response",
             "data": {
                 "items": history_data,
@@ -367,16 +477,16 @@ async def handle_websocket_history_request(websocket: WebSocket, user_id: str):
                 "page": history.page,
                 "per_page": history.per_page
             }
-        }))
+        })
         
         logger.debug(f"WebSocket历史记录已发送: user={user_id}, count={len(history_data)}")
         
     except Exception as e:
         logger.error(f"WebSocket历史记录请求失败: {e}")
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "error",
             "message": "获取历史记录失败"
-        }))
+        })
 
 
 async def handle_websocket_key_exchange(websocket: WebSocket, message: dict, user_id: str):
@@ -385,10 +495,10 @@ async def handle_websocket_key_exchange(websocket: WebSocket, message: dict, use
         encrypted_session_key = message.get("data", {}).get("encrypted_session_key")
         
         if not encrypted_session_key:
-            await websocket.send_text(json.dumps({
+            await websocket_manager.send(websocket, {
                 "type": "error",
                 "message": "缺少加密的会话密钥"
-            }))
+            })
             return
         
         # 解密会话密钥
@@ -397,16 +507,16 @@ async def handle_websocket_key_exchange(websocket: WebSocket, message: dict, use
         # 存储会话密钥
         encryption_manager.user_session_keys[user_id] = session_key
         
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "key_exchange_success",
             "message": "密钥交换成功"
-        }))
+        })
         
         logger.info(f"WebSocket密钥交换成功: user={user_id}")
         
     except Exception as e:
         logger.error(f"WebSocket密钥交换失败: {e}")
-        await websocket.send_text(json.dumps({
+        await websocket_manager.send(websocket, {
             "type": "error",
             "message": "密钥交换失败"
-        })) 
\ No newline at end of file
+        }) 
\ No newline at end of file
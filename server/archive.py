@@ -0,0 +1,654 @@
+"""
+剪贴板冷数据归档
+Redis只保留最近的热数据，较旧的条目由后台任务迁移到磁盘上的追加写归档：
+
+    {path}/{user_id[:2]}/{user_id}/seg-000001.dat   数据段：长度前缀 + zlib压缩的条目块（JSON数组）
+    {path}/{user_id[:2]}/{user_id}/index.tsv        索引：每行 分数、条目ID、设备ID、段号、块偏移、块长度、块内序号，
+                                                     删除时追加 "-\t条目ID" 墓碑行
+
+数据段和索引都只追加写入（先写数据段再写索引并fsync，中途崩溃只留下不被引用的字节）。
+多个worker共享同一目录：写入由进程内的锁和索引文件上的排他锁（flock）串行化；
+索引按用户缓存在进程内（LRU），文件变化时只解析新追加的行，文件被替换（压缩、删除后重建）时整体重新加载；
+解压后的数据块也有一个小的LRU缓存，翻页时相邻条目通常在同一块内。
+读写都是阻塞的文件操作，服务器在线程中调用（asyncio.to_thread）；内存结构由一把锁保护，索引和数据块的读取、解压都不持有这把锁。
+删除用户归档（drop）只把目录改名到回收目录，文件由后台任务删除。
+
+保留规则（max_age / max_items）由后台任务执行：过期条目追加墓碑，失效记录过半时压缩——
+把仍有效的条目重写到新的数据段和索引（原子替换索引文件）后删除旧数据段，回收磁盘空间。
+"""
+
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from server.records import parse_clipboard_record
+from shared import serialization
+from shared.models import ClipboardItem
+from shared.utils import config_manager
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # 非POSIX平台只有进程内的锁，归档目录不能由多个worker共享
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+
+INDEX_FILE = "index.tsv"
+SEGMENT_PATTERN = re.compile(r"^seg-(\d{6})\.dat$")
+# 用户ID作为目录名，只允许安全字符（防止路径穿越）
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+# 块头：4字节大端长度
+BLOCK_HEADER = struct.Struct(">I")
+TOMBSTONE = "-"
+# 被删除用户的归档目录先改名到这里，由后台任务删除（以点开头，不会与用户ID前缀冲突）
+TRASH_DIR = ".trash"
+# 管理后台批量统计使用的计数缓存的用户数（每项只有标记和计数）
+COUNT_CACHE_SIZE = 65536
+# 进程内写锁的分片数（不同用户的写入互不等待）
+WRITE_LOCK_STRIPES = 64
+
+# (分数, 条目ID)，与Redis有序集合的排序一致：先按分数，分数相同时按成员字典序
+ArchiveKey = Tuple[float, str]
+
+
+def _field(value: str) -> str:
+    """索引字段不能包含制表符和换行"""
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+class ArchiveIndex:
+    """单个用户的归档索引"""
+
+    __slots__ = ('keys', 'entries', 'stamp', 'offset', 'dead')
+
+    def __init__(self):
+        self.keys: List[ArchiveKey] = []  # 升序
+        self.entries: Dict[str, tuple] = {}  # 条目ID -> (分数, 设备ID, 段号, 偏移, 长度, 块内序号)
+        self.stamp: Optional[tuple] = None  # 索引文件的 (inode, mtime_ns, 大小)
+        self.offset = 0  # 已解析到的文件位置（最后一个完整行之后）
+        self.dead = 0  # 被覆盖或删除的条目数（数据段中不再被引用的记录）
+
+    def add(self, item_id: str, entry: tuple):
+        """添加或覆盖条目（同一ID再次归档时以最新位置为准）"""
+        self.remove(item_id)
+        self.entries[item_id] = entry
+        insort(self.keys, (entry[0], item_id))
+
+    def remove(self, item_id: str) -> bool:
+        entry = self.entries.pop(item_id, None)
+        if entry is None:
+            return False
+        position = bisect_left(self.keys, (entry[0], item_id))
+        del self.keys[position]
+        self.dead += 1
+        return True
+
+    def parse(self, data: bytes, user_id: str):
+        """应用一段索引文件内容（只处理完整的行，offset前进到最后一个换行之后）"""
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8", errors="replace").split("\n")[:-1]:
+            fields = line.split("\t")
+            try:
+                if fields[0] == TOMBSTONE:
+                    self.remove(fields[1])
+                else:
+                    score, item_id, device_id, segment, offset, length, slot = fields
+                    self.add(item_id, (float(score), device_id, int(segment), int(offset), int(length), int(slot)))
+            except (ValueError, IndexError):
+                # 崩溃时写了一半的行
+                logger.warning(f"跳过损坏的归档索引行: user={user_id}, line={line[:80]!r}")
+        self.offset += end
+
+    def count_before(self, score: float) -> int:
+        """分数小于score的条目数"""
+        return bisect_left(self.keys, (score, ""))
+
+    def newest(self, offset: int, limit: int) -> List[ArchiveKey]:
+        """按时间倒序跳过offset条后的limit条"""
+        end = len(self.keys) - offset
+        if end <= 0 or limit <= 0:
+            return []
+        return self.keys[max(end - limit, 0):end][::-1]
+
+    def before(self, key: ArchiveKey, limit: int) -> List[ArchiveKey]:
+        """按时间倒序排在key之后（严格更旧）的limit条"""
+        end = bisect_left(self.keys, key)
+        if limit <= 0:
+            return []
+        return self.keys[max(end - limit, 0):end][::-1]
+
+
+class ClipboardArchive:
+    """按用户分目录的剪贴板冷数据归档"""
+
+    def __init__(self):
+        config = config_manager.get('archive', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.path = config.get('path', 'data/archive')
+        expire_time = config_manager.get('clipboard.expire_time', 86400)
+        # 超过该秒数的条目迁移到归档，必须明显小于条目哈希的过期时间，否则迁移前已过期
+        self.hot_seconds = min(config.get('hot_seconds', 21600), expire_time // 2)
+        self.hot_max_items = config.get('hot_max_items', 200)  # 每个用户在Redis中最多保留的条目数
+        self.segment_max_bytes = config.get('segment_max_bytes', 64 * 1024 * 1024)
+        self.block_items = config.get('block_items', 64)  # 每个压缩块的条目数
+        self.compress_level = config.get('compress_level', 6)
+        self.index_cache_size = config.get('index_cache_size', 256)  # 缓存索引的用户数
+        self.block_cache_size = config.get('block_cache_size', 64)  # 缓存的解压数据块数
+        self.max_age = config.get('max_age', 90 * 86400)  # 归档条目的保留秒数，0表示不限
+        self.max_items = config.get('max_items', 10000)  # 每个用户归档保留的条目数，0表示不限
+
+        self._lock = threading.RLock()  # 保护进程内的索引、计数和数据块缓存（锁内不做文件I/O）
+        self._write_locks = [threading.Lock() for _ in range(WRITE_LOCK_STRIPES)]
+        self._indexes: "OrderedDict[str, ArchiveIndex]" = OrderedDict()
+        self._blocks: "OrderedDict[tuple, list]" = OrderedDict()  # (用户, 索引inode, 段号, 偏移) -> 条目记录
+        self._counts: "OrderedDict[str, tuple]" = OrderedDict()  # 用户 -> (索引文件标记, 条目数)
+        self.appended = 0
+        self.pruned = 0
+        self.compactions = 0
+        self.index_loads = 0
+        self.block_reads = 0
+        self.block_hits = 0
+
+    # ==================== 文件布局 ====================
+
+    def _user_dir(self, user_id: str) -> str:
+        if not USER_ID_PATTERN.match(user_id or ""):
+            raise ValueError(f"非法的用户ID: {user_id!r}")
+        return os.path.join(self.path, user_id[:2], user_id)
+
+    def _segment_path(self, user_id: str, segment: int) -> str:
+        return os.path.join(self._user_dir(user_id), f"seg-{segment:06d}.dat")
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _discard_blocks(self, user_id: str):
+        for key in [key for key in self._blocks if key[0] == user_id]:
+            del self._blocks[key]
+
+    # ==================== 索引 ====================
+
+    def _index(self, user_id: str) -> Optional[ArchiveIndex]:
+        """
+        读取用户索引，用户没有归档时返回None
+
+        缓存有效时直接返回；同一文件追加了新行（其他worker或本进程的写入）时只解析新增部分。
+        文件读取不持有 self._lock：读完后在锁内应用，期间索引被其他线程更新时重试
+        """
+        index_path = os.path.join(self._user_dir(user_id), INDEX_FILE)
+        while True:
+            stamp = self._stamp(index_path)
+            with self._lock:
+                index = self._indexes.get(user_id)
+                if stamp is None:
+                    if index is not None:
+                        del self._indexes[user_id]
+                        self._discard_blocks(user_id)
+                    return None
+                if index is not None and index.stamp == stamp:
+                    self._indexes.move_to_end(user_id)
+                    return index
+                # 同一文件只读取新追加的部分
+                offset = index.offset if index is not None and index.stamp[0] == stamp[0] and index.offset <= stamp[2] else 0
+
+            loaded = self._read_index(index_path, user_id, offset)
+            if loaded is None:
+                continue
+            stamp, data = loaded
+            with self._lock:
+                current = self._indexes.get(user_id)
+                if offset:
+                    if current is not index or current.offset != offset or current.stamp[0] != stamp[0]:
+                        continue
+                    current.parse(data, user_id)
+                    current.stamp = stamp
+                    self._indexes.move_to_end(user_id)
+                    return current
+                if current is not None and current.stamp[0] != stamp[0]:
+                    # 索引被替换（压缩，或删除后重建）：缓存的数据块不再有效
+                    self._discard_blocks(user_id)
+                self._indexes[user_id] = data
+                self._indexes.move_to_end(user_id)
+                self.index_loads += 1
+                while len(self._indexes) > self.index_cache_size:
+                    self._indexes.popitem(last=False)
+                return data
+
+    @staticmethod
+    def _read_index(index_path: str, user_id: str, offset: int):
+        """
+        读取索引文件（不持有锁）：offset为0时解析整个文件返回 (标记, ArchiveIndex)，
+        否则返回 (标记, offset之后的内容)；文件不存在、或读取增量时文件已被替换（标记的inode不同）时返回None
+        """
+        try:
+            with open(index_path, "rb") as f:
+                # 以打开的文件为准（stat之后文件可能已被替换）
+                stat = os.fstat(f.fileno())
+                stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if offset > stat.st_size:
+                    return None
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if offset:
+            return stamp, data
+        # 读取期间文件又追加了内容时，下次比较标记不一致，从offset继续解析
+        index = ArchiveIndex()
+        index.parse(data, user_id)
+        index.stamp = stamp
+        return stamp, index
+
+    def _write_lock(self, user_id: str) -> threading.Lock:
+        return self._write_locks[hash(user_id) % WRITE_LOCK_STRIPES]
+
+    @contextmanager
+    def _index_writer(self, user_id: str, create: bool = False) -> Iterator:
+        """
+        串行化对用户归档的写入：进程内的写锁 + 索引文件上的排他锁，产出以追加模式打开的索引文件
+
+        加锁后发现索引已被压缩替换时重新打开新文件；用户没有归档且create为False时抛出 FileNotFoundError
+        """
+        user_dir = self._user_dir(user_id)
+        index_path = os.path.join(user_dir, INDEX_FILE)
+        with self._write_lock(user_id):
+            while True:
+                if create:
+                    # 等待期间归档可能被压缩整体删除
+                    os.makedirs(user_dir, exist_ok=True)
+                f = open(index_path, "ab+")
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_ino == os.stat(index_path).st_ino:
+                        break
+                except FileNotFoundError:
+                    pass
+                f.close()
+            try:
+                yield f
+            finally:
+                f.close()  # 同时释放文件锁
+
+    @staticmethod
+    def _append_lines(index_file, lines: List[str]):
+        """向加锁的索引文件追加行并fsync"""
+        data = "".join(lines).encode("utf-8")
+        size = os.fstat(index_file.fileno()).st_size
+        if size > 0:
+            # 上次写入中断留下不完整的行时先换行，避免与新行粘连
+            index_file.seek(size - 1)
+            if index_file.read(1) != b"\n":
+                data = b"\n" + data
+        index_file.write(data)
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+    def _current_segment(self, user_dir: str) -> int:
+        """可继续追加的数据段号"""
+        segments = [int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(user_dir)) if match]
+        if not segments:
+            return 1
+        segment = max(segments)
+        if os.path.getsize(os.path.join(user_dir, f"seg-{segment:06d}.dat")) >= self.segment_max_bytes:
+            segment += 1
+        return segment
+
+    # ==================== 写入 ====================
+
+    def append(self, user_id: str, records: List[Tuple[float, Dict[str, str]]]) -> int:
+        """
+        归档一批条目（分数, 条目记录），数据段和索引都fsync后返回
+
+        Returns:
+            归档的条目数
+        """
+        if not records:
+            return 0
+
+        with self._index_writer(user_id, create=True) as index_file:
+            user_dir = self._user_dir(user_id)
+            segment = self._current_segment(user_dir)
+
+            lines = []
+            with open(self._segment_path(user_id, segment), "ab") as f:
+                for start in range(0, len(records), self.block_items):
+                    block = records[start:start + self.block_items]
+                    payload = zlib.compress(serialization.dumps([record for _, record in block]), self.compress_level)
+                    offset = f.tell()
+                    f.write(BLOCK_HEADER.pack(len(payload)))
+                    f.write(payload)
+                    length = BLOCK_HEADER.size + len(payload)
+                    for slot, (score, record) in enumerate(block):
+                        lines.append(f"{score!r}\t{_field(record['id'])}\t{_field(record.get('device_id', ''))}"
+                                     f"\t{segment}\t{offset}\t{length}\t{slot}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._append_lines(index_file, lines)
+        self._index(user_id)
+        with self._lock:
+            self.appended += len(records)
+        return len(records)
+
+    def delete(self, user_id: str, item_ids: Iterable[str]) -> List[str]:
+        """追加墓碑删除条目，返回实际存在并被删除的条目ID"""
+        index = self._index(user_id)
+        if index is None:
+            return []
+        with self._lock:
+            candidates = [item_id for item_id in dict.fromkeys(item_ids) if item_id in index.entries]
+        if not candidates:
+            return []
+
+        try:
+            with self._index_writer(user_id) as index_file:
+                # 等待写锁期间索引可能已变化
+                index = self._index(user_id)
+                with self._lock:
+                    removed = [item_id for item_id in candidates if index is not None and item_id in index.entries]
+                if removed:
+                    self._append_lines(index_file, [f"{TOMBSTONE}\t{item_id}\n" for item_id in removed])
+        except FileNotFoundError:
+            # 归档已被整体删除
+            return []
+        if removed:
+            self._index(user_id)
+        return removed
+
+    def delete_device(self, user_id: str, device_id: str) -> List[str]:
+        """删除来自指定设备的归档条目"""
+        index = self._index(user_id)
+        if index is None:
+            return []
+        device_id = _field(device_id)
+        with self._lock:
+            item_ids = [item_id for item_id, entry in index.entries.items() if entry[1] == device_id]
+        return self.delete(user_id, item_ids)
+
+    def drop(self, user_id: str) -> bool:
+        """
+        删除用户的全部归档：目录改名到回收目录后立即不可见（一次rename，可在事件循环中调用），
+        文件由 purge_trash 在后台删除
+
+        不等待写锁：进行中的写入在改名后的目录中完成（随之被回收），之后的写入重新创建归档
+        """
+        user_dir = self._user_dir(user_id)
+        trash_dir = os.path.join(self.path, TRASH_DIR)
+        try:
+            os.makedirs(trash_dir, exist_ok=True)
+            os.rename(user_dir, os.path.join(trash_dir, f"{user_id}-{uuid.uuid4().hex[:8]}"))
+            dropped = True
+        except FileNotFoundError:
+            dropped = False
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            self._counts.pop(user_id, None)
+            self._discard_blocks(user_id)
+        return dropped
+
+    def purge_trash(self) -> int:
+        """删除回收目录中的归档（drop 改名过来的），返回删除的目录数"""
+        trash_dir = os.path.join(self.path, TRASH_DIR)
+        if not os.path.isdir(trash_dir):
+            return 0
+        names = os.listdir(trash_dir)
+        for name in names:
+            shutil.rmtree(os.path.join(trash_dir, name), ignore_errors=True)
+        return len(names)
+
+    # ==================== 保留和压缩 ====================
+
+    def prune(self, user_id: str, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        按保留规则删除用户最旧的归档条目（早于 max_age 秒或排在 max_items 条之后），
+        失效记录不少于有效条目时压缩
+
+        Returns:
+            {"pruned": 删除的条目数, "compacted": 压缩次数}
+        """
+        now = time.time() if now is None else now
+        index = self._index(user_id)
+        if index is None:
+            return {"pruned": 0, "compacted": 0}
+        with self._lock:
+            expired = index.count_before(now - self.max_age) if self.max_age else 0
+            if self.max_items:
+                expired = max(expired, len(index.keys) - self.max_items)
+            expired_ids = [item_id for _, item_id in index.keys[:expired]]
+
+        pruned = len(self.delete(user_id, expired_ids)) if expired_ids else 0
+        self.pruned += pruned
+        index = self._index(user_id)
+        with self._lock:
+            wasteful = index is not None and index.dead >= max(len(index.keys), self.block_items)
+        compacted = 1 if wasteful and self.compact(user_id) else 0
+        return {"pruned": pruned, "compacted": compacted}
+
+    def compact(self, user_id: str) -> bool:
+        """
+        把仍有效的条目重写到新的数据段和索引，原子替换索引文件后删除旧数据段；没有有效条目时删除整个归档
+
+        新数据段的段号接在旧段号之后，替换前读取中的旧索引仍指向完整的旧数据
+        """
+        user_dir = self._user_dir(user_id)
+        index_path = os.path.join(user_dir, INDEX_FILE)
+        try:
+            with self._index_writer(user_id) as index_file:
+                index = self._index(user_id)
+                if index is None:
+                    return False
+                with self._lock:
+                    inode = index.stamp[0]
+                    live = [(score, item_id, index.entries[item_id]) for score, item_id in index.keys]
+                old_segments = [name for name in os.listdir(user_dir) if SEGMENT_PATTERN.match(name)]
+
+                if not live:
+                    with self._lock:
+                        self._indexes.pop(user_id, None)
+                        self._discard_blocks(user_id)
+                    shutil.rmtree(user_dir, ignore_errors=True)
+                    self.compactions += 1
+                    return True
+
+                segment = max((int(SEGMENT_PATTERN.match(name).group(1)) for name in old_segments), default=0) + 1
+                lines = []
+                f = open(self._segment_path(user_id, segment), "ab")
+                try:
+                    for start in range(0, len(live), self.block_items):
+                        block = []
+                        for score, item_id, (_, _, old_segment, offset, length, slot) in live[start:start + self.block_items]:
+                            records = self._read_block(user_id, inode, old_segment, offset, length)
+                            block.append((score, records[slot]))
+                        if f.tell() >= self.segment_max_bytes:
+                            f.flush()
+                            os.fsync(f.fileno())
+                            f.close()
+                            segment += 1
+                            f = open(self._segment_path(user_id, segment), "ab")
+                        payload = zlib.compress(serialization.dumps([record for _, record in block]),
+                                                self.compress_level)
+                        offset = f.tell()
+                        f.write(BLOCK_HEADER.pack(len(payload)))
+                        f.write(payload)
+                        length = BLOCK_HEADER.size + len(payload)
+                        for slot, (score, record) in enumerate(block):
+                            lines.append(f"{score!r}\t{_field(record['id'])}\t{_field(record.get('device_id', ''))}"
+                                         f"\t{segment}\t{offset}\t{length}\t{slot}\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    f.close()
+
+                tmp_path = index_path + ".tmp"
+                with open(tmp_path, "wb") as tmp:
+                    tmp.write("".join(lines).encode("utf-8"))
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+                # 等待锁的其他写入者发现inode变化后改为打开新索引
+                os.replace(tmp_path, index_path)
+                with self._lock:
+                    self._indexes.pop(user_id, None)
+                    self._discard_blocks(user_id)
+        except FileNotFoundError:
+            return False
+
+        for name in old_segments:
+            try:
+                os.unlink(os.path.join(user_dir, name))
+            except FileNotFoundError:
+                pass
+        self.compactions += 1
+        return True
+
+    def list_users(self) -> List[str]:
+        """有归档目录的用户ID"""
+        if not os.path.isdir(self.path):
+            return []
+        users = []
+        for prefix in os.listdir(self.path):
+            prefix_dir = os.path.join(self.path, prefix)
+            if prefix != TRASH_DIR and os.path.isdir(prefix_dir):
+                users.extend(user_id for user_id in os.listdir(prefix_dir) if USER_ID_PATTERN.match(user_id))
+        return users
+
+    # ==================== 读取 ====================
+
+    def count(self, user_id: str, cache_index: bool = True) -> int:
+        """
+        用户归档的条目数
+
+        cache_index 为False时（管理后台批量统计）索引不在缓存中则只解析计数，不放入索引缓存，
+        避免挤掉正在翻页的用户的索引；计数按索引文件标记缓存
+        """
+        if cache_index:
+            index = self._index(user_id)
+            if index is None:
+                return 0
+            with self._lock:
+                return len(index.keys)
+
+        index_path = os.path.join(self._user_dir(user_id), INDEX_FILE)
+        stamp = self._stamp(index_path)
+        if stamp is None:
+            return 0
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.stamp == stamp:
+                return len(index.keys)
+            cached = self._counts.get(user_id)
+            if cached is not None and cached[0] == stamp:
+                self._counts.move_to_end(user_id)
+                return cached[1]
+
+        loaded = self._read_index(index_path, user_id, 0)
+        if loaded is None:
+            return 0
+        stamp, index = loaded
+        with self._lock:
+            self._counts[user_id] = (stamp, len(index.keys))
+            self._counts.move_to_end(user_id)
+            while len(self._counts) > COUNT_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        return len(index.keys)
+
+    def contains(self, user_id: str, item_id: str) -> bool:
+        index = self._index(user_id)
+        if index is None:
+            return False
+        with self._lock:
+            return item_id in index.entries
+
+    def newest_keys(self, user_id: str, offset: int, limit: int) -> List[ArchiveKey]:
+        """按时间倒序的 (分数, 条目ID)"""
+        index = self._index(user_id)
+        if index is None:
+            return []
+        with self._lock:
+            return index.newest(offset, limit)
+
+    def keys_before(self, user_id: str, key: ArchiveKey, limit: int) -> List[ArchiveKey]:
+        """按时间倒序排在游标key之后的 (分数, 条目ID)"""
+        index = self._index(user_id)
+        if index is None:
+            return []
+        with self._lock:
+            return index.before(key, limit)
+
+    def _read_block(self, user_id: str, inode: int, segment: int, offset: int, length: int) -> list:
+        """读取并解压一个数据块（文件读取和解压不持有锁）"""
+        cache_key = (user_id, inode, segment, offset)
+        with self._lock:
+            block = self._blocks.get(cache_key)
+            if block is not None:
+                self._blocks.move_to_end(cache_key)
+                self.block_hits += 1
+                return block
+
+        with open(self._segment_path(user_id, segment), "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        (size,) = BLOCK_HEADER.unpack_from(data)
+        block = serialization.loads(zlib.decompress(data[BLOCK_HEADER.size:BLOCK_HEADER.size + size]))
+
+        with self._lock:
+            self.block_reads += 1
+            self._blocks[cache_key] = block
+            while len(self._blocks) > self.block_cache_size:
+                self._blocks.popitem(last=False)
+        return block
+
+    def get_items(self, user_id: str, item_ids: List[str]) -> List[ClipboardItem]:
+        """按给定顺序读取归档条目（不存在或无法解析的跳过）"""
+        index = self._index(user_id)
+        if index is None:
+            return []
+        with self._lock:
+            inode = index.stamp[0]
+            entries = [(item_id, index.entries.get(item_id)) for item_id in item_ids]
+
+        items = []
+        for item_id, entry in entries:
+            if entry is None:
+                continue
+            _, _, segment, offset, length, slot = entry
+            try:
+                items.append(parse_clipboard_record(self._read_block(user_id, inode, segment, offset, length)[slot]))
+            except Exception as e:
+                logger.error(f"读取归档条目失败 {item_id}: {e}")
+        return items
+
+    def get_item(self, user_id: str, item_id: str) -> Optional[ClipboardItem]:
+        items = self.get_items(user_id, [item_id])
+        return items[0] if items else None
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取归档统计"""
+        return {
+            "enabled": self.enabled,
+            "cached_indexes": len(self._indexes),
+            "cached_blocks": len(self._blocks),
+            "appended": self.appended,
+            "pruned": self.pruned,
+            "compactions": self.compactions,
+            "index_loads": self.index_loads,
+            "block_reads": self.block_reads,
+            "block_hits": self.block_hits
+        }
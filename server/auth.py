@@ -9,7 +9,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from loguru import logger
 
-from shared.models import User, Device, AuthRequest, AuthResponse
+from shared.models import User, AuthRequest, AuthResponse
 from shared.utils import config_manager, get_device_info
 from server.redis_manager import redis_manager
 
@@ -74,11 +74,11 @@ class AuthManager:
                 logger.error("用户名或密码为空")
                 return None
             
-            # 检查用户是否已存在
-            username_key = f"username:{username}"
-            if redis_manager.redis_client.exists(username_key):
+            # 检查用户是否已存在（避免为已有用户计算密码哈希）
+            existing = redis_manager.get_user_by_username(username)
+            if existing:
                 logger.warning(f"用户已存在: {username}")
-                return redis_manager.get_user_by_username(username)  # 返回已存在的用户而不是None
+                return existing  # 返回已存在的用户而不是None
             
             # 创建用户
             user = User(
@@ -98,9 +98,10 @@ class AuthManager:
                 elif isinstance(value, list):
                     user_data[key] = str(value)  # 将列表转换为字符串
             
-            # 保存用户信息
-            redis_manager.redis_client.hset(f"user:{user.id}", mapping=user_data)
-            redis_manager.redis_client.set(f"username:{username}", user.id)
+            # 保存用户信息（用户名索引和用户记录原子写入，用户名已被占用时不覆盖）
+            if not redis_manager.create_user(user.id, username, user_data):
+                logger.warning(f"用户已存在: {username}")
+                return redis_manager.get_user_by_username(username)  # 返回已存在的用户而不是None
             
             logger.info(f"用户注册成功: {username}")
             return user
@@ -110,20 +111,18 @@ class AuthManager:
             return None
     
     def authenticate_user(self, auth_request: AuthRequest) -> AuthResponse:
-        """用户认证"""
+        """用户认证（校验密码并登记设备，不签发令牌）"""
         try:
             if not redis_manager.is_connected():
                 return AuthResponse(success=False, message="服务器连接失败")
             
-            # 查找用户
-            username_key = f"username:{auth_request.username}"
-            user_id = redis_manager.redis_client.get(username_key)
-            
-            if not user_id:
+            # 查找用户（用户名索引经进程内缓存，命中时只需读取用户信息）
+            credentials = redis_manager.lookup_user_credentials(auth_request.username)
+            if not credentials:
                 return AuthResponse(success=False, message="用户不存在")
             
-            # 获取用户信息
-            user_data = redis_manager.redis_client.hgetall(f"user:{user_id}")
+            user_id = credentials['id']
+            user_data = credentials['data']
             if not user_data:
                 return AuthResponse(success=False, message="用户数据不存在")
             
@@ -143,73 +142,24 @@ class AuthManager:
                           f"设备-{device_id[:8]}" if device_id else 'Unknown Device')
             logger.debug(f"设备名称: {device_name}")
 
-            # 检查设备是否已存在
-            device_key = f"device:{device_id}"
-            existing_device_data = redis_manager.redis_client.hgetall(device_key)
-            
-            if existing_device_data:
-                # 更新现有设备信息
-                device_data = existing_device_data
-                device_data['last_seen'] = datetime.now().isoformat()
-                device_data['is_online'] = 'True'
-                device_data['ip_address'] = device_info.get('ip_address', device_data.get('ip_address', '0.0.0.0'))
-                device_data['os_info'] = f"{device_info.get('platform', 'Unknown')} {device_info.get('version', '')}".strip()
-                # 也要更新设备名称，防止之前保存的名称不正确
-                device_data['name'] = device_name
-                redis_manager.redis_client.hset(device_key, mapping=device_data)
-                device_id_to_use = device_id
-                logger.debug(f"更新现有设备: {device_id} -> {device_name}")
-            else:
-                # 创建新设备
-                os_info = f"{device_info.get('platform', 'Unknown')} {device_info.get('version', '')}".strip()
-                device = Device(
-                    id=device_id, # 使用客户端传来的ID
-                    name=device_name,
-                    os_info=os_info,
-                    ip_address=device_info.get('ip_address', '0.0.0.0'),
-                    user_id=user_id,
-                    is_online=True
-                )
-                logger.debug(f"创建新设备: {device_id} -> {device_name}")
-                
-                # 保存设备信息
-                device_data = device.dict()
-                device_data['created_at'] = device.created_at.isoformat()
-                device_data['last_seen'] = device.last_seen.isoformat()
-                
-                # 转换布尔值为字符串
-                for key, value in device_data.items():
-                    if isinstance(value, bool):
-                        device_data[key] = str(value)
-                    elif isinstance(value, list):
-                        device_data[key] = str(value)
-                
-                redis_manager.redis_client.hset(device_key, mapping=device_data)
-                device_id_to_use = device.id
-
-            # 将设备ID添加到用户的设备列表中
-            redis_manager.redis_client.sadd(f"devices:{user_id}", device_id_to_use)
-            
-            # 设置设备在线状态
-            redis_manager.set_device_online(user_id, device_id_to_use)
-            
-            # 创建访问令牌
-            token_data = {
-                "user_id": user_id,
-                "device_id": device_id_to_use,
-                "username": auth_request.username
-            }
-            access_token = self.create_access_token(token_data)
-            
-            if not access_token:
-                return AuthResponse(success=False, message="令牌创建失败")
+            # 设备创建或更新、加入用户设备集合、在线状态和版本号在一次脚本调用中原子完成：
+            # 可变字段直接覆盖，创建时间只在设备首次出现时写入
+            device_record = redis_manager.upsert_device_login(
+                user_id=user_id,
+                device_id=device_id,
+                name=device_name,
+                os_info=f"{device_info.get('platform', 'Unknown')} {device_info.get('version', '')}".strip(),
+                ip_address=device_info.get('ip_address', '0.0.0.0')
+            )
+            logger.debug(f"设备已更新: {device_id} -> {device_name}")
             
+            # 令牌由调用方创建会话时签发（access/refresh 一次生成），这里只返回身份和设备
             logger.info(f"用户认证成功: {auth_request.username}")
             return AuthResponse(
                 success=True,
-                token=access_token,
                 user_id=user_id,
-                device_id=device_id_to_use,
+                device_id=device_id,
+                device=device_record,
                 message="认证成功"
             )
             
@@ -230,8 +180,8 @@ class AuthManager:
             if not user_id or not device_id:
                 return None
             
-            # 更新设备在线状态
-            redis_manager.set_device_online(user_id, device_id)
+            # 记录设备心跳
+            redis_manager.touch_device(user_id, device_id)
             
             return {
                 "user_id": user_id,
@@ -246,27 +196,17 @@ class AuthManager:
     def get_user_info(self, username: str) -> Optional[Dict[str, Any]]:
         """通过用户名获取用户信息"""
         try:
-            if not redis_manager.is_connected():
-                return None
-            
-            # 查找用户
-            username_key = f"username:{username}"
-            user_id = redis_manager.redis_client.get(username_key)
-            
-            if not user_id:
-                return None
-            
-            # 获取用户信息
-            user_data = redis_manager.redis_client.hgetall(f"user:{user_id}")
-            if not user_data:
+            # 查找用户（经过进程内记录缓存，命中时无需访问Redis）
+            user = redis_manager.get_user_by_username(username)
+            if not user:
                 return None
             
             return {
-                "id": user_id,
-                "username": user_data.get('username'),
-                "email": user_data.get('email'),
-                "created_at": user_data.get('created_at'),
-                "is_active": user_data.get('is_active', 'True') == 'True'
+                "id": user['id'],
+                "username": user['username'],
+                "email": user['email'],
+                "created_at": user['created_at'],
+                "is_active": user['is_active']
             }
             
         except Exception as e:
@@ -281,7 +221,7 @@ class AuthManager:
         
         # 添加password字段用于兼容
         try:
-            user_data = redis_manager.redis_client.hgetall(f"user:{user_info['id']}")
+            user_data = redis_manager.get_user_by_id(user_info['id'])
             return {
                 "id": user_info["id"],
                 "username": user_info["username"],
@@ -308,7 +248,6 @@ class AuthManager:
                           device_info.get('label') or 
                           f"设备-{device_id[:8]}")
             
-            device_key = f"device:{device_id}"
             device_data = {
                 'id': device_id,
                 'name': device_name,
@@ -320,14 +259,8 @@ class AuthManager:
                 'last_seen': datetime.now().isoformat()
             }
             
-            # 保存设备信息
-            redis_manager.redis_client.hset(device_key, mapping=device_data)
-            
-            # 添加到用户设备列表
-            redis_manager.redis_client.sadd(f"devices:{user_id}", device_id)
-            
-            # 设置在线状态
-            redis_manager.set_device_online(user_id, device_id)
+            # 保存设备信息、加入用户设备列表并设置在线状态
+            redis_manager.save_device(user_id, device_id, device_data)
             
             return {"id": device_id, "name": device_name}
             
@@ -347,12 +280,7 @@ class AuthManager:
             
             if user_id and device_id:
                 # 设置设备离线
-                device_key = f"device:{device_id}"
-                redis_manager.redis_client.hset(device_key, 'is_online', 'false')
-                
-                # 从在线设备集合中移除
-                online_devices_key = f"online_devices:{user_id}"
-                redis_manager.redis_client.srem(online_devices_key, device_id)
+                redis_manager.set_device_offline(user_id, device_id)
                 
                 logger.info(f"用户登出成功: {payload.get('username')}")
                 return True
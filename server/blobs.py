@@ -0,0 +1,142 @@
+"""
+二进制内容（图片、文件）的磁盘存储
+上传的请求体按块流式写入临时文件，同时增量计算SHA-256，完成后以摘要为文件名原子地移入存储目录
+（相同内容只存一份）。Redis中的剪贴板项只保存 blob_id 等元数据，
+引用关系记录在 blob_refs:{blob_id} 集合中（成员为 "用户ID:条目ID"），由后台任务回收不再被引用的文件。
+
+    {path}/{blob_id[:2]}/{blob_id}   内容文件（blob_id 为内容的SHA-256十六进制摘要）
+    {path}/tmp/                      上传中的临时文件
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from shared.utils import config_manager
+
+
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobTooLarge(Exception):
+    """上传内容超过大小限制"""
+
+
+class BlobStore:
+    """按内容摘要寻址的本地文件存储"""
+
+    def __init__(self):
+        config = config_manager.get('blobs', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.path = config.get('path', 'data/blobs')
+        self.chunk_size = config.get('chunk_size', 65536)  # 下载时每次读取的字节数
+        self.gc_grace = config.get('gc_grace', 3600)  # 未被引用的文件和临时文件超过该秒数才回收
+        self.max_size = config_manager.get('clipboard.max_data_size', 10 * 1024 * 1024)
+
+    def blob_path(self, blob_id: str) -> str:
+        if not BLOB_ID_PATTERN.match(blob_id or ""):
+            raise ValueError(f"非法的blob_id: {blob_id!r}")
+        return os.path.join(self.path, blob_id[:2], blob_id)
+
+    def exists(self, blob_id: str) -> bool:
+        try:
+            return os.path.isfile(self.blob_path(blob_id))
+        except ValueError:
+            return False
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], max_size: Optional[int] = None) -> Tuple[str, int]:
+        """
+        把异步字节流写入存储，超过max_size时立即停止读取并抛出 BlobTooLarge
+
+        Returns:
+            (blob_id, 字节数)
+        """
+        max_size = max_size or self.max_size
+        tmp_dir = os.path.join(self.path, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > max_size:
+                        raise BlobTooLarge(f"内容超过 {max_size} 字节限制")
+                    digest.update(chunk)
+                    f.write(chunk)
+                # fsync 和改名放到线程中，不阻塞事件循环
+                await asyncio.to_thread(self._sync, f)
+            blob_id = digest.hexdigest()
+            await asyncio.to_thread(self._commit, tmp_path, blob_id)
+            return blob_id, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _commit(self, tmp_path: str, blob_id: str):
+        """临时文件移入存储目录；内容已存在时只刷新修改时间（避免被并发的回收任务删除）"""
+        path = self.blob_path(blob_id)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def delete(self, blob_id: str, older_than: Optional[float] = None) -> bool:
+        """删除内容文件；给出older_than时只删除修改时间早于它的（期间被重新上传的保留）"""
+        try:
+            path = self.blob_path(blob_id)
+            if older_than is not None and os.path.getmtime(path) >= older_than:
+                return False
+            os.unlink(path)
+            return True
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def stale_blobs(self, cutoff: float, batch_size: int = 100) -> Iterator[List[str]]:
+        """
+        分批列出修改时间早于cutoff的内容文件，同时删除遗留的临时文件
+
+        Yields:
+            blob_id 列表
+        """
+        if not os.path.isdir(self.path):
+            return
+        batch = []
+        for prefix in sorted(os.listdir(self.path)):
+            directory = os.path.join(self.path, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                    if prefix == "tmp":
+                        os.unlink(path)
+                        logger.debug(f"删除遗留的上传临时文件: {name}")
+                    elif BLOB_ID_PATTERN.match(name):
+                        batch.append(name)
+                except FileNotFoundError:
+                    continue
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+# 全局内容存储
+blob_store = BlobStore()
@@ -0,0 +1,157 @@
+"""
+后台级联删除任务
+管理员删除用户等重操作先同步分离数据（用户立即不可见），剩余的键按块 UNLINK，
+作为事件循环中的后台任务执行；任务进度写入Redis，任一worker都可查询
+"""
+
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from server.redis_manager import redis_manager
+from shared.utils import config_manager
+
+
+JOB_KEY_PREFIX = "cascade_job:"
+
+# 任务结束时发布一条汇总事件
+CASCADE_EVENTS_CHANNEL = "cascade_events"
+
+# 任务记录中的整数字段
+_INT_FIELDS = ('total', 'processed', 'deleted')
+
+
+class CascadeJobs:
+    """级联删除任务管理器"""
+
+    def __init__(self):
+        config = config_manager.get('cascade_delete', {}) or {}
+        self.job_ttl = config.get('job_ttl', 86400)  # 任务记录保留时间
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, kind: str, target: str, chunks: Iterator[Tuple[str, List[str]]],
+               total: int = 0) -> Dict[str, Any]:
+        """
+        创建并启动级联删除任务
+
+        Args:
+            kind: 任务类型（如 'user'）
+            target: 删除对象标识
+            chunks: (阶段, 待删除键) 分块迭代器
+            total: 预计删除的键数（用于进度显示）
+
+        Returns:
+            任务记录；没有运行中的事件循环时同步执行完毕后返回
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "target": target,
+            "status": "pending",
+            "phase": "",
+            "total": total,
+            "processed": 0,
+            "deleted": 0,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": "",
+            "error": ""
+        }
+        job_key = f"{JOB_KEY_PREFIX}{job['id']}"
+        pipe = redis_manager.redis_client.pipeline(transaction=False)
+        pipe.hset(job_key, mapping=job)
+        pipe.expire(job_key, self.job_ttl)
+        pipe.execute()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None:
+            asyncio.run(self._run(job['id'], chunks))
+            return self.get(job['id']) or job
+
+        task = loop.create_task(self._run(job['id'], chunks))
+        self._tasks[job['id']] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job['id'], None))
+        logger.info(f"级联删除任务已启动: {job['id']} ({kind}={target}, 预计 {total} 个键)")
+        return job
+
+    async def _run(self, job_id: str, chunks: Iterator[Tuple[str, List[str]]]):
+        """逐块删除，每块之间让出事件循环"""
+        job_key = f"{JOB_KEY_PREFIX}{job_id}"
+        processed = 0
+        deleted = 0
+        status = "completed"
+        error = ""
+
+        try:
+            redis_manager.redis_client.hset(job_key, "status", "running")
+            for phase, keys in chunks:
+                processed += len(keys)
+                deleted += redis_manager.unlink_chunk(keys, job_key, {
+                    "phase": phase,
+                    "processed": processed,
+                    "deleted": deleted
+                })
+                await asyncio.sleep(0)
+
+        except Exception as e:
+            status = "failed"
+            error = str(e)
+            logger.error(f"级联删除任务失败: {job_id}, {e}")
+
+        summary = {
+            "status": status,
+            "processed": processed,
+            "deleted": deleted,
+            "finished_at": datetime.now().isoformat(),
+            "error": error
+        }
+        try:
+            pipe = redis_manager.redis_client.pipeline(transaction=False)
+            pipe.hset(job_key, mapping=summary)
+            pipe.expire(job_key, self.job_ttl)
+            pipe.hgetall(job_key)
+            job = pipe.execute()[-1]
+            redis_manager.publish_event(CASCADE_EVENTS_CHANNEL, job)
+            logger.info(f"级联删除任务结束: {job_id}, 状态: {status}, 删除键: {deleted}")
+        except Exception as e:
+            logger.error(f"记录级联删除任务结果失败: {job_id}, {e}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务记录（任一worker创建的任务均可查询）"""
+        try:
+            job = redis_manager.redis_client.hgetall(f"{JOB_KEY_PREFIX}{job_id}")
+            if not job:
+                return None
+            for field in _INT_FIELDS:
+                job[field] = int(job.get(field) or 0)
+            job['running_here'] = job_id in self._tasks
+            return job
+
+        except Exception as e:
+            logger.error(f"读取级联删除任务失败: {e}")
+            return None
+
+    def delete_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        分离用户后以后台任务清理剩余数据
+
+        Returns:
+            {"detached": 分离信息, "job": 任务记录}，用户不存在时返回None
+        """
+        detached = redis_manager.detach_user(user_id)
+        if detached is None:
+            return None
+
+        # 剪贴板项（元数据和内容各一个键） + 设备 + 用户级集合
+        total = detached['clipboards'] * 2 + detached['devices'] + 4
+        job = self.submit('user', user_id, redis_manager.user_cascade_chunks(detached), total=total)
+        return {"detached": detached, "job": job}
+
+
+# 全局级联删除任务管理器
+cascade_jobs = CascadeJobs()
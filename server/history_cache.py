@@ -0,0 +1,220 @@
+"""
+剪切板历史热缓存
+每个worker为活跃用户缓存最近N条已解码的剪切板项及其预序列化的兼容格式JSON片段，
+通过剪切板同步事件原地更新，用同步版本号发现丢失的事件
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from server.records import blob_fields, preview_fields
+from shared.models import ClipboardItem
+from shared.utils import config_manager
+from shared import serialization
+
+
+# 单条缓存项除内容和片段外的估算开销（字节）
+ITEM_OVERHEAD = 512
+
+# 1.0兼容接口的时间格式（客户端原样显示）
+COMPAT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_compat_clipboard(item: ClipboardItem) -> Dict[str, Any]:
+    """转换为1.0兼容接口（/get_clipboards）的剪切板格式"""
+    return {
+        "clip_id": item.id,
+        "content": item.content,
+        "content_type": item.metadata.get('original_content_type', 'text/plain'),
+        "created_at": item.created_at.strftime(COMPAT_TIME_FORMAT),
+        "last_modified": item.updated_at.strftime(COMPAT_TIME_FORMAT),
+        "device_id": item.device_id,
+        "device_label": f"设备-{item.device_id[:8]}",  # 简化设备标签处理
+        **blob_fields(item)
+    }
+
+
+def format_compat_preview(item: ClipboardItem) -> Dict[str, Any]:
+    """预览模式（fields=preview）的1.0兼容格式：用截断的预览代替完整内容"""
+    data = format_compat_clipboard(item)
+    del data["content"]
+    data.update(preview_fields(item))
+    return data
+
+
+def serialize_fragment(data: Dict[str, Any]) -> bytes:
+    """与 FastJSONResponse 相同的编码，片段可直接拼接进响应体"""
+    return serialization.dumps(data)
+
+
+class UserHistory:
+    """单个用户的缓存窗口（按创建时间倒序）"""
+
+    __slots__ = ('version', 'total', 'items', 'fragments', 'size', 'expires_at')
+
+    def __init__(self, version: int, total: int, items: List[ClipboardItem], ttl: float):
+        self.version = version
+        self.total = total
+        self.items = items
+        self.fragments = {item.id: serialize_fragment(format_compat_clipboard(item)) for item in items}
+        self.size = sum(self._item_size(item) for item in items)
+        self.expires_at = time.monotonic() + ttl
+
+    def _item_size(self, item: ClipboardItem) -> int:
+        return len(item.content) + len(self.fragments.get(item.id, b'')) + ITEM_OVERHEAD
+
+    def add(self, item: ClipboardItem, window: int):
+        """按创建时间插入新条目，超出窗口的旧条目被移出"""
+        self.remove(item.id)
+        position = 0
+        while position < len(self.items) and self.items[position].created_at > item.created_at:
+            position += 1
+        if position >= window:
+            return
+
+        self.items.insert(position, item)
+        self.fragments[item.id] = serialize_fragment(format_compat_clipboard(item))
+        self.size += self._item_size(item)
+        while len(self.items) > window:
+            self._drop(self.items.pop())
+
+    def remove(self, item_id: str) -> bool:
+        for index, item in enumerate(self.items):
+            if item.id == item_id:
+                self._drop(self.items.pop(index))
+                return True
+        return False
+
+    def _drop(self, item: ClipboardItem):
+        self.size -= self._item_size(item)
+        self.fragments.pop(item.id, None)
+
+    def covers(self, limit: int) -> bool:
+        """窗口是否包含前limit条（总数不足limit时需包含全部）"""
+        return len(self.items) >= min(limit, self.total)
+
+
+class HistoryCache:
+    """按用户LRU淘汰、受全局内存预算约束的历史缓存"""
+
+    def __init__(self):
+        config = config_manager.get('history_cache', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.window = config.get('window', 100)  # 每个用户缓存的最近条目数
+        self.max_bytes = config.get('max_bytes', 64 * 1024 * 1024)  # 全局内存预算
+        self.ttl = config.get('ttl', 300)  # 兜底有效期，防止漏掉事件后长期不一致
+        # 总数上限（与Redis的历史上限一致），启用冷数据归档时为None
+        self.max_history = config_manager.get('clipboard.max_history', 1000)
+
+        self._users: "OrderedDict[str, UserHistory]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.gaps = 0
+        self.evictions = 0
+        # 用户缓存被移除时的回调（用于取消该用户的同步频道订阅）
+        self.on_discard: Optional[Callable[[str], None]] = None
+
+    def get(self, user_id: str, limit: int) -> Optional[Tuple[List[ClipboardItem], int, UserHistory]]:
+        """返回 (前limit条, 总数, 缓存窗口)，未命中返回None"""
+        entry = self._users.get(user_id)
+        if entry is None or limit > self.window or entry.expires_at < time.monotonic() or not entry.covers(limit):
+            if entry is not None:
+                self.discard(user_id)
+            self.misses += 1
+            return None
+
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return entry.items[:limit], entry.total, entry
+
+    def store(self, user_id: str, version: int, total: int, items: List[ClipboardItem]):
+        """写入用户的最近条目窗口"""
+        previous = self._users.pop(user_id, None)
+        if previous is not None:
+            self.size -= previous.size
+        entry = UserHistory(version, total, list(items[:self.window]), self.ttl)
+        self._users[user_id] = entry
+        self.size += entry.size
+        self._enforce_budget()
+
+    def discard(self, user_id: str) -> bool:
+        """移除用户缓存，返回是否存在"""
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return False
+        self.size -= entry.size
+        if self.on_discard:
+            self.on_discard(user_id)
+        return True
+
+    def _enforce_budget(self):
+        """超出内存预算时按LRU淘汰用户"""
+        while self.size > self.max_bytes and self._users:
+            user_id = next(iter(self._users))
+            self.discard(user_id)
+            self.evictions += 1
+            logger.debug("历史缓存淘汰用户: {}", user_id)
+
+    def _capped(self, total: int) -> int:
+        return total if self.max_history is None else min(total, self.max_history)
+
+    def apply(self, user_id: str, version: Optional[int], action: str,
+              item: Optional[ClipboardItem] = None, item_id: Optional[str] = None,
+              items: Optional[List[ClipboardItem]] = None):
+        """
+        按同步事件更新缓存
+
+        版本号不大于缓存版本的事件已包含在缓存中；跳过版本（事件丢失）时丢弃缓存，
+        下次读取时重新加载
+        """
+        entry = self._users.get(user_id)
+        if entry is None or version is None or version <= entry.version:
+            return
+
+        if version != entry.version + 1:
+            self.gaps += 1
+            self.discard(user_id)
+            return
+
+        before = entry.size
+        if action == 'add' and item is not None:
+            entry.add(item, self.window)
+            entry.total = self._capped(entry.total + 1)
+        elif action == 'add_batch' and items is not None:
+            for batch_item in items:
+                entry.add(batch_item, self.window)
+            entry.total = self._capped(entry.total + len(items))
+        elif action == 'delete' and item_id:
+            entry.remove(item_id)
+            entry.total = max(entry.total - 1, 0)
+        elif action == 'clear':
+            entry.items.clear()
+            entry.fragments.clear()
+            entry.size = 0
+            entry.total = 0
+        else:
+            self.discard(user_id)
+            return
+
+        entry.version = version
+        self.size += entry.size - before
+        self._enforce_budget()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "users": len(self._users),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "window": self.window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "gaps": self.gaps,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
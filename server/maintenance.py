@@ -0,0 +1,409 @@
+"""
+后台维护调度器
+读路径不再承担清理成本：悬空的历史ID、已删除设备留下的剪贴板项、失效的设备/在线索引
+以及中断的级联删除遗留的键，都由这里的后台任务用 SCAN 分批遍历键空间、限速清理；
+较旧的剪贴板历史也由这里迁移到磁盘归档（server.archive），不再被引用的图片和文件内容在这里回收（server.blobs）。
+
+每个worker运行同一个调度循环。需要全局唯一执行的任务通过Redis租约选主
+（SET NX PX，持有者续约；任务结束后把租约延长到下次运行时间，兼作全局调度间隔），
+只影响本进程的任务（如本地吊销记录）在每个worker上各自执行。
+任务进度和耗时写入 maintenance:stats:{name}，任一worker都可查询。
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+from server.blobs import blob_store
+from server.redis_manager import redis_manager
+from server.security import token_manager
+from shared import serialization
+from shared.utils import config_manager
+
+
+LEASE_KEY_PREFIX = "maintenance:lease:"
+STATS_KEY_PREFIX = "maintenance:stats:"
+
+# 仅当租约仍属于本worker时修改过期时间
+# KEYS[1]: 租约键  ARGV: worker_id, 毫秒
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 仅当租约仍属于本worker时释放
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLost(Exception):
+    """任务执行期间租约被其他worker取得（如本worker长时间阻塞导致租约过期）"""
+
+
+class MaintenanceJob:
+    """一个周期性维护任务"""
+
+    def __init__(self, name: str, func: Callable[['JobContext'], Awaitable[Optional[Dict[str, int]]]],
+                 interval: float, leader: bool = True):
+        """
+        Args:
+            name: 任务名
+            func: 任务函数，接收 JobContext，返回结果计数
+            interval: 运行间隔（秒）
+            leader: 是否需要选主（全局只由一个worker执行）
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.leader = leader
+        self.next_run = 0.0  # time.monotonic() 时间
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {
+            "runs": 0,
+            "failures": 0,
+            "skipped": 0,  # 租约由其他worker持有而跳过的次数
+            "running": False,
+            "last_status": "",
+            "last_started_at": "",
+            "last_duration_ms": 0.0,
+            "last_result": {},
+            "last_error": ""
+        }
+
+
+class JobContext:
+    """任务执行上下文：限速、续约、进度上报"""
+
+    def __init__(self, scheduler: 'MaintenanceScheduler', job: MaintenanceJob):
+        self.scheduler = scheduler
+        self.job = job
+        self.counts: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self._last_renew = self.started
+        self._last_report = self.started
+
+    def add(self, counts: Dict[str, int]):
+        """累加结果计数"""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    async def throttle(self, keys: int):
+        """
+        每处理完一批后调用：按 keys_per_second 让出事件循环，必要时续约并上报进度
+
+        Raises:
+            LeaseLost: 租约已不属于本worker
+        """
+        scheduler = self.scheduler
+        rate = scheduler.keys_per_second
+        await asyncio.sleep(keys / rate if rate and keys else 0)
+
+        now = time.monotonic()
+        if self.job.leader and now - self._last_renew >= scheduler.lease_ttl / 3:
+            if not scheduler._renew_lease(self.job, scheduler.lease_ttl):
+                raise LeaseLost(self.job.name)
+            self._last_renew = now
+        if now - self._last_report >= scheduler.progress_interval:
+            scheduler._write_stats(self.job, {"progress": serialization.dumps_str(self.counts)})
+            self._last_report = now
+
+    async def scan(self, match: str, key_type: Optional[str] = None) -> AsyncIterator[List[str]]:
+        """SCAN遍历匹配的键，每批返回后由调用方处理再调用 throttle"""
+        cursor = 0
+        while True:
+            cursor, keys = redis_manager.redis_client.scan(
+                cursor, match=match, count=self.scheduler.scan_count, _type=key_type
+            )
+            if keys:
+                yield keys
+            else:
+                await self.throttle(0)
+            if not cursor:
+                return
+
+
+class MaintenanceScheduler:
+    """后台维护任务调度器"""
+
+    def __init__(self):
+        config = config_manager.get('maintenance', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.tick = config.get('tick', 1)  # 检查到期任务的间隔（秒）
+        self.scan_count = config.get('scan_count', 100)  # 每次SCAN的COUNT
+        self.keys_per_second = config.get('keys_per_second', 2000)  # 限速，0为不限速
+        self.lease_ttl = config.get('lease_ttl', 60)  # 执行期间的租约时长（秒），持有者每1/3续约
+        self.progress_interval = config.get('progress_interval', 1)  # 进度上报间隔（秒）
+        self.trash_grace = config.get('trash_grace', 3600)  # 遗留的待清理键超过该秒数才回收
+        self.intervals = config.get('intervals', {}) or {}  # 任务名 -> 运行间隔（秒）
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs: Dict[str, MaintenanceJob] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, func: Callable[[JobContext], Awaitable[Optional[Dict[str, int]]]],
+                 interval: float, leader: bool = True) -> MaintenanceJob:
+        """注册任务（配置 maintenance.intervals 中的同名项覆盖默认间隔）"""
+        job = MaintenanceJob(name, func, self.intervals.get(name, interval), leader)
+        self.jobs[name] = job
+        return job
+
+    def start(self):
+        """启动调度循环（需要在事件循环中调用）"""
+        if not self.enabled or self._task:
+            return
+        try:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"后台维护调度器已启动: {self.worker_id}, 任务: {', '.join(self.jobs)}")
+        except RuntimeError:
+            logger.debug("暂无事件循环，后台维护调度器未启动")
+
+    async def stop(self):
+        """停止调度循环和运行中的任务，释放本worker持有的租约"""
+        tasks = [self._task] if self._task else []
+        tasks += [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+        for job in self.jobs.values():
+            if job.leader:
+                try:
+                    redis_manager.run_script(RELEASE_LEASE_SCRIPT, [f"{LEASE_KEY_PREFIX}{job.name}"],
+                                             [self.worker_id])
+                except Exception as e:
+                    logger.error(f"释放维护任务租约失败: {job.name}, {e}")
+
+    async def _loop(self):
+        while True:
+            now = time.monotonic()
+            for job in self.jobs.values():
+                if job.next_run <= now and not (job.task and not job.task.done()):
+                    job.task = asyncio.create_task(self._execute(job))
+            await asyncio.sleep(self.tick)
+
+    def _acquire_lease(self, job: MaintenanceJob) -> bool:
+        """尝试取得任务租约；失败时把下次尝试推迟到当前租约到期"""
+        lease_key = f"{LEASE_KEY_PREFIX}{job.name}"
+        pipe = redis_manager.redis_client.pipeline(transaction=False)
+        pipe.set(lease_key, self.worker_id, nx=True, px=int(self.lease_ttl * 1000))
+        pipe.pttl(lease_key)
+        acquired, pttl = pipe.execute()
+        if not acquired:
+            job.next_run = time.monotonic() + (pttl / 1000 if pttl and pttl > 0 else self.tick)
+        return bool(acquired)
+
+    def _renew_lease(self, job: MaintenanceJob, seconds: float) -> bool:
+        return bool(redis_manager.run_script(
+            RENEW_LEASE_SCRIPT, [f"{LEASE_KEY_PREFIX}{job.name}"],
+            [self.worker_id, max(int(seconds * 1000), 1)]
+        ))
+
+    def _write_stats(self, job: MaintenanceJob, fields: Dict[str, Any], count: Optional[str] = None):
+        """写入全局任务统计（任务状态不影响清理结果，失败只记录日志）"""
+        try:
+            stats_key = f"{STATS_KEY_PREFIX}{job.name}"
+            pipe = redis_manager.redis_client.pipeline(transaction=False)
+            pipe.hset(stats_key, mapping=fields)
+            if count:
+                pipe.hincrby(stats_key, count, 1)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"写入维护任务统计失败: {job.name}, {e}")
+
+    async def _execute(self, job: MaintenanceJob):
+        job.next_run = time.monotonic() + job.interval
+        try:
+            if job.leader and not self._acquire_lease(job):
+                job.stats["skipped"] += 1
+                return
+        except Exception as e:
+            logger.error(f"获取维护任务租约失败: {job.name}, {e}")
+            return
+
+        ctx = JobContext(self, job)
+        started_at = datetime.now().isoformat()
+        job.stats.update(running=True, last_started_at=started_at)
+        self._write_stats(job, {"owner": self.worker_id, "status": "running",
+                                "started_at": started_at, "progress": "{}"})
+
+        status, error = "completed", ""
+        try:
+            result = await job.func(ctx)
+            if result:
+                ctx.add(result)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except LeaseLost:
+            status, error = "lease_lost", "租约已被其他worker取得"
+            logger.warning(f"维护任务租约丢失，停止执行: {job.name}")
+        except Exception as e:
+            status, error = "failed", str(e)
+            logger.error(f"维护任务失败: {job.name}, {e}")
+        finally:
+            duration = time.monotonic() - ctx.started
+            job.stats.update(
+                running=False, last_status=status, last_error=error,
+                last_duration_ms=round(duration * 1000, 1), last_result=dict(ctx.counts)
+            )
+            job.stats["runs"] += 1
+            if status != "completed":
+                job.stats["failures"] += 1
+
+            self._write_stats(job, {
+                "status": status,
+                "finished_at": datetime.now().isoformat(),
+                "duration_ms": round(duration * 1000, 1),
+                "result": serialization.dumps_str(ctx.counts),
+                "progress": "{}",
+                "error": error
+            }, count="runs" if status == "completed" else "failures")
+
+            # 保持租约到下次运行时间，其他worker在此之前不会重复执行
+            if job.leader and status != "lease_lost":
+                try:
+                    self._renew_lease(job, job.interval - duration)
+                except Exception as e:
+                    logger.error(f"延长维护任务租约失败: {job.name}, {e}")
+
+        if ctx.counts:
+            logger.info(f"维护任务完成: {job.name}, 耗时 {duration * 1000:.0f}ms, 结果: {ctx.counts}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """本worker的任务统计"""
+        return {
+            "enabled": self.enabled,
+            "running": bool(self._task and not self._task.done()),
+            "worker_id": self.worker_id,
+            "jobs": {name: {"interval": job.interval, "leader": job.leader, **job.stats}
+                     for name, job in self.jobs.items()}
+        }
+
+    def get_cluster_stats(self) -> Dict[str, Any]:
+        """全局任务统计（最近一次执行任务的worker写入的记录）和当前租约持有者"""
+        try:
+            pipe = redis_manager.redis_client.pipeline(transaction=False)
+            for name in self.jobs:
+                pipe.hgetall(f"{STATS_KEY_PREFIX}{name}")
+                pipe.get(f"{LEASE_KEY_PREFIX}{name}")
+            results = pipe.execute()
+
+            cluster = {}
+            for index, name in enumerate(self.jobs):
+                stats, holder = results[index * 2], results[index * 2 + 1]
+                for field in ('result', 'progress'):
+                    stats[field] = serialization.loads(stats[field]) if stats.get(field) else {}
+                for field in ('runs', 'failures'):
+                    stats[field] = int(stats.get(field) or 0)
+                stats['lease_holder'] = holder
+                cluster[name] = stats
+            return cluster
+
+        except Exception as e:
+            logger.error(f"读取维护任务统计失败: {e}")
+            return {}
+
+
+# ==================== 维护任务 ====================
+
+async def repair_clipboard_indexes(ctx: JobContext) -> None:
+    """修复剪贴板历史索引：移除悬空ID，收集已删除设备留下的剪贴板项"""
+    async for keys in ctx.scan("clipboard:*", "zset"):
+        for key in keys:
+            result = redis_manager.repair_clipboard_index(key.split(':', 1)[1])
+            ctx.add(result)
+            await ctx.throttle(result["checked"] + 1)
+
+
+async def compact_device_indexes(ctx: JobContext) -> None:
+    """压缩设备集合和在线状态集合"""
+    async for keys in ctx.scan("devices:*", "set"):
+        for key in keys:
+            ctx.add(redis_manager.compact_device_index(key.split(':', 1)[1]))
+        await ctx.throttle(len(keys))
+
+
+async def sweep_cascade_trash(ctx: JobContext) -> None:
+    """回收中断的级联删除遗留的待清理键"""
+    cutoff = time.time() - ctx.scheduler.trash_grace
+    async for keys in ctx.scan("cascade_trash:*"):
+        for key in keys:
+            created_at = redis_manager.trash_key_created_at(key)
+            if created_at is None or created_at > cutoff:
+                continue
+            for _, chunk in redis_manager.trash_cascade_chunks(key):
+                ctx.add({"deleted": redis_manager.unlink_chunk(chunk)})
+                await ctx.throttle(len(chunk))
+            ctx.add({"trash_keys": 1})
+        await ctx.throttle(len(keys))
+
+
+async def archive_cold_history(ctx: JobContext) -> None:
+    """
+    把各用户较旧的剪贴板历史从Redis迁移到磁盘归档，再按 archive.max_age / max_items 清理归档
+
+    归档的读写都是阻塞的文件操作（fsync、压缩），在线程中执行，不占用事件循环；
+    清空历史和删除用户时归档目录只被移入回收目录，由这里在后台删除
+    """
+    archive = redis_manager.archive
+    if not archive.enabled:
+        return
+    ctx.add({"trash_purged": await asyncio.to_thread(archive.purge_trash)})
+    async for keys in ctx.scan("clipboard:*", "zset"):
+        for key in keys:
+            result = await asyncio.to_thread(redis_manager.archive_user_history, key.split(':', 1)[1])
+            ctx.add(result)
+            await ctx.throttle(result["archived"] + result["dangling"] + 1)
+
+    if not (archive.max_age or archive.max_items):
+        return
+    for user_id in await asyncio.to_thread(archive.list_users):
+        result = await asyncio.to_thread(redis_manager.prune_archived_history, user_id)
+        ctx.add(result)
+        await ctx.throttle(result["pruned"] + 1)
+
+
+async def sweep_blobs(ctx: JobContext) -> None:
+    """移除失效的blob引用，删除不再被任何剪贴板项引用的内容文件"""
+    if not blob_store.enabled:
+        return
+    async for keys in ctx.scan("blob_refs:*", "set"):
+        for key in keys:
+            # 检查条目是否在归档中需要读取归档索引，在线程中执行
+            result = await asyncio.to_thread(redis_manager.prune_blob_refs, key.split(':', 1)[1])
+            ctx.add(result)
+            await ctx.throttle(result["refs"] + 1)
+
+    cutoff = time.time() - blob_store.gc_grace
+    for blob_ids in blob_store.stale_blobs(cutoff, ctx.scheduler.scan_count):
+        for blob_id, referenced in zip(blob_ids, redis_manager.blobs_referenced(blob_ids)):
+            if not referenced and blob_store.delete(blob_id, older_than=cutoff):
+                ctx.add({"blobs_deleted": 1})
+        await ctx.throttle(len(blob_ids))
+
+
+async def clean_revocations(ctx: JobContext) -> None:
+    """清理本进程过期的吊销记录并重建过滤器"""
+    token_manager.clean_expired_blacklist()
+
+
+# 全局维护调度器
+maintenance_scheduler = MaintenanceScheduler()
+maintenance_scheduler.register("repair_clipboard_indexes", repair_clipboard_indexes, 3600)
+maintenance_scheduler.register("compact_device_indexes", compact_device_indexes, 3600)
+maintenance_scheduler.register("sweep_cascade_trash", sweep_cascade_trash, 600)
+maintenance_scheduler.register("archive_cold_history", archive_cold_history, 600)
+maintenance_scheduler.register("sweep_blobs", sweep_blobs, 3600)
+maintenance_scheduler.register("clean_revocations", clean_revocations, 300, leader=False)
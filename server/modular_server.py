@@ -5,20 +5,28 @@ BeeSyncClip 模块化服务器
 
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from server.api.responses import FastJSONResponse
+import asyncio
 import time
+from typing import Optional
 from loguru import logger
 from datetime import datetime, timedelta
 
 # 导入模块化组件
 from server.security import security_middleware, encryption_manager, token_manager
 from server.api import auth_router, clipboard_router, device_router, websocket_router
+from server.api.compression import CompressionMiddleware
+from server.api.ingest import PayloadTooLarge, max_request_bytes, max_websocket_message_bytes, measure_content, receive_body
 from server.redis_manager import redis_manager
+from server.records import blob_fields, preview_fields
+from server.history_cache import format_compat_clipboard, format_compat_preview, COMPAT_TIME_FORMAT
 from server.auth import auth_manager
+from server.cascade import cascade_jobs
+from server.maintenance import maintenance_scheduler
 from shared.models import ClipboardItem, ClipboardType
-from shared.utils import calculate_checksum
+from shared import serialization
 import hashlib
-import json
+import zlib
 
 
 # 创建FastAPI应用
@@ -27,7 +35,8 @@ app = FastAPI(
     description="模块化、标准化、加密的跨平台同步剪切板 API 服务",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
 )
 
 # 硬编码管理员配置
@@ -46,6 +55,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（按Accept-Encoding协商，跳过小响应和已压缩的内容类型）
+app.add_middleware(CompressionMiddleware)
+
 
 @app.middleware("http")
 async def security_middleware_handler(request: Request, call_next):
@@ -53,12 +65,18 @@ async def security_middleware_handler(request: Request, call_next):
     start_time = time.time()
     
     try:
-        # 检查速率限制
+        # 检查速率限制（按路由策略，按用户或IP计数）
         client_ip = request.client.host if request.client else "unknown"
-        if not security_middleware.check_rate_limit(client_ip):
-            return JSONResponse(
+        rate_limit = security_middleware.rate_limiter.check(
+            request.url.path,
+            client_ip,
+            security_middleware.get_rate_limit_identity(request)
+        )
+        if not rate_limit["allowed"]:
+            return FastJSONResponse(
                 content={"error": "请求过于频繁，请稍后再试"},
-                status_code=429
+                status_code=429,
+                headers={"Retry-After": str(rate_limit["retry_after"])}
             )
         
         # 处理请求
@@ -75,7 +93,7 @@ async def security_middleware_handler(request: Request, call_next):
         
     except Exception as e:
         logger.error(f"安全中间件处理失败: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={"error": "服务器内部错误"},
             status_code=500
         )
@@ -134,12 +152,19 @@ async def health_check():
                 "encryption_enabled": True,
                 "jwt_enabled": True,
                 "rate_limiting": True
-            }
+            },
+            "caches": {
+                "records": redis_manager.record_cache.get_stats(),
+                "history": redis_manager.history_cache.get_stats(),
+                "tokens": token_manager.get_cache_stats()
+            },
+            "archive": redis_manager.archive.get_stats(),
+            "maintenance": maintenance_scheduler.get_stats()
         }
         
     except Exception as e:
         logger.error(f"健康检查失败: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={
                 "status": "unhealthy",
                 "error": str(e),
@@ -169,17 +194,14 @@ async def security_info():
             "x_xss_protection": "1; mode=block",
             "strict_transport_security": "max-age=31536000; includeSubDomains"
         },
-        "rate_limiting": {
-            "enabled": True,
-            "max_requests_per_minute": 60
-        }
+        "rate_limiting": security_middleware.rate_limiter.get_stats()
     }
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """HTTP异常处理器"""
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
@@ -201,7 +223,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         request
     )
     
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={
             "error": "服务器内部错误",
@@ -225,6 +247,14 @@ async def startup_event():
         ADMIN_CONFIG["password"].encode()
     ).hexdigest()
     
+    # 订阅token吊销广播并启动Redis消息监听器
+    token_manager.enable_revocation_sync()
+    from server.api.websocket_routes import websocket_manager
+    websocket_manager.start_redis_listener()
+    
+    # 后台维护任务（索引修复、孤儿清理），读路径不再承担清理成本
+    maintenance_scheduler.start()
+    
     logger.info("✅ Redis连接正常")
     logger.info("🔐 加密管理器已初始化")
     logger.info("🎫 Token管理器已初始化")
@@ -240,11 +270,19 @@ async def shutdown_event():
     
     # 清理资源
     try:
+        # 停止后台维护任务并释放租约，其他worker可立即接手
+        await maintenance_scheduler.stop()
+        
+        # 停止订阅消息监听和心跳写入任务，避免它们在连接关闭后继续访问Redis
+        from server.api.websocket_routes import websocket_manager
+        await websocket_manager.stop_redis_listener()
+        
         # 清理过期的token黑名单
         token_manager.clean_expired_blacklist()
         
-        # 关闭Redis连接
+        # 关闭Redis连接（先写入缓冲的设备心跳）
         if redis_manager.is_connected():
+            redis_manager.flush_presence()
             redis_manager.close()
             logger.info("✅ Redis连接已关闭")
         
@@ -254,6 +292,52 @@ async def shutdown_event():
         logger.error(f"关闭服务器时发生错误: {e}")
 
 
+def format_compat_time(value) -> Optional[str]:
+    """将datetime或ISO时间字符串转换为兼容接口使用的格式"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.strftime(COMPAT_TIME_FORMAT)
+    except ValueError:
+        return value
+
+
+def format_compat_device(device: dict) -> dict:
+    """转换为1.0兼容接口的设备格式（登录和 /get_devices 共用）"""
+    return {
+        "device_id": device.get('device_id'),
+        "label": device.get('name'),
+        "os": device.get('os_info'),
+        "ip_address": device.get('ip_address'),
+        "first_login": format_compat_time(device.get('created_at')),
+        "last_login": format_compat_time(device.get('last_seen'))
+    }
+
+
+def make_sync_etag(user_id: str, scope: str, version: int, extra: str = "") -> str:
+    """由用户同步版本号生成弱ETag（同一版本的响应内容等价）"""
+    tag = f"{user_id[:8]}-{scope}-{version}"
+    if extra:
+        tag += f"-{extra}"
+    return f'W/"{tag}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """检查 If-None-Match 是否包含当前ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    """304响应（不包含响应体）"""
+    return Response(status_code=304, headers={"ETag": etag})
+
+
 # 兼容性路由 - 保持与前端的兼容性
 @app.post("/login")
 async def login_compat(request: Request):
@@ -265,9 +349,12 @@ async def login_compat(request: Request):
         username = request_data.get('username')
         password = request_data.get('password')
         device_info = request_data.get('device_info', {})
+        lean = bool(request_data.get('lean')) or request.query_params.get('mode') == 'lean'
+        # 预览模式：历史只返回截断的预览，完整内容按需读取
+        preview = (request_data.get('fields') or request.query_params.get('fields')) == 'preview'
         
         if not username or not password:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户名和密码不能为空"
             }, status_code=400)
@@ -283,61 +370,47 @@ async def login_compat(request: Request):
         # 验证用户
         auth_response = auth_manager.authenticate_user(auth_request)
         if not auth_response.success:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": auth_response.message
             }, status_code=401)
         
-        # 获取用户信息（用于后续处理）
-        user = auth_manager.get_user_info(username)
-        
-        # 生成tokens
-        tokens = token_manager.generate_tokens(
-            user_id=auth_response.user_id,
-            username=username,
-            device_id=auth_response.device_id
-        )
-        
-        # 创建安全会话
+        # 创建安全会话（access/refresh token只在这里签发，认证时不生成令牌）
         session_data = security_middleware.create_secure_session(
             user_id=auth_response.user_id,
             username=username,
             device_id=auth_response.device_id
         )
         
+        # 精简模式：只返回token、版本号和水位线，设备和历史由客户端按需并行拉取
+        if lean:
+            device = auth_response.device or {}
+            sync_state = await asyncio.to_thread(redis_manager.get_user_sync_state, auth_response.user_id)
+            return FastJSONResponse(content={
+                "success": True,
+                "user_id": auth_response.user_id,
+                "username": username,
+                "device_id": auth_response.device_id,
+                "message": "登录成功",
+                "token": session_data.get("access_token"),
+                "current_device": {**format_compat_device(device), "device_id": auth_response.device_id},
+                **sync_state,
+                **session_data
+            })
+        
         # 获取用户设备列表（与1.0版本兼容）
         user_devices = redis_manager.get_user_devices(auth_response.user_id)
         
         # 获取用户剪贴板历史（与1.0版本兼容）
-        clipboard_history = redis_manager.get_user_clipboard_history(
-            auth_response.user_id, page=1, per_page=50
+        clipboard_history = await redis_manager.fetch_user_clipboard_history(
+            auth_response.user_id, page=1, per_page=50, with_content=not preview
         )
         
-        # 查找当前设备信息
-        current_device = None
-        for device in user_devices:
-            if device['device_id'] == device_info['device_id']:
-                current_device = {
-                    "device_id": device['device_id'],
-                    "label": device['name'],
-                    "os": device['os_info'],
-                    "ip_address": device['ip_address'],
-                    "first_login": device['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                    "last_login": device['last_seen'].strftime("%Y-%m-%d %H:%M:%S")
-                }
-                break
-        
-        # 转换设备列表格式
-        devices_list = []
-        for device in user_devices:
-            devices_list.append({
-                "device_id": device['device_id'],
-                "label": device['name'],
-                "os": device['os_info'],
-                "ip_address": device['ip_address'],
-                "first_login": device['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                "last_login": device['last_seen'].strftime("%Y-%m-%d %H:%M:%S")
-            })
+        # 转换设备列表格式并查找当前设备信息
+        devices_list = [format_compat_device(device) for device in user_devices]
+        current_device = next(
+            (device for device in devices_list if device['device_id'] == device_info['device_id']), None
+        )
         
         # 转换剪贴板格式
         clipboards_list = []
@@ -352,32 +425,36 @@ async def login_compat(request: Request):
             }
             content_type = content_type_map.get(item.type, 'text/plain')
             
-            clipboards_list.append({
+            record = {
                 "clip_id": item.id,
-                "content": item.content,
                 "content_type": content_type,
-                "created_at": item.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "last_modified": item.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "device_id": item.device_id
-            })
+                "created_at": item.created_at.strftime(COMPAT_TIME_FORMAT),
+                "last_modified": item.updated_at.strftime(COMPAT_TIME_FORMAT),
+                "device_id": item.device_id,
+                **blob_fields(item)
+            }
+            if preview:
+                record.update(preview_fields(item))
+            else:
+                record["content"] = item.content
+            clipboards_list.append(record)
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "user_id": auth_response.user_id,
             "username": username,
             "device_id": auth_response.device_id,
             "message": "登录成功",
-            "token": tokens.get("access_token"),  # 兼容1.0版本的token字段
+            "token": session_data.get("access_token"),  # 兼容1.0版本的token字段
             "devices": devices_list,
             "current_device": current_device,
             "clipboards": clipboards_list,
-            **tokens,
             **session_data
         })
         
     except Exception as e:
         logger.error(f"兼容性登录失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "登录过程中发生错误"
         }, status_code=500)
@@ -395,7 +472,7 @@ async def register_compat(request: Request):
         email = request_data.get('email')
         
         if not username or not password:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户名和密码不能为空"
             }, status_code=400)
@@ -403,7 +480,7 @@ async def register_compat(request: Request):
         # 检查用户是否已存在
         existing_user = auth_manager.get_user_info(username)
         if existing_user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户名已存在"
             }, status_code=409)
@@ -416,21 +493,21 @@ async def register_compat(request: Request):
         )
         
         if user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": True,
                 "user_id": user.id,
                 "username": user.username,
                 "message": "注册成功"
             }, status_code=201)
         else:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "注册失败"
             }, status_code=500)
             
     except Exception as e:
         logger.error(f"兼容性注册失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "注册过程中发生错误"
         }, status_code=500)
@@ -443,59 +520,62 @@ async def get_devices_compat(request: Request):
         # 获取username参数
         username = request.query_params.get("username")
         if not username:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "error": "缺少username参数"
             }, status_code=400)
         
         # 获取用户信息
         user = redis_manager.get_user_by_username(username)
         if not user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "error": "用户不存在"
             }, status_code=404)
         
         user_id = user['id']
         
+        # 设备版本号和在线设备一次往返读取；两者都未变化时返回304
+        version, presence = redis_manager.get_devices_sync_state(user_id)
+        online_digest = format(zlib.crc32(",".join(sorted(presence)).encode()), "08x")
+        etag = make_sync_etag(user_id, 'devices', version, online_digest)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        
         # 获取用户设备列表
         devices = redis_manager.get_user_devices(user_id)
         
         # 转换为兼容性格式（与登录接口保持一致）
-        device_list = []
-        for device in devices:
-            device_info = {
-                "device_id": device.get('device_id'),
-                "label": device.get('name'),  # 与登录接口一致
-                "os": device.get('os_info'),  # 与登录接口一致
-                "ip_address": device.get('ip_address'),  # 与登录接口一致
-                "first_login": device.get('created_at').strftime("%Y-%m-%d %H:%M:%S") if device.get('created_at') else None,
-                "last_login": device.get('last_seen').strftime("%Y-%m-%d %H:%M:%S") if device.get('last_seen') else None,
-                "is_online": redis_manager.is_device_online(user_id, device.get('device_id', ''))
-            }
-            device_list.append(device_info)
+        device_list = [
+            {**format_compat_device(device), "is_online": device.get('device_id') in presence}
+            for device in devices
+        ]
         
         logger.debug(f"获取设备列表成功: user={username}, count={len(device_list)}")
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "devices": device_list,
             "total": len(device_list)
-        })
+        }, headers={"ETag": etag})
         
     except Exception as e:
         import traceback
         logger.error(f"获取设备列表失败: {e}")
         logger.error(f"详细错误信息: {traceback.format_exc()}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "error": f"获取设备列表失败: {str(e)}"
         }, status_code=500)
 
 
 @app.get("/get_clipboards")
-async def get_clipboards_compat(username: str):
-    """兼容性获取剪切板接口（优化版本）"""
+async def get_clipboards_compat(username: str, request: Request, fields: Optional[str] = None):
+    """
+    兼容性获取剪切板接口（优化版本）
+    
+    fields=preview 时每条只返回截断的预览、大小、校验和和类型，完整内容通过 GET /clipboard/{clip_id}/content 按需读取
+    """
     try:
         if not username:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "缺少username参数"
             }, status_code=400)
@@ -503,58 +583,84 @@ async def get_clipboards_compat(username: str):
         # 获取用户信息
         user = redis_manager.get_user_by_username(username)
         if not user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户未找到"
             }, status_code=404)
         
-        # 🚀 优化：移除每次调用的orphaned cleanup，改为定期任务
-        # cleaned_count = redis_manager.clean_orphaned_clipboard_items(user['id'])
+        # 悬空ID和孤儿条目由后台维护任务清理（server/maintenance.py），这里不做清理
+        
+        # 版本号未变化时直接返回304，不读取和序列化历史
+        preview = fields == "preview"
+        version = redis_manager.get_sync_version(user['id'], 'clipboard')
+        etag = make_sync_etag(user['id'], 'clipboard', version, "preview" if preview else "")
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        
+        if preview:
+            # 只读取元数据（活跃用户由历史缓存提供）
+            history = await redis_manager.fetch_user_clipboard_history(user['id'], page=1, per_page=100)
+            clipboards_list = [format_compat_preview(item) for item in history.items]
+            return FastJSONResponse(content={
+                "success": True,
+                "clipboards": clipboards_list,
+                "count": len(clipboards_list)
+            }, headers={"ETag": etag})
+        
+        # 活跃用户直接拼接历史缓存中预序列化的片段，无需访问Redis和重新编码
+        fragments = await redis_manager.fetch_clipboard_fragments(user['id'], limit=100, min_version=version)
+        if fragments is not None:
+            body = b'{"success":true,"clipboards":[' + b','.join(fragments) + b'],"count":' + str(len(fragments)).encode() + b'}'
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
         
         # 🚀 优化：获取用户剪切板历史（使用批量查询）
-        history = redis_manager.get_user_clipboard_history(user['id'], page=1, per_page=100)
+        history = await redis_manager.fetch_user_clipboard_history(user['id'], page=1, per_page=100, with_content=True)
         
         # 转换格式以兼容原始API
-        clipboards_list = []
-        for item in history.items:
-            # 获取原始content_type
-            content_type = item.metadata.get('original_content_type', 'text/plain')
-            
-            clipboards_list.append({
-                "clip_id": item.id,
-                "content": item.content,
-                "content_type": content_type,
-                "created_at": item.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "last_modified": item.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "device_id": item.device_id,
-                "device_label": f"设备-{item.device_id[:8]}"  # 简化设备标签处理
-            })
+        clipboards_list = [format_compat_clipboard(item) for item in history.items]
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "clipboards": clipboards_list,
             "count": len(clipboards_list)
-        })
+        }, headers={"ETag": etag})
         
     except Exception as e:
         logger.error(f"获取剪贴板内容错误: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "获取剪贴板内容过程中发生错误"
         }, status_code=500)
 
 
 @app.post("/add_clipboard")
-async def add_clipboard_compat(request: dict):
-    """兼容性添加剪切板接口"""
+async def add_clipboard_compat(req: Request):
+    """兼容性添加剪切板接口（请求体按块接收，超过大小限制时立即返回413）"""
     try:
+        try:
+            body = await receive_body(req, max_request_bytes())
+            request = serialization.loads(body.data)
+            if not isinstance(request, dict):
+                raise ValueError("请求体必须是JSON对象")
+            content = request.get('content')
+            size, checksum = measure_content(content) if isinstance(content, str) else (0, None)
+        except PayloadTooLarge as e:
+            return FastJSONResponse(content={
+                "success": False,
+                "message": str(e)
+            }, status_code=413)
+        except ValueError:
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "请求格式无效"
+            }, status_code=400)
+        
         username = request.get('username')
-        content = request.get('content')
         device_id = request.get('device_id')
         content_type = request.get('content_type', 'text/plain')
         
         if not username or not content or not device_id:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "缺少必要参数"
             }, status_code=400)
@@ -562,7 +668,7 @@ async def add_clipboard_compat(request: dict):
         # 获取用户信息
         user = redis_manager.get_user_by_username(username)
         if not user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户不存在"
             }, status_code=404)
@@ -575,28 +681,28 @@ async def add_clipboard_compat(request: dict):
                 "source": "compat_api",
                 "original_content_type": content_type
             },
-            size=len(content.encode('utf-8')),
+            size=size,
             device_id=device_id,
             user_id=user['id'],
-            checksum=calculate_checksum(content)
+            checksum=checksum
         )
         
         # 保存到Redis
         if redis_manager.save_clipboard_item(clipboard_item):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": True,
                 "message": "剪贴板记录已添加",
                 "clip_id": clipboard_item.id
             }, status_code=201)
         else:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "保存失败"
             }, status_code=500)
             
     except Exception as e:
         logger.error(f"添加剪切板内容失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "添加剪切板内容过程中发生错误"
         }, status_code=500)
@@ -626,7 +732,7 @@ async def admin_login(request: Request):
         password = request_data.get('password')
         
         if not username or not password:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户名和密码不能为空"
             }, status_code=400)
@@ -634,7 +740,7 @@ async def admin_login(request: Request):
         # 验证管理员凭据
         if not verify_admin_credentials(username, password):
             logger.warning(f"管理员登录失败: {username}")
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户名或密码错误"
             }, status_code=401)
@@ -644,7 +750,7 @@ async def admin_login(request: Request):
         
         logger.info(f"管理员登录成功: {username}")
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "message": "管理员登录成功",
             "admin_token": admin_token,
@@ -654,7 +760,7 @@ async def admin_login(request: Request):
         
     except Exception as e:
         logger.error(f"管理员登录失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "登录过程中发生错误"
         }, status_code=500)
@@ -676,7 +782,7 @@ async def admin_get_users(request: Request):
         # 获取Authorization头中的token
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "缺少认证token"
             }, status_code=401)
@@ -685,24 +791,24 @@ async def admin_get_users(request: Request):
         
         # 验证管理员token
         if not verify_admin_token(token):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "无效的管理员token"
             }, status_code=401)
         
-        # 获取所有用户
+        # 获取所有用户，设备和剪贴板数量按用户批量读取
         users = redis_manager.get_all_users()
+        user_ids = [user['id'] for user in users]
+        devices_by_user = redis_manager.get_users_devices(user_ids)
+        clipboard_counts = await asyncio.to_thread(redis_manager.get_users_clipboard_counts, user_ids)
         
         # 格式化用户列表
         users_list = []
         for user in users:
-            # 获取用户的设备数量
-            devices_count = len(redis_manager.get_user_devices(user['id']))
-            # 获取用户的剪贴板数量
-            clipboard_history = redis_manager.get_user_clipboard_history(user['id'], page=1, per_page=1)
-            clipboards_count = clipboard_history.total
+            user_devices = devices_by_user.get(user['id'], [])
+            devices_count = len(user_devices)
+            clipboards_count = clipboard_counts.get(user['id'], 0)
             # 获取用户最后登录时间
-            user_devices = redis_manager.get_user_devices(user['id'])
             last_login = None
             if user_devices:
                 # 找到最近的登录时间
@@ -720,14 +826,14 @@ async def admin_get_users(request: Request):
                 "clipboards_count": clipboards_count
             })
         logger.info(f"管理员获取用户列表成功，共 {len(users_list)} 个用户")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "users": users_list,
             "total": len(users_list)
         })
     except Exception as e:
         logger.error(f"管理员获取用户列表失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "获取用户列表失败"
         }, status_code=500)
@@ -740,7 +846,7 @@ async def admin_delete_user(user_key: str, request: Request):
         # 获取Authorization头中的token
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "缺少认证token"
             }, status_code=401)
@@ -749,7 +855,7 @@ async def admin_delete_user(user_key: str, request: Request):
         
         # 验证管理员token
         if not verify_admin_token(token):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "无效的管理员token"
             }, status_code=401)
@@ -760,50 +866,117 @@ async def admin_delete_user(user_key: str, request: Request):
             # 再用username查找
             user = redis_manager.get_user_by_username(user_key)
         if not user:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "用户不存在"
             }, status_code=404)
         user_id = user['id']
         username = user.get('username', user_key)
         
-        # 删除用户的所有剪贴板数据
-        clipboard_history = redis_manager.get_user_clipboard_history(user_id, page=1, per_page=10000)
-        deleted_clipboards = 0
-        for item in clipboard_history.items:
-            if redis_manager.delete_clipboard_item(item.id):
-                deleted_clipboards += 1
-        
-        # 删除用户的所有设备
-        devices = redis_manager.get_user_devices(user_id)
-        deleted_devices = 0
-        for device in devices:
-            device_id = device.get('device_id')
-            if device_id and redis_manager.remove_user_device(user_id, device_id):
-                deleted_devices += 1
-        
-        # 删除用户账户
-        if redis_manager.delete_user(user_id):
-            logger.info(f"管理员删除用户成功: {username}, 删除剪贴板: {deleted_clipboards}, 删除设备: {deleted_devices}")
-            return JSONResponse(content={
+        # 账户立即删除，剪贴板和设备数据由后台任务分块清理
+        result = cascade_jobs.delete_user(user_id)
+        if result:
+            detached, job = result['detached'], result['job']
+            logger.info(f"管理员删除用户: {username}, 剪贴板: {detached['clipboards']}, "
+                        f"设备: {detached['devices']}, 清理任务: {job['id']}")
+            return FastJSONResponse(content={
                 "success": True,
-                "message": f"用户 {username} 及其所有数据已删除",
-                "deleted_clipboards": deleted_clipboards,
-                "deleted_devices": deleted_devices
+                "message": f"用户 {username} 已删除，其数据正在后台清理",
+                "deleted_clipboards": detached['clipboards'],
+                "deleted_devices": detached['devices'],
+                "job_id": job['id'],
+                "job_status": job['status'],
+                "job_url": f"/admin/jobs/{job['id']}"
             })
         else:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "删除用户失败"
             }, status_code=500)
     except Exception as e:
         logger.error(f"管理员删除用户失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "删除用户过程中发生错误"
         }, status_code=500)
 
 
+@app.get("/admin/jobs/{job_id}")
+async def admin_get_job(job_id: str, request: Request):
+    """管理员查询后台任务进度"""
+    try:
+        # 获取Authorization头中的token
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "缺少认证token"
+            }, status_code=401)
+        
+        token = auth_header.split("Bearer ")[1]
+        
+        # 验证管理员token
+        if not verify_admin_token(token):
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "无效的管理员token"
+            }, status_code=401)
+        
+        job = cascade_jobs.get(job_id)
+        if not job:
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "任务不存在或已过期"
+            }, status_code=404)
+        
+        return FastJSONResponse(content={
+            "success": True,
+            "job": job
+        })
+        
+    except Exception as e:
+        logger.error(f"管理员查询任务失败: {e}")
+        return FastJSONResponse(content={
+            "success": False,
+            "message": "查询任务失败"
+        }, status_code=500)
+
+
+@app.get("/admin/maintenance")
+async def admin_get_maintenance(request: Request):
+    """管理员查询后台维护任务状态"""
+    try:
+        # 获取Authorization头中的token
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "缺少认证token"
+            }, status_code=401)
+
+        token = auth_header.split("Bearer ")[1]
+
+        # 验证管理员token
+        if not verify_admin_token(token):
+            return FastJSONResponse(content={
+                "success": False,
+                "message": "无效的管理员token"
+            }, status_code=401)
+
+        return FastJSONResponse(content={
+            "success": True,
+            "jobs": maintenance_scheduler.get_cluster_stats(),
+            "worker": maintenance_scheduler.get_stats()
+        })
+
+    except Exception as e:
+        logger.error(f"管理员查询维护任务失败: {e}")
+        return FastJSONResponse(content={
+            "success": False,
+            "message": "查询维护任务失败"
+        }, status_code=500)
+
+
 @app.get("/admin/stats")
 async def admin_get_stats(request: Request):
     """管理员获取系统统计信息"""
@@ -811,7 +984,7 @@ async def admin_get_stats(request: Request):
         # 获取Authorization头中的token
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "缺少认证token"
             }, status_code=401)
@@ -820,7 +993,7 @@ async def admin_get_stats(request: Request):
         
         # 验证管理员token
         if not verify_admin_token(token):
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "无效的管理员token"
             }, status_code=401)
@@ -829,28 +1002,25 @@ async def admin_get_stats(request: Request):
         all_users = redis_manager.get_all_users()
         total_users = len(all_users)
         
+        user_ids = [user['id'] for user in all_users]
+        devices_by_user = redis_manager.get_users_devices(user_ids)
+        clipboard_counts = await asyncio.to_thread(redis_manager.get_users_clipboard_counts, user_ids)
+        
         total_devices = 0
-        total_clipboards = 0
         active_users = 0
+        week_ago = datetime.now() - timedelta(days=7)
         
-        for user in all_users:
-            user_id = user['id']
-            
+        for user_id in user_ids:
             # 统计设备数量
-            devices = redis_manager.get_user_devices(user_id)
+            devices = devices_by_user.get(user_id, [])
             total_devices += len(devices)
             
             # 检查是否为活跃用户（7天内有设备活动）
-            week_ago = datetime.now() - timedelta(days=7)
-            for device in devices:
-                last_seen = device.get('last_seen')
-                if last_seen and last_seen > week_ago:
-                    active_users += 1
-                    break
-            
-            # 统计剪贴板数量
-            clipboard_history = redis_manager.get_user_clipboard_history(user_id, page=1, per_page=1)
-            total_clipboards += clipboard_history.total
+            if any(device.get('last_seen') and device['last_seen'] > week_ago for device in devices):
+                active_users += 1
+        
+        # 统计剪贴板数量
+        total_clipboards = sum(clipboard_counts.values())
         
         # Redis状态
         redis_info = {
@@ -858,7 +1028,7 @@ async def admin_get_stats(request: Request):
             "version": "6.0+"  # 简化版本信息
         }
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "stats": {
                 "total_users": total_users,
@@ -873,7 +1043,7 @@ async def admin_get_stats(request: Request):
         
     except Exception as e:
         logger.error(f"管理员获取统计信息失败: {e}")
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": False,
             "message": "获取统计信息失败"
         }, status_code=500)
@@ -889,5 +1059,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         log_level="info",
-        reload=False
+        reload=False,
+        ws_max_size=max_websocket_message_bytes()  # 超大的WebSocket帧在协议层直接拒绝
     ) 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+进程内记录缓存
+缓存很少变化但几乎每个请求都会读取的Redis记录（用户、用户名索引、设备），
+通过Redis客户端追踪（CLIENT TRACKING BCAST）接收失效通知保持一致
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from loguru import logger
+
+from shared.utils import config_manager
+
+
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+
+# 未命中标记（缓存值本身可能是任意类型）
+MISS = object()
+
+
+class RecordCache:
+    """有界LRU缓存，条目带TTL，由Redis失效通知驱动淘汰"""
+
+    def __init__(self):
+        config = config_manager.get('record_cache', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.max_entries = config.get('max_entries', 10000)
+        self.ttl = config.get('ttl', 300)  # 安全兜底：即使漏掉失效通知，条目也会过期
+        self.prefixes = config.get('prefixes', ['user:', 'username:', 'device:'])
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, 过期时间)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        # 追踪连接：订阅失效频道，同时作为 CLIENT TRACKING 的重定向目标
+        self._connection = None
+        self._retry_at = 0.0
+        # 失效通知只在轮询时处理，长时间未轮询时不能信任缓存内容
+        self._last_poll = 0.0
+        self.poll_grace = config.get('poll_grace', 1.0)
+
+    @property
+    def active(self) -> bool:
+        """追踪连接正常且失效通知在持续处理时缓存才可用"""
+        return (self.enabled and self._connection is not None
+                and time.monotonic() - self._last_poll < self.poll_grace)
+
+    def get(self, key: str) -> Any:
+        """读取缓存，未命中或缓存不可用时返回 MISS"""
+        if not self.active:
+            return MISS
+
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISS
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any):
+        """写入缓存"""
+        if not self.active:
+            return
+
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None):
+        """淘汰指定键，keys为None时清空缓存"""
+        if keys is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            return
+
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def enable_tracking(self, client) -> bool:
+        """
+        建立追踪连接：获取连接ID，开启以自身为重定向目标的广播追踪，然后订阅失效频道
+
+        Args:
+            client: redis.Redis 实例（使用其连接参数创建独立连接）
+        """
+        connection = None
+        try:
+            connection = client.connection_pool.make_connection()
+            connection.connect()
+
+            connection.send_command('CLIENT', 'ID')
+            client_id = connection.read_response()
+
+            args = ['CLIENT', 'TRACKING', 'ON', 'REDIRECT', client_id, 'BCAST']
+            for prefix in self.prefixes:
+                args.extend(['PREFIX', prefix])
+            connection.send_command(*args)
+            connection.read_response()
+
+            connection.send_command('SUBSCRIBE', INVALIDATION_CHANNEL)
+            connection.read_response()
+
+            # 追踪开启前缓存的内容可能已过期
+            self.invalidate()
+            self._connection = connection
+            self._last_poll = time.monotonic()
+            logger.info("记录缓存已启用Redis客户端追踪")
+            return True
+
+        except Exception as e:
+            logger.warning(f"记录缓存无法启用客户端追踪，暂时绕过缓存: {e}")
+            if connection is not None:
+                connection.disconnect()
+            self._retry_at = time.monotonic() + 5
+            return False
+
+    def poll(self, client) -> int:
+        """处理已到达的失效通知（由发布订阅监听循环调用），返回处理的通知数"""
+        if not self.enabled:
+            return 0
+
+        if self._connection is None:
+            if time.monotonic() >= self._retry_at:
+                self.enable_tracking(client)
+            return 0
+
+        handled = 0
+        try:
+            while self._connection.can_read(timeout=0):
+                response = self._connection.read_response()
+                if not isinstance(response, list) or len(response) < 3 or response[0] != 'message':
+                    continue
+                # 消息内容为键列表，None 表示 FLUSHALL/FLUSHDB
+                self.invalidate(response[2])
+                handled += 1
+            self._last_poll = time.monotonic()
+
+        except Exception as e:
+            logger.warning(f"记录缓存追踪连接断开: {e}")
+            self._connection.disconnect()
+            self._connection = None
+            self.invalidate()
+            self._retry_at = time.monotonic() + 1
+
+        return handled
+
+    def close(self):
+        """关闭追踪连接"""
+        if self._connection is not None:
+            self._connection.disconnect()
+            self._connection = None
+        self.invalidate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "tracking": self._connection is not None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
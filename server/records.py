@@ -0,0 +1,171 @@
+"""
+存储记录格式转换
+剪贴板项和设备在各存储后端中以字符串字段字典保存（与Redis哈希一致），这里负责双向转换。
+记录中的 preview 字段是内容开头的片段，列表只读取元数据时据此展示，不需要读取内容。
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+from shared.models import ClipboardItem
+from shared.utils import config_manager
+from shared import serialization
+
+
+# 预览保留的字符数
+PREVIEW_CHARS = config_manager.get('clipboard.preview_chars', 200)
+
+
+def _parse_datetime(value: Optional[str]) -> datetime:
+    """解析ISO格式时间，缺失或格式错误时返回当前时间"""
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            logger.warning("时间字段解析失败: {}", value)
+    return datetime.now()
+
+
+def parse_device_record(device_id: str, device_data: Dict[str, str]) -> Dict[str, Any]:
+    """将Redis中的设备哈希转换为设备信息字典"""
+    return {
+        'device_id': device_id,
+        'name': device_data.get('name', 'Unknown Device'),
+        'os_info': device_data.get('os_info', 'Unknown'),
+        'ip_address': device_data.get('ip_address', '0.0.0.0'),
+        'created_at': _parse_datetime(device_data.get('created_at')),
+        'last_seen': _parse_datetime(device_data.get('last_seen'))
+    }
+
+
+def parse_clipboard_record(item_data: Dict[str, str]) -> ClipboardItem:
+    """将Redis中的剪切板项哈希转换为 ClipboardItem（兼容旧的content_type字段）"""
+    item_data = dict(item_data)
+    
+    # 兼容处理
+    if 'content_type' in item_data and 'type' not in item_data:
+        content_type = item_data.pop('content_type')
+        # 映射到枚举值
+        if content_type in ['text/plain', 'text']:
+            item_data['type'] = 'text'
+        elif content_type in ['image/png', 'image/jpeg', 'image']:
+            item_data['type'] = 'image'
+        elif content_type in ['application/octet-stream', 'file']:
+            item_data['type'] = 'file'
+        elif content_type in ['text/html', 'html']:
+            item_data['type'] = 'html'
+        elif content_type in ['text/rtf', 'rtf']:
+            item_data['type'] = 'rtf'
+        else:
+            item_data['type'] = 'text'
+
+        # 保存原始content_type到metadata
+        if 'metadata' not in item_data:
+            item_data['metadata'] = {}
+        elif isinstance(item_data['metadata'], str):
+            item_data['metadata'] = serialization.loads(item_data['metadata'])
+
+        if isinstance(item_data['metadata'], dict):
+            item_data['metadata']['original_content_type'] = content_type
+
+    # 处理时间字段
+    if 'created_at' in item_data and isinstance(item_data['created_at'], str):
+        item_data['created_at'] = datetime.fromisoformat(item_data['created_at'])
+
+    if 'updated_at' in item_data and isinstance(item_data['updated_at'], str):
+        item_data['updated_at'] = datetime.fromisoformat(item_data['updated_at'])
+    elif 'updated_at' not in item_data:
+        item_data['updated_at'] = item_data.get('created_at', datetime.now())
+
+    # 处理metadata
+    if 'metadata' in item_data and isinstance(item_data['metadata'], str):
+        item_data['metadata'] = serialization.loads(item_data['metadata'])
+    elif 'metadata' not in item_data:
+        item_data['metadata'] = {}
+
+    # 确保必需字段
+    if 'size' not in item_data:
+        item_data['size'] = len(item_data.get('content', ''))
+    if 'checksum' not in item_data:
+        item_data['checksum'] = None
+    # 只有元数据的记录（内容单独存储）content为空
+    item_data.setdefault('content', '')
+    
+    item = ClipboardItem(**item_data)
+    if 'preview' not in item_data:
+        # 旧记录没有预览字段
+        item.preview = make_preview(item)
+    return item
+
+
+def make_preview(item: ClipboardItem) -> str:
+    """内容预览：文本类内容取开头 PREVIEW_CHARS 个字符，图片等base64内容和磁盘文件为空"""
+    if item.preview is not None and not item.content:
+        return item.preview
+    metadata = item.metadata if isinstance(item.metadata, dict) else {}
+    if not (metadata.get('original_content_type') or 'text/plain').startswith('text/'):
+        return ""
+    return item.content[:PREVIEW_CHARS]
+
+
+def blob_fields(item: ClipboardItem) -> Dict[str, str]:
+    """上传到磁盘的文件条目的 blob_id 和文件名（content为空，内容通过 GET /clipboard/{id}/blob 下载），其他条目为空字典"""
+    metadata = item.metadata if isinstance(item.metadata, dict) else {}
+    if not metadata.get('blob_id'):
+        return {}
+    return {"blob_id": metadata['blob_id'], "filename": metadata.get('filename', '')}
+
+
+def preview_fields(item: ClipboardItem) -> Dict[str, Any]:
+    """列表预览模式（fields=preview）的条目字段：预览、是否截断、字节数、校验和及文件标记，不含完整内容"""
+    preview = make_preview(item)
+    return {
+        "preview": preview,
+        "truncated": len(preview.encode('utf-8')) < item.size,
+        "size": item.size,
+        "checksum": item.checksum,
+        **blob_fields(item)
+    }
+
+
+def build_clipboard_record(item: ClipboardItem) -> Dict[str, str]:
+    """剪切板项转换为存储到Redis哈希的字段（parse_clipboard_record 的逆操作）"""
+    item_data = item.dict()
+    item_data['preview'] = make_preview(item)
+    item_data['created_at'] = item.created_at.isoformat()
+    item_data['updated_at'] = item.updated_at.isoformat()
+
+    # 序列化metadata为JSON字符串
+    if 'metadata' in item_data and isinstance(item_data['metadata'], dict):
+        item_data['metadata'] = serialization.dumps_str(item_data['metadata'])
+
+    # 兼容原始API：添加content_type字段
+    metadata = item.metadata if isinstance(item.metadata, dict) else {}
+    if 'original_content_type' in metadata:
+        item_data['content_type'] = metadata['original_content_type']
+    else:
+        # 如果没有原始类型，根据type转换
+        type_to_content_type = {
+            'text': 'text/plain',
+            'image': 'image/png',
+            'file': 'application/octet-stream',
+            'html': 'text/html',
+            'rtf': 'text/rtf'
+        }
+        item_data['content_type'] = type_to_content_type.get(item.type.value, 'text/plain')
+
+    # 确保所有值都是Redis可接受的类型
+    for key, value in item_data.items():
+        if isinstance(value, (dict, list)):
+            item_data[key] = serialization.dumps_str(value)
+        elif value is None:
+            item_data[key] = ""
+
+    return item_data
+
+
+def split_clipboard_record(item_data: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+    """存储字段拆分为 (元数据, 内容)，元数据中保留预览"""
+    metadata = {key: value for key, value in item_data.items() if key != 'content'}
+    return metadata, item_data.get('content', '')
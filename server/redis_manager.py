@@ -3,15 +3,67 @@ BeeSyncClip Redis 数据管理器
 支持发布订阅实时同步
 """
 
-import json
 import redis
 import asyncio
-from typing import List, Optional, Dict, Any, Callable
+import time
+import uuid
+from typing import List, Optional, Dict, Any, Callable, Iterator, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
 from shared.models import ClipboardItem, ClipboardHistory
 from shared.utils import config_manager
+from shared import serialization
+from server.record_cache import RecordCache, MISS
+from server.history_cache import HistoryCache
+from server.archive import ArchiveKey, ClipboardArchive
+from server.records import blob_fields, build_clipboard_record, parse_clipboard_record, parse_device_record, split_clipboard_record
+
+
+# _queue_clipboard_item 为每个条目写入的命令数（HSET元数据、SET内容、ZADD、EXPIRE）
+ITEM_WRITE_COMMANDS = 4
+
+# 登录时原子地完成设备创建/更新、加入设备集合、在线状态和版本号更新
+# KEYS: device:{id}, devices:{user_id}, presence:{user_id}, sync_version:{user_id}
+# ARGV: device_id, name, os_info, ip_address, user_id, now(ISO), now(时间戳), 在线集合保留秒数
+DEVICE_LOGIN_SCRIPT = """
+redis.call('HSET', KEYS[1], 'id', ARGV[1], 'name', ARGV[2], 'os_info', ARGV[3],
+           'ip_address', ARGV[4], 'user_id', ARGV[5], 'last_seen', ARGV[6], 'is_online', 'true')
+redis.call('HSETNX', KEYS[1], 'created_at', ARGV[6])
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[7], ARGV[1])
+redis.call('EXPIRE', KEYS[3], ARGV[8])
+redis.call('HINCRBY', KEYS[4], 'devices', 1)
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# 用户名不存在时原子地创建用户记录和用户名索引
+# KEYS: username:{name}, user:{id}  ARGV: user_id, field, value, ...  返回1表示创建成功
+CREATE_USER_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX') then
+    redis.call('HSET', KEYS[2], unpack(ARGV, 2))
+    return 1
+end
+return 0
+"""
+
+
+# 仅当迁移租约仍属于本次迁移时释放
+# KEYS: archive_lease:{user_id}  ARGV: 租约令牌
+RELEASE_ARCHIVE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 迁移租约的有效期（毫秒），持有者异常退出时到期自动释放
+ARCHIVE_LEASE_MS = 300000
+
+
+def _pairs_to_dict(values: list) -> Dict[str, Any]:
+    """将Lua返回的 [field, value, ...] 列表转换为字典"""
+    return dict(zip(values[::2], values[1::2])) if values else {}
 
 
 class RedisManager:
@@ -22,6 +74,35 @@ class RedisManager:
         self.pubsub_client = None
         self.pubsub = None
         self.subscribers = {}  # user_id -> callback functions
+        self.channel_subscribers = {}  # channel -> callback functions（非用户频道）
+        self._scripts = {}  # Lua脚本源码 -> Script对象
+        
+        # 在线状态：presence:{user_id} 有序集合，成员为设备ID，分数为最后心跳时间
+        presence_config = config_manager.get('presence', {}) or {}
+        self.presence_timeout = presence_config.get('timeout', 60)  # 超过该秒数无心跳视为离线
+        self.presence_flush_interval = presence_config.get('flush_interval', 5)  # 心跳批量写入间隔
+        self.presence_retention = presence_config.get('retention', 86400)  # 在线集合无心跳后的保留时间
+        self._pending_presence = {}  # user_id -> {device_id: 最后心跳时间}，等待批量写入
+        
+        # 用户、用户名索引、设备记录的进程内缓存（由Redis客户端追踪保持一致）
+        self.record_cache = RecordCache()
+        
+        # 活跃用户最近剪切板历史的进程内缓存（由同步事件更新）
+        self.history_cache = HistoryCache()
+        self.history_cache.on_discard = self._release_history_subscription
+        self._history_subscriptions = set()
+        self._history_loads = {}  # user_id -> 在线程中读取历史窗口期间收到的同步事件最大版本号（每次读取一个单元）
+        self._listener_heartbeat = 0.0  # 监听循环最近一次运行时间，事件未被处理时不能信任历史缓存
+        
+        # 冷数据归档：较旧的历史条目由后台任务从Redis迁移到磁盘，读取时透明合并
+        self.archive = ClipboardArchive()
+        if self.archive.enabled:
+            # 总数包含归档条目，不再受Redis中的历史上限约束
+            self.history_cache.max_history = None
+        self._archiving = set()  # 正在后台线程中迁移的用户
+        
+        # 批量级联删除每个pipeline处理的键数
+        self.cascade_chunk_size = (config_manager.get('cascade_delete', {}) or {}).get('chunk_size', 500)
         self.connect()
     
     def connect(self) -> bool:
@@ -72,8 +153,15 @@ class RedisManager:
             pass
         return False
 
-    def publish_clipboard_sync(self, user_id: str, action: str, data: dict, source_device: str = None):
-        """发布剪贴板同步消息"""
+    def publish_clipboard_sync(self, user_id: str, action: str, data: dict, source_device: str = None,
+                               version: Optional[int] = None, item: Optional[dict] = None,
+                               items: Optional[List[dict]] = None):
+        """
+        发布剪贴板同步消息
+        
+        version 为本次变更后的剪贴板同步版本号，item 为新增条目除内容外的存储字段
+        （批量新增时为 items，顺序与 data["items"] 一致），其他worker据此原地更新历史缓存
+        """
         try:
             if not self.is_connected():
                 logger.error("Redis未连接，无法发布消息")
@@ -83,11 +171,17 @@ class RedisManager:
                 "action": action,  # add, delete, clear
                 "data": data,
                 "source_device": source_device,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now()
             }
+            if version is not None:
+                message["version"] = version
+            if item is not None:
+                message["item"] = item
+            if items is not None:
+                message["items"] = items
             
             channel = f"clipboard_sync:{user_id}"
-            self.redis_client.publish(channel, json.dumps(message))
+            self.redis_client.publish(channel, serialization.dumps(message))
             
             logger.debug(f"发布同步消息: user={user_id}, action={action}")
             return True
@@ -146,6 +240,160 @@ class RedisManager:
             logger.error(f"取消订阅失败: {e}")
             return False
 
+    def _history_cache_usable(self) -> bool:
+        """同步事件监听正常运行时历史缓存才可用"""
+        return self.history_cache.enabled and time.monotonic() - self._listener_heartbeat < 1.0
+    
+    def _release_history_subscription(self, user_id: str):
+        """用户移出历史缓存后取消其同步频道订阅"""
+        if user_id in self._history_subscriptions:
+            self._history_subscriptions.discard(user_id)
+            self.unsubscribe_clipboard_sync(user_id, self._on_history_event)
+    
+    def _on_history_event(self, user_id: str, message: dict):
+        """根据剪贴板同步事件更新历史缓存"""
+        action = message.get("action")
+        data = message.get("data") or {}
+        item = None
+        items = None
+        try:
+            if action == "add" and message.get("item"):
+                item = parse_clipboard_record({**message["item"], "content": data.get("content", "")})
+            elif action == "add_batch" and message.get("items") is not None:
+                items = [
+                    parse_clipboard_record({**record, "content": entry.get("content", "")})
+                    for record, entry in zip(message["items"], data.get("items") or [])
+                ]
+        except Exception as e:
+            logger.warning(f"同步事件中的剪切板项无法解析: {e}")
+        for pending in self._history_loads.get(user_id, ()):
+            pending[0] = max(pending[0], int(message.get("version") or 0))
+        self.history_cache.apply(user_id, message.get("version"), action, item=item,
+                                 item_id=data.get("clip_id"), items=items)
+    
+    def _subscribe_history(self, user_id: str):
+        """订阅用户的同步频道以更新历史缓存"""
+        # 先订阅再读取：读取之后发布的事件都能收到，之前的事件按版本号忽略
+        if user_id not in self._history_subscriptions:
+            self._history_subscriptions.add(user_id)
+            self.subscribe_clipboard_sync(user_id, self._on_history_event)
+    
+    def _load_history_window(self, user_id: str):
+        """读取用户最近条目窗口写入历史缓存，返回 (条目, 总数)"""
+        self._subscribe_history(user_id)
+        items, total, version = self._read_history(user_id, 0, self.history_cache.window,
+                                                   with_version=True, with_content=True)
+        self.history_cache.store(user_id, int(version or 0), total, items)
+        return items, total
+    
+    async def _fetch_history_window(self, user_id: str):
+        """
+        _load_history_window 的异步版本：读取（可能读取和解压归档文件）在线程中执行，
+        历史缓存只在事件循环中更新
+        
+        读取期间到达的事件已由监听循环处理（缓存中还没有该用户时被忽略），
+        读取结果可能早于这些事件，此时不写入缓存，下次请求重新加载
+        """
+        self._subscribe_history(user_id)
+        pending = [0]
+        self._history_loads.setdefault(user_id, []).append(pending)
+        try:
+            items, total, version = await asyncio.to_thread(
+                self._read_history, user_id, 0, self.history_cache.window, True, True
+            )
+        finally:
+            loads = self._history_loads[user_id]
+            loads.remove(pending)
+            if not loads:
+                del self._history_loads[user_id]
+        
+        version = int(version or 0)
+        if pending[0] <= version:
+            self.history_cache.store(user_id, version, total, items)
+        return items, total
+    
+    async def fetch_clipboard_fragments(self, user_id: str, limit: int, min_version: int = 0) -> Optional[List[bytes]]:
+        """
+        获取最近limit条的预序列化兼容格式片段，历史缓存不可用时返回None
+        
+        min_version: 调用方已读取的同步版本号，缓存落后于该版本（事件尚未到达）时重新加载
+        """
+        if not self._history_cache_usable() or limit > self.history_cache.window:
+            return None
+        
+        try:
+            cached = self.history_cache.get(user_id, limit)
+            if cached is None or cached[2].version < min_version:
+                await self._fetch_history_window(user_id)
+                cached = self.history_cache.get(user_id, limit)
+                if cached is None or cached[2].version < min_version:
+                    return None
+            items, _, entry = cached
+            return [entry.fragments[item.id] for item in items]
+            
+        except Exception as e:
+            logger.error(f"获取剪切板片段失败: {e}")
+            return None
+    
+    def _cached_get(self, key: str) -> Optional[str]:
+        """带进程内缓存的GET"""
+        value = self.record_cache.get(key)
+        if value is MISS:
+            value = self.redis_client.get(key)
+            if value:
+                self.record_cache.set(key, value)
+        return value
+    
+    def _cached_hgetall(self, key: str) -> Dict[str, str]:
+        """带进程内缓存的HGETALL（返回副本，调用方可以修改）"""
+        value = self.record_cache.get(key)
+        if value is MISS:
+            value = self.redis_client.hgetall(key)
+            if value:
+                self.record_cache.set(key, value)
+        return dict(value)
+    
+    def run_script(self, source: str, keys: list, args: list):
+        """执行Lua脚本（首次注册后使用EVALSHA，脚本缓存丢失时自动回退EVAL）"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self.redis_client.register_script(source)
+            self._scripts[source] = script
+        return script(keys=keys, args=args, client=self.redis_client)
+
+    def publish_event(self, channel: str, message: dict) -> bool:
+        """向指定频道发布事件（用于跨worker广播）"""
+        try:
+            if not self.redis_client:
+                return False
+            
+            self.redis_client.publish(channel, serialization.dumps(message))
+            return True
+            
+        except Exception as e:
+            logger.error(f"发布事件失败: channel={channel}, error={e}")
+            return False
+
+    def subscribe_channel(self, channel: str, callback: Callable) -> bool:
+        """订阅非用户频道，回调签名为 callback(data)"""
+        try:
+            if not self.is_connected():
+                logger.error("Redis未连接，无法订阅")
+                return False
+            
+            callbacks = self.channel_subscribers.setdefault(channel, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+            
+            self.pubsub.subscribe(channel)
+            
+            logger.info(f"订阅频道: {channel}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"订阅频道失败: channel={channel}, error={e}")
+            return False
+
     async def listen_for_messages(self):
         """监听Redis发布订阅消息"""
         try:
@@ -153,35 +401,85 @@ class RedisManager:
                 return
             
             while True:
-                message = self.pubsub.get_message(timeout=1.0)
+                self._listener_heartbeat = time.monotonic()
+                
+                # 处理记录缓存的失效通知
+                self.record_cache.poll(self.pubsub_client)
+                
+                # 非阻塞轮询，避免在事件循环中阻塞等待
+                message = self.pubsub.get_message(timeout=0) if self.pubsub.subscribed else None
                 if message and message['type'] == 'message':
                     try:
                         # 解析消息
                         channel = message['channel']
-                        data = json.loads(message['data'])
+                        data = serialization.loads(message['data'])
                         
-                        # 提取用户ID
-                        user_id = channel.split(':')[1]
+                        if channel in self.channel_subscribers:
+                            callbacks = list(self.channel_subscribers[channel])
+                            user_id = None
+                        else:
+                            # 提取用户ID
+                            user_id = channel.split(':')[1]
+                            callbacks = list(self.subscribers.get(user_id, []))
                         
                         # 调用回调函数
-                        if user_id in self.subscribers:
-                            for callback in self.subscribers[user_id]:
-                                try:
-                                    if asyncio.iscoroutinefunction(callback):
-                                        await callback(user_id, data)
-                                    else:
-                                        callback(user_id, data)
-                                except Exception as e:
-                                    logger.error(f"回调函数执行失败: {e}")
+                        for callback in callbacks:
+                            try:
+                                args = (data,) if user_id is None else (user_id, data)
+                                if asyncio.iscoroutinefunction(callback):
+                                    await callback(*args)
+                                else:
+                                    callback(*args)
+                            except Exception as e:
+                                logger.error(f"回调函数执行失败: {e}")
                     
                     except Exception as e:
                         logger.error(f"处理订阅消息失败: {e}")
+                    
+                    # 有消息时继续读取，只让出一次事件循环
+                    await asyncio.sleep(0)
+                    continue
                 
                 await asyncio.sleep(0.01)  # 避免CPU占用过高
                 
         except Exception as e:
             logger.error(f"监听订阅消息失败: {e}")
 
+    @staticmethod
+    def _item_keys(item_ids: List[str]) -> List[str]:
+        """条目的元数据哈希和内容键"""
+        keys = []
+        for item_id in item_ids:
+            keys.append(f"item:{item_id}")
+            keys.append(f"item_body:{item_id}")
+        return keys
+    
+    def _queue_clipboard_item(self, pipe, item: ClipboardItem, item_data: Dict[str, str], expire_time: int):
+        """
+        向pipeline写入单个剪切板项，共 ITEM_WRITE_COMMANDS 条命令
+        
+        元数据（含预览）写入哈希 item:{id}，内容单独写入 item_body:{id}，列表只需读取哈希
+        """
+        item_key = f"item:{item.id}"
+        metadata, content = split_clipboard_record(item_data)
+        pipe.hset(item_key, mapping=metadata)
+        pipe.set(f"item_body:{item.id}", content, ex=expire_time)
+        # 添加到用户的有序集合中（按时间戳排序）
+        pipe.zadd(f"clipboard:{item.user_id}", {item.id: item.created_at.timestamp()})
+        pipe.expire(item_key, expire_time)
+    
+    @staticmethod
+    def _sync_payload(item: ClipboardItem, item_data: Dict[str, str]) -> dict:
+        """同步事件中的条目数据"""
+        return {
+            "clip_id": item.id,
+            "content": item.content,
+            "content_type": item_data['content_type'],
+            "created_at": item.created_at,
+            "device_id": item.device_id,
+            **blob_fields(item)
+        }
+    
     def save_clipboard_item(self, item: ClipboardItem) -> bool:
         """保存剪切板项"""
         try:
@@ -191,66 +489,33 @@ class RedisManager:
             
             # 使用有序集合存储用户的剪切板历史
             user_key = f"clipboard:{item.user_id}"
-            item_key = f"item:{item.id}"
+            item_data = build_clipboard_record(item)
+            expire_time = config_manager.get('clipboard.expire_time', 86400)
             
-            # 保存具体的剪切板项数据
-            item_data = item.dict()
-            item_data['created_at'] = item.created_at.isoformat()
-            item_data['updated_at'] = item.updated_at.isoformat()
+            # 所有写操作在一次往返中完成
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_clipboard_item(pipe, item, item_data, expire_time)
+            pipe.expire(user_key, expire_time)
             
-            # 序列化metadata为JSON字符串
-            if 'metadata' in item_data and isinstance(item_data['metadata'], dict):
-                item_data['metadata'] = json.dumps(item_data['metadata'])
+            # 限制历史记录数量（启用归档时超出的条目迁移到归档而不是丢弃）
+            max_history = config_manager.get('clipboard.max_history', 1000)
+            self._queue_history_limit(pipe, user_key, max_history)
             
-            # 兼容原始API：添加content_type字段
-            metadata = item.metadata if isinstance(item.metadata, dict) else {}
-            if 'original_content_type' in metadata:
-                item_data['content_type'] = metadata['original_content_type']
-            else:
-                # 如果没有原始类型，根据type转换
-                type_to_content_type = {
-                    'text': 'text/plain',
-                    'image': 'image/png',
-                    'file': 'application/octet-stream',
-                    'html': 'text/html',
-                    'rtf': 'text/rtf'
-                }
-                item_data['content_type'] = type_to_content_type.get(item.type.value, 'text/plain')
-            
-            # 确保所有值都是Redis可接受的类型
-            for key, value in item_data.items():
-                if isinstance(value, (dict, list)):
-                    item_data[key] = json.dumps(value)
-                elif value is None:
-                    item_data[key] = ""
-            
-            self.redis_client.hset(item_key, mapping=item_data)
-            
-            # 添加到用户的有序集合中（按时间戳排序）
-            score = item.created_at.timestamp()
-            self.redis_client.zadd(user_key, {item.id: score})
-            
-            # 设置过期时间
-            expire_time = config_manager.get('clipboard.expire_time', 86400)
-            self.redis_client.expire(item_key, expire_time)
-            self.redis_client.expire(user_key, expire_time)
+            self.bump_sync_version(item.user_id, 'clipboard', pipe=pipe)
+            hot_total, version = pipe.execute()[-2:]
+            self._archive_overflow(item.user_id, hot_total, max_history)
             
-            # 限制历史记录数量
-            max_history = config_manager.get('clipboard.max_history', 1000)
-            self.redis_client.zremrangebyrank(user_key, 0, -(max_history + 1))
+            # 本worker的历史缓存立即更新，保证写后读一致
+            self.history_cache.apply(item.user_id, version, "add", item=item)
             
             # 🔥 发布同步消息
             self.publish_clipboard_sync(
                 user_id=item.user_id,
                 action="add",
-                data={
-                    "clip_id": item.id,
-                    "content": item.content,
-                    "content_type": item.type.value if hasattr(item.type, 'value') else str(item.type),
-                    "created_at": item.created_at.isoformat(),
-                    "device_id": item.device_id
-                },
-                source_device=item.device_id
+                data=self._sync_payload(item, item_data),
+                source_device=item.device_id,
+                version=version,
+                item=split_clipboard_record(item_data)[0]
             )
             
             logger.debug(f"保存剪切板项成功: {item.id}")
@@ -260,105 +525,338 @@ class RedisManager:
             logger.error(f"保存剪切板项失败: {e}")
             return False
     
-    def get_clipboard_item(self, item_id: str) -> Optional[ClipboardItem]:
-        """获取指定的剪切板项"""
+    def save_clipboard_items(self, user_id: str, items: List[ClipboardItem],
+                             source_device: str = None) -> Tuple[List[bool], Optional[int]]:
+        """
+        批量保存同一用户的剪切板项
+        
+        所有写入在一次pipeline中完成，同步版本号只递增一次，并只发布一条合并的 add_batch 事件
+        
+        Returns:
+            (与items顺序一致的逐项保存结果, 写入后的剪切板同步版本号；失败时为None)
+        """
+        if not items:
+            return [], None
+        
         try:
             if not self.is_connected():
-                return None
-            
-            item_key = f"item:{item_id}"
-            item_data = self.redis_client.hgetall(item_key)
-            
-            if not item_data:
-                return None
+                logger.error("Redis 未连接")
+                return [False] * len(items), None
             
-            # 兼容旧数据: 将 'content_type' 映射到 'type'
-            if 'content_type' in item_data and 'type' not in item_data:
-                content_type = item_data.pop('content_type')
-                # 映射 content_type 到 ClipboardType 枚举值
-                if content_type in ['text/plain', 'text']:
-                    item_data['type'] = 'text'
-                elif content_type in ['image/png', 'image/jpeg', 'image']:
-                    item_data['type'] = 'image'
-                elif content_type in ['application/octet-stream', 'file']:
-                    item_data['type'] = 'file'
-                elif content_type in ['text/html', 'html']:
-                    item_data['type'] = 'html'
-                elif content_type in ['text/rtf', 'rtf']:
-                    item_data['type'] = 'rtf'
-                else:
-                    # 默认为text类型
-                    item_data['type'] = 'text'
-
-            # 转换时间字段
-            if 'created_at' in item_data:
-                if isinstance(item_data['created_at'], str):
-                    item_data['created_at'] = datetime.fromisoformat(item_data['created_at'])
+            user_key = f"clipboard:{user_id}"
+            expire_time = config_manager.get('clipboard.expire_time', 86400)
+            max_history = config_manager.get('clipboard.max_history', 1000)
             
-            if 'updated_at' in item_data:
-                if isinstance(item_data['updated_at'], str):
-                    item_data['updated_at'] = datetime.fromisoformat(item_data['updated_at'])
-            else:
-                # 如果没有updated_at字段，使用created_at的值
-                item_data['updated_at'] = item_data.get('created_at', datetime.now())
+            records = [build_clipboard_record(item) for item in items]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item, item_data in zip(items, records):
+                self._queue_clipboard_item(pipe, item, item_data, expire_time)
+            pipe.expire(user_key, expire_time)
+            self._queue_history_limit(pipe, user_key, max_history)
+            self.bump_sync_version(user_id, 'clipboard', pipe=pipe)
+            responses = pipe.execute(raise_on_error=False)
+            if not isinstance(responses[-2], Exception):
+                self._archive_overflow(user_id, responses[-2], max_history)
+            
+            saved = [
+                not any(isinstance(response, Exception)
+                        for response in responses[index * ITEM_WRITE_COMMANDS:(index + 1) * ITEM_WRITE_COMMANDS])
+                for index in range(len(items))
+            ]
+            version = responses[-1]
+            if isinstance(version, Exception):
+                logger.error(f"批量保存后更新同步版本失败: {version}")
+                self.history_cache.discard(user_id)
+                return saved, None
+            
+            stored = [(item, item_data) for item, item_data, ok in zip(items, records, saved) if ok]
+            self.history_cache.apply(user_id, version, "add_batch", items=[item for item, _ in stored])
+            
+            # 合并为一条同步消息
+            self.publish_clipboard_sync(
+                user_id=user_id,
+                action="add_batch",
+                data={"items": [self._sync_payload(item, item_data) for item, item_data in stored]},
+                source_device=source_device,
+                version=version,
+                items=[split_clipboard_record(item_data)[0] for _, item_data in stored]
+            )
             
-            # 转换元数据
-            if 'metadata' in item_data and isinstance(item_data['metadata'], str):
-                item_data['metadata'] = json.loads(item_data['metadata'])
-            elif 'metadata' not in item_data:
-                item_data['metadata'] = {}
+            logger.debug(f"批量保存剪切板项: user={user_id}, saved={len(stored)}/{len(items)}")
+            return saved, version
             
-            # 确保必需字段存在
-            if 'size' not in item_data:
-                item_data['size'] = len(item_data.get('content', ''))
+        except Exception as e:
+            logger.error(f"批量保存剪切板项失败: {e}")
+            return [False] * len(items), None
+    
+    def _queue_history_limit(self, pipe, user_key: str, max_history: int):
+        """
+        写入后的历史上限：未启用归档时裁剪到 max_history 条；
+        启用归档时不裁剪（超出的条目由 _archive_overflow 迁移），改为读取热数据条目数
+        """
+        if self.archive.enabled:
+            pipe.zcard(user_key)
+        else:
+            pipe.zremrangebyrank(user_key, 0, -(max_history + 1))
+    
+    def _archive_overflow(self, user_id: str, hot_total: int, max_history: int):
+        """
+        启用归档时热数据超过 max_history 条（离线恢复等突发写入）立即迁移该用户，不等归档任务的下一轮
+
+        有运行中的事件循环时在线程中执行（同一用户同时只有一个），否则同步执行
+        """
+        if not self.archive.enabled or hot_total <= max_history or user_id in self._archiving:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        if loop is None:
+            self.archive_user_history(user_id)
+            return
+        
+        self._archiving.add(user_id)
+        future = loop.run_in_executor(None, self.archive_user_history, user_id)
+        future.add_done_callback(lambda done: self._archive_overflow_done(user_id, done))
+    
+    def _archive_overflow_done(self, user_id: str, future):
+        self._archiving.discard(user_id)
+        if future.exception() is not None:
+            logger.error(f"迁移超出上限的剪贴板历史失败: user={user_id}, {future.exception()}")
+    
+    def add_blob_ref(self, user_id: str, item_id: str, blob_id: str) -> bool:
+        """记录剪贴板项对磁盘内容的引用（在保存剪贴板项之前调用，回收任务不会删除仍被引用的文件）"""
+        try:
+            self.redis_client.sadd(f"blob_refs:{blob_id}", f"{user_id}:{item_id}")
+            return True
+        except Exception as e:
+            logger.error(f"记录blob引用失败: {e}")
+            return False
+    
+    def get_clipboard_item(self, item_id: str, user_id: Optional[str] = None,
+                           with_content: bool = True) -> Optional[ClipboardItem]:
+        """
+        获取指定的剪切板项（给出user_id时热数据中不存在的条目从该用户的归档读取）
+        
+        with_content为False时只读取元数据，条目的content为空
+        """
+        try:
+            if not self.is_connected():
+                return None
             
-            if 'checksum' not in item_data:
-                item_data['checksum'] = None
+            items = self._batch_get_clipboard_items([item_id], with_content=with_content)
+            if not items:
+                if user_id and self._cold_count(user_id):
+                    item = self.archive.get_item(user_id, item_id)
+                    if item and not with_content:
+                        item.content = ""
+                    return item
+                return None
             
-            return ClipboardItem(**item_data)
+            return items[0]
             
         except Exception as e:
             logger.error(f"获取剪切板项失败: {e}")
             return None
     
-    def get_user_clipboard_history(self, user_id: str, page: int = 1, 
-                                 per_page: int = 50) -> ClipboardHistory:
-        """获取用户的剪切板历史（优化版本，避免N+1查询）"""
+    def get_user_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50,
+                                   with_content: bool = False) -> ClipboardHistory:
+        """
+        获取用户的剪切板历史（优化版本，避免N+1查询）
+        
+        默认只读取元数据（条目的content为空，preview为预览），with_content为True时同时读取内容；
+        由历史缓存提供的首页总是带内容
+        """
         try:
-            if not self.is_connected():
-                return ClipboardHistory(items=[], total=0, page=page, per_page=per_page)
-            
-            user_key = f"clipboard:{user_id}"
-            
-            # 获取总数
-            total = self.redis_client.zcard(user_key)
-            
-            # 计算分页
-            start = (page - 1) * per_page
-            end = start + per_page - 1
-            
-            # 获取指定范围的项目ID（按时间倒序）
-            item_ids = self.redis_client.zrevrange(user_key, start, end)
+            # 活跃用户的首页直接由历史缓存提供
+            if page == 1 and per_page <= self.history_cache.window and self._history_cache_usable():
+                cached = self.history_cache.get(user_id, per_page)
+                if cached is not None:
+                    items, total, _ = cached
+                else:
+                    items, total = self._load_history_window(user_id)
+                    items = items[:per_page]
+                return ClipboardHistory(items=items, total=total, page=page, per_page=per_page)
             
-            if not item_ids:
-                return ClipboardHistory(items=[], total=total, page=page, per_page=per_page)
+            return self._read_history_page(user_id, page, per_page, with_content)
             
-            # 🚀 批量获取剪切板项，避免N+1查询问题
-            items = self._batch_get_clipboard_items(item_ids)
+        except Exception as e:
+            logger.error(f"获取用户剪切板历史失败: {e}")
+            return ClipboardHistory(items=[], total=0, page=page, per_page=per_page)
+    
+    async def fetch_user_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50,
+                                           with_content: bool = False) -> ClipboardHistory:
+        """
+        get_user_clipboard_history 的异步版本（供请求处理使用）
+        
+        历史缓存命中时在事件循环中直接返回，其余读取可能读取和解压归档文件，在线程中执行
+        """
+        try:
+            if page == 1 and per_page <= self.history_cache.window and self._history_cache_usable():
+                cached = self.history_cache.get(user_id, per_page)
+                if cached is not None:
+                    items, total, _ = cached
+                else:
+                    items, total = await self._fetch_history_window(user_id)
+                    items = items[:per_page]
+                return ClipboardHistory(items=items, total=total, page=page, per_page=per_page)
             
-            return ClipboardHistory(
-                items=items,
-                total=total,
-                page=page,
-                per_page=per_page
-            )
+            return await asyncio.to_thread(self._read_history_page, user_id, page, per_page, with_content)
             
         except Exception as e:
             logger.error(f"获取用户剪切板历史失败: {e}")
             return ClipboardHistory(items=[], total=0, page=page, per_page=per_page)
     
-    def _batch_get_clipboard_items(self, item_ids: List[str]) -> List[ClipboardItem]:
-        """批量获取剪切板项，优化性能"""
+    def _read_history_page(self, user_id: str, page: int, per_page: int, with_content: bool) -> ClipboardHistory:
+        """不经过历史缓存读取一页历史（不访问历史缓存，可在线程中执行）"""
+        if not self.is_connected():
+            return ClipboardHistory(items=[], total=0, page=page, per_page=per_page)
+        
+        # 热数据和归档合并后按时间倒序分页
+        items, total, _ = self._read_history(user_id, (page - 1) * per_page, per_page, with_content=with_content)
+        
+        return ClipboardHistory(
+            items=items,
+            total=total,
+            page=page,
+            per_page=per_page
+        )
+    
+    def _cold_count(self, user_id: str) -> int:
+        """用户归档中的条目数（未启用归档时为0）"""
+        return self.archive.count(user_id) if self.archive.enabled else 0
+    
+    @staticmethod
+    def _merge_tiers(hot: List[Tuple[str, float]], cold: List[ArchiveKey], limit: int) -> List[Tuple[float, str, bool]]:
+        """
+        合并两层各自按时间倒序的键，返回前limit条 (分数, 条目ID, 是否在热数据中)
+        
+        迁移过程中同一条目可能短暂同时存在于两层，以热数据为准
+        """
+        merged = {item_id: (score, item_id, False) for score, item_id in cold}
+        merged.update((item_id, (score, item_id, True)) for item_id, score in hot)
+        return sorted(merged.values(), reverse=True)[:limit]
+    
+    def _load_tiered_items(self, user_id: str, keys: List[Tuple[float, str, bool]],
+                           with_content: bool = False) -> List[ClipboardItem]:
+        """按合并后的顺序读取两层的条目（哈希已过期的跳过）"""
+        hot_ids = [item_id for _, item_id, hot in keys if hot]
+        cold_ids = [item_id for _, item_id, hot in keys if not hot]
+        loaded = {item.id: item for item in self._batch_get_clipboard_items(hot_ids, with_content=with_content)}
+        if cold_ids:
+            for item in self.archive.get_items(user_id, cold_ids):
+                if not with_content:
+                    item.content = ""  # 与热数据一致，只保留元数据和预览
+                loaded[item.id] = item
+        return [loaded[item_id] for _, item_id, _ in keys if item_id in loaded]
+    
+    def _read_history(self, user_id: str, start: int, count: int, with_version: bool = False,
+                      with_content: bool = False) -> Tuple[List[ClipboardItem], int, Optional[str]]:
+        """
+        按时间倒序读取热数据和归档合并后的第start条起的count条
+        
+        归档中的条目通常都比Redis中的旧，此时直接按偏移量拼接两层；
+        客户端补传的旧条目会让两层时间交错，这时读取两层的前start+count条合并
+        
+        Returns:
+            (条目, 两层总数, 同步版本号（with_version为True时与数据在同一pipeline中读取）)
+        """
+        user_key = f"clipboard:{user_id}"
+        end = start + count - 1
+        cold_total = self._cold_count(user_id)
+        newest_cold = self.archive.newest_keys(user_id, 0, 1) if cold_total else []
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        if with_version:
+            pipe.hget(f"sync_version:{user_id}", 'clipboard')
+        pipe.zcard(user_key)
+        pipe.zrevrange(user_key, start, end, withscores=True)
+        if newest_cold:
+            # 热数据中不晚于最新归档条目的数量，为0时两层不交错
+            pipe.zcount(user_key, '-inf', newest_cold[0][0])
+        results = pipe.execute()
+        version = results.pop(0) if with_version else None
+        hot_total, hot_keys = results[0], results[1]
+        total = hot_total + cold_total
+        
+        if not newest_cold:
+            return self._batch_get_clipboard_items([item_id for item_id, _ in hot_keys], with_content), total, version
+        
+        if results[2] == 0:
+            cold_keys = self.archive.newest_keys(user_id, max(start - hot_total, 0), count - len(hot_keys))
+            keys = self._merge_tiers(hot_keys, cold_keys, count)
+        else:
+            hot_keys = self.redis_client.zrevrange(user_key, 0, end, withscores=True)
+            keys = self._merge_tiers(hot_keys, self.archive.newest_keys(user_id, 0, end + 1), end + 1)[start:]
+        return self._load_tiered_items(user_id, keys, with_content), total, version
+    
+    def get_clipboard_page(self, user_id: str, cursor: Optional[ArchiveKey] = None, limit: int = 50,
+                           with_content: bool = False) -> Tuple[List[ClipboardItem], Optional[ArchiveKey]]:
+        """
+        游标分页读取剪贴板历史（跨越热数据和归档），新写入的条目不会导致翻页重复或遗漏
+        
+        Args:
+            cursor: 上一页最后一条的 (分数, 条目ID)，None表示从最新开始
+            with_content: 是否读取内容（默认只读取元数据）
+            
+        Returns:
+            (条目, 下一页游标；没有更多时为None)
+        """
+        try:
+            if not self.is_connected():
+                return [], None
+            return self._clipboard_page(user_id, cursor, limit, with_content)
+            
+        except Exception as e:
+            logger.error(f"游标读取剪切板历史失败: {e}")
+            return [], None
+    
+    def _clipboard_page(self, user_id: str, cursor: Optional[ArchiveKey], limit: int,
+                        with_content: bool) -> Tuple[List[ClipboardItem], Optional[ArchiveKey]]:
+        """读取一页历史（get_clipboard_page 的实现，出错时抛出异常）"""
+        user_key = f"clipboard:{user_id}"
+        if cursor is None:
+            hot_keys = self.redis_client.zrevrange(user_key, 0, limit - 1, withscores=True)
+        else:
+            score, last_id = cursor
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zrevrangebyscore(user_key, score, score, withscores=True)  # 与游标同分的条目按ID继续
+            pipe.zrevrangebyscore(user_key, f"({score!r}", '-inf', start=0, num=limit, withscores=True)
+            ties, older = pipe.execute()
+            hot_keys = [(item_id, item_score) for item_id, item_score in ties if item_id < last_id] + older
+        
+        cold_keys = []
+        if self._cold_count(user_id):
+            cold_keys = (self.archive.newest_keys(user_id, 0, limit) if cursor is None
+                         else self.archive.keys_before(user_id, cursor, limit))
+        
+        keys = self._merge_tiers(hot_keys, cold_keys, limit)
+        next_cursor = (keys[-1][0], keys[-1][1]) if len(keys) == limit else None
+        return self._load_tiered_items(user_id, keys, with_content), next_cursor
+    
+    def iter_clipboard_pages(self, user_id: str, cursor: Optional[ArchiveKey] = None, page_size: int = 200,
+                             with_content: bool = False) -> Iterator[Tuple[List[ClipboardItem], Optional[ArchiveKey]]]:
+        """
+        从游标开始逐页读取全部历史（导出使用），每页的条目在一次pipeline中读取，内存占用与历史总量无关
+        
+        与 get_clipboard_page 不同，读取失败时抛出异常，调用方据此中止，不会把不完整的结果当作历史结束
+        
+        Yields:
+            (条目, 该页之后的游标；最后一页为None)
+        """
+        while True:
+            items, cursor = self._clipboard_page(user_id, cursor, page_size, with_content)
+            yield items, cursor
+            if cursor is None:
+                return
+    
+    def _batch_get_clipboard_items(self, item_ids: List[str], with_content: bool = False) -> List[ClipboardItem]:
+        """
+        批量获取剪切板项，优化性能
+        
+        只读取元数据哈希（content为空），with_content为True时同一pipeline中读取内容
+        """
         try:
             if not item_ids:
                 return []
@@ -369,64 +867,23 @@ class RedisManager:
             for item_id in item_ids:
                 item_key = f"item:{item_id}"
                 pipe.hgetall(item_key)
+                if with_content:
+                    pipe.get(f"item_body:{item_id}")
             
             results = pipe.execute()
+            step = 2 if with_content else 1
             
             items = []
-            for i, item_data in enumerate(results):
+            for i in range(len(item_ids)):
+                item_data = results[i * step]
                 if not item_data:
                     continue
+                if with_content and results[i * step + 1] is not None:
+                    # 旧格式的条目内容在哈希中，没有单独的内容键
+                    item_data['content'] = results[i * step + 1]
                 
                 try:
-                    # 兼容处理
-                    if 'content_type' in item_data and 'type' not in item_data:
-                        content_type = item_data.pop('content_type')
-                        # 映射到枚举值
-                        if content_type in ['text/plain', 'text']:
-                            item_data['type'] = 'text'
-                        elif content_type in ['image/png', 'image/jpeg', 'image']:
-                            item_data['type'] = 'image'
-                        elif content_type in ['application/octet-stream', 'file']:
-                            item_data['type'] = 'file'
-                        elif content_type in ['text/html', 'html']:
-                            item_data['type'] = 'html'
-                        elif content_type in ['text/rtf', 'rtf']:
-                            item_data['type'] = 'rtf'
-                        else:
-                            item_data['type'] = 'text'
-                        
-                        # 保存原始content_type到metadata
-                        if 'metadata' not in item_data:
-                            item_data['metadata'] = {}
-                        elif isinstance(item_data['metadata'], str):
-                            item_data['metadata'] = json.loads(item_data['metadata'])
-                        
-                        if isinstance(item_data['metadata'], dict):
-                            item_data['metadata']['original_content_type'] = content_type
-                    
-                    # 处理时间字段
-                    if 'created_at' in item_data and isinstance(item_data['created_at'], str):
-                        item_data['created_at'] = datetime.fromisoformat(item_data['created_at'])
-                    
-                    if 'updated_at' in item_data and isinstance(item_data['updated_at'], str):
-                        item_data['updated_at'] = datetime.fromisoformat(item_data['updated_at'])
-                    elif 'updated_at' not in item_data:
-                        item_data['updated_at'] = item_data.get('created_at', datetime.now())
-                    
-                    # 处理metadata
-                    if 'metadata' in item_data and isinstance(item_data['metadata'], str):
-                        item_data['metadata'] = json.loads(item_data['metadata'])
-                    elif 'metadata' not in item_data:
-                        item_data['metadata'] = {}
-                    
-                    # 确保必需字段
-                    if 'size' not in item_data:
-                        item_data['size'] = len(item_data.get('content', ''))
-                    if 'checksum' not in item_data:
-                        item_data['checksum'] = None
-                    
-                    item = ClipboardItem(**item_data)
-                    items.append(item)
+                    items.append(parse_clipboard_record(item_data))
                     
                 except Exception as e:
                     logger.error(f"解析剪切板项失败 {item_ids[i]}: {e}")
@@ -438,49 +895,104 @@ class RedisManager:
             logger.error(f"批量获取剪切板项失败: {e}")
             return []
     
-    def delete_clipboard_item(self, item_id: str) -> bool:
-        """删除指定的剪切板项（重载版本，不需要user_id）"""
+    def delete_clipboard_item(self, item_id: str, user_id: Optional[str] = None) -> bool:
+        """
+        删除指定的剪切板项
+        
+        给出user_id时只删除该用户的条目，热数据中不存在时从该用户的归档删除；
+        不给出时由条目哈希确定所属用户（只能删除热数据）
+        """
         try:
-            if not self.is_connected():
+            deleted = self._delete_item_records(item_id, user_id)
+            if deleted is None:
                 return False
+            self._announce_delete(item_id, *deleted)
+            return True
             
-            item_key = f"item:{item_id}"
-            
-            # 获取项目数据以找到用户ID
-            item_data = self.redis_client.hgetall(item_key)
-            if not item_data:
+        except Exception as e:
+            logger.error(f"删除剪切板项失败: {e}")
+            return False
+    
+    async def remove_clipboard_item(self, item_id: str, user_id: str) -> bool:
+        """delete_clipboard_item 的异步版本：删除归档条目需要改写文件，在线程中执行"""
+        try:
+            deleted = await asyncio.to_thread(self._delete_item_records, item_id, user_id)
+            if deleted is None:
                 return False
-            
-            user_id = item_data.get('user_id')
-            if user_id:
-                # 从用户的有序集合中删除
-                user_key = f"clipboard:{user_id}"
-                self.redis_client.zrem(user_key, item_id)
-            
-            # 删除具体的项目数据
-            self.redis_client.delete(item_key)
-            
-            # 🔥 发布删除同步消息
-            if item_data and user_id:
-                self.publish_clipboard_sync(
-                    user_id=user_id,
-                    action="delete",
-                    data={
-                        "clip_id": item_id,
-                        "device_id": item_data.get('device_id')
-                    },
-                    source_device=item_data.get('device_id')
-                )
-            
-            logger.debug(f"删除剪切板项成功: {item_id}")
+            self._announce_delete(item_id, *deleted)
             return True
             
         except Exception as e:
             logger.error(f"删除剪切板项失败: {e}")
             return False
     
-    def get_latest_clipboard_item(self, user_id: str) -> Optional[ClipboardItem]:
-        """获取用户最新的剪切板项"""
+    def _delete_item_records(self, item_id: str, user_id: Optional[str]) -> Optional[Tuple[Optional[str], Optional[int], Optional[str]]]:
+        """
+        从Redis或归档删除条目（不访问历史缓存，可在线程中执行）
+        
+        返回 (所属用户ID, 同步版本号, 来源设备ID)，条目不存在或不属于该用户时返回None
+        """
+        if not self.is_connected():
+            return None
+        
+        item_key = f"item:{item_id}"
+        
+        # 获取项目数据以找到用户ID
+        item_data = self.redis_client.hgetall(item_key)
+        if not item_data:
+            if not user_id or not self._cold_count(user_id) or not self.archive.delete(user_id, [item_id]):
+                return None
+            logger.debug(f"删除归档剪切板项成功: {item_id}")
+            return user_id, self.bump_sync_version(user_id, 'clipboard'), None
+        if user_id and item_data.get('user_id') != user_id:
+            return None
+        
+        user_id = item_data.get('user_id')
+        pipe = self.redis_client.pipeline(transaction=False)
+        if user_id:
+            # 从用户的有序集合中删除
+            user_key = f"clipboard:{user_id}"
+            pipe.zrem(user_key, item_id)
+            self.bump_sync_version(user_id, 'clipboard', pipe=pipe)
+        
+        # 删除具体的项目数据
+        pipe.delete(item_key, f"item_body:{item_id}")
+        results = pipe.execute()
+        if user_id and not results[0] and self.archive.enabled:
+            # 读取哈希之后条目被迁移到了归档
+            self.archive.delete(user_id, [item_id])
+        
+        logger.debug(f"删除剪切板项成功: {item_id}")
+        return user_id, (results[1] if user_id else None), item_data.get('device_id')
+    
+    def _announce_delete(self, item_id: str, user_id: Optional[str], version: Optional[int],
+                         device_id: Optional[str]):
+        """更新历史缓存并发布删除同步消息"""
+        if not user_id:
+            return
+        self.history_cache.apply(user_id, version, "delete", item_id=item_id)
+        
+        # 🔥 发布删除同步消息
+        self.publish_clipboard_sync(
+            user_id=user_id,
+            action="delete",
+            data={
+                "clip_id": item_id,
+                "device_id": device_id
+            },
+            source_device=device_id,
+            version=version
+        )
+    
+    async def fetch_latest_clipboard_item(self, user_id: str) -> Optional[ClipboardItem]:
+        """获取用户最新的剪切板项（历史缓存未命中时在线程中读取）"""
+        if self._history_cache_usable():
+            history = await self.fetch_user_clipboard_history(user_id, page=1, per_page=1)
+            return history.items[0] if history.items else None
+        return await asyncio.to_thread(self._read_latest_item, user_id)
+    
+    def _read_latest_item(self, user_id: str) -> Optional[ClipboardItem]:
+        """不经过历史缓存读取用户最新的剪切板项（可在线程中执行）"""
         try:
             if not self.is_connected():
                 return None
@@ -491,6 +1003,9 @@ class RedisManager:
             latest_ids = self.redis_client.zrevrange(user_key, 0, 0)
             
             if not latest_ids:
+                if self._cold_count(user_id):
+                    cold_keys = self.archive.newest_keys(user_id, 0, 1)
+                    return self.archive.get_item(user_id, cold_keys[0][1]) if cold_keys else None
                 return None
             
             return self.get_clipboard_item(latest_ids[0])
@@ -499,26 +1014,104 @@ class RedisManager:
             logger.error(f"获取最新剪切板项失败: {e}")
             return None
     
+    def bump_sync_version(self, user_id: str, scope: str, pipe=None) -> Optional[int]:
+        """
+        递增用户的同步版本号
+        
+        Args:
+            user_id: 用户ID
+            scope: 'clipboard' 或 'devices'
+            pipe: 传入pipeline时只排队命令，随pipeline一起执行
+        """
+        try:
+            version_key = f"sync_version:{user_id}"
+            if pipe is not None:
+                pipe.hincrby(version_key, scope, 1)
+                return None
+            return self.redis_client.hincrby(version_key, scope, 1)
+            
+        except Exception as e:
+            logger.error(f"更新同步版本号失败: {e}")
+            return None
+    
+    def get_sync_version(self, user_id: str, scope: str) -> int:
+        """读取用户某个范围的同步版本号（单次HGET）"""
+        try:
+            return int(self.redis_client.hget(f"sync_version:{user_id}", scope) or 0)
+        except Exception as e:
+            logger.error(f"读取同步版本号失败: {e}")
+            return 0
+    
+    def get_user_sync_state(self, user_id: str) -> Dict[str, Any]:
+        """
+        一次往返获取用户的同步版本号和水位线
+        
+        客户端据此判断本地缓存是否最新，再决定是否拉取设备和历史；
+        启用归档时还会读取归档索引，请求处理中应在线程中调用
+        """
+        state = {
+            "versions": {"clipboard": 0, "devices": 0},
+            "watermarks": {
+                "clipboard_total": 0,
+                "latest_clip_id": None,
+                "latest_clip_at": None,
+                "devices_total": 0
+            }
+        }
+        try:
+            if not self.is_connected():
+                return state
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(f"sync_version:{user_id}")
+            pipe.zcard(f"clipboard:{user_id}")
+            pipe.zrevrange(f"clipboard:{user_id}", 0, 0, withscores=True)
+            pipe.scard(f"devices:{user_id}")
+            versions, clipboard_total, latest, devices_total = pipe.execute()
+            
+            state["versions"]["clipboard"] = int(versions.get('clipboard', 0))
+            state["versions"]["devices"] = int(versions.get('devices', 0))
+            # 总数包含归档条目；热数据为空时最新条目在归档中
+            cold_total = self._cold_count(user_id)
+            state["watermarks"]["clipboard_total"] = clipboard_total + cold_total
+            state["watermarks"]["devices_total"] = devices_total
+            if not latest and cold_total:
+                latest = [(item_id, score) for score, item_id in self.archive.newest_keys(user_id, 0, 1)]
+            if latest:
+                latest_id, latest_score = latest[0]
+                state["watermarks"]["latest_clip_id"] = latest_id
+                state["watermarks"]["latest_clip_at"] = datetime.fromtimestamp(latest_score).isoformat()
+            
+            return state
+            
+        except Exception as e:
+            logger.error(f"获取同步状态失败: {e}")
+            return state
+    
+    def queue_device_online(self, pipe, user_id: str, device_id: str):
+        """将设置设备在线状态的命令加入pipeline"""
+        now = time.time()
+        self.record_cache.invalidate([f"device:{device_id}"])
+        pipe.hset(f"device:{device_id}", mapping={
+            'user_id': user_id,
+            'last_seen': datetime.fromtimestamp(now).isoformat(),
+            'is_online': 'true'
+        })
+        
+        presence_key = f"presence:{user_id}"
+        pipe.zadd(presence_key, {device_id: now})
+        pipe.expire(presence_key, self.presence_retention)
+        self.bump_sync_version(user_id, 'devices', pipe=pipe)
+    
     def set_device_online(self, user_id: str, device_id: str) -> bool:
-        """设置设备在线状态"""
+        """设置设备在线状态（立即写入，用于连接建立等状态变化）"""
         try:
             if not self.is_connected():
                 return False
             
-            device_key = f"device:{device_id}"
-            self.redis_client.hset(device_key, mapping={
-                'user_id': user_id,
-                'last_seen': datetime.now().isoformat(),
-                'is_online': 'true'
-            })
-            
-            # 设置过期时间（心跳超时）
-            self.redis_client.expire(device_key, 60)
-            
-            # 添加到在线设备集合
-            online_devices_key = f"online_devices:{user_id}"
-            self.redis_client.sadd(online_devices_key, device_id)
-            self.redis_client.expire(online_devices_key, 60)
+            pipe = self.redis_client.pipeline(transaction=False)
+            self.queue_device_online(pipe, user_id, device_id)
+            pipe.execute()
             
             return True
             
@@ -526,48 +1119,196 @@ class RedisManager:
             logger.error(f"设置设备在线状态失败: {e}")
             return False
     
-    def get_online_devices(self, user_id: str) -> List[str]:
-        """获取用户的在线设备列表"""
+    def set_device_offline(self, user_id: str, device_id: str) -> bool:
+        """设置设备离线状态"""
         try:
+            # 丢弃尚未写入的心跳，避免下一次批量写入把设备重新标记为在线
+            pending = self._pending_presence.get(user_id)
+            if pending:
+                pending.pop(device_id, None)
+                if not pending:
+                    self._pending_presence.pop(user_id, None)
+            
             if not self.is_connected():
-                return []
+                return False
             
-            online_devices_key = f"online_devices:{user_id}"
-            return list(self.redis_client.smembers(online_devices_key))
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zrem(f"presence:{user_id}", device_id)
+            # 仅更新已存在的设备记录，避免为已删除的设备重新创建残缺的哈希
+            device_key = f"device:{device_id}"
+            self.record_cache.invalidate([device_key])
+            if self.redis_client.exists(device_key):
+                pipe.hset(device_key, mapping={
+                    'last_seen': datetime.now().isoformat(),
+                    'is_online': 'false'
+                })
+                self.bump_sync_version(user_id, 'devices', pipe=pipe)
+            pipe.execute()
+            
+            return True
             
         except Exception as e:
-            logger.error(f"获取在线设备列表失败: {e}")
-            return []
+            logger.error(f"设置设备离线状态失败: {e}")
+            return False
+    
+    def touch_device(self, user_id: str, device_id: str):
+        """记录设备心跳（仅写入本地缓冲，由 flush_presence 批量写入Redis）"""
+        self._pending_presence.setdefault(user_id, {})[device_id] = time.time()
+    
+    def flush_presence(self) -> int:
+        """将缓冲的心跳通过一个pipeline写入Redis，返回写入的设备数"""
+        if not self._pending_presence:
+            return 0
+        
+        pending, self._pending_presence = self._pending_presence, {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id, devices in pending.items():
+                presence_key = f"presence:{user_id}"
+                pipe.zadd(presence_key, devices)
+                pipe.expire(presence_key, self.presence_retention)
+            pipe.execute()
+            return sum(len(devices) for devices in pending.values())
+            
+        except Exception as e:
+            # 写入失败时放回缓冲区，保留较新的心跳时间
+            for user_id, devices in pending.items():
+                current = self._pending_presence.setdefault(user_id, {})
+                for device_id, seen in devices.items():
+                    if seen > current.get(device_id, 0):
+                        current[device_id] = seen
+            logger.error(f"批量写入设备心跳失败: {e}")
+            return 0
+    
+    async def presence_flush_loop(self):
+        """周期性批量写入设备心跳"""
+        while True:
+            await asyncio.sleep(self.presence_flush_interval)
+            self.flush_presence()
+    
+    def _merge_pending_presence(self, user_id: str, presence: Dict[str, float], cutoff: float) -> Dict[str, float]:
+        """合并本worker尚未写入的心跳"""
+        for device_id, seen in self._pending_presence.get(user_id, {}).items():
+            if seen >= cutoff and seen > presence.get(device_id, 0):
+                presence[device_id] = seen
+        return presence
+    
+    def get_devices_presence(self, user_id: str) -> Dict[str, float]:
+        """一次读取获取用户所有在线设备及其最后心跳时间"""
+        try:
+            cutoff = time.time() - self.presence_timeout
+            presence = {}
+            if self.is_connected():
+                presence = dict(self.redis_client.zrangebyscore(
+                    f"presence:{user_id}", cutoff, '+inf', withscores=True
+                ))
+            return self._merge_pending_presence(user_id, presence, cutoff)
+            
+        except Exception as e:
+            logger.error(f"获取设备在线状态失败: {e}")
+            return {}
+    
+    def get_devices_sync_state(self, user_id: str) -> Tuple[int, Dict[str, float]]:
+        """一次往返获取设备同步版本号和在线设备（用于设备列表的ETag）"""
+        try:
+            cutoff = time.time() - self.presence_timeout
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hget(f"sync_version:{user_id}", 'devices')
+            pipe.zrangebyscore(f"presence:{user_id}", cutoff, '+inf', withscores=True)
+            version, presence = pipe.execute()
+            return int(version or 0), self._merge_pending_presence(user_id, dict(presence), cutoff)
+            
+        except Exception as e:
+            logger.error(f"获取设备同步状态失败: {e}")
+            return 0, {}
+    
+    def get_online_devices(self, user_id: str) -> List[str]:
+        """获取用户的在线设备列表"""
+        return list(self.get_devices_presence(user_id))
     
     def is_device_online(self, user_id: str, device_id: str) -> bool:
-        """检查设备是否在线"""
+        """检查设备是否在线（批量场景请使用 get_devices_presence）"""
         try:
+            cutoff = time.time() - self.presence_timeout
+            if self._pending_presence.get(user_id, {}).get(device_id, 0) >= cutoff:
+                return True
+            
             if not self.is_connected():
                 return False
             
-            online_devices_key = f"online_devices:{user_id}"
-            return self.redis_client.sismember(online_devices_key, device_id)
+            score = self.redis_client.zscore(f"presence:{user_id}", device_id)
+            return score is not None and score >= cutoff
             
         except Exception as e:
             logger.error(f"检查设备在线状态失败: {e}")
             return False
     
+    def lookup_user_credentials(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        获取用户ID及完整用户数据（包含密码哈希），用户不存在时返回None
+        
+        用户名索引经进程内缓存（命中时只需一次HGETALL往返）；用户哈希的键由索引的值决定，
+        不放进Lua脚本读取（脚本访问未声明的键在Redis集群中会跨槽失败），密码哈希总是从Redis读取最新值
+        """
+        user_id = self._cached_get(f"username:{username}")
+        if not user_id:
+            return None
+        
+        return {"id": user_id, "data": self.redis_client.hgetall(f"user:{user_id}")}
+    
+    def upsert_device_login(self, user_id: str, device_id: str, name: str,
+                            os_info: str, ip_address: str) -> Dict[str, Any]:
+        """登录时一次原子脚本调用完成设备写入和在线状态更新，返回写入后的设备记录"""
+        now = time.time()
+        self.record_cache.invalidate([f"device:{device_id}"])
+        result = self.run_script(
+            DEVICE_LOGIN_SCRIPT,
+            keys=[
+                f"device:{device_id}",
+                f"devices:{user_id}",
+                f"presence:{user_id}",
+                f"sync_version:{user_id}"
+            ],
+            args=[device_id, name, os_info, ip_address, user_id,
+                  datetime.fromtimestamp(now).isoformat(), now, self.presence_retention]
+        )
+        return _pairs_to_dict(result)
+    
+    def create_user(self, user_id: str, username: str, user_data: Dict[str, str]) -> bool:
+        """创建用户记录和用户名索引（一次原子脚本），用户名已存在时返回False"""
+        fields = [value for pair in user_data.items() for value in pair]
+        username_key = f"username:{username}"
+        created = self.run_script(CREATE_USER_SCRIPT, keys=[username_key, f"user:{user_id}"],
+                                  args=[user_id, *fields])
+        self.record_cache.invalidate([username_key, f"user:{user_id}"])
+        return bool(created)
+    
+    def save_device(self, user_id: str, device_id: str, device_data: Dict[str, str]) -> Dict[str, str]:
+        """写入设备记录、加入用户设备集合并设为在线（一次往返），返回写入后的设备记录"""
+        device_key = f"device:{device_id}"
+        self.record_cache.invalidate([device_key])
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(device_key, mapping=device_data)
+        pipe.sadd(f"devices:{user_id}", device_id)
+        self.queue_device_online(pipe, user_id, device_id)
+        pipe.hgetall(device_key)
+        return pipe.execute()[-1]
+    
+    def get_device_record(self, device_id: str) -> Dict[str, str]:
+        """读取设备哈希（经进程内缓存），设备不存在时返回空字典"""
+        return self._cached_hgetall(f"device:{device_id}")
+    
     def get_user_by_username(self, username: str) -> Optional[dict]:
         """根据用户名获取用户信息"""
         try:
-            if not self.is_connected():
-                return None
-            
-            # 首先通过用户名索引获取用户ID
-            username_key = f"username:{username}"
-            user_id = self.redis_client.get(username_key)
+            # 首先通过用户名索引获取用户ID（缓存命中时无需访问Redis）
+            user_id = self._cached_get(f"username:{username}")
             
             if not user_id:
                 return None
             
             # 然后获取用户详细信息
-            user_data_key = f"user:{user_id}"
-            user_data = self.redis_client.hgetall(user_data_key)
+            user_data = self._cached_hgetall(f"user:{user_id}")
             
             if not user_data:
                 return None
@@ -600,62 +1341,73 @@ class RedisManager:
     
     def get_user_devices(self, user_id: str) -> List[dict]:
         """获取用户设备列表"""
+        return self.get_users_devices([user_id]).get(user_id, [])
+    
+    def get_users_devices(self, user_ids: List[str]) -> Dict[str, List[dict]]:
+        """批量获取多个用户的设备列表（两次pipeline往返，与用户数和设备数无关）"""
         try:
             if not self.is_connected():
                 logger.error("Redis未连接")
-                return []
-            
-            devices_key = f"devices:{user_id}"
-            device_ids = self.redis_client.smembers(devices_key)
-            logger.debug(f"获取用户设备列表: user_id={user_id}, device_ids={device_ids}")
-            
-            devices = []
-            for device_id in device_ids:
-                device_key = f"device:{device_id}"
-                device_data = self.redis_client.hgetall(device_key)
-                logger.debug(f"设备数据: device_id={device_id}, data={device_data}")
-                
+                return {}
+            
+            user_ids = list(user_ids)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.smembers(f"devices:{user_id}")
+            device_id_sets = pipe.execute()
+            
+            # 缓存命中的设备直接使用，其余设备在一次pipeline中读取
+            owners = []
+            device_records = {}
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id, device_ids in zip(user_ids, device_id_sets):
+                for device_id in device_ids:
+                    owners.append((user_id, device_id))
+                    cached = self.record_cache.get(f"device:{device_id}")
+                    if cached is MISS:
+                        pipe.hgetall(f"device:{device_id}")
+                    else:
+                        device_records[device_id] = cached
+            missing = [device_id for _, device_id in owners if device_id not in device_records]
+            if missing:
+                for device_id, device_data in zip(missing, pipe.execute()):
+                    device_records[device_id] = device_data
+                    if device_data:
+                        self.record_cache.set(f"device:{device_id}", device_data)
+            
+            result = {user_id: [] for user_id in user_ids}
+            for user_id, device_id in owners:
+                device_data = device_records.get(device_id)
                 if device_data:
-                    # 转换时间字段
-                    from datetime import datetime
-                    try:
-                        created_at = device_data.get('created_at')
-                        last_seen = device_data.get('last_seen')
-                        
-                        device_info = {
-                            'device_id': device_id,
-                            'name': device_data.get('name', 'Unknown Device'),
-                            'os_info': device_data.get('os_info', 'Unknown'),
-                            'ip_address': device_data.get('ip_address', '0.0.0.0'),
-                            'created_at': datetime.fromisoformat(created_at) if created_at else datetime.now(),
-                            'last_seen': datetime.fromisoformat(last_seen) if last_seen else datetime.now()
-                        }
-                        devices.append(device_info)
-                        logger.debug(f"设备信息已添加: {device_info}")
-                    except Exception as time_error:
-                        logger.error(f"时间字段解析失败: {time_error}, device_data={device_data}")
-                        # 如果时间解析失败，使用默认值
-                        device_info = {
-                            'device_id': device_id,
-                            'name': device_data.get('name', 'Unknown Device'),
-                            'os_info': device_data.get('os_info', 'Unknown'),
-                            'ip_address': device_data.get('ip_address', '0.0.0.0'),
-                            'created_at': datetime.now(),
-                            'last_seen': datetime.now()
-                        }
-                        devices.append(device_info)
-                        logger.debug(f"设备信息已添加 (默认时间): {device_info}")
+                    result[user_id].append(parse_device_record(device_id, device_data))
                 else:
-                    logger.warning(f"设备数据为空: device_id={device_id}")
+                    logger.warning("设备数据为空: device_id={}", device_id)
+            return result
             
-            logger.debug(f"最终设备列表: {devices}")
-            return devices
+        except Exception as e:
+            logger.error(f"批量获取用户设备列表失败: {e}")
+            return {}
+    
+    def get_users_clipboard_counts(self, user_ids: List[str]) -> Dict[str, int]:
+        """批量获取多个用户的剪贴板条目数（一次pipeline往返，包含归档条目时会读取文件）"""
+        try:
+            if not self.is_connected():
+                return {}
+            
+            user_ids = list(user_ids)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.zcard(f"clipboard:{user_id}")
+            counts = dict(zip(user_ids, pipe.execute()))
+            if self.archive.enabled:
+                # 只读取计数，不把所有用户的索引载入索引缓存
+                for user_id in user_ids:
+                    counts[user_id] += self.archive.count(user_id, cache_index=False)
+            return counts
             
         except Exception as e:
-            logger.error(f"获取用户设备列表失败: {e}")
-            import traceback
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return []
+            logger.error(f"批量获取剪贴板数量失败: {e}")
+            return {}
     
     def update_device_name(self, device_id: str, new_name: str) -> bool:
         """更新设备名称"""
@@ -670,7 +1422,11 @@ class RedisManager:
                 return False
             
             # 更新设备名称
+            self.record_cache.invalidate([device_key])
             self.redis_client.hset(device_key, "name", new_name)
+            user_id = self.redis_client.hget(device_key, "user_id")
+            if user_id:
+                self.bump_sync_version(user_id, 'devices')
             
             logger.debug(f"更新设备名称成功: {device_id} -> {new_name}")
             return True
@@ -697,11 +1453,13 @@ class RedisManager:
                 # 从用户设备集合中删除
                 devices_key = f"devices:{user_id}"
                 self.redis_client.srem(devices_key, device_id)
-                # 从在线设备集合中删除
-                self.redis_client.srem(f"online_devices:{user_id}", device_id)
+                # 从在线状态集合中删除
+                self.redis_client.zrem(f"presence:{user_id}", device_id)
+                self.bump_sync_version(user_id, 'devices')
             
             # 删除设备信息
             self.redis_client.delete(device_key)
+            self.record_cache.invalidate([device_key])
             
             logger.debug(f"删除设备成功: {device_id}")
             return True
@@ -710,30 +1468,87 @@ class RedisManager:
             logger.error(f"删除设备失败: {e}")
             return False
     
-    def delete_device_clipboard_items(self, device_id: str) -> int:
+    def _member_chunks(self, key: str, key_type: str = 'zset') -> Iterator[List[str]]:
+        """分块读取有序集合或集合的成员，每块一次往返"""
+        chunk_size = self.cascade_chunk_size
+        if key_type == 'zset':
+            start = 0
+            while True:
+                members = self.redis_client.zrange(key, start, start + chunk_size - 1)
+                if members:
+                    yield members
+                if len(members) < chunk_size:
+                    return
+                start += chunk_size
+        else:
+            cursor = 0
+            while True:
+                cursor, members = self.redis_client.sscan(key, cursor, count=chunk_size)
+                if members:
+                    yield list(members)
+                if not cursor:
+                    return
+    
+    def _delete_user_items(self, user_id: str, item_ids: List[str]) -> int:
+        """分块 ZREM + UNLINK 删除用户的剪贴板项，同步版本号只递增一次"""
+        if not item_ids:
+            return 0
+        
+        user_key = f"clipboard:{user_id}"
+        chunk_size = self.cascade_chunk_size
+        for offset in range(0, len(item_ids), chunk_size):
+            chunk = item_ids[offset:offset + chunk_size]
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zrem(user_key, *chunk)
+            pipe.unlink(*self._item_keys(chunk))
+            pipe.execute()
+        
+        self.bump_sync_version(user_id, 'clipboard')
+        self.history_cache.discard(user_id)
+        return len(item_ids)
+    
+    def _find_user_items(self, user_id: str, match: Callable[[str], bool]) -> List[str]:
+        """分块pipeline读取用户剪贴板项的device_id，返回满足条件的条目ID（哈希已过期的跳过）"""
+        matched = []
+        for item_ids in self._member_chunks(f"clipboard:{user_id}"):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item_id in item_ids:
+                pipe.hget(f"item:{item_id}", 'device_id')
+            for item_id, device_id in zip(item_ids, pipe.execute()):
+                if device_id is not None and match(device_id):
+                    matched.append(item_id)
+        return matched
+    
+    def delete_device_clipboard_items(self, device_id: str, user_id: Optional[str] = None) -> int:
         """删除指定设备的所有剪贴板项"""
         try:
             if not self.is_connected():
                 return 0
             
-            deleted_count = 0
+            if user_id is None:
+                user_id = self.redis_client.hget(f"device:{device_id}", 'user_id')
             
-            # 查找所有剪贴板项
-            item_keys = self.redis_client.keys("item:*")
-            
-            for item_key in item_keys:
-                item_data = self.redis_client.hgetall(item_key)
-                if item_data.get('device_id') == device_id:
-                    # 从用户的剪贴板历史中删除
-                    user_id = item_data.get('user_id')
-                    if user_id:
-                        item_id = item_key.split(':')[1]
-                        user_key = f"clipboard:{user_id}"
-                        self.redis_client.zrem(user_key, item_id)
-                    
-                    # 删除项目数据
-                    self.redis_client.delete(item_key)
-                    deleted_count += 1
+            if user_id:
+                deleted_count = self._delete_user_items(
+                    user_id, self._find_user_items(user_id, lambda item_device: item_device == device_id)
+                )
+                if self._cold_count(user_id):
+                    archived = self.archive.delete_device(user_id, device_id)
+                    if archived:
+                        deleted_count += len(archived)
+                        self.bump_sync_version(user_id, 'clipboard')
+                        self.history_cache.discard(user_id)
+            else:
+                # 设备记录已不存在时无法定位用户，退化为分块扫描全部剪贴板项
+                matched: Dict[str, List[str]] = {}
+                keys = []
+                for key in self.redis_client.scan_iter(match="item:*", count=self.cascade_chunk_size):
+                    keys.append(key)
+                    if len(keys) >= self.cascade_chunk_size:
+                        self._match_device_items(keys, device_id, matched)
+                        keys = []
+                self._match_device_items(keys, device_id, matched)
+                deleted_count = sum(self._delete_user_items(owner, item_ids) for owner, item_ids in matched.items())
             
             logger.debug(f"删除设备剪贴板项: {device_id}, 数量: {deleted_count}")
             return deleted_count
@@ -742,24 +1557,38 @@ class RedisManager:
             logger.error(f"删除设备剪贴板项失败: {e}")
             return 0
     
-    def clear_user_clipboard_history(self, user_id: str) -> bool:
-        """清空用户所有剪贴板历史"""
+    def _match_device_items(self, item_keys: List[str], device_id: str, matched: Dict[str, List[str]]):
+        """一次pipeline读取一批条目的所属用户和设备，按用户收集属于该设备的条目ID"""
+        if not item_keys:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for item_key in item_keys:
+            pipe.hmget(item_key, 'user_id', 'device_id')
+        for item_key, (owner, item_device) in zip(item_keys, pipe.execute()):
+            if owner and item_device == device_id:
+                matched.setdefault(owner, []).append(item_key.split(':', 1)[1])
+    
+    def clear_user_clipboard_history(self, user_id: str, source_device: str = None) -> bool:
+        """清空用户所有剪贴板历史（发布带版本号的clear同步消息）"""
         try:
             if not self.is_connected():
                 return False
             
-            user_key = f"clipboard:{user_id}"
-            
-            # 获取所有剪贴板项ID
-            item_ids = self.redis_client.zrange(user_key, 0, -1)
+            # 历史集合改名到待清理键并递增版本号（一次事务），用户立即看到空历史
+            trash_key = self._trash_key('clipboard', user_id)
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.rename(f"clipboard:{user_id}", trash_key)
+            self.bump_sync_version(user_id, 'clipboard', pipe=pipe)
+            renamed, version = pipe.execute(raise_on_error=False)
+            if self.archive.enabled:
+                self.archive.drop(user_id)
             
-            # 删除所有剪贴板项数据
-            for item_id in item_ids:
-                item_key = f"item:{item_id}"
-                self.redis_client.delete(item_key)
+            self.history_cache.apply(user_id, version, "clear")
+            self.publish_clipboard_sync(user_id, "clear", {}, source_device, version=version)
             
-            # 清空用户的剪贴板有序集合
-            self.redis_client.delete(user_key)
+            # 历史集合不存在时RENAME返回错误，无需清理
+            if not isinstance(renamed, Exception):
+                self.run_cascade(self.history_cascade_chunks(trash_key))
             
             logger.debug(f"清空用户剪贴板历史: {user_id}")
             return True
@@ -775,31 +1604,11 @@ class RedisManager:
                 return 0
             
             # 获取用户的有效设备列表
-            valid_devices = set()
-            user_devices = self.get_user_devices(user_id)
-            for device in user_devices:
-                if device.get('device_id'):
-                    valid_devices.add(device['device_id'])
-            
-            user_key = f"clipboard:{user_id}"
-            item_ids = self.redis_client.zrange(user_key, 0, -1)
-            
-            cleaned_count = 0
-            for item_id in item_ids:
-                item_key = f"item:{item_id}"
-                item_data = self.redis_client.hgetall(item_key)
-                
-                if item_data:
-                    device_id = item_data.get('device_id')
-                    # 如果设备ID不存在或不在有效设备列表中，删除此剪贴板项
-                    if not device_id or device_id not in valid_devices:
-                        # 从用户集合中删除
-                        self.redis_client.zrem(user_key, item_id)
-                        # 删除项目数据
-                        self.redis_client.delete(item_key)
-                        cleaned_count += 1
-                        logger.debug(f"清理无效剪贴板项: {item_id}, device_id={device_id}")
+            valid_devices = {device['device_id'] for device in self.get_user_devices(user_id) if device.get('device_id')}
             
+            # 设备ID为空或不在有效设备列表中的条目
+            orphaned = self._find_user_items(user_id, lambda device_id: device_id not in valid_devices)
+            cleaned_count = self._delete_user_items(user_id, orphaned)
             if cleaned_count > 0:
                 logger.info(f"清理完成: user_id={user_id}, cleaned_items={cleaned_count}")
             
@@ -808,6 +1617,359 @@ class RedisManager:
         except Exception as e:
             logger.error(f"清理无效剪贴板项失败: {e}")
             return 0
+
+    # ==================== 后台维护（由 server.maintenance 调度） ====================
+
+    def repair_clipboard_index(self, user_id: str) -> Dict[str, int]:
+        """
+        修复用户剪贴板历史索引：移除哈希已过期的悬空ID，删除来自已删除设备的剪贴板项
+
+        Returns:
+            {"checked": 检查的条目数, "dangling": 移除的悬空ID数, "orphaned": 删除的孤儿条目数}
+        """
+        user_key = f"clipboard:{user_id}"
+        devices = self.redis_client.smembers(f"devices:{user_id}")
+        checked = 0
+        dangling = []
+        candidates: Dict[str, List[str]] = {}  # device_id -> 条目ID
+
+        for item_ids in self._member_chunks(user_key):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item_id in item_ids:
+                pipe.hget(f"item:{item_id}", 'device_id')
+            for item_id, device_id in zip(item_ids, pipe.execute()):
+                if device_id is None:
+                    dangling.append(item_id)
+                elif device_id not in devices:
+                    candidates.setdefault(device_id, []).append(item_id)
+            checked += len(item_ids)
+
+        # 悬空ID对读取结果没有影响（读路径本就跳过），移除时不递增版本号
+        chunk_size = self.cascade_chunk_size
+        for offset in range(0, len(dangling), chunk_size):
+            self.redis_client.zrem(user_key, *dangling[offset:offset + chunk_size])
+
+        # 扫描期间可能有新设备登录，删除前再确认一次设备仍不在集合中
+        orphaned = []
+        if candidates:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for device_id in candidates:
+                pipe.sismember(f"devices:{user_id}", device_id)
+            for (device_id, item_ids), exists in zip(candidates.items(), pipe.execute()):
+                if not exists:
+                    orphaned.extend(item_ids)
+        self._delete_user_items(user_id, orphaned)
+
+        return {"checked": checked, "dangling": len(dangling), "orphaned": len(orphaned)}
+
+    def compact_device_index(self, user_id: str) -> Dict[str, int]:
+        """
+        压缩用户设备索引：移除设备记录已不存在的设备集合成员，以及在线状态集合中
+        超过保留时间或已不属于该用户的设备
+
+        Returns:
+            {"devices": 移除的设备集合成员数, "presence": 移除的在线状态成员数}
+        """
+        devices_key = f"devices:{user_id}"
+        presence_key = f"presence:{user_id}"
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.smembers(devices_key)
+        pipe.zremrangebyscore(presence_key, '-inf', time.time() - self.presence_retention)
+        pipe.zrange(presence_key, 0, -1)
+        device_ids, expired_presence, presence_ids = pipe.execute()
+
+        device_ids = list(device_ids)
+        missing = []
+        if device_ids:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for device_id in device_ids:
+                pipe.exists(f"device:{device_id}")
+            missing = [device_id for device_id, exists in zip(device_ids, pipe.execute()) if not exists]
+
+        valid = set(device_ids) - set(missing)
+        stale_presence = [device_id for device_id in presence_ids if device_id not in valid]
+
+        if missing or stale_presence:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if missing:
+                pipe.srem(devices_key, *missing)
+                self.bump_sync_version(user_id, 'devices', pipe=pipe)
+            if stale_presence:
+                pipe.zrem(presence_key, *stale_presence)
+            pipe.execute()
+
+        return {"devices": len(missing), "presence": expired_presence + len(stale_presence)}
+
+    def archive_user_history(self, user_id: str) -> Dict[str, int]:
+        """
+        把用户超过 archive.hot_seconds 或排在 archive.hot_max_items 之后的条目迁移到归档
+        
+        按从旧到新分块：读取哈希和内容 → 写入归档（fsync） → 逐条ZREM → UNLINK哈希和内容。
+        ZREM返回0说明条目在迁移期间被删除或历史被清空，从归档中撤销。
+        迁移不改变用户可见的历史，不递增同步版本号。
+        同一用户同时只有一个迁移（跨worker的租约）：并发的迁移会把对方已写入归档的条目当作被删除而撤销；
+        租约被占用时直接返回
+        
+        Returns:
+            {"archived": 迁移的条目数, "dangling": 移除的悬空ID数}
+        """
+        lease_key = f"archive_lease:{user_id}"
+        token = uuid.uuid4().hex
+        if not self.redis_client.set(lease_key, token, nx=True, px=ARCHIVE_LEASE_MS):
+            return {"archived": 0, "dangling": 0}
+        try:
+            return self._archive_user_history(user_id)
+        finally:
+            self.run_script(RELEASE_ARCHIVE_LEASE_SCRIPT, [lease_key], [token])
+    
+    def _archive_user_history(self, user_id: str) -> Dict[str, int]:
+        """迁移一个用户的历史（archive_user_history 的实现，调用方持有迁移租约）"""
+        user_key = f"clipboard:{user_id}"
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zcard(user_key)
+        pipe.zcount(user_key, '-inf', f"({time.time() - self.archive.hot_seconds!r}")
+        total, aged = pipe.execute()
+        
+        # 两个条件选出的都是最旧的若干条
+        remaining = max(aged, total - self.archive.hot_max_items)
+        archived = 0
+        dangling = 0
+        while remaining > 0:
+            keys = self.redis_client.zrange(user_key, 0, min(remaining, self.cascade_chunk_size) - 1, withscores=True)
+            if not keys:
+                break
+            remaining -= len(keys)
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item_id, _ in keys:
+                pipe.hgetall(f"item:{item_id}")
+                pipe.get(f"item_body:{item_id}")
+            results = pipe.execute()
+            records = []
+            for record, content in zip(results[::2], results[1::2]):
+                if record and content is not None:
+                    record['content'] = content
+                records.append(record)
+            self.archive.append(user_id, [(score, record) for (_, score), record in zip(keys, records) if record])
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for item_id, _ in keys:
+                pipe.zrem(user_key, item_id)
+            removed = pipe.execute()
+            
+            moved = [item_id for (item_id, _), record, ok in zip(keys, records, removed) if record and ok]
+            raced = [item_id for (item_id, _), record, ok in zip(keys, records, removed) if record and not ok]
+            if raced:
+                self.archive.delete(user_id, raced)
+            if moved:
+                self.redis_client.unlink(*self._item_keys(moved))
+            archived += len(moved)
+            dangling += sum(1 for record, ok in zip(records, removed) if not record and ok)
+        
+        return {"archived": archived, "dangling": dangling}
+
+    def prune_archived_history(self, user_id: str) -> Dict[str, int]:
+        """
+        按 archive.max_age / archive.max_items 删除用户最旧的归档条目
+
+        删除的条目从用户可见的历史中消失，递增同步版本号（热数据未变，历史缓存不受影响）
+
+        Returns:
+            {"pruned": 删除的条目数, "compacted": 压缩次数}
+        """
+        result = self.archive.prune(user_id)
+        if result["pruned"]:
+            self.bump_sync_version(user_id, 'clipboard')
+        return result
+
+    def prune_blob_refs(self, blob_id: str) -> Dict[str, int]:
+        """
+        移除blob引用集合中已不存在的剪贴板项（热数据和归档中都没有），集合为空时Redis自动删除该键
+
+        Returns:
+            {"refs": 检查的引用数, "dead_refs": 移除的引用数}
+        """
+        refs_key = f"blob_refs:{blob_id}"
+        refs = [ref.split(':', 1) for ref in self.redis_client.smembers(refs_key) if ':' in ref]
+        if not refs:
+            return {"refs": 0, "dead_refs": 0}
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for _, item_id in refs:
+            pipe.exists(f"item:{item_id}")
+        dead = [
+            f"{user_id}:{item_id}" for (user_id, item_id), alive in zip(refs, pipe.execute())
+            if not alive and not (self._cold_count(user_id) and self.archive.contains(user_id, item_id))
+        ]
+        if dead:
+            self.redis_client.srem(refs_key, *dead)
+        return {"refs": len(refs), "dead_refs": len(dead)}
+    
+    def get_item_owners(self, item_ids: List[str]) -> List[Optional[str]]:
+        """一次pipeline读取一批条目所属的用户ID（条目不存在时为None）"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for item_id in item_ids:
+            pipe.hget(f"item:{item_id}", "user_id")
+        return pipe.execute()
+    
+    def get_retained_items(self, user_id: str, item_ids: List[str]) -> List[bool]:
+        """
+        一批条目是否在用户的历史中（热数据有序集合或归档）
+
+        只剩哈希的条目（已被 max_history 裁剪，哈希等待过期）不算在历史中
+        """
+        user_key = f"clipboard:{user_id}"
+        pipe = self.redis_client.pipeline(transaction=False)
+        for item_id in item_ids:
+            pipe.zscore(user_key, item_id)
+        scores = pipe.execute()
+        cold = self._cold_count(user_id)
+        return [score is not None or bool(cold and self.archive.contains(user_id, item_id))
+                for item_id, score in zip(item_ids, scores)]
+    
+    def unlink_clipboard_items(self, item_ids: List[str]) -> int:
+        """删除已不在任何历史中的条目的哈希和内容"""
+        return self.redis_client.unlink(*self._item_keys(item_ids)) if item_ids else 0
+    
+    def blobs_referenced(self, blob_ids: List[str]) -> List[bool]:
+        """一次pipeline检查一批blob是否仍被剪贴板项引用"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for blob_id in blob_ids:
+            pipe.exists(f"blob_refs:{blob_id}")
+        return [bool(exists) for exists in pipe.execute()]
+
+    # ==================== 批量级联删除 ====================
+
+    @staticmethod
+    def _trash_key(kind: str, user_id: str) -> str:
+        """待清理数据的临时键（原键RENAME到这里后对用户立即不可见），包含创建时间以便回收遗留键"""
+        return f"cascade_trash:{kind}:{user_id}:{int(time.time())}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def trash_key_created_at(trash_key: str) -> Optional[int]:
+        """待清理键的创建时间戳，无法解析时返回None"""
+        try:
+            return int(trash_key.rsplit(':', 2)[1])
+        except (IndexError, ValueError):
+            return None
+
+    def history_cascade_chunks(self, trash_key: str) -> Iterator[Tuple[str, List[str]]]:
+        """已分离的剪贴板历史集合的清理分块：(阶段, 待删除键)"""
+        for item_ids in self._member_chunks(trash_key):
+            yield 'clipboard', self._item_keys(item_ids)
+        yield 'clipboard', [trash_key]
+
+    def trash_cascade_chunks(self, trash_key: str) -> Iterator[Tuple[str, List[str]]]:
+        """任意待清理键的清理分块（用于回收中断的级联删除遗留的键）"""
+        if trash_key.startswith('cascade_trash:devices:'):
+            for device_ids in self._member_chunks(trash_key, 'set'):
+                device_keys = [f"device:{device_id}" for device_id in device_ids]
+                self.record_cache.invalidate(device_keys)
+                yield 'devices', device_keys
+            yield 'devices', [trash_key]
+        else:
+            yield from self.history_cascade_chunks(trash_key)
+
+    def user_cascade_chunks(self, detached: Dict[str, Any]) -> Iterator[Tuple[str, List[str]]]:
+        """已分离用户的剩余数据清理分块：剪贴板项 → 设备 → 用户级集合"""
+        user_id = detached['user_id']
+        if detached.get('clipboard_key'):
+            for item_ids in self._member_chunks(detached['clipboard_key']):
+                yield 'clipboard', self._item_keys(item_ids)
+        if detached.get('devices_key'):
+            for device_ids in self._member_chunks(detached['devices_key'], 'set'):
+                device_keys = [f"device:{device_id}" for device_id in device_ids]
+                self.record_cache.invalidate(device_keys)
+                yield 'devices', device_keys
+        account_keys = [detached.get('clipboard_key'), detached.get('devices_key'),
+                        f"presence:{user_id}", f"sync_version:{user_id}"]
+        yield 'account', [key for key in account_keys if key]
+    
+    def unlink_chunk(self, keys: List[str], job_key: Optional[str] = None,
+                     progress: Optional[Dict[str, Any]] = None) -> int:
+        """
+        UNLINK一块键（内存由Redis后台线程释放），任务进度随同一pipeline写入
+        
+        Returns:
+            实际删除的键数
+        """
+        if not keys and not job_key:
+            return 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        if job_key and progress:
+            pipe.hset(job_key, mapping=progress)
+        results = pipe.execute()
+        return results[0] if keys else 0
+    
+    def run_cascade(self, chunks: Iterator[Tuple[str, List[str]]]) -> int:
+        """同步执行级联删除，返回删除的键数"""
+        return sum(self.unlink_chunk(keys) for _, keys in chunks)
+    
+    def detach_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        分离用户：一次事务删除用户记录和用户名索引，并把剪贴板历史和设备集合改名到待清理键，
+        用户立即不可登录、不可见；剩余数据由 user_cascade_chunks 分块清理
+        
+        Returns:
+            分离信息（待清理键、剪贴板和设备数量），用户不存在时返回None
+        """
+        user = self.get_user_by_id(user_id)
+        if not user:
+            return None
+        
+        username = user.get('username', '')
+        user_key = f"user:{user_id}"
+        username_key = f"username:{username}"
+        clipboard_key = f"clipboard:{user_id}"
+        devices_key = f"devices:{user_id}"
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zcard(clipboard_key)
+        pipe.scard(devices_key)
+        clipboards, devices = pipe.execute()
+        
+        detached = {
+            "user_id": user_id,
+            "username": username,
+            "clipboards": clipboards,
+            "devices": devices,
+            "clipboard_key": self._trash_key('clipboard', user_id) if clipboards else None,
+            "devices_key": self._trash_key('devices', user_id) if devices else None
+        }
+        
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.unlink(user_key, username_key)
+        if detached['clipboard_key']:
+            pipe.rename(clipboard_key, detached['clipboard_key'])
+        if detached['devices_key']:
+            pipe.rename(devices_key, detached['devices_key'])
+        self.bump_sync_version(user_id, 'clipboard', pipe=pipe)
+        results = pipe.execute(raise_on_error=False)
+        
+        # 两次读取之间集合被删除时RENAME失败，跳过对应的清理
+        offset = 1
+        for field in ('clipboard_key', 'devices_key'):
+            if detached[field]:
+                if isinstance(results[offset], Exception):
+                    detached[field] = None
+                offset += 1
+        version = results[-1]
+        
+        self._pending_presence.pop(user_id, None)
+        if self.archive.enabled:
+            self.archive.drop(user_id)
+        self.record_cache.invalidate([user_key, username_key])
+        self.history_cache.apply(user_id, version, "clear")
+        self.history_cache.discard(user_id)
+        
+        # 一条汇总事件通知该用户的设备
+        self.publish_clipboard_sync(user_id, "clear", {"reason": "user_deleted"}, version=version)
+        
+        logger.info(f"用户已分离: {user_id} ({username}), 剪贴板: {clipboards}, 设备: {devices}")
+        return detached
     
     def get_user_clipboard_stats(self, user_id: str) -> Dict[str, Any]:
         """获取用户剪切板统计信息"""
@@ -816,7 +1978,7 @@ class RedisManager:
                 return {"total": 0, "today": 0, "this_week": 0}
             
             user_key = f"clipboard:{user_id}"
-            total = self.redis_client.zcard(user_key)
+            total = self.redis_client.zcard(user_key) + self._cold_count(user_id)
             
             # 简化统计，只返回总数
             return {
@@ -836,6 +1998,7 @@ class RedisManager:
             if self.pubsub:
                 self.pubsub.close()
                 self.pubsub = None
+            self.record_cache.close()
             
             # 关闭Redis客户端连接
             if self.redis_client:
@@ -848,6 +2011,7 @@ class RedisManager:
             
             # 清空订阅者
             self.subscribers.clear()
+            self.channel_subscribers.clear()
             
             logger.info("Redis连接已关闭")
             
@@ -861,42 +2025,37 @@ class RedisManager:
             if not self.is_connected():
                 return []
             
-            users = []
-            # 查找所有用户ID格式的key（user:uuid）
-            all_user_keys = self.redis_client.keys("user:*")
-            
-            user_keys = []
-            for key in all_user_keys:
-                # 只保留user:uuid格式的key，排除user:username:xxx格式
-                key_str = key.decode('utf-8') if isinstance(key, bytes) else key
-                if key_str.startswith('user:') and not key_str.startswith('user:username:'):
-                    key_type = self.redis_client.type(key)
-                    if key_type in [b'hash', 'hash']:  # 确保是hash类型（兼容bytes和str）
-                        user_keys.append(key)
+            # 查找所有用户ID格式的key（user:uuid），排除user:username:xxx格式
+            user_keys = [
+                key for key in self.redis_client.scan_iter(match="user:*", count=1000)
+                if not key.startswith('user:username:')
+            ]
             
+            # 类型检查和用户数据读取各一次pipeline往返
+            pipe = self.redis_client.pipeline(transaction=False)
             for user_key in user_keys:
-                user_data = self.redis_client.hgetall(user_key)
-                if user_data:
-                    # 将bytes转换为字符串
-                    user_info = {}
-                    for key, value in user_data.items():
-                        if isinstance(key, bytes):
-                            key = key.decode('utf-8')
-                        if isinstance(value, bytes):
-                            value = value.decode('utf-8')
-                        user_info[key] = value
-                    
-                    # 转换时间字段
-                    if user_info.get('created_at'):
-                        try:
-                            from datetime import datetime
-                            user_info['created_at'] = datetime.fromisoformat(user_info['created_at'])
-                        except:
-                            pass
-                    
-                    users.append(user_info)
+                pipe.type(user_key)
+            user_keys = [key for key, key_type in zip(user_keys, pipe.execute()) if key_type == 'hash']
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_key in user_keys:
+                pipe.hgetall(user_key)
+            
+            users = []
+            for user_info in pipe.execute():
+                if not user_info:
+                    continue
+                
+                # 转换时间字段
+                if user_info.get('created_at'):
+                    try:
+                        user_info['created_at'] = datetime.fromisoformat(user_info['created_at'])
+                    except ValueError:
+                        pass
+                
+                users.append(user_info)
             
-            logger.debug(f"获取所有用户成功，共 {len(users)} 个用户")
+            logger.debug("获取所有用户成功，共 {} 个用户", len(users))
             return users
             
         except Exception as e:
@@ -904,43 +2063,18 @@ class RedisManager:
             return []
     
     def delete_user(self, user_id: str) -> bool:
-        """删除用户账户（管理员功能）"""
+        """删除用户账户及其全部数据（同步执行，管理员接口使用后台任务版本）"""
         try:
             if not self.is_connected():
                 return False
             
-            user_key = f"user:{user_id}"
-            
-            # 检查用户是否存在
-            if not self.redis_client.exists(user_key):
+            detached = self.detach_user(user_id)
+            if detached is None:
                 logger.warning(f"用户不存在: {user_id}")
                 return False
             
-            # 获取用户信息
-            user_data = self.redis_client.hgetall(user_key)
-            username = user_data.get('username') or user_data.get(b'username', b'').decode('utf-8')
-            
-            # 删除用户名到ID的映射
-            if username:
-                username_key = f"username:{username}"
-                self.redis_client.delete(username_key)
-            
-            # 删除用户设备集合
-            devices_key = f"devices:{user_id}"
-            self.redis_client.delete(devices_key)
-            
-            # 删除在线设备集合
-            online_devices_key = f"online_devices:{user_id}"
-            self.redis_client.delete(online_devices_key)
-            
-            # 删除用户剪贴板集合
-            clipboard_key = f"clipboard:{user_id}"
-            self.redis_client.delete(clipboard_key)
-            
-            # 删除用户信息
-            self.redis_client.delete(user_key)
-            
-            logger.info(f"删除用户成功: {user_id} ({username})")
+            deleted = self.run_cascade(self.user_cascade_chunks(detached))
+            logger.info(f"删除用户成功: {user_id} ({detached['username']}), 删除键: {deleted}")
             return True
             
         except Exception as e:
@@ -957,13 +2091,14 @@ class RedisManager:
             devices_key = f"devices:{user_id}"
             self.redis_client.srem(devices_key, device_id)
             
-            # 从在线设备集合中删除
-            online_devices_key = f"online_devices:{user_id}"
-            self.redis_client.srem(online_devices_key, device_id)
+            # 从在线状态集合中删除
+            self.redis_client.zrem(f"presence:{user_id}", device_id)
             
             # 删除设备信息
             device_key = f"device:{device_id}"
             self.redis_client.delete(device_key)
+            self.record_cache.invalidate([device_key])
+            self.bump_sync_version(user_id, 'devices')
             
             logger.debug(f"从用户 {user_id} 中移除设备: {device_id}")
             return True
@@ -973,8 +2108,7 @@ class RedisManager:
             return False
 
     def get_user_by_id(self, user_id: str):
-        user_key = f"user:{user_id}"
-        return self.redis_client.hgetall(user_key)
+        return self._cached_hgetall(f"user:{user_id}")
 
 
 # 全局 Redis 管理器实例
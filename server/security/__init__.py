@@ -4,10 +4,12 @@ BeeSyncClip 安全模块
 """
 
 from .encryption import EncryptionManager, encryption_manager
+from .bloom_filter import BloomFilter
 from .token_manager import TokenManager, token_manager
 from .security_middleware import SecurityMiddleware, security_middleware
 
 __all__ = [
+    'BloomFilter',
     'EncryptionManager', 'encryption_manager',
     'TokenManager', 'token_manager', 
     'SecurityMiddleware', 'security_middleware'
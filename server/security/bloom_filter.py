@@ -0,0 +1,64 @@
+"""
+布隆过滤器
+用于在本地快速判断"一定不存在"的成员，避免不必要的Redis往返
+"""
+
+import math
+import hashlib
+from typing import Iterable
+
+
+class BloomFilter:
+    """基于bytearray的布隆过滤器（不支持删除，需要时整体重建）"""
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        """
+        初始化布隆过滤器
+
+        Args:
+            capacity: 预期容纳的元素数量
+            error_rate: 达到容量时的目标误判率
+        """
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+
+        # m = -n*ln(p)/(ln2)^2, k = m/n*ln2
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        """双重哈希计算k个比特位置"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        """添加元素"""
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        """批量添加元素"""
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        """返回False表示一定不存在，True表示可能存在"""
+        for pos in self._positions(item):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def is_saturated(self) -> bool:
+        """元素数量超过容量后误判率会快速上升，应当重建"""
+        return self.count > self.capacity
+
+    def clear(self):
+        """清空过滤器"""
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
@@ -0,0 +1,191 @@
+"""
+速率限制器
+基于滑动窗口计数器：Redis中每个窗口一个计数键（一次Lua调用完成判断和计数），
+本地维护同样的计数器做预检查，超限请求无需访问Redis
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from loguru import logger
+
+from shared.utils import config_manager
+from server.redis_manager import redis_manager
+
+
+# KEYS[1]: 当前窗口计数键  KEYS[2]: 上一窗口计数键
+# ARGV[1]: 限额  ARGV[2]: 窗口长度（秒）  ARGV[3]: 当前窗口已过去的比例
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local estimated = previous * (1 - tonumber(ARGV[3])) + current
+if estimated >= limit then
+    return {0, math.floor(estimated)}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+end
+return {1, math.floor(estimated) + 1}
+"""
+
+
+class RateLimitPolicy:
+    """速率限制策略"""
+
+    def __init__(self, name: str, limit: int, window: int = 60, key_by: str = "ip", route: Optional[str] = None):
+        """
+        Args:
+            name: 策略名称（用于Redis键）
+            limit: 窗口内允许的请求数
+            window: 窗口长度（秒）
+            key_by: 计数维度，'ip' 或 'user'（未认证请求回退到ip）
+            route: 匹配的路由前缀，None表示默认策略
+        """
+        self.name = name
+        self.limit = int(limit)
+        self.window = int(window)
+        self.key_by = key_by
+        self.route = route
+
+
+class RateLimiter:
+    """滑动窗口速率限制器"""
+
+    def __init__(self):
+        config = config_manager.get('rate_limit', {}) or {}
+        self.enabled = config.get('enabled', True)
+        self.key_prefix = config.get('key_prefix', 'ratelimit')
+
+        default = config.get('default', {}) or {}
+        self.default_policy = RateLimitPolicy(
+            name='default',
+            limit=default.get('limit', 60),
+            window=default.get('window', 60),
+            key_by=default.get('key_by', 'ip')
+        )
+
+        # 路由策略按前缀长度降序匹配
+        self.policies: List[RateLimitPolicy] = []
+        for policy in config.get('policies', []) or []:
+            self.policies.append(RateLimitPolicy(
+                name=policy.get('name') or policy['route'].strip('/').replace('/', '_') or 'root',
+                limit=policy.get('limit', self.default_policy.limit),
+                window=policy.get('window', self.default_policy.window),
+                key_by=policy.get('key_by', 'ip'),
+                route=policy['route']
+            ))
+        self.policies.sort(key=lambda p: len(p.route), reverse=True)
+
+        # 本地计数器：(策略名, 标识) -> [窗口序号, 当前窗口计数, 上一窗口计数]，LRU淘汰
+        self.local_max_keys = config.get('local_max_keys', 10000)
+        self._local_counters: "OrderedDict[Tuple[str, str], List[int]]" = OrderedDict()
+
+        self._script = None
+        # Redis调用失败后暂停使用Redis的截止时间，避免每个请求都等待连接失败
+        self._redis_retry_at = 0.0
+
+    def match_policy(self, path: str) -> RateLimitPolicy:
+        """根据请求路径匹配策略（按路径段匹配前缀：/login 匹配 /login/x，不匹配 /loginfoo）"""
+        for policy in self.policies:
+            route = policy.route.rstrip('/')
+            if path == route or path.startswith(route + '/'):
+                return policy
+        return self.default_policy
+
+    def _local_estimate(self, key: Tuple[str, str], policy: RateLimitPolicy, now: float) -> Tuple[List[int], float]:
+        """获取本地计数器及其滑动窗口估计值"""
+        window_index = int(now // policy.window)
+        counter = self._local_counters.get(key)
+
+        if counter is None:
+            counter = [window_index, 0, 0]
+            self._local_counters[key] = counter
+            if len(self._local_counters) > self.local_max_keys:
+                self._local_counters.popitem(last=False)
+        else:
+            self._local_counters.move_to_end(key)
+            if counter[0] != window_index:
+                # 窗口滚动：只相邻窗口的计数有意义
+                counter[2] = counter[1] if counter[0] == window_index - 1 else 0
+                counter[1] = 0
+                counter[0] = window_index
+
+        elapsed = (now % policy.window) / policy.window
+        return counter, counter[2] * (1 - elapsed) + counter[1]
+
+    def _get_script(self):
+        """注册Lua脚本（redis-py会自动使用EVALSHA）"""
+        if self._script is None:
+            self._script = redis_manager.redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    def check(self, path: str, client_ip: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        检查请求是否允许通过
+
+        Returns:
+            包含 allowed、limit、remaining、retry_after 的字典
+        """
+        policy = self.match_policy(path)
+        result = {"allowed": True, "limit": policy.limit, "remaining": policy.limit, "retry_after": 0}
+        if not self.enabled:
+            return result
+
+        identity = user_id if policy.key_by == 'user' and user_id else client_ip
+        key = (policy.name, identity)
+        now = time.time()
+
+        counter, estimated = self._local_estimate(key, policy, now)
+        retry_after = int(policy.window - now % policy.window) + 1
+
+        # 本地预检查：本worker计数已超限时，全局计数必然超限
+        if estimated >= policy.limit:
+            result.update(allowed=False, remaining=0, retry_after=retry_after)
+            return result
+
+        counter[1] += 1
+
+        if now < self._redis_retry_at:
+            result["remaining"] = max(0, policy.limit - int(estimated) - 1)
+            return result
+
+        try:
+            window_index = int(now // policy.window)
+            base_key = f"{self.key_prefix}:{policy.name}:{identity}"
+            allowed, count = self._get_script()(
+                keys=[f"{base_key}:{window_index}", f"{base_key}:{window_index - 1}"],
+                args=[policy.limit, policy.window, (now % policy.window) / policy.window]
+            )
+        except Exception as e:
+            # Redis不可用时按本地计数判断
+            logger.warning(f"速率限制回退到本地计数: {e}")
+            self._redis_retry_at = now + 5
+            result["remaining"] = max(0, policy.limit - int(estimated) - 1)
+            return result
+
+        if not allowed:
+            counter[1] -= 1
+            result.update(allowed=False, remaining=0, retry_after=retry_after)
+            return result
+
+        result["remaining"] = max(0, policy.limit - int(count))
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流器状态"""
+        return {
+            "enabled": self.enabled,
+            "local_keys": len(self._local_counters),
+            "local_max_keys": self.local_max_keys,
+            "default": {"limit": self.default_policy.limit, "window": self.default_policy.window},
+            "policies": [
+                {"route": p.route, "limit": p.limit, "window": p.window, "key_by": p.key_by}
+                for p in self.policies
+            ]
+        }
+
+
+# 全局速率限制器实例
+rate_limiter = RateLimiter()
@@ -11,6 +11,7 @@ from loguru import logger
 
 from .token_manager import token_manager
 from .encryption import encryption_manager
+from .rate_limiter import rate_limiter
 
 
 class SecurityMiddleware:
@@ -18,8 +19,8 @@ class SecurityMiddleware:
     
     def __init__(self):
         self.security = HTTPBearer(auto_error=False)
-        self.rate_limit_cache: Dict[str, list] = {}
-        self.max_requests_per_minute = 60
+        self.rate_limiter = rate_limiter
+        self.max_requests_per_minute = rate_limiter.default_policy.limit
         logger.info("安全中间件初始化完成")
     
     def add_security_headers(self, response: Response) -> Response:
@@ -32,34 +33,31 @@ class SecurityMiddleware:
         response.headers["Content-Security-Policy"] = "default-src 'self'"
         return response
     
-    def check_rate_limit(self, client_ip: str) -> bool:
+    def check_rate_limit(self, client_ip: str, path: str = "", user_id: Optional[str] = None) -> bool:
         """检查速率限制"""
         try:
-            current_time = time.time()
-            minute_ago = current_time - 60
-            
-            # 清理过期记录
-            if client_ip in self.rate_limit_cache:
-                self.rate_limit_cache[client_ip] = [
-                    req_time for req_time in self.rate_limit_cache[client_ip] 
-                    if req_time > minute_ago
-                ]
-            else:
-                self.rate_limit_cache[client_ip] = []
-            
-            # 检查请求数量
-            if len(self.rate_limit_cache[client_ip]) >= self.max_requests_per_minute:
-                logger.warning(f"IP {client_ip} 超过速率限制")
-                return False
-            
-            # 记录当前请求
-            self.rate_limit_cache[client_ip].append(current_time)
-            return True
+            result = self.rate_limiter.check(path, client_ip, user_id)
+            if not result["allowed"]:
+                logger.warning(f"{user_id or client_ip} 超过速率限制: path={path}")
+            return result["allowed"]
             
         except Exception as e:
             logger.error(f"速率限制检查失败: {e}")
             return True  # 出错时允许通过
     
+    def get_rate_limit_identity(self, request: Request) -> Optional[str]:
+        """按用户限流的路由使用token中的user_id（验证结果有缓存）"""
+        policy = self.rate_limiter.match_policy(request.url.path)
+        if policy.key_by != 'user':
+            return None
+        
+        authorization = request.headers.get("Authorization")
+        if not authorization or not authorization.startswith("Bearer "):
+            return None
+        
+        payload = token_manager.verify_token(authorization[7:], 'access')
+        return payload.get('user_id') if payload else None
+    
     async def authenticate_request(self, request: Request) -> Optional[Dict[str, Any]]:
         """认证请求"""
         try:
@@ -6,10 +6,23 @@ JWT Token 管理器
 import jwt
 import time
 import os
-from typing import Dict, Any, Optional
+import hashlib
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
+from shared.utils import config_manager
+from server.redis_manager import redis_manager
+from .bloom_filter import BloomFilter
+
+
+# 跨worker广播token吊销事件的频道
+TOKEN_REVOCATION_CHANNEL = "token_revocation"
+# 吊销记录键前缀：revoked_token:{jti}，TTL等于token剩余有效期
+REVOKED_TOKEN_PREFIX = "revoked_token:"
+
 
 class TokenManager:
     """JWT Token管理器"""
@@ -27,8 +40,19 @@ class TokenManager:
         self.refresh_token_expire_days = 30   # 刷新token过期时间（天）
         self.admin_token_expire_hours = 12    # 管理员token过期时间（小时）
         
-        # Token黑名单（用于登出）
-        self.token_blacklist = set()
+        # Token吊销记录保存在Redis中（按jti），本地布隆过滤器负责"一定未吊销"的快速判断
+        self.revocation_filter = BloomFilter(
+            capacity=config_manager.get('security.revocation_filter_capacity', 100000),
+            error_rate=config_manager.get('security.revocation_filter_error_rate', 0.001)
+        )
+        # 本worker吊销的jti -> 过期时间戳（Redis不可用时兜底）
+        self.local_revocations: Dict[str, float] = {}
+        
+        # 已验证token缓存：token摘要 -> (payload, 过期时间戳)，按LRU淘汰
+        self.verify_cache_size = config_manager.get('security.token_cache_size', 10000)
+        self._verify_cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
         
         logger.info("JWT Token管理器初始化完成")
     
@@ -37,6 +61,127 @@ class TokenManager:
         import secrets
         return secrets.token_hex(32)
     
+    @staticmethod
+    def token_digest(token: str) -> str:
+        """计算token摘要，用作缓存和吊销记录的键"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def _get_cached_payload(self, digest: str) -> Optional[Dict[str, Any]]:
+        """从验证缓存中获取payload，过期条目直接丢弃"""
+        entry = self._verify_cache.get(digest)
+        if entry is None:
+            return None
+        
+        payload, exp = entry
+        if exp <= time.time():
+            self._verify_cache.pop(digest, None)
+            return None
+        
+        self._verify_cache.move_to_end(digest)
+        return payload
+    
+    def _cache_payload(self, digest: str, payload: Dict[str, Any]):
+        """缓存已验证的payload，有效期到token的exp为止"""
+        exp = payload.get('exp')
+        if self.verify_cache_size <= 0 or not exp:
+            return
+        
+        self._verify_cache[digest] = (payload, float(exp))
+        self._verify_cache.move_to_end(digest)
+        while len(self._verify_cache) > self.verify_cache_size:
+            self._verify_cache.popitem(last=False)
+    
+    def _token_jti(self, payload: Dict[str, Any], digest: str) -> str:
+        """获取token的jti，旧token没有jti时使用摘要代替"""
+        return payload.get('jti') or digest
+    
+    def is_jti_revoked(self, jti: str) -> bool:
+        """
+        检查jti是否已被吊销
+        
+        布隆过滤器判断为不存在时直接返回，只有可能命中时才查询Redis
+        """
+        if jti not in self.revocation_filter:
+            return False
+        
+        if jti in self.local_revocations:
+            return True
+        
+        try:
+            return bool(redis_manager.redis_client.exists(f"{REVOKED_TOKEN_PREFIX}{jti}"))
+        except Exception as e:
+            # Redis不可用时按过滤器结果保守处理
+            logger.error(f"查询token吊销状态失败: {e}")
+            return True
+    
+    def _decode_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        解码并验证token签名，优先使用验证缓存
+        
+        Returns:
+            payload的副本，已吊销时返回None；签名或过期错误照常抛出jwt异常
+        """
+        digest = self.token_digest(token)
+        
+        payload = self._get_cached_payload(digest)
+        if payload is not None:
+            self.cache_hits += 1
+            return dict(payload)
+        
+        self.cache_misses += 1
+        payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        if self.is_jti_revoked(self._token_jti(payload, digest)):
+            return None
+        
+        self._cache_payload(digest, payload)
+        return dict(payload)
+    
+    def enable_revocation_sync(self) -> bool:
+        """订阅吊销广播并从Redis加载吊销记录，使各worker保持一致"""
+        subscribed = redis_manager.subscribe_channel(TOKEN_REVOCATION_CHANNEL, self._handle_revocation_message)
+        self.rebuild_revocation_filter()
+        return subscribed
+    
+    def rebuild_revocation_filter(self) -> int:
+        """用SCAN遍历Redis中的吊销记录重建布隆过滤器，过期记录由TTL自动清除"""
+        try:
+            new_filter = BloomFilter(self.revocation_filter.capacity, self.revocation_filter.error_rate)
+            new_filter.update(self.local_revocations.keys())
+            
+            if redis_manager.redis_client:
+                prefix_len = len(REVOKED_TOKEN_PREFIX)
+                for key in redis_manager.redis_client.scan_iter(match=f"{REVOKED_TOKEN_PREFIX}*", count=1000):
+                    new_filter.add(key[prefix_len:])
+            
+            self.revocation_filter = new_filter
+            logger.debug(f"吊销过滤器已重建，记录数: {new_filter.count}")
+            return new_filter.count
+            
+        except Exception as e:
+            logger.error(f"重建吊销过滤器失败: {e}")
+            return -1
+    
+    def _handle_revocation_message(self, data: Dict[str, Any]):
+        """处理其他worker发出的吊销事件"""
+        jti = data.get('jti')
+        if jti:
+            self.revocation_filter.add(jti)
+        
+        digest = data.get('digest')
+        if digest:
+            self._verify_cache.pop(digest, None)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取验证缓存统计信息"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            'size': len(self._verify_cache),
+            'max_size': self.verify_cache_size,
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / total if total else 0.0
+        }
+    
     def generate_tokens(self, user_id: str, username: str, device_id: str) -> Dict[str, str]:
         """
         生成访问token和刷新token
@@ -58,6 +203,7 @@ class TokenManager:
                 'username': username,
                 'device_id': device_id,
                 'type': 'access',
+                'jti': uuid.uuid4().hex,
                 'iat': now,
                 'exp': now + timedelta(hours=self.access_token_expire_hours)
             }
@@ -68,6 +214,7 @@ class TokenManager:
                 'username': username,
                 'device_id': device_id,
                 'type': 'refresh',
+                'jti': uuid.uuid4().hex,
                 'iat': now,
                 'exp': now + timedelta(days=self.refresh_token_expire_days)
             }
@@ -101,14 +248,12 @@ class TokenManager:
             解码后的payload，如果验证失败返回None
         """
         try:
-            # 检查token是否在黑名单中
-            if token in self.token_blacklist:
+            # 解码并验证token（已吊销时返回None）
+            payload = self._decode_token(token)
+            if payload is None:
                 logger.warning("Token已被吊销")
                 return None
             
-            # 解码并验证token
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            
             # 验证token类型
             if payload.get('type') != token_type:
                 logger.warning(f"Token类型不匹配: 期望 {token_type}, 实际 {payload.get('type')}")
@@ -164,39 +309,56 @@ class TokenManager:
     
     def revoke_token(self, token: str):
         """
-        吊销token（加入黑名单）
+        吊销token（写入Redis吊销记录）
         
         Args:
             token: 要吊销的token
         """
         try:
-            self.token_blacklist.add(token)
-            logger.debug("Token已加入黑名单")
+            digest = self.token_digest(token)
+            self._verify_cache.pop(digest, None)
+            
+            try:
+                payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm], options={"verify_exp": False})
+            except jwt.InvalidTokenError:
+                logger.warning("无法解析要吊销的token，已忽略")
+                return
+            
+            jti = self._token_jti(payload, digest)
+            exp = float(payload.get('exp') or time.time() + self.refresh_token_expire_days * 86400)
+            ttl = int(exp - time.time()) + 1
+            if ttl <= 0:
+                # token已过期，无需记录
+                return
+            
+            self.revocation_filter.add(jti)
+            self.local_revocations[jti] = exp
+            
+            # 吊销记录随token过期自动删除，并通知其他worker刷新过滤器
+            redis_manager.redis_client.set(f"{REVOKED_TOKEN_PREFIX}{jti}", "1", ex=ttl)
+            redis_manager.publish_event(TOKEN_REVOCATION_CHANNEL, {'jti': jti, 'digest': digest})
+            
+            if self.revocation_filter.is_saturated():
+                self.rebuild_revocation_filter()
+            
+            logger.debug("Token已吊销")
         except Exception as e:
             logger.error(f"吊销token失败: {e}")
     
     def clean_expired_blacklist(self):
-        """清理过期的黑名单token"""
+        """清理本地过期的吊销记录并重建过滤器（Redis中的记录由TTL自动过期）"""
         try:
-            current_time = datetime.utcnow()
-            expired_tokens = set()
-            
-            for token in self.token_blacklist:
-                try:
-                    payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm], options={"verify_exp": False})
-                    exp = payload.get('exp')
-                    if exp and datetime.utcfromtimestamp(exp) < current_time:
-                        expired_tokens.add(token)
-                except:
-                    # 如果无法解码，也认为是过期的
-                    expired_tokens.add(token)
-            
-            self.token_blacklist -= expired_tokens
-            if expired_tokens:
-                logger.debug(f"清理了 {len(expired_tokens)} 个过期的黑名单token")
+            now = time.time()
+            expired = [jti for jti, exp in self.local_revocations.items() if exp < now]
+            for jti in expired:
+                del self.local_revocations[jti]
+            
+            self.rebuild_revocation_filter()
+            if expired:
+                logger.debug(f"清理了 {len(expired)} 个过期的本地吊销记录")
                 
         except Exception as e:
-            logger.error(f"清理黑名单失败: {e}")
+            logger.error(f"清理吊销记录失败: {e}")
     
     def get_token_info(self, token: str) -> Optional[Dict[str, Any]]:
         """
@@ -222,7 +384,7 @@ class TokenManager:
                 'issued_at': datetime.utcfromtimestamp(iat_timestamp).isoformat() if iat_timestamp else None,
                 'expires_at': datetime.utcfromtimestamp(exp_timestamp).isoformat() if exp_timestamp else None,
                 'is_expired': exp_timestamp and datetime.utcfromtimestamp(exp_timestamp) < datetime.utcnow(),
-                'is_blacklisted': token in self.token_blacklist
+                'is_blacklisted': self.is_jti_revoked(self._token_jti(payload, self.token_digest(token)))
             }
             
         except Exception as e:
@@ -247,6 +409,7 @@ class TokenManager:
                 'username': username,
                 'role': 'admin',
                 'type': 'admin',
+                'jti': uuid.uuid4().hex,
                 'iat': now,
                 'exp': now + timedelta(hours=self.admin_token_expire_hours)
             }
@@ -273,14 +436,12 @@ class TokenManager:
             解码后的payload，如果验证失败返回None
         """
         try:
-            # 检查token是否在黑名单中
-            if token in self.token_blacklist:
+            # 解码并验证token（已吊销时返回None）
+            payload = self._decode_token(token)
+            if payload is None:
                 logger.warning("管理员Token已被吊销")
                 return None
             
-            # 解码并验证token
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            
             # 验证token类型和角色
             if payload.get('type') != 'admin' or payload.get('role') != 'admin':
                 logger.warning(f"Token类型或角色不匹配: type={payload.get('type')}, role={payload.get('role')}")
@@ -0,0 +1,43 @@
+"""
+BeeSyncClip 存储后端
+同一组数据操作的三种实现，只用于基准测试对比和一致性测试；服务器本身不经过这一层，
+运行时直接使用 RedisManager（实时同步依赖Redis发布订阅），因此也没有选择后端的配置项，
+不能用 sqlite 或 memory 后端替代Redis部署服务器。
+redis: 包装 RedisManager
+sqlite: 单文件数据库
+memory: 纯内存，用于基准测试
+"""
+
+from .base import StorageBackend
+from .memory_backend import MemoryStorage
+from .sqlite_backend import SQLiteStorage
+
+
+BACKENDS = ('redis', 'sqlite', 'memory')
+
+
+def create_storage(backend: str, **options) -> StorageBackend:
+    """
+    按名称创建存储后端
+
+    Args:
+        backend: 'redis'、'sqlite' 或 'memory'
+        options: 传给后端构造函数的参数（如 sqlite 的 path）
+    """
+    if backend == 'redis':
+        from .redis_backend import RedisStorage
+        return RedisStorage(**options)
+    if backend == 'sqlite':
+        return SQLiteStorage(**options)
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"未知的存储后端: {backend}（可选: {', '.join(BACKENDS)}）")
+
+
+__all__ = [
+    'StorageBackend',
+    'MemoryStorage',
+    'SQLiteStorage',
+    'BACKENDS',
+    'create_storage',
+]
@@ -0,0 +1,115 @@
+"""
+存储后端接口
+定义用户、设备、在线状态、剪贴板历史和同步版本号（变更日志）的数据操作，
+各后端（Redis、SQLite、内存）实现相同的语义，由 tests/test_storage_conformance.py 统一验证。
+
+记录格式与Redis布局一致：用户和设备为字符串字段字典，剪贴板项为 ClipboardItem，
+设备列表项为 parse_device_record 的结果。
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.models import ClipboardHistory, ClipboardItem
+from shared.utils import config_manager
+
+
+class StorageBackend(ABC):
+    """存储后端基类"""
+
+    name = "base"
+
+    def __init__(self):
+        presence_config = config_manager.get('presence', {}) or {}
+        self.presence_timeout = presence_config.get('timeout', 60)  # 超过该秒数无心跳视为离线
+        self.max_history = config_manager.get('clipboard.max_history', 1000)  # 每个用户保留的历史条数
+
+    # ==================== 用户 ====================
+
+    @abstractmethod
+    def create_user(self, user_id: str, username: str, user_data: Dict[str, str]) -> bool:
+        """创建用户，用户名已存在时不覆盖并返回False"""
+
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[Dict[str, str]]:
+        """读取用户记录，不存在时返回None"""
+
+    @abstractmethod
+    def get_user_id(self, username: str) -> Optional[str]:
+        """用户名 -> 用户ID"""
+
+    @abstractmethod
+    def count_users(self) -> int:
+        """用户总数"""
+
+    @abstractmethod
+    def delete_user(self, user_id: str) -> bool:
+        """删除用户及其设备、在线状态、剪贴板历史和同步版本号，用户不存在时返回False"""
+
+    # ==================== 设备 ====================
+
+    @abstractmethod
+    def save_device(self, user_id: str, device_id: str, device_data: Dict[str, str]) -> Dict[str, str]:
+        """合并写入设备记录、加入用户设备列表并设为在线，返回写入后的设备记录"""
+
+    @abstractmethod
+    def get_device(self, device_id: str) -> Optional[Dict[str, str]]:
+        """读取设备记录，不存在时返回None"""
+
+    @abstractmethod
+    def list_devices(self, user_id: str) -> List[Dict[str, Any]]:
+        """用户的设备列表（parse_device_record 格式）"""
+
+    @abstractmethod
+    def remove_device(self, user_id: str, device_id: str) -> bool:
+        """删除设备记录、设备列表成员和在线状态"""
+
+    # ==================== 在线状态 ====================
+
+    @abstractmethod
+    def touch_devices(self, user_id: str, device_ids: List[str]):
+        """批量记录设备心跳（当前时间）"""
+
+    @abstractmethod
+    def get_presence(self, user_id: str) -> Dict[str, float]:
+        """在线设备 -> 最后心跳时间（超过 presence_timeout 的不返回）"""
+
+    # ==================== 剪贴板历史 ====================
+
+    @abstractmethod
+    def save_clipboard_items(self, user_id: str, items: List[ClipboardItem]) -> Tuple[List[bool], Optional[int]]:
+        """
+        批量保存剪贴板项，超过 max_history 的最旧条目被裁剪
+
+        Returns:
+            (逐项保存结果, 写入后的剪贴板同步版本号；失败时为None)
+        """
+
+    @abstractmethod
+    def get_clipboard_item(self, item_id: str) -> Optional[ClipboardItem]:
+        """读取单个剪贴板项"""
+
+    @abstractmethod
+    def get_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50) -> ClipboardHistory:
+        """按创建时间倒序分页读取历史"""
+
+    @abstractmethod
+    def delete_clipboard_item(self, item_id: str) -> bool:
+        """删除剪贴板项，不存在时返回False"""
+
+    @abstractmethod
+    def clear_clipboard(self, user_id: str) -> bool:
+        """清空用户剪贴板历史"""
+
+    # ==================== 同步版本号 ====================
+
+    @abstractmethod
+    def get_sync_version(self, user_id: str, scope: str) -> int:
+        """读取用户某个范围（'clipboard' 或 'devices'）的同步版本号"""
+
+    @abstractmethod
+    def bump_sync_version(self, user_id: str, scope: str) -> Optional[int]:
+        """递增并返回同步版本号"""
+
+    def close(self):
+        """释放资源"""
@@ -0,0 +1,185 @@
+"""
+内存存储后端
+纯Python数据结构实现，进程退出即丢失，用于基准测试隔离数据层成本
+"""
+
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.records import build_clipboard_record, parse_clipboard_record, parse_device_record
+from server.storage.base import StorageBackend
+from shared.models import ClipboardHistory, ClipboardItem
+
+
+class MemoryStorage(StorageBackend):
+    """内存存储后端（线程安全）"""
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict[str, str]] = {}
+        self._usernames: Dict[str, str] = {}
+        self._devices: Dict[str, Dict[str, str]] = {}
+        self._user_devices: Dict[str, set] = {}
+        self._presence: Dict[str, Dict[str, float]] = {}
+        self._items: Dict[str, Dict[str, str]] = {}  # item_id -> 存储记录
+        self._history: Dict[str, List[Tuple[float, str]]] = {}  # user_id -> 按 (时间戳, ID) 升序
+        self._versions: Dict[str, Dict[str, int]] = {}
+
+    # ==================== 用户 ====================
+
+    def create_user(self, user_id: str, username: str, user_data: Dict[str, str]) -> bool:
+        with self._lock:
+            if username in self._usernames:
+                return False
+            self._usernames[username] = user_id
+            self._users[user_id] = dict(user_data)
+            return True
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, str]]:
+        user = self._users.get(user_id)
+        return dict(user) if user else None
+
+    def get_user_id(self, username: str) -> Optional[str]:
+        return self._usernames.get(username)
+
+    def count_users(self) -> int:
+        return len(self._users)
+
+    def delete_user(self, user_id: str) -> bool:
+        with self._lock:
+            user = self._users.pop(user_id, None)
+            if user is None:
+                return False
+            self._usernames.pop(user.get('username'), None)
+            for device_id in self._user_devices.pop(user_id, set()):
+                self._devices.pop(device_id, None)
+            for _, item_id in self._history.pop(user_id, []):
+                self._items.pop(item_id, None)
+            self._presence.pop(user_id, None)
+            self._versions.pop(user_id, None)
+            return True
+
+    # ==================== 设备 ====================
+
+    def save_device(self, user_id: str, device_id: str, device_data: Dict[str, str]) -> Dict[str, str]:
+        with self._lock:
+            now = time.time()
+            record = self._devices.setdefault(device_id, {})
+            record.update(device_data)
+            record.update(user_id=user_id, last_seen=datetime.fromtimestamp(now).isoformat(), is_online='true')
+            self._user_devices.setdefault(user_id, set()).add(device_id)
+            self._presence.setdefault(user_id, {})[device_id] = now
+            self._bump(user_id, 'devices')
+            return dict(record)
+
+    def get_device(self, device_id: str) -> Optional[Dict[str, str]]:
+        device = self._devices.get(device_id)
+        return dict(device) if device else None
+
+    def list_devices(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [parse_device_record(device_id, self._devices[device_id])
+                    for device_id in self._user_devices.get(user_id, ()) if device_id in self._devices]
+
+    def remove_device(self, user_id: str, device_id: str) -> bool:
+        with self._lock:
+            self._user_devices.get(user_id, set()).discard(device_id)
+            self._presence.get(user_id, {}).pop(device_id, None)
+            self._devices.pop(device_id, None)
+            self._bump(user_id, 'devices')
+            return True
+
+    # ==================== 在线状态 ====================
+
+    def touch_devices(self, user_id: str, device_ids: List[str]):
+        now = time.time()
+        with self._lock:
+            presence = self._presence.setdefault(user_id, {})
+            for device_id in device_ids:
+                presence[device_id] = now
+
+    def get_presence(self, user_id: str) -> Dict[str, float]:
+        cutoff = time.time() - self.presence_timeout
+        with self._lock:
+            return {device_id: seen for device_id, seen in self._presence.get(user_id, {}).items() if seen >= cutoff}
+
+    # ==================== 剪贴板历史 ====================
+
+    def save_clipboard_items(self, user_id: str, items: List[ClipboardItem]) -> Tuple[List[bool], Optional[int]]:
+        if not items:
+            return [], None
+        records = [build_clipboard_record(item) for item in items]
+        with self._lock:
+            history = self._history.setdefault(user_id, [])
+            for item, record in zip(items, records):
+                previous = self._items.get(item.id)
+                if previous is not None:
+                    self._remove_from_history(previous, item.id)
+                self._items[item.id] = record
+                bisect.insort(history, (item.created_at.timestamp(), item.id))
+            # 与Redis的 ZREMRANGEBYRANK 相同：只保留最新的 max_history 条
+            overflow = len(history) - self.max_history
+            if overflow > 0:
+                for _, item_id in history[:overflow]:
+                    self._items.pop(item_id, None)
+                del history[:overflow]
+            return [True] * len(items), self._bump(user_id, 'clipboard')
+
+    def get_clipboard_item(self, item_id: str) -> Optional[ClipboardItem]:
+        record = self._items.get(item_id)
+        return parse_clipboard_record(record) if record else None
+
+    def get_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50) -> ClipboardHistory:
+        with self._lock:
+            history = self._history.get(user_id, [])
+            total = len(history)
+            end = total - (page - 1) * per_page
+            window = history[max(end - per_page, 0):max(end, 0)]
+            records = [self._items[item_id] for _, item_id in reversed(window)]
+        items = [parse_clipboard_record(record) for record in records]
+        return ClipboardHistory(items=items, total=total, page=page, per_page=per_page)
+
+    def delete_clipboard_item(self, item_id: str) -> bool:
+        with self._lock:
+            record = self._items.pop(item_id, None)
+            if record is None:
+                return False
+            self._remove_from_history(record, item_id)
+            self._bump(record['user_id'], 'clipboard')
+            return True
+
+    def _remove_from_history(self, record: Dict[str, str], item_id: str):
+        history = self._history.get(record.get('user_id'))
+        if not history:
+            return
+        entry = (datetime.fromisoformat(record['created_at']).timestamp(), item_id)
+        index = bisect.bisect_left(history, entry)
+        if index < len(history) and history[index] == entry:
+            del history[index]
+
+    def clear_clipboard(self, user_id: str) -> bool:
+        with self._lock:
+            for _, item_id in self._history.pop(user_id, []):
+                self._items.pop(item_id, None)
+            self._bump(user_id, 'clipboard')
+            return True
+
+    # ==================== 同步版本号 ====================
+
+    def _bump(self, user_id: str, scope: str) -> int:
+        versions = self._versions.setdefault(user_id, {})
+        versions[scope] = versions.get(scope, 0) + 1
+        return versions[scope]
+
+    def get_sync_version(self, user_id: str, scope: str) -> int:
+        return self._versions.get(user_id, {}).get(scope, 0)
+
+    def bump_sync_version(self, user_id: str, scope: str) -> Optional[int]:
+        with self._lock:
+            return self._bump(user_id, scope)
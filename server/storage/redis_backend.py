@@ -0,0 +1,95 @@
+"""
+Redis存储后端
+把接口委托给服务器运行时使用的 RedisManager（复用其进程内缓存、历史缓存和同步事件发布），供基准测试与其他后端对比
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.redis_manager import RedisManager, redis_manager
+from server.storage.base import StorageBackend
+from shared.models import ClipboardHistory, ClipboardItem
+
+
+class RedisStorage(StorageBackend):
+    """基于 RedisManager 的存储后端"""
+
+    name = "redis"
+
+    def __init__(self, manager: Optional[RedisManager] = None):
+        self.manager = manager or redis_manager
+        super().__init__()
+
+    @property
+    def presence_timeout(self) -> float:
+        return self.manager.presence_timeout
+
+    @presence_timeout.setter
+    def presence_timeout(self, value: float):
+        self.manager.presence_timeout = value
+
+    # ==================== 用户 ====================
+
+    def create_user(self, user_id: str, username: str, user_data: Dict[str, str]) -> bool:
+        return self.manager.create_user(user_id, username, user_data)
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, str]]:
+        return self.manager.get_user_by_id(user_id) or None
+
+    def get_user_id(self, username: str) -> Optional[str]:
+        user = self.manager.get_user_by_username(username)
+        return user['id'] if user else None
+
+    def count_users(self) -> int:
+        return self.manager.get_total_users_count()
+
+    def delete_user(self, user_id: str) -> bool:
+        return self.manager.delete_user(user_id)
+
+    # ==================== 设备 ====================
+
+    def save_device(self, user_id: str, device_id: str, device_data: Dict[str, str]) -> Dict[str, str]:
+        return self.manager.save_device(user_id, device_id, device_data)
+
+    def get_device(self, device_id: str) -> Optional[Dict[str, str]]:
+        return self.manager.get_device_record(device_id) or None
+
+    def list_devices(self, user_id: str) -> List[Dict[str, Any]]:
+        return self.manager.get_user_devices(user_id)
+
+    def remove_device(self, user_id: str, device_id: str) -> bool:
+        return self.manager.remove_user_device(user_id, device_id)
+
+    # ==================== 在线状态 ====================
+
+    def touch_devices(self, user_id: str, device_ids: List[str]):
+        for device_id in device_ids:
+            self.manager.touch_device(user_id, device_id)
+        self.manager.flush_presence()
+
+    def get_presence(self, user_id: str) -> Dict[str, float]:
+        return self.manager.get_devices_presence(user_id)
+
+    # ==================== 剪贴板历史 ====================
+
+    def save_clipboard_items(self, user_id: str, items: List[ClipboardItem]) -> Tuple[List[bool], Optional[int]]:
+        return self.manager.save_clipboard_items(user_id, items)
+
+    def get_clipboard_item(self, item_id: str) -> Optional[ClipboardItem]:
+        return self.manager.get_clipboard_item(item_id)
+
+    def get_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50) -> ClipboardHistory:
+        return self.manager.get_user_clipboard_history(user_id, page, per_page, with_content=True)
+
+    def delete_clipboard_item(self, item_id: str) -> bool:
+        return self.manager.delete_clipboard_item(item_id)
+
+    def clear_clipboard(self, user_id: str) -> bool:
+        return self.manager.clear_user_clipboard_history(user_id)
+
+    # ==================== 同步版本号 ====================
+
+    def get_sync_version(self, user_id: str, scope: str) -> int:
+        return self.manager.get_sync_version(user_id, scope)
+
+    def bump_sync_version(self, user_id: str, scope: str) -> Optional[int]:
+        return self.manager.bump_sync_version(user_id, scope)
@@ -0,0 +1,239 @@
+"""
+SQLite存储后端
+嵌入式单文件数据库，用于基准测试对比（服务器运行时不使用，见 server/storage/__init__.py）。
+使用WAL日志模式（读不阻塞写），所有SQL为固定语句（sqlite3模块缓存其预编译结果），
+批量写入在一个事务中用 executemany 完成。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.records import build_clipboard_record, parse_clipboard_record, parse_device_record
+from server.storage.base import StorageBackend
+from shared import serialization
+from shared.models import ClipboardHistory, ClipboardItem
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS devices (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS devices_by_user ON devices (user_id);
+CREATE TABLE IF NOT EXISTS presence (
+    user_id TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    seen REAL NOT NULL,
+    PRIMARY KEY (user_id, device_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clipboard_items (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    score REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clipboard_by_user ON clipboard_items (user_id, score, id);
+CREATE TABLE IF NOT EXISTS sync_versions (
+    user_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (user_id, scope)
+) WITHOUT ROWID;
+"""
+
+BUMP_VERSION_SQL = """
+INSERT INTO sync_versions (user_id, scope, version) VALUES (?, ?, 1)
+ON CONFLICT (user_id, scope) DO UPDATE SET version = version + 1
+"""
+SELECT_VERSION_SQL = "SELECT version FROM sync_versions WHERE user_id = ? AND scope = ?"
+UPSERT_PRESENCE_SQL = """
+INSERT INTO presence (user_id, device_id, seen) VALUES (?, ?, ?)
+ON CONFLICT (user_id, device_id) DO UPDATE SET seen = excluded.seen
+"""
+UPSERT_ITEM_SQL = """
+INSERT INTO clipboard_items (id, user_id, score, data) VALUES (?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, score = excluded.score, data = excluded.data
+"""
+# 与Redis的 ZREMRANGEBYRANK 相同：只保留最新的 max_history 条
+TRIM_HISTORY_SQL = """
+DELETE FROM clipboard_items WHERE id IN (
+    SELECT id FROM clipboard_items WHERE user_id = ? ORDER BY score DESC, id DESC LIMIT -1 OFFSET ?
+)
+"""
+HISTORY_PAGE_SQL = """
+SELECT data FROM clipboard_items WHERE user_id = ? ORDER BY score DESC, id DESC LIMIT ? OFFSET ?
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite存储后端（单连接，写操作串行化）"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/beesyncclip.db"):
+        """
+        Args:
+            path: 数据库文件路径，":memory:" 为内存数据库
+        """
+        super().__init__()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL模式下只在检查点时fsync
+        self._conn.executescript(SCHEMA)
+
+    def _bump(self, user_id: str, scope: str) -> int:
+        """在当前事务中递增版本号"""
+        self._conn.execute(BUMP_VERSION_SQL, (user_id, scope))
+        return self._conn.execute(SELECT_VERSION_SQL, (user_id, scope)).fetchone()[0]
+
+    # ==================== 用户 ====================
+
+    def create_user(self, user_id: str, username: str, user_data: Dict[str, str]) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO users (id, username, data) VALUES (?, ?, ?)",
+                (user_id, username, serialization.dumps_str(user_data))
+            )
+            return cursor.rowcount == 1
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return serialization.loads(row[0]) if row else None
+
+    def get_user_id(self, username: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def count_users(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def delete_user(self, user_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            if cursor.rowcount == 0:
+                return False
+            for table in ("devices", "presence", "clipboard_items", "sync_versions"):
+                self._conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+            return True
+
+    # ==================== 设备 ====================
+
+    def save_device(self, user_id: str, device_id: str, device_data: Dict[str, str]) -> Dict[str, str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data FROM devices WHERE id = ?", (device_id,)).fetchone()
+            record = serialization.loads(row[0]) if row else {}
+            record.update(device_data)
+            record.update(user_id=user_id, last_seen=datetime.fromtimestamp(now).isoformat(), is_online='true')
+            self._conn.execute(
+                "INSERT OR REPLACE INTO devices (id, user_id, data) VALUES (?, ?, ?)",
+                (device_id, user_id, serialization.dumps_str(record))
+            )
+            self._conn.execute(UPSERT_PRESENCE_SQL, (user_id, device_id, now))
+            self._bump(user_id, 'devices')
+            return record
+
+    def get_device(self, device_id: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM devices WHERE id = ?", (device_id,)).fetchone()
+        return serialization.loads(row[0]) if row else None
+
+    def list_devices(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM devices WHERE user_id = ?", (user_id,)).fetchall()
+        return [parse_device_record(device_id, serialization.loads(data)) for device_id, data in rows]
+
+    def remove_device(self, user_id: str, device_id: str) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM devices WHERE id = ?", (device_id,))
+            self._conn.execute("DELETE FROM presence WHERE user_id = ? AND device_id = ?", (user_id, device_id))
+            self._bump(user_id, 'devices')
+            return True
+
+    # ==================== 在线状态 ====================
+
+    def touch_devices(self, user_id: str, device_ids: List[str]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT_PRESENCE_SQL, [(user_id, device_id, now) for device_id in device_ids])
+
+    def get_presence(self, user_id: str) -> Dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT device_id, seen FROM presence WHERE user_id = ? AND seen >= ?",
+                (user_id, time.time() - self.presence_timeout)
+            ).fetchall()
+        return dict(rows)
+
+    # ==================== 剪贴板历史 ====================
+
+    def save_clipboard_items(self, user_id: str, items: List[ClipboardItem]) -> Tuple[List[bool], Optional[int]]:
+        if not items:
+            return [], None
+        rows = [(item.id, user_id, item.created_at.timestamp(), serialization.dumps_str(build_clipboard_record(item)))
+                for item in items]
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT_ITEM_SQL, rows)
+            self._conn.execute(TRIM_HISTORY_SQL, (user_id, self.max_history))
+            return [True] * len(items), self._bump(user_id, 'clipboard')
+
+    def get_clipboard_item(self, item_id: str) -> Optional[ClipboardItem]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM clipboard_items WHERE id = ?", (item_id,)).fetchone()
+        return parse_clipboard_record(serialization.loads(row[0])) if row else None
+
+    def get_clipboard_history(self, user_id: str, page: int = 1, per_page: int = 50) -> ClipboardHistory:
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM clipboard_items WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            rows = self._conn.execute(HISTORY_PAGE_SQL, (user_id, per_page, (page - 1) * per_page)).fetchall()
+        items = [parse_clipboard_record(serialization.loads(data)) for data, in rows]
+        return ClipboardHistory(items=items, total=total, page=page, per_page=per_page)
+
+    def delete_clipboard_item(self, item_id: str) -> bool:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT user_id FROM clipboard_items WHERE id = ?", (item_id,)).fetchone()
+            if not row:
+                return False
+            self._conn.execute("DELETE FROM clipboard_items WHERE id = ?", (item_id,))
+            self._bump(row[0], 'clipboard')
+            return True
+
+    def clear_clipboard(self, user_id: str) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM clipboard_items WHERE user_id = ?", (user_id,))
+            self._bump(user_id, 'clipboard')
+            return True
+
+    # ==================== 同步版本号 ====================
+
+    def get_sync_version(self, user_id: str, scope: str) -> int:
+        with self._lock:
+            row = self._conn.execute(SELECT_VERSION_SQL, (user_id, scope)).fetchone()
+        return row[0] if row else 0
+
+    def bump_sync_version(self, user_id: str, scope: str) -> Optional[int]:
+        with self._lock, self._conn:
+            return self._bump(user_id, scope)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
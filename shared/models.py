@@ -30,6 +30,7 @@ class ClipboardItem(BaseModel):
     device_id: str
     user_id: str
     checksum: Optional[str] = None  # 数据校验和
+    preview: Optional[str] = None  # 内容预览（只读取元数据时 content 为空）
     
     class Config:
         json_encoders = {
@@ -108,6 +109,7 @@ class AuthResponse(BaseModel):
     token: Optional[str] = None
     user_id: Optional[str] = None
     device_id: Optional[str] = None
+    device: Optional[Dict[str, Any]] = None  # 登录时写入后的设备记录
     message: str = ""
 
 
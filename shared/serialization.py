@@ -0,0 +1,130 @@
+"""
+BeeSyncClip JSON序列化层
+HTTP响应、发布订阅事件和WebSocket消息统一通过本模块编解码。
+按 orjson → msgspec → 标准库json 的顺序选择可用后端，也可通过环境变量
+BEESYNCCLIP_JSON_BACKEND 或 use_backend() 指定；datetime/date/Enum/集合/pydantic模型
+由各后端原生处理，调用方无需先转换为字符串
+"""
+
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Tuple, Union
+from loguru import logger
+
+
+def encode_default(obj: Any) -> Any:
+    """后端无法原生编码的类型（WebSocket的msgpack编码同样使用）"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_backend() -> Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    # 与 starlette JSONResponse 相同的参数，输出紧凑的UTF-8
+    encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=encode_default)
+
+    def dumps(obj: Any) -> bytes:
+        return encoder.encode(obj).encode('utf-8')
+
+    return dumps, json.loads
+
+
+def _orjson_backend():
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=encode_default, option=option)
+
+    return dumps, orjson.loads
+
+
+def _msgspec_backend():
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=encode_default)
+    decoder = msgspec.json.Decoder()
+
+    return encoder.encode, decoder.decode
+
+
+# 后端优先级顺序
+_BACKENDS: Dict[str, Callable] = {
+    'orjson': _orjson_backend,
+    'msgspec': _msgspec_backend,
+    'json': _stdlib_backend,
+}
+
+backend_name = 'json'
+_dumps, _loads = _stdlib_backend()
+
+
+def available_backends() -> list:
+    """返回当前环境可用的后端名称（按优先级）"""
+    names = []
+    for name, factory in _BACKENDS.items():
+        try:
+            factory()
+            names.append(name)
+        except ImportError:
+            continue
+    return names
+
+
+def use_backend(name: str = None) -> str:
+    """
+    切换序列化后端
+
+    Args:
+        name: 后端名称，为None时按优先级自动选择
+
+    Returns:
+        实际启用的后端名称
+    """
+    global backend_name, _dumps, _loads
+
+    candidates = [name] if name else list(_BACKENDS)
+    for candidate in candidates:
+        factory = _BACKENDS.get(candidate)
+        if factory is None:
+            logger.warning(f"未知的JSON序列化后端: {candidate}")
+            continue
+        try:
+            _dumps, _loads = factory()
+            backend_name = candidate
+            return backend_name
+        except ImportError:
+            logger.warning(f"JSON序列化后端不可用: {candidate}")
+
+    _dumps, _loads = _stdlib_backend()
+    backend_name = 'json'
+    return backend_name
+
+
+def dumps(obj: Any) -> bytes:
+    """编码为UTF-8 JSON字节串"""
+    return _dumps(obj)
+
+
+def dumps_str(obj: Any) -> str:
+    """编码为JSON字符串（WebSocket文本帧、Redis发布）"""
+    return _dumps(obj).decode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """解码JSON字节串或字符串"""
+    return _loads(data)
+
+
+use_backend(os.environ.get('BEESYNCCLIP_JSON_BACKEND') or None)
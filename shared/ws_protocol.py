@@ -0,0 +1,171 @@
+"""
+BeeSyncClip WebSocket消息编解码
+服务器和客户端共用的参考实现。
+
+连接时客户端通过 Sec-WebSocket-Protocol 提供 MSGPACK_SUBPROTOCOL 即协商为二进制协议，
+未提供时使用JSON文本帧（旧客户端行为不变）。二进制协议中：
+  - 每帧为 1字节标志 + msgpack负载，标志为 FRAME_ZLIB 时负载经zlib压缩（只用于较大的文本消息）
+  - 图片/文件类剪切板内容以msgpack bin类型原样传输，不做base64编码
+
+客户端示例:
+    codec = MsgpackCodec()
+    async with websockets.connect(url, subprotocols=[codec.subprotocol]) as ws:
+        await ws.send(codec.encode({"type": "ping"}))
+        message = codec.decode(await ws.recv())
+"""
+
+import base64
+import binascii
+import zlib
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+from shared import serialization
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+
+MSGPACK_SUBPROTOCOL = "beesync.msgpack.v1"
+
+FRAME_PLAIN = 0x00
+FRAME_ZLIB = 0x01
+
+
+def is_binary_content_type(content_type: Optional[str]) -> bool:
+    """该类型的剪切板内容在存储和JSON协议中是否为base64文本"""
+    if not content_type:
+        return False
+    return content_type in ('image', 'file', 'application/octet-stream') or content_type.startswith('image/')
+
+
+def _content_to_bytes(data: Dict[str, Any]) -> Dict[str, Any]:
+    content = data.get('content')
+    if isinstance(content, str) and is_binary_content_type(data.get('content_type')):
+        try:
+            return {**data, 'content': base64.b64decode(content, validate=True)}
+        except (binascii.Error, ValueError):
+            return data
+    return data
+
+
+def _content_to_base64(data: Dict[str, Any]) -> Dict[str, Any]:
+    content = data.get('content')
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return {**data, 'content': base64.b64encode(content).decode('ascii')}
+    return data
+
+
+def _map_clipboard_data(message: Dict[str, Any], convert: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """对消息中的剪切板数据（data 本身，或 data.items 中的每一项）应用转换"""
+    data = message.get('data')
+    if not isinstance(data, dict):
+        return message
+    if isinstance(data.get('items'), list):
+        data = {**data, 'items': [convert(item) if isinstance(item, dict) else item for item in data['items']]}
+    else:
+        data = convert(data)
+    return {**message, 'data': data}
+
+
+def content_to_base64(message: Dict[str, Any]) -> Dict[str, Any]:
+    """把消息中的原始二进制内容转换回base64文本（服务器按文本存储剪切板内容）"""
+    return _map_clipboard_data(message, _content_to_base64)
+
+
+def _has_binary_content(message: Dict[str, Any]) -> bool:
+    data = message.get('data')
+    if not isinstance(data, dict):
+        return False
+    items = data['items'] if isinstance(data.get('items'), list) else [data]
+    return any(isinstance(item, dict) and isinstance(item.get('content'), bytes) for item in items)
+
+
+class JSONCodec:
+    """默认协议：JSON文本帧"""
+
+    name = "json"
+    subprotocol = None
+    binary = False
+
+    def encode(self, message: Dict[str, Any]) -> str:
+        return serialization.dumps_str(message)
+
+    def decode(self, frame: Union[str, bytes]) -> Dict[str, Any]:
+        message = serialization.loads(frame)
+        if not isinstance(message, dict):
+            raise ValueError("WebSocket消息必须是对象")
+        return message
+
+
+class MsgpackCodec:
+    """二进制协议：msgpack帧，原始二进制内容字段，较大文本消息按帧压缩"""
+
+    name = "msgpack"
+    subprotocol = MSGPACK_SUBPROTOCOL
+    binary = True
+
+    def __init__(self, compress_threshold: int = 4096, compress_level: int = 6,
+                 max_size: int = 16 * 1024 * 1024):
+        """
+        Args:
+            compress_threshold: msgpack负载达到该字节数时尝试压缩，0为不压缩
+            compress_level: zlib压缩级别
+            max_size: 解压后允许的最大消息字节数
+        """
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack未安装，无法使用二进制WebSocket协议")
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.max_size = max_size
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        message = _map_clipboard_data(message, _content_to_bytes)
+        payload = msgpack.packb(message, default=serialization.encode_default, use_bin_type=True)
+
+        # 图片等二进制内容通常已压缩，只压缩文本消息
+        if (self.compress_threshold and len(payload) >= self.compress_threshold
+                and not _has_binary_content(message)):
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                return bytes((FRAME_ZLIB,)) + compressed
+
+        return bytes((FRAME_PLAIN,)) + payload
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        if not frame:
+            raise ValueError("空的WebSocket帧")
+
+        flag = frame[0]
+        body = memoryview(frame)[1:]
+        if flag == FRAME_ZLIB:
+            decompressor = zlib.decompressobj()
+            body = decompressor.decompress(body, self.max_size)
+            if decompressor.unconsumed_tail:
+                raise ValueError("解压后的消息超过大小限制")
+        elif flag != FRAME_PLAIN:
+            raise ValueError(f"未知的帧标志: {flag}")
+
+        message = msgpack.unpackb(body, raw=False)
+        if not isinstance(message, dict):
+            raise ValueError("WebSocket消息必须是map")
+        return message
+
+
+JSON_CODEC = JSONCodec()
+
+
+def select_codec(offered: Iterable[str], msgpack_codec: Optional[MsgpackCodec] = None):
+    """
+    按客户端提供的子协议选择编解码器
+
+    Args:
+        offered: 客户端 Sec-WebSocket-Protocol 中的子协议列表
+        msgpack_codec: 服务器启用的msgpack编解码器，为None时只支持JSON
+    """
+    if msgpack_codec is not None and MSGPACK_SUBPROTOCOL in offered:
+        return msgpack_codec
+    return JSON_CODEC
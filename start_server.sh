@@ -227,6 +227,7 @@ sys.path.insert(0, project_root)
 
 # 导入模块化服务器应用
 from server.modular_server import app
+from server.api.ingest import max_websocket_message_bytes
 
 if __name__ == "__main__":
     import uvicorn
@@ -249,7 +250,8 @@ if __name__ == "__main__":
         app,
         host="$DEFAULT_HOST",
         port=$PORT,
-        log_level="info"
+        log_level="info",
+        ws_max_size=max_websocket_message_bytes()  # 超大的WebSocket帧在协议层直接拒绝
     )
 EOF
     else
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+/admin/users 基准
+在本地Redis中写入 N 个用户 × M 台设备，对比旧的逐用户逐设备查询方式
+与批量pipeline实现的接口耗时
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_admin_users [--users 1000] [--devices 5] [--rounds 5]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import redis
+from loguru import logger
+from fastapi.testclient import TestClient
+
+from server.redis_manager import redis_manager
+from server.security import token_manager
+from server.modular_server import app
+
+
+def legacy_admin_users(client):
+    """旧实现：每个用户两次获取设备列表（SMEMBERS + 每设备HGETALL）并读取一页剪贴板"""
+    users = []
+    for key in client.keys("user:*"):
+        if client.type(key) != 'hash':
+            continue
+        user = client.hgetall(key)
+        for _ in range(2):
+            for device_id in client.smembers(f"devices:{user['id']}"):
+                client.hgetall(f"device:{device_id}")
+        client.zcard(f"clipboard:{user['id']}")
+        client.zrevrange(f"clipboard:{user['id']}", 0, 0)
+        users.append(user)
+    return users
+
+
+def populate(client, prefix: str, users: int, devices: int):
+    """写入测试数据"""
+    now = datetime.now().isoformat()
+    pipe = client.pipeline(transaction=False)
+    for u in range(users):
+        user_id = f"{prefix}-u{u}"
+        pipe.hset(f"user:{user_id}", mapping={'id': user_id, 'username': user_id, 'created_at': now})
+        for d in range(devices):
+            device_id = f"{prefix}-u{u}-d{d}"
+            pipe.sadd(f"devices:{user_id}", device_id)
+            pipe.hset(f"device:{device_id}", mapping={
+                'id': device_id, 'name': device_id, 'user_id': user_id, 'created_at': now, 'last_seen': now
+            })
+    pipe.execute()
+
+
+def timed(fn, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/admin/users 基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--devices", type=int, default=5, help="每个用户的设备数")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    client = redis.Redis(host=args.redis_host, port=args.redis_port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+
+    prefix = f"bench-{uuid.uuid4().hex[:6]}"
+    populate(client, prefix, args.users, args.devices)
+    http = TestClient(app)
+    headers = {"Authorization": f"Bearer {token_manager.generate_admin_token('admin')}"}
+
+    def batched():
+        response = http.get("/admin/users", headers=headers)
+        assert response.status_code == 200
+
+    try:
+        print(f"{args.users} 用户 × {args.devices} 设备（库中已有用户同样计入）")
+        print(f"legacy   p50={timed(lambda: legacy_admin_users(client), args.rounds):9.1f}ms")
+        print(f"batched  p50={timed(batched, args.rounds):9.1f}ms")
+    finally:
+        for pattern in (f"user:{prefix}-*", f"devices:{prefix}-*", f"device:{prefix}-*"):
+            keys = list(client.scan_iter(match=pattern, count=1000))
+            for i in range(0, len(keys), 1000):
+                client.unlink(*keys[i:i + 1000])
+
+
+if __name__ == "__main__":
+    main()
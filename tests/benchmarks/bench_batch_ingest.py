@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+离线恢复批量写入基准
+模拟设备恢复网络后回放 N 条排队的剪切板内容，对比逐条 POST /clipboard/add 与
+按批 POST /clipboard/batch 的总耗时；可选在Redis前注入往返延迟模拟跨机房部署
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_batch_ingest [--items 1000] [--batch-size 500] [--rtt-ms 1]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import redis
+from loguru import logger
+from fastapi.testclient import TestClient
+
+from server.redis_manager import redis_manager
+from server.security import security_middleware
+from server.modular_server import app
+from tests.benchmarks.harness import DelayProxy
+
+
+def queued_items(count: int):
+    """离线期间排队的剪切板内容（带原始复制时间）"""
+    start = datetime.now() - timedelta(seconds=count)
+    return [
+        {
+            "content": f"离线复制 {i} " + "x" * 100,
+            "client_id": f"queued-{i}",
+            "created_at": (start + timedelta(seconds=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线恢复批量写入基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--items", type=int, default=1000, help="排队的剪切板条目数")
+    parser.add_argument("--batch-size", type=int, default=500, help="每次批量请求的条目数")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+    redis_manager.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+    redis_manager.redis_client.ping()
+    security_middleware.rate_limiter.enabled = False  # 基准测量的是写入路径本身
+    client = TestClient(app)
+
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    client.post("/register", json={"username": username, "password": "bench-password"})
+    login = client.post("/login", json={"username": username, "password": "bench-password", "lean": True,
+                                        "device_info": {"device_id": "bench-device"}}).json()
+    headers = {"Authorization": f"Bearer {login['token']}"}
+    items = queued_items(args.items)
+
+    try:
+        print(f"回放 {args.items} 条排队内容, 注入RTT {args.rtt_ms}ms")
+
+        start = time.perf_counter()
+        for item in items:
+            response = client.post("/clipboard/add", headers=headers,
+                                   json={"content": item["content"], "device_id": "bench-device"})
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+        print(f"single  {elapsed:8.2f}s  {args.items / elapsed:8.0f} 条/s  请求 {args.items}")
+
+        user = redis_manager.get_user_by_username(username)
+        redis_manager.clear_user_clipboard_history(user['id'])
+
+        start = time.perf_counter()
+        saved = 0
+        for offset in range(0, len(items), args.batch_size):
+            response = client.post("/clipboard/batch", headers=headers,
+                                   json={"device_id": "bench-device", "items": items[offset:offset + args.batch_size]})
+            assert response.status_code == 200, response.text
+            saved += response.json()["saved"]
+        elapsed = time.perf_counter() - start
+        requests = -(-len(items) // args.batch_size)
+        print(f"batch   {elapsed:8.2f}s  {args.items / elapsed:8.0f} 条/s  请求 {requests}  写入 {saved}")
+    finally:
+        user = redis_manager.get_user_by_username(username)
+        if user:
+            redis_manager.clear_user_clipboard_history(user['id'])
+            redis_manager.delete_user(user['id'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+大文件上传基准
+在独立的服务器进程中并发上传 N 个图片，对比 JSON+base64 的 POST /clipboard/add 与
+流式的 POST /clipboard/upload：吞吐量（MB/s）以及服务器进程的峰值RSS（每种方式使用新进程，10ms采样）。
+
+旧接口的内容上限按字符计算，base64后约为原始大小的4/3，因此默认使用7MB（base64后仍在10MB以内），
+用 --size-mb 10 可观察旧接口在拒绝前已经解析完整请求体的内存占用。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_blob_upload [--size-mb 7] [--uploads 32] [--concurrency 8] [--rtt-ms 0]
+"""
+
+import argparse
+import asyncio
+import base64
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+import psutil
+from loguru import logger
+
+from tests.benchmarks.harness import DelayProxy, ResourceSampler, serve
+
+
+async def upload_all(base_url: str, headers: dict, mode: str, payload: bytes, uploads: int, concurrency: int):
+    """并发上传，返回 (耗时, 各状态码计数)"""
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    encoded = base64.b64encode(payload).decode('ascii') if mode == "json" else None
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120) as client:
+        async def one():
+            async with semaphore:
+                if mode == "json":
+                    response = await client.post("/clipboard/add", json={
+                        "content": encoded, "device_id": "bench-device", "content_type": "image/png"
+                    })
+                else:
+                    response = await client.post("/clipboard/upload", params={"device_id": "bench-device"},
+                                                 content=payload, headers={"Content-Type": "image/png"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(uploads)))
+        return time.perf_counter() - start, statuses
+
+
+def run_mode(mode: str, args, redis_host: str, redis_port: int, blob_path: str, payload: bytes):
+    port = args.port
+    context = multiprocessing.get_context("spawn")
+    server = context.Process(target=serve, args=(port, redis_host, redis_port, blob_path), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("服务器启动超时")
+
+        username = f"bench-{uuid.uuid4().hex[:8]}"
+        httpx.post(f"{base_url}/register", json={"username": username, "password": "bench-password"})
+        login = httpx.post(f"{base_url}/login", json={
+            "username": username, "password": "bench-password", "lean": True,
+            "device_info": {"device_id": "bench-device"}
+        }).json()
+        headers = {"Authorization": f"Bearer {login['token']}"}
+
+        idle = psutil.Process(server.pid).memory_info().rss
+        with ResourceSampler(server.pid, interval=0.01) as sampler:
+            elapsed, statuses = asyncio.run(
+                upload_all(base_url, headers, mode, payload, args.uploads, args.concurrency)
+            )
+        ok = statuses.get(200, 0)
+        print(f"{mode:<7} {ok * len(payload) / elapsed / 1024 / 1024:8.1f} MB/s  {elapsed:6.2f}s  "
+              f"RSS 空闲 {idle / 1024 / 1024:6.1f}MB  峰值 {sampler.rss_peak / 1024 / 1024:7.1f}MB  状态 {statuses}")
+
+        httpx.post(f"{base_url}/clipboard/clear", headers=headers, json={})
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大文件上传基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--port", type=int, default=18000, help="基准服务器监听端口")
+    parser.add_argument("--size-mb", type=float, default=7)
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    parser.add_argument("--modes", default="json,stream")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    print(f"{args.uploads} 次上传 x {args.size_mb}MB, 并发 {args.concurrency}, 注入RTT {args.rtt_ms}ms")
+    with tempfile.TemporaryDirectory() as blob_path:
+        for mode in args.modes.split(","):
+            run_mode(mode, args, host, port, blob_path, payload)
+
+
+if __name__ == "__main__":
+    main()
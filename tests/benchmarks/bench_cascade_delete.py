@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+用户级联删除基准
+为一个用户写入 N 条剪贴板历史和 M 台设备，对比旧的逐条删除方式
+（每条 HGETALL + 删除 + 发布事件）与分块UNLINK级联删除的耗时和往返次数
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_cascade_delete [--items 1000] [--devices 10] [--rtt-ms 1]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import redis
+from loguru import logger
+
+from server.redis_manager import redis_manager
+from tests.benchmarks.harness import DelayProxy
+
+
+def populate(client, user_id: str, items: int, devices: int):
+    """写入测试用户、设备和剪贴板历史"""
+    now = datetime.now()
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(f"user:{user_id}", mapping={'id': user_id, 'username': user_id, 'created_at': now.isoformat()})
+    pipe.set(f"username:{user_id}", user_id)
+    for d in range(devices):
+        device_id = f"{user_id}-d{d}"
+        pipe.sadd(f"devices:{user_id}", device_id)
+        pipe.hset(f"device:{device_id}", mapping={'id': device_id, 'user_id': user_id})
+    for i in range(items):
+        item_id = f"{user_id}-i{i}"
+        pipe.hset(f"item:{item_id}", mapping={
+            'id': item_id, 'user_id': user_id, 'device_id': f"{user_id}-d0", 'content': "x" * 200,
+            'type': 'text', 'created_at': now.isoformat(), 'updated_at': now.isoformat()
+        })
+        pipe.zadd(f"clipboard:{user_id}", {item_id: now.timestamp() + i})
+    pipe.execute()
+
+
+def legacy_delete(client, user_id: str):
+    """旧实现：逐条读取、删除剪贴板项并各自发布同步事件，再逐个删除设备"""
+    for item_id in client.zrevrange(f"clipboard:{user_id}", 0, 9999):
+        client.hgetall(f"item:{item_id}")
+        client.delete(f"item:{item_id}")
+        client.zrem(f"clipboard:{user_id}", item_id)
+        client.hincrby(f"sync_version:{user_id}", 'clipboard', 1)
+        client.publish(f"clipboard_sync:{user_id}", '{"action":"delete"}')
+    for device_id in client.smembers(f"devices:{user_id}"):
+        client.srem(f"devices:{user_id}", device_id)
+        client.delete(f"device:{device_id}")
+    client.delete(f"user:{user_id}", f"username:{user_id}", f"clipboard:{user_id}",
+                  f"devices:{user_id}", f"sync_version:{user_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用户级联删除基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--items", type=int, default=1000, help="剪贴板历史条数")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=1, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+    client = redis.Redis(host=host, port=port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+
+    print(f"{args.items} 条历史, {args.devices} 台设备, 注入RTT {args.rtt_ms}ms, "
+          f"分块 {redis_manager.cascade_chunk_size}")
+
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    populate(client, user_id, args.items, args.devices)
+    start = time.perf_counter()
+    legacy_delete(client, user_id)
+    elapsed = time.perf_counter() - start
+    print(f"legacy   {elapsed * 1000:9.1f}ms  往返 ~{args.items * 5 + args.devices * 2 + 2}")
+
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    populate(client, user_id, args.items, args.devices)
+    start = time.perf_counter()
+    detached = redis_manager.detach_user(user_id)
+    detach_elapsed = time.perf_counter() - start
+    deleted = redis_manager.run_cascade(redis_manager.user_cascade_chunks(detached))
+    elapsed = time.perf_counter() - start
+    print(f"cascade  {elapsed * 1000:9.1f}ms  (分离 {detach_elapsed * 1000:.1f}ms 后即可返回)  删除键 {deleted}")
+
+
+if __name__ == "__main__":
+    main()
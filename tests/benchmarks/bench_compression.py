@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+HTTP响应压缩基准
+在独立的服务器进程中为一个用户写入 N 条可压缩的文本历史，客户端经模拟慢速链路（带宽限制 + 往返延迟）
+分别以 identity / gzip / br / zstd 请求 /get_clipboards 与 /login，对比线上传输字节数和端到端耗时
+（发出请求 → 收完响应 → 解压并解析JSON）。服务器未安装 brotli / zstandard 时对应编码会回退，结果中标注实际编码。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_compression [--items 50] [--content-kb 8] [--link-mbps 10] [--link-rtt-ms 40] [--rtt-ms 0]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from loguru import logger
+
+from tests.benchmarks.harness import DelayProxy, serve
+
+
+WORDS = ("clipboard sync device history token redis server client message content "
+         "update version cursor preview archive upload download network latency").split()
+
+
+class SlowLinkProxy(DelayProxy):
+    """模拟慢速链路的TCP代理：每个方向按带宽串行发送，送达时再加单程延迟"""
+
+    def __init__(self, target_host: str, target_port: int, rtt_ms: float, mbps: float):
+        super().__init__(target_host, target_port, rtt_ms)
+        self.bytes_per_second = mbps * 1000 * 1000 / 8
+
+    async def _pipe(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        link_free = 0.0
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                # 链路空闲后开始发送，发送耗时 = 字节数 / 带宽
+                link_free = max(loop.time(), link_free) + len(data) / self.bytes_per_second
+                await asyncio.sleep(link_free - loop.time())
+                # 传播延迟不占用链路，后续数据可以继续发送
+                loop.call_later(self.one_way, writer.write, data)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            await asyncio.sleep(self.one_way)
+            writer.close()
+
+
+def make_text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def measure(label: str, client: httpx.Client, rounds: int, request):
+    samples = []
+    wire = 0
+    encodings = set()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = request(client)
+        response.json()
+        samples.append((time.perf_counter() - start) * 1000)
+        wire = response.num_bytes_downloaded
+        encodings.add(response.headers.get("content-encoding", "identity"))
+    samples.sort()
+    print(f"  {label:<10} 实际编码 {','.join(sorted(encodings)):<9} 传输 {wire / 1024:9.1f}KB  "
+          f"解码后 {len(response.content) / 1024:9.1f}KB  p50 {statistics.median(samples):9.2f}ms  "
+          f"p99 {samples[min(int(len(samples) * 0.99), len(samples) - 1)]:9.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP响应压缩基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--port", type=int, default=18002, help="基准服务器监听端口")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--content-kb", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--link-mbps", type=float, default=10, help="模拟链路带宽（Mbit/s）")
+    parser.add_argument("--link-rtt-ms", type=float, default=40, help="模拟链路往返延迟（毫秒）")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    parser.add_argument("--encodings", default="identity,gzip,br,zstd")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+
+    print(f"{args.items} 条 x {args.content_kb}KB 文本, 读取 {args.rounds} 轮, "
+          f"链路 {args.link_mbps}Mbit/s RTT {args.link_rtt_ms}ms, 注入Redis RTT {args.rtt_ms}ms")
+    with tempfile.TemporaryDirectory() as blob_path:
+        context = multiprocessing.get_context("spawn")
+        server = context.Process(target=serve, args=(args.port, host, port, blob_path), daemon=True)
+        server.start()
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            for _ in range(200):
+                try:
+                    if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("服务器启动超时")
+
+            username = f"bench-{uuid.uuid4().hex[:8]}"
+            credentials = {"username": username, "password": "bench-password"}
+            httpx.post(f"{base_url}/register", json=credentials)
+            login = httpx.post(f"{base_url}/login", json={
+                **credentials, "lean": True, "device_info": {"device_id": "bench-device"}
+            }).json()
+            headers = {"Authorization": f"Bearer {login['token']}"}
+
+            rng = random.Random(0)
+            with httpx.Client(base_url=base_url, headers=headers, timeout=120) as client:
+                for index in range(args.items):
+                    client.post("/clipboard/add", json={
+                        "content": f"{index} {make_text(rng, args.content_kb * 1024)}", "device_id": "bench-device"
+                    })
+
+            link = SlowLinkProxy("127.0.0.1", args.port, args.link_rtt_ms, args.link_mbps).start()
+            link_url = f"http://127.0.0.1:{link.port}"
+            for path, request in (
+                ("/get_clipboards", lambda c: c.get("/get_clipboards", params={"username": username})),
+                ("/login", lambda c: c.post("/login", json={**credentials, "device_info": {"device_id": "bench-device"}})),
+            ):
+                print(path)
+                for encoding in args.encodings.split(","):
+                    with httpx.Client(base_url=link_url, headers={**headers, "Accept-Encoding": encoding},
+                                      timeout=120) as client:
+                        request(client)  # 预热连接
+                        measure(encoding, client, args.rounds, request)
+
+            httpx.post(f"{base_url}/clipboard/clear", headers=headers, json={})
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+条件请求（ETag / If-None-Match）轮询基准
+模拟客户端反复轮询 /get_clipboards 和 /get_devices，期间偶尔有写入，
+对比无条件轮询与携带 If-None-Match 时的传输字节数和服务器CPU时间
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_conditional_get [--items 100] [--polls 2000] [--write-every 100]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+
+import redis
+from loguru import logger
+from fastapi.testclient import TestClient
+
+from server.redis_manager import redis_manager
+from server.security import security_middleware
+from server.modular_server import app
+
+
+def poll(client: TestClient, username: str, polls: int, write_every: int, conditional: bool):
+    """执行轮询，返回 (响应体字节数, 304次数, CPU秒数)"""
+    etags = {}
+    total_bytes = 0
+    not_modified = 0
+    start = time.process_time()
+    for i in range(polls):
+        if write_every and i and i % write_every == 0:
+            client.post("/add_clipboard", json={"username": username, "content": f"poll write {i}", "device_id": "bench-device"})
+        for endpoint in ("/get_clipboards", "/get_devices"):
+            headers = {"If-None-Match": etags[endpoint]} if conditional and endpoint in etags else {}
+            response = client.get(endpoint, params={"username": username}, headers=headers)
+            total_bytes += len(response.content)
+            if response.status_code == 304:
+                not_modified += 1
+            elif "etag" in response.headers:
+                etags[endpoint] = response.headers["etag"]
+    return total_bytes, not_modified, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="条件请求轮询基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--items", type=int, default=100, help="历史条目数")
+    parser.add_argument("--polls", type=int, default=2000, help="轮询次数（每次轮询两个接口）")
+    parser.add_argument("--write-every", type=int, default=100, help="每隔多少次轮询写入一条")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    redis_manager.redis_client = redis.Redis(host=args.redis_host, port=args.redis_port, decode_responses=True)
+    redis_manager.redis_client.ping()
+    security_middleware.rate_limiter.enabled = False  # 基准测量的是接口本身
+    client = TestClient(app)
+
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    client.post("/register", json={"username": username, "password": "bench-password"})
+    client.post("/login", json={"username": username, "password": "bench-password",
+                                "device_info": {"device_id": "bench-device"}})
+    for i in range(args.items):
+        client.post("/add_clipboard", json={"username": username, "content": f"item {i} " + "x" * 200,
+                                            "device_id": "bench-device"})
+
+    try:
+        print(f"{args.items} 条历史, {args.polls} 次轮询, 每 {args.write_every} 次写入一条")
+        for name, conditional in (("unconditional", False), ("if-none-match", True)):
+            total_bytes, not_modified, cpu = poll(client, username, args.polls, args.write_every, conditional)
+            print(f"{name:<14} 响应体 {total_bytes / 1024:10.1f} KiB  304 {not_modified:6d}  CPU {cpu:6.2f}s")
+    finally:
+        user = redis_manager.get_user_by_username(username)
+        if user:
+            redis_manager.clear_user_clipboard_history(user['id'])
+            redis_manager.delete_user(user['id'])
+
+
+if __name__ == "__main__":
+    main()
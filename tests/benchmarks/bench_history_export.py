@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+历史导出/导入基准
+为一个用户写入 N 条历史（默认10万条 x 512B），在独立的服务器进程中流式导出（GET /clipboard/export，
+identity 与 gzip 两种编码，客户端边收边写临时文件），再把导出文件流式导入另一个用户（POST /clipboard/import）。
+输出耗时、条数/秒和服务器进程相对空闲时的峰值RSS增量（10ms采样）：内存占用应与历史总量无关。
+服务器与写入过程都把 clipboard.max_history 提高到 N，导入不会被保留规则截断。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_history_export [--items 100000] [--content-bytes 512] [--rtt-ms 0]
+"""
+
+import argparse
+import gzip
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+import psutil
+import redis
+from loguru import logger
+
+from server.redis_manager import redis_manager
+from shared.models import ClipboardItem, ClipboardType
+from shared.utils import config_manager
+from tests.benchmarks.harness import DelayProxy, ResourceSampler, serve
+
+
+def serve_unbounded(port: int, redis_host: str, redis_port: int, data_path: str, max_history: int):
+    """子进程：提高历史保留上限后运行服务器"""
+    config_manager.set('clipboard.max_history', max_history)
+    serve(port, redis_host, redis_port, data_path)
+
+
+def populate(user_id: str, items: int, content_bytes: int):
+    """在基准进程中分批写入历史（每批一次pipeline）"""
+    start = datetime.now() - timedelta(seconds=items)
+    filler = "x" * content_bytes
+    for offset in range(0, items, 1000):
+        batch = [
+            ClipboardItem(
+                type=ClipboardType.TEXT,
+                content=f"{index} {filler}",
+                size=content_bytes,
+                created_at=start + timedelta(seconds=index),
+                device_id=f"{user_id}-d0",
+                user_id=user_id
+            )
+            for index in range(offset, min(offset + 1000, items))
+        ]
+        redis_manager.save_clipboard_items(user_id, batch)
+
+
+def login(base_url: str, username: str):
+    """注册并登录，返回 (认证请求头, 用户ID)"""
+    httpx.post(f"{base_url}/register", json={"username": username, "password": "bench-password"})
+    result = httpx.post(f"{base_url}/login", json={
+        "username": username, "password": "bench-password", "lean": True,
+        "device_info": {"device_id": "bench-device"}
+    }).json()
+    return {"Authorization": f"Bearer {result['token']}"}, result['user_id']
+
+
+def report(label: str, elapsed: float, items: int, transferred: int, idle: int, sampler: ResourceSampler):
+    print(f"  {label:<16} {elapsed:7.2f}s  {items / elapsed:9.0f} 条/s  传输 {transferred / 1024 / 1024:8.1f}MB  "
+          f"RSS 空闲 {idle / 1024 / 1024:6.1f}MB  峰值增量 {(sampler.rss_peak - idle) / 1024 / 1024:6.1f}MB")
+
+
+def export_to_file(client: httpx.Client, encoding: str, path: str, pid: int):
+    idle = psutil.Process(pid).memory_info().rss
+    with ResourceSampler(pid, interval=0.01) as sampler, open(path, "wb") as f:
+        start = time.perf_counter()
+        with client.stream("GET", "/clipboard/export", headers={"Accept-Encoding": encoding}) as response:
+            for chunk in response.iter_raw(256 * 1024):
+                f.write(chunk)
+            transferred = response.num_bytes_downloaded
+        elapsed = time.perf_counter() - start
+    return elapsed, transferred, idle, sampler
+
+
+def file_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(256 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史导出/导入基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--port", type=int, default=18003, help="基准服务器监听端口")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--content-bytes", type=int, default=512)
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+    redis_manager.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+    redis_manager.history_cache.enabled = False
+    config_manager.set('clipboard.max_history', args.items)
+
+    print(f"{args.items} 条 x {args.content_bytes}B, 注入RTT {args.rtt_ms}ms")
+    with tempfile.TemporaryDirectory() as work_path:
+        data_path = os.path.join(work_path, "server")
+        context = multiprocessing.get_context("spawn")
+        server = context.Process(target=serve_unbounded, args=(args.port, host, port, data_path, args.items),
+                                 daemon=True)
+        server.start()
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            for _ in range(200):
+                try:
+                    if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("服务器启动超时")
+
+            source_headers, source_user = login(base_url, f"bench-{uuid.uuid4().hex[:8]}")
+            start = time.perf_counter()
+            populate(source_user, args.items, args.content_bytes)
+            print(f"  写入历史 {time.perf_counter() - start:7.2f}s")
+
+            export_path = os.path.join(work_path, "export.ndjson")
+            with httpx.Client(base_url=base_url, headers=source_headers, timeout=600) as client:
+                for encoding in ("identity", "gzip"):
+                    elapsed, transferred, idle, sampler = export_to_file(client, encoding, export_path, server.pid)
+                    report(f"导出 {encoding}", elapsed, args.items, transferred, idle, sampler)
+                # 最后一次为gzip，解压后作为导入文件
+                with gzip.open(export_path, "rb") as src, open(export_path + ".plain", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+
+            for encoding, path in (("identity", export_path + ".plain"), ("gzip", export_path)):
+                # 每种编码导入一个新用户（同一用户重复导入会全部按已存在跳过）
+                target_headers, _ = login(base_url, f"bench-{uuid.uuid4().hex[:8]}")
+                with httpx.Client(base_url=base_url, headers=target_headers, timeout=600) as client:
+                    idle = psutil.Process(server.pid).memory_info().rss
+                    with ResourceSampler(server.pid, interval=0.01) as sampler:
+                        start = time.perf_counter()
+                        response = client.post(
+                            "/clipboard/import", params={"device_id": "bench-device"}, content=file_chunks(path),
+                            headers={"Content-Type": "application/x-ndjson", "Content-Encoding": encoding}
+                        )
+                        elapsed = time.perf_counter() - start
+                    result = response.json()
+                    report(f"导入 {encoding}", elapsed, args.items, os.path.getsize(path), idle, sampler)
+                    print(f"  {'':<16} 导入 {result.get('imported')} 条, 跳过 {result.get('skipped')} 条, "
+                          f"失败 {result.get('failed')} 条")
+                    client.post("/clipboard/clear", json={})
+            httpx.post(f"{base_url}/clipboard/clear", headers=source_headers, json={})
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+登录路径延迟基准
+在本地Redis前放置一个注入固定往返延迟的TCP代理，对比逐条命令的旧登录路径
+与脚本化登录路径（凭据查询：用户名索引缓存命中时1次往返 + 设备写入1次往返）的Redis耗时
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_login_latency [--rtt-ms 2] [--logins 200]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import redis
+from loguru import logger
+
+from shared.models import AuthRequest
+from server.redis_manager import redis_manager
+from server.auth import auth_manager
+from tests.benchmarks.harness import DelayProxy
+
+
+def legacy_login_commands(client, username: str, device_id: str):
+    """旧登录路径的Redis命令序列（每条命令一次往返）"""
+    user_id = client.get(f"username:{username}")
+    client.hgetall(f"user:{user_id}")
+    device_key = f"device:{device_id}"
+    client.hgetall(device_key)
+    now = datetime.now().isoformat()
+    client.hset(device_key, mapping={
+        'id': device_id, 'name': 'bench', 'user_id': user_id, 'os_info': 'bench',
+        'ip_address': '127.0.0.1', 'is_online': 'True', 'last_seen': now
+    })
+    client.sadd(f"devices:{user_id}", device_id)
+    client.hset(device_key, mapping={'last_seen': now, 'is_online': 'true', 'user_id': user_id})
+    client.expire(device_key, 60)
+    client.sadd(f"online_devices:{user_id}", device_id)
+    client.expire(f"online_devices:{user_id}", 60)
+
+
+def scripted_login_commands(username: str, device_id: str):
+    """脚本化登录路径的Redis调用"""
+    credentials = redis_manager.lookup_user_credentials(username)
+    redis_manager.upsert_device_login(credentials['id'], device_id, 'bench', 'bench', '127.0.0.1')
+
+
+def measure(fn, count: int):
+    """执行count次，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<12} p50={statistics.median(samples):7.2f}ms  p95={p95:7.2f}ms  mean={statistics.mean(samples):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录路径延迟基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="注入的往返延迟（毫秒）")
+    parser.add_argument("--logins", type=int, default=200, help="每种路径的登录次数")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    proxy = DelayProxy(args.redis_host, args.redis_port, args.rtt_ms).start()
+    client = redis.Redis(host="127.0.0.1", port=proxy.port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    password = "bench-password"
+    user = auth_manager.register_user(username, password)
+    device_id = f"bench-device-{uuid.uuid4().hex[:8]}"
+
+    try:
+        print(f"注入RTT: {args.rtt_ms}ms, 每种路径 {args.logins} 次")
+        report("legacy", measure(lambda: legacy_login_commands(client, username, device_id), args.logins))
+        report("scripted", measure(lambda: scripted_login_commands(username, device_id), args.logins))
+
+        # 完整登录（包含PBKDF2），用于对比Redis耗时在登录总耗时中的占比
+        request = AuthRequest(username=username, password=password, device_info={"device_id": device_id})
+        report("full login", measure(lambda: auth_manager.authenticate_user(request), max(1, args.logins // 10)))
+    finally:
+        client.delete(f"username:{username}", f"user:{user.id}", f"device:{device_id}",
+                      f"devices:{user.id}", f"online_devices:{user.id}", f"sync_version:{user.id}")
+
+
+if __name__ == "__main__":
+    main()
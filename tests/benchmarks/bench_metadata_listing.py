@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+元数据/内容分离存储基准
+为一个用户写入 N 条大内容（默认100条 x 1MB），对比读取一页历史的耗时和Redis返回的字节数：
+    legacy    旧布局：内容在条目哈希中，HGETALL 读取全部字段
+    metadata  新布局只读取元数据（含预览），列表的默认读取方式
+    content   新布局同时读取内容（按需读取正文时的开销）
+字节数取Redis服务器的 total_net_output_bytes 增量；读取时关闭进程内历史缓存。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_metadata_listing [--items 100] [--content-kb 1024] [--rounds 20] [--rtt-ms 0]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import redis
+from loguru import logger
+
+from server.records import build_clipboard_record
+from server.redis_manager import redis_manager
+from shared.models import ClipboardItem, ClipboardType
+from tests.benchmarks.harness import DelayProxy
+
+
+def make_items(user_id: str, items: int, content_bytes: int):
+    start = datetime.now() - timedelta(seconds=items)
+    return [
+        ClipboardItem(
+            type=ClipboardType.TEXT,
+            content=f"{index} " + "x" * content_bytes,
+            size=content_bytes,
+            created_at=start + timedelta(seconds=index),
+            device_id=f"{user_id}-d0",
+            user_id=user_id
+        )
+        for index in range(items)
+    ]
+
+
+def populate_legacy(client, user_id: str, items):
+    """按旧布局写入：内容和元数据在同一个哈希中"""
+    for item in items:
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(f"item:{item.id}", mapping=build_clipboard_record(item))
+        pipe.zadd(f"clipboard:{user_id}", {item.id: item.created_at.timestamp()})
+        pipe.expire(f"item:{item.id}", 3600)
+        pipe.execute()
+
+
+def net_output(client) -> int:
+    return client.info('stats')['total_net_output_bytes']
+
+
+def measure(label: str, client, rounds: int, fn):
+    samples = []
+    before = net_output(client)
+    for _ in range(rounds):
+        start = time.perf_counter()
+        items = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    transferred = (net_output(client) - before) / rounds
+    samples.sort()
+    print(f"  {label:<10} p50 {statistics.median(samples):8.2f}ms  "
+          f"p99 {samples[min(int(len(samples) * 0.99), len(samples) - 1)]:8.2f}ms  "
+          f"Redis返回 {transferred / 1024:10.1f}KB/次  ({len(items)} 条)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="元数据/内容分离存储基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--content-kb", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+    client = redis.Redis(host=host, port=port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+    redis_manager.history_cache.enabled = False
+
+    print(f"{args.items} 条 x {args.content_kb}KB, 读取 {args.rounds} 轮, 注入RTT {args.rtt_ms}ms")
+    legacy_user = f"bench-{uuid.uuid4().hex[:12]}"
+    split_user = f"bench-{uuid.uuid4().hex[:12]}"
+    content_bytes = args.content_kb * 1024
+    try:
+        populate_legacy(client, legacy_user, make_items(legacy_user, args.items, content_bytes))
+        split_items = make_items(split_user, args.items, content_bytes)
+        for offset in range(0, args.items, 20):
+            redis_manager.save_clipboard_items(split_user, split_items[offset:offset + 20])
+
+        measure("legacy", client, args.rounds,
+                lambda: redis_manager.get_user_clipboard_history(legacy_user, 1, args.items).items)
+        measure("metadata", client, args.rounds,
+                lambda: redis_manager.get_user_clipboard_history(split_user, 1, args.items).items)
+        measure("content", client, args.rounds,
+                lambda: redis_manager.get_user_clipboard_history(split_user, 1, args.items, with_content=True).items)
+    finally:
+        for user_id in (legacy_user, split_user):
+            redis_manager.clear_user_clipboard_history(user_id)
+            client.delete(f"sync_version:{user_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+设备在线状态基准
+模拟大量已连接设备发送心跳，对比：
+  - 旧方案：每次心跳一个pipeline（HSET + EXPIRE + SADD + EXPIRE），查询时每个设备一次SISMEMBER
+  - 新方案：心跳写入本地缓冲后一次pipeline批量ZADD，查询时每个用户一次ZRANGEBYSCORE
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_presence [--devices 100000] [--per-user 5]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import redis
+from loguru import logger
+
+from server.redis_manager import redis_manager
+
+
+def legacy_heartbeat(client, user_id: str, device_id: str):
+    """旧方案的一次心跳"""
+    pipe = client.pipeline(transaction=False)
+    device_key = f"device:{device_id}"
+    pipe.hset(device_key, mapping={'user_id': user_id, 'last_seen': datetime.now().isoformat(), 'is_online': 'true'})
+    pipe.expire(device_key, 60)
+    pipe.sadd(f"online_devices:{user_id}", device_id)
+    pipe.expire(f"online_devices:{user_id}", 60)
+    pipe.execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备在线状态基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--devices", type=int, default=100000, help="已连接设备总数")
+    parser.add_argument("--per-user", type=int, default=5, help="每个用户的设备数")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    client = redis.Redis(host=args.redis_host, port=args.redis_port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+
+    prefix = f"bench-{uuid.uuid4().hex[:6]}"
+    users = {}
+    for i in range(args.devices):
+        users.setdefault(f"{prefix}-u{i // args.per_user}", []).append(f"{prefix}-d{i}")
+    print(f"{args.devices} 台设备, {len(users)} 个用户, 每轮每台设备一次心跳")
+
+    try:
+        # 旧方案：每次心跳一次往返
+        start = time.perf_counter()
+        for user_id, devices in users.items():
+            for device_id in devices:
+                legacy_heartbeat(client, user_id, device_id)
+        elapsed = time.perf_counter() - start
+        print(f"legacy    写入: {elapsed:7.2f}s  {args.devices / elapsed:10.0f} 心跳/s  "
+              f"往返 {args.devices}  命令 {args.devices * 4}")
+
+        start = time.perf_counter()
+        online = 0
+        for user_id, devices in users.items():
+            for device_id in devices:
+                online += client.sismember(f"online_devices:{user_id}", device_id)
+        elapsed = time.perf_counter() - start
+        print(f"legacy    查询: {elapsed:7.2f}s  在线 {online}  往返 {args.devices}")
+
+        # 新方案：心跳只写本地缓冲，一次pipeline批量写入
+        start = time.perf_counter()
+        for user_id, devices in users.items():
+            for device_id in devices:
+                redis_manager.touch_device(user_id, device_id)
+        buffered = time.perf_counter() - start
+        flushed = redis_manager.flush_presence()
+        elapsed = time.perf_counter() - start
+        print(f"coalesced 写入: {elapsed:7.2f}s  {args.devices / elapsed:10.0f} 心跳/s  "
+              f"(缓冲 {buffered:.3f}s)  往返 1  命令 {len(users) * 2}  写入设备 {flushed}")
+
+        start = time.perf_counter()
+        online = 0
+        for user_id in users:
+            online += len(redis_manager.get_devices_presence(user_id))
+        elapsed = time.perf_counter() - start
+        print(f"coalesced 查询: {elapsed:7.2f}s  在线 {online}  往返 {len(users)}")
+    finally:
+        for pattern in (f"device:{prefix}-*", f"online_devices:{prefix}-*", f"presence:{prefix}-*"):
+            keys = list(client.scan_iter(match=pattern, count=1000))
+            for i in range(0, len(keys), 1000):
+                client.unlink(*keys[i:i + 1000])
+
+
+if __name__ == "__main__":
+    main()
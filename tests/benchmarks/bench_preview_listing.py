@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+历史列表预览模式基准
+在独立的服务器进程中为一个用户写入 N 条大内容，对比完整内容与 fields=preview 两种列表：
+响应体大小，以及客户端首屏就绪时间（发出请求 → 解析响应 → 生成所有行的显示文本，与
+page1_clipboard.py 的渲染数据准备一致），并给出预览模式下复制一条记录时按需读取完整内容的耗时。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_preview_listing [--items 100] [--content-kb 512] [--rounds 10] [--rtt-ms 0]
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from loguru import logger
+
+from tests.benchmarks.harness import DelayProxy, serve
+
+
+def render_rows(records):
+    """与客户端相同的行文本准备（预览模式下截断的记录追加省略号）"""
+    rows = []
+    for record in records:
+        text = record.get('content', record.get('preview')) or '无内容'
+        if record.get('truncated') and 'content' not in record:
+            text += '…'
+        rows.append((record.get('device_label', '未知设备'), record.get('created_at', ''), text))
+    return rows
+
+
+def measure(label: str, client: httpx.Client, rounds: int, path: str, params: dict):
+    samples = []
+    size = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.get(path, params=params)
+        records = response.json()['clipboards']
+        render_rows(records)
+        samples.append((time.perf_counter() - start) * 1000)
+        size = len(response.content)
+    samples.sort()
+    print(f"  {label:<26} 响应 {size / 1024:10.1f}KB  首屏 p50 {statistics.median(samples):8.2f}ms  "
+          f"p99 {samples[min(int(len(samples) * 0.99), len(samples) - 1)]:8.2f}ms  ({len(records)} 条)")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史列表预览模式基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--port", type=int, default=18001, help="基准服务器监听端口")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--content-kb", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+
+    print(f"{args.items} 条 x {args.content_kb}KB, 读取 {args.rounds} 轮, 注入RTT {args.rtt_ms}ms")
+    with tempfile.TemporaryDirectory() as blob_path:
+        context = multiprocessing.get_context("spawn")
+        server = context.Process(target=serve, args=(args.port, host, port, blob_path), daemon=True)
+        server.start()
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            for _ in range(200):
+                try:
+                    if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("服务器启动超时")
+
+            username = f"bench-{uuid.uuid4().hex[:8]}"
+            httpx.post(f"{base_url}/register", json={"username": username, "password": "bench-password"})
+            login = httpx.post(f"{base_url}/login", json={
+                "username": username, "password": "bench-password", "lean": True,
+                "device_info": {"device_id": "bench-device"}
+            }).json()
+            headers = {"Authorization": f"Bearer {login['token']}"}
+
+            with httpx.Client(base_url=base_url, headers=headers, timeout=120) as client:
+                body = "x" * (args.content_kb * 1024)
+                for index in range(args.items):
+                    client.post("/clipboard/add", json={"content": f"{index} {body}", "device_id": "bench-device"})
+
+                compat = {"username": username}
+                measure("/get_clipboards", client, args.rounds, "/get_clipboards", compat)
+                measure("/get_clipboards preview", client, args.rounds, "/get_clipboards", {**compat, "fields": "preview"})
+                measure("/clipboard/list", client, args.rounds, "/clipboard/list", {"limit": args.items})
+                records = measure("/clipboard/list preview", client, args.rounds, "/clipboard/list",
+                                  {"limit": args.items, "fields": "preview"})
+
+                samples = []
+                for record in records[:args.rounds]:
+                    start = time.perf_counter()
+                    client.get(f"/clipboard/{record['id']}/content").json()
+                    samples.append((time.perf_counter() - start) * 1000)
+                print(f"  按需读取单条完整内容        p50 {statistics.median(samples):8.2f}ms")
+
+                client.post("/clipboard/clear", json={})
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
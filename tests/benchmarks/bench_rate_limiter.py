@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+速率限制中间件开销基准
+对比旧的按IP时间戳列表实现与滑动窗口限流器（Redis Lua + 本地预检查）的单请求开销
+
+用法（在项目根目录，需要可访问 config/settings.yaml 中配置的 Redis）:
+    python -m tests.benchmarks.bench_rate_limiter [--requests 50000] [--ips 10000]
+"""
+
+import argparse
+import sys
+import time
+
+from loguru import logger
+
+from server.redis_manager import redis_manager
+from server.security.rate_limiter import RateLimiter
+
+
+class LegacyRateLimiter:
+    """旧实现：每个IP一个时间戳列表，每次请求重建列表"""
+
+    def __init__(self, max_requests_per_minute: int = 60):
+        self.rate_limit_cache = {}
+        self.max_requests_per_minute = max_requests_per_minute
+
+    def check_rate_limit(self, client_ip: str) -> bool:
+        current_time = time.time()
+        minute_ago = current_time - 60
+        if client_ip in self.rate_limit_cache:
+            self.rate_limit_cache[client_ip] = [
+                t for t in self.rate_limit_cache[client_ip] if t > minute_ago
+            ]
+        else:
+            self.rate_limit_cache[client_ip] = []
+        if len(self.rate_limit_cache[client_ip]) >= self.max_requests_per_minute:
+            return False
+        self.rate_limit_cache[client_ip].append(current_time)
+        return True
+
+
+def measure(fn, total: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(total):
+        fn(i)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="速率限制中间件开销基准")
+    parser.add_argument("--requests", type=int, default=50000, help="每个场景的请求数")
+    parser.add_argument("--ips", type=int, default=10000, help="不同客户端IP数量（模拟NAT/扫描）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.ips)]
+
+    legacy = LegacyRateLimiter()
+    legacy_scan = measure(lambda i: legacy.check_rate_limit(ips[i % len(ips)]), args.requests)
+    legacy_hot = LegacyRateLimiter(max_requests_per_minute=10 ** 9)
+    legacy_single = measure(lambda i: legacy_hot.check_rate_limit("10.0.0.1"), args.requests)
+
+    limiter = RateLimiter()
+    limiter.enabled = True
+    redis_ok = redis_manager.is_connected()
+    if redis_ok:
+        redis_manager.redis_client.delete(*redis_manager.redis_client.keys(f"{limiter.key_prefix}:*") or ["_"])
+    new_scan = measure(lambda i: limiter.check("/get_clipboards", ips[i % len(ips)]), args.requests)
+
+    # 单个IP超限后，本地预检查直接拒绝
+    for _ in range(limiter.default_policy.limit):
+        limiter.check("/get_clipboards", "10.255.255.255")
+    new_rejected = measure(lambda i: limiter.check("/get_clipboards", "10.255.255.255"), args.requests)
+
+    print("—— 速率限制中间件开销 ——")
+    print(f"请求数/场景       : {args.requests}")
+    print(f"不同IP数          : {args.ips}")
+    print(f"Redis             : {'已连接' if redis_ok else '未连接（仅本地计数）'}")
+    print(f"旧实现 多IP       : {legacy_scan:.2f} µs/req, 字典键数 {len(legacy.rate_limit_cache)}")
+    print(f"旧实现 单IP热点   : {legacy_single:.2f} µs/req, 列表长度 {len(legacy_hot.rate_limit_cache['10.0.0.1'])}")
+    print(f"新实现 多IP       : {new_scan:.2f} µs/req, 本地键数 {limiter.get_stats()['local_keys']}")
+    print(f"新实现 超限拒绝   : {new_rejected:.2f} µs/req（本地预检查，无Redis往返）")
+
+
+if __name__ == "__main__":
+    main()
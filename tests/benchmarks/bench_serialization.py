@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+JSON序列化基准
+以100条历史记录的 /clipboard/list 响应为负载，对比各可用后端的编码/解码耗时，
+以及旧写法（逐条 isoformat 后用标准库编码）与直接编码datetime的差别
+
+不需要Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_serialization [--items 100] [--size 200] [--rounds 2000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+from shared import serialization
+from shared.models import ClipboardItem, ClipboardType
+
+
+def build_items(count: int, size: int):
+    now = datetime.now()
+    return [
+        ClipboardItem(
+            type=ClipboardType.TEXT,
+            content=f"历史条目 {i} " + "x" * size,
+            metadata={"original_content_type": "text/plain", "source": "bench"},
+            size=size,
+            created_at=now - timedelta(seconds=i),
+            updated_at=now - timedelta(seconds=i),
+            device_id="bench-device",
+            user_id="bench-user",
+            checksum=f"{i:064x}"
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_payload(items):
+    """旧写法：处理器内逐条把datetime转成字符串"""
+    return {
+        "success": True,
+        "clipboards": [
+            {
+                "id": item.id,
+                "content": item.content,
+                "content_type": item.metadata.get('original_content_type', 'text/plain'),
+                "timestamp": item.created_at.isoformat(),
+                "device_id": item.device_id,
+                "size": item.size,
+                "checksum": item.checksum,
+                "encrypted": False
+            }
+            for item in items
+        ],
+        "total": len(items)
+    }
+
+
+def native_payload(items):
+    """新写法：datetime交给序列化层编码"""
+    return {
+        "success": True,
+        "clipboards": [
+            {
+                "id": item.id,
+                "content": item.content,
+                "content_type": item.metadata.get('original_content_type', 'text/plain'),
+                "timestamp": item.created_at,
+                "device_id": item.device_id,
+                "size": item.size,
+                "checksum": item.checksum,
+                "encrypted": False
+            }
+            for item in items
+        ],
+        "total": len(items)
+    }
+
+
+def legacy_encode(items):
+    # 与 starlette JSONResponse.render 相同
+    return json.dumps(legacy_payload(items), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, rounds: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON序列化基准")
+    parser.add_argument("--items", type=int, default=100, help="历史条目数")
+    parser.add_argument("--size", type=int, default=200, help="每条内容长度")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    items = build_items(args.items, args.size)
+    baseline = legacy_encode(items)
+    print(f"{args.items} 条历史, 负载 {len(baseline) / 1024:.1f} KiB, {args.rounds} 轮")
+    print(f"{'legacy/json':<14} 构造+编码 {timed(lambda: legacy_encode(items), args.rounds):8.1f}us  "
+          f"解码 {timed(lambda: json.loads(baseline), args.rounds):8.1f}us")
+
+    for name in serialization.available_backends():
+        serialization.use_backend(name)
+        payload = serialization.dumps(native_payload(items))
+        assert serialization.loads(payload) == json.loads(baseline)
+        encode = timed(lambda: serialization.dumps(native_payload(items)), args.rounds)
+        decode = timed(lambda: serialization.loads(payload), args.rounds)
+        print(f"{name:<14} 构造+编码 {encode:8.1f}us  解码 {decode:8.1f}us  ({len(payload) / 1024:.1f} KiB)")
+
+    serialization.use_backend()
+
+
+if __name__ == "__main__":
+    main()
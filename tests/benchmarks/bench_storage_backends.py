@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+存储后端吞吐量对比
+在内存、SQLite（WAL）和Redis后端上执行相同的操作序列：逐条写入剪贴板、批量写入、
+读取历史首页、心跳写入和设备列表读取，输出每种操作的吞吐量（次/秒）。
+内存后端的结果即数据层之外的开销下限（模型转换、序列化）。
+
+Redis后端需要本地运行的Redis，连接不上时跳过，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_storage_backends [--users 20] [--items 200] [--batch-size 50] [--rtt-ms 0]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import redis
+from loguru import logger
+
+from server.storage import BACKENDS, create_storage
+from shared.models import ClipboardItem, ClipboardType
+from tests.benchmarks.harness import DelayProxy
+
+
+def make_items(user_id: str, count: int):
+    start = datetime.now() - timedelta(seconds=count)
+    return [
+        ClipboardItem(
+            type=ClipboardType.TEXT,
+            content=f"基准内容 {index} " + "x" * 200,
+            size=220,
+            created_at=start + timedelta(seconds=index),
+            device_id=f"{user_id}-d0",
+            user_id=user_id
+        )
+        for index in range(count)
+    ]
+
+
+def timed(label: str, operations: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<14} {operations / elapsed:10.0f} 次/s  ({elapsed * 1000:8.1f}ms, {operations} 次)")
+
+
+def run(storage, args):
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    for user_id in users:
+        storage.create_user(user_id, f"bench-{user_id[:8]}", {'id': user_id, 'username': f"bench-{user_id[:8]}"})
+        for device in range(3):
+            storage.save_device(user_id, f"{user_id}-d{device}", {'name': f"device {device}"})
+    single = {user_id: make_items(user_id, args.items) for user_id in users}
+    batched = {user_id: make_items(user_id, args.items) for user_id in users}
+    total = args.users * args.items
+
+    try:
+        timed("save (单条)", total, lambda: [
+            storage.save_clipboard_items(user_id, [item]) for user_id in users for item in single[user_id]
+        ])
+        timed(f"save (批量{args.batch_size})", total, lambda: [
+            storage.save_clipboard_items(user_id, batched[user_id][offset:offset + args.batch_size])
+            for user_id in users for offset in range(0, args.items, args.batch_size)
+        ])
+        reads = args.users * args.rounds
+        timed("history p1", reads, lambda: [
+            storage.get_clipboard_history(user_id, 1, 50) for _ in range(args.rounds) for user_id in users
+        ])
+        timed("touch x3", reads, lambda: [
+            storage.touch_devices(user_id, [f"{user_id}-d{device}" for device in range(3)])
+            for _ in range(args.rounds) for user_id in users
+        ])
+        timed("presence", reads, lambda: [
+            storage.get_presence(user_id) for _ in range(args.rounds) for user_id in users
+        ])
+        timed("devices", reads, lambda: [
+            storage.list_devices(user_id) for _ in range(args.rounds) for user_id in users
+        ])
+    finally:
+        for user_id in users:
+            storage.delete_user(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存储后端吞吐量对比")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=200, help="每个用户写入的剪贴板条数")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20, help="每个用户的读取轮数")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    print(f"{args.users} 用户 x {args.items} 条, 批量 {args.batch_size}, 读取 {args.rounds} 轮")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in args.backends.split(","):
+            if name == "redis":
+                from server.redis_manager import redis_manager
+                host, port = args.redis_host, args.redis_port
+                if args.rtt_ms:
+                    proxy = DelayProxy(host, port, args.rtt_ms).start()
+                    host, port = "127.0.0.1", proxy.port
+                redis_manager.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+                try:
+                    redis_manager.redis_client.ping()
+                except redis.RedisError as e:
+                    print(f"redis: 跳过（{e}）")
+                    continue
+                storage = create_storage("redis")
+                print(f"redis (注入RTT {args.rtt_ms}ms):")
+            elif name == "sqlite":
+                storage = create_storage("sqlite", path=os.path.join(tmpdir, "bench.db"))
+                print("sqlite (WAL):")
+            else:
+                storage = create_storage(name)
+                print(f"{name}:")
+            run(storage, args)
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
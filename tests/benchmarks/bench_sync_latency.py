@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+端到端同步传播延迟基准
+启动临时Redis（未指定 --redis-port 时）和服务器进程，N 个用户各 M 台设备以asyncio WebSocket客户端连接，
+每个用户按固定速率轮流从一台设备发布剪贴板（WebSocket clipboard_sync 或 HTTP /clipboard/add），
+测量从发布到同一用户其他每台设备收到 clipboard_update 的传播延迟百分位、所有设备都收到的完成延迟、
+发布确认延迟、投递吞吐量，以及服务器进程的CPU和RSS。重复投递和丢失单独计数。
+结果写入JSON（默认 bench-results/sync_latency-<时间>.json），--baseline 与之前的结果文件对比。
+
+需要 redis-server（或用 --redis-port 指定已运行的Redis），用法（在项目根目录）:
+    python -m tests.benchmarks.bench_sync_latency [--users 50] [--devices 3] [--rate 2] [--duration 20] [--via ws]
+"""
+
+import argparse
+import asyncio
+import collections
+import random
+import sys
+import time
+import uuid
+from contextlib import ExitStack
+
+import httpx
+from loguru import logger
+from websockets.asyncio.client import connect
+
+from shared.ws_protocol import JSONCodec, MsgpackCodec
+from tests.benchmarks.harness import (
+    DelayProxy, LocalRedis, ResourceSampler, ServerProcess, compare_results, percentiles, write_results
+)
+
+
+MARKER = "bench-sync:"
+
+
+class LatencyRecorder:
+    """记录每条发布的时间和各设备的到达时间"""
+
+    def __init__(self):
+        self.sent = {}  # seq -> (发布时间, 应收到的设备数)
+        self.arrivals = collections.Counter()  # seq -> 已收到的设备数
+        self.seen = set()  # (seq, 设备)
+        self.propagation = []
+        self.completion = []
+        self.acks = []
+        self.duplicates = 0
+        self.errors = 0
+        self.first_publish = None
+        self.last_delivery = None
+
+    def published(self, seq: int, expected: int, at: float):
+        self.sent[seq] = (at, expected)
+        if self.first_publish is None:
+            self.first_publish = at
+
+    def delivered(self, content, device: str, at: float):
+        if not isinstance(content, str) or not content.startswith(MARKER):
+            return
+        seq = int(content[len(MARKER):content.index(":", len(MARKER))])
+        if seq not in self.sent:
+            return
+        if (seq, device) in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add((seq, device))
+        sent_at, expected = self.sent[seq]
+        self.propagation.append((at - sent_at) * 1000)
+        self.arrivals[seq] += 1
+        if self.arrivals[seq] == expected:
+            self.completion.append((at - sent_at) * 1000)
+        self.last_delivery = at
+
+    def metrics(self) -> dict:
+        expected = sum(count for _, count in self.sent.values())
+        delivered = len(self.seen)
+        window = (self.last_delivery - self.first_publish) if self.last_delivery and self.first_publish else 0
+        return {
+            "published": len(self.sent),
+            "acked": len(self.acks),
+            "expected_deliveries": expected,
+            "delivered": delivered,
+            "lost": expected - delivered,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "delivery_rate": round(delivered / window, 1) if window else 0.0,
+            "propagation_ms": percentiles(self.propagation),
+            "completion_ms": percentiles(self.completion),
+            "ack_ms": percentiles(self.acks)
+        }
+
+
+class BenchDevice:
+    """一台模拟设备：一条WebSocket连接，读取循环记录到达的同步消息"""
+
+    def __init__(self, user_id: str, device_id: str, token: str, codec, recorder: LatencyRecorder):
+        self.user_id = user_id
+        self.device_id = device_id
+        self.token = token
+        self.codec = codec
+        self.recorder = recorder
+        self.pending_acks = collections.deque()
+        self.ws = None
+        self.reader = None
+
+    async def connect(self, ws_url: str):
+        subprotocols = [self.codec.subprotocol] if self.codec.subprotocol else None
+        self.ws = await connect(f"{ws_url}/ws/{self.user_id}/{self.device_id}?token={self.token}",
+                                subprotocols=subprotocols, max_size=None, ping_interval=None)
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for frame in self.ws:
+                now = time.perf_counter()
+                try:
+                    message = self.codec.decode(frame)
+                except ValueError:
+                    self.recorder.errors += 1
+                    continue
+                kind = message.get("type")
+                if kind == "clipboard_update":
+                    data = message.get("data") or {}
+                    entries = (data.get("items") or []) if message.get("action") == "add_batch" else [data]
+                    for entry in entries:
+                        self.recorder.delivered(entry.get("content"), self.device_id, now)
+                elif kind == "sync_success" and self.pending_acks:
+                    self.recorder.acks.append((now - self.pending_acks.popleft()) * 1000)
+                elif kind == "error":
+                    self.recorder.errors += 1
+                    if self.pending_acks:
+                        self.pending_acks.popleft()
+        except Exception:
+            pass
+
+    async def publish_ws(self, content: str):
+        self.pending_acks.append(time.perf_counter())
+        await self.ws.send(self.codec.encode({
+            "type": "clipboard_sync",
+            "data": {"content": content, "content_type": "text/plain"}
+        }))
+
+    async def publish_http(self, client: httpx.AsyncClient, content: str):
+        start = time.perf_counter()
+        try:
+            response = await client.post("/clipboard/add", headers={"Authorization": f"Bearer {self.token}"},
+                                         json={"content": content, "device_id": self.device_id})
+            if response.status_code == 200:
+                self.recorder.acks.append((time.perf_counter() - start) * 1000)
+            else:
+                self.recorder.errors += 1
+        except httpx.HTTPError:
+            self.recorder.errors += 1
+
+    async def close(self):
+        await self.ws.close()
+        await self.reader
+
+
+async def login_devices(client: httpx.AsyncClient, users: int, devices: int, concurrency: int):
+    """并发注册 N 个用户并为每个用户登录 M 台设备，返回 [(用户ID, [(设备ID, token)])]"""
+    semaphore = asyncio.Semaphore(concurrency)
+    prefix = f"bench-{uuid.uuid4().hex[:6]}"
+
+    async def one_user(index: int):
+        username = f"{prefix}-{index}"
+        credentials = {"username": username, "password": "bench-password"}
+        async with semaphore:
+            await client.post("/register", json=credentials)
+        sessions = []
+        for device in range(devices):
+            device_id = f"{username}-d{device}"
+            async with semaphore:
+                result = (await client.post("/login", json={
+                    **credentials, "lean": True, "device_info": {"device_id": device_id}
+                })).json()
+            sessions.append((device_id, result["token"]))
+        return result["user_id"], sessions
+
+    return await asyncio.gather(*(one_user(index) for index in range(users)))
+
+
+async def publish_loop(devices, rate: float, duration: float, recorder: LatencyRecorder, sequence,
+                       via: str, client: httpx.AsyncClient, padding: str, offset: float):
+    """开环发布：按固定间隔轮流从各设备发布，不等待上一条确认"""
+    interval = 1 / rate
+    start = time.perf_counter() + offset
+    tasks = []
+    sent = 0
+    while sent * interval < duration:
+        delay = start + sent * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        device = devices[sent % len(devices)]
+        seq = next(sequence)
+        content = f"{MARKER}{seq}:{padding}"
+        recorder.published(seq, len(devices) - 1, time.perf_counter())
+        if via == "ws":
+            await device.publish_ws(content)
+        else:
+            tasks.append(asyncio.create_task(device.publish_http(client, content)))
+        sent += 1
+    await asyncio.gather(*tasks)
+
+
+async def run(args, server: ServerProcess) -> dict:
+    recorder = LatencyRecorder()
+    codec = MsgpackCodec() if args.protocol == "msgpack" else JSONCodec()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        accounts = await login_devices(client, args.users, args.devices, args.concurrency)
+        print(f"  登录 {args.users * args.devices} 台设备 {time.perf_counter() - start:6.2f}s")
+
+        users = [
+            [BenchDevice(user_id, device_id, token, codec, recorder) for device_id, token in sessions]
+            for user_id, sessions in accounts
+        ]
+        start = time.perf_counter()
+        for offset in range(0, len(users), args.concurrency):
+            await asyncio.gather(*(device.connect(server.ws_url)
+                                   for devices in users[offset:offset + args.concurrency] for device in devices))
+        print(f"  建立 {args.users * args.devices} 条WebSocket连接 {time.perf_counter() - start:6.2f}s")
+        await asyncio.sleep(args.settle)  # 等待服务器完成同步频道订阅
+
+        padding = "x" * args.content_bytes
+        sequence = iter(range(1, 1 << 62))
+        rng = random.Random(0)
+        with ResourceSampler(server.pid) as sampler:
+            await asyncio.gather(*(
+                publish_loop(devices, args.rate, args.duration, recorder, sequence, args.via, client, padding,
+                             rng.random() / args.rate)
+                for devices in users
+            ))
+            await asyncio.sleep(args.drain)
+
+        await asyncio.gather(*(device.close() for devices in users for device in devices))
+        for devices in users:
+            await client.post("/clipboard/clear", headers={"Authorization": f"Bearer {devices[0].token}"}, json={})
+
+    metrics = recorder.metrics()
+    metrics["server"] = sampler.summary()
+    return metrics
+
+
+def report(metrics: dict):
+    print(f"  发布 {metrics['published']} 条, 确认 {metrics['acked']}, 应投递 {metrics['expected_deliveries']}, "
+          f"投递 {metrics['delivered']}, 丢失 {metrics['lost']}, 重复 {metrics['duplicates']}, 错误 {metrics['errors']}")
+    print(f"  投递吞吐 {metrics['delivery_rate']:.1f} 条/s")
+    for label, key in (("传播延迟", "propagation_ms"), ("全部设备收到", "completion_ms"), ("发布确认", "ack_ms")):
+        stats = metrics[key]
+        if stats["count"]:
+            print(f"  {label:<8} p50 {stats['p50']:8.2f}ms  p90 {stats['p90']:8.2f}ms  p99 {stats['p99']:8.2f}ms  "
+                  f"p99.9 {stats['p999']:8.2f}ms  max {stats['max']:8.2f}ms")
+    server = metrics["server"]
+    print(f"  服务器 CPU 平均 {server['cpu_percent_avg']:.1f}% 峰值 {server['cpu_percent_peak']:.1f}%  "
+          f"RSS {server['rss_start_mb']:.1f}MB → 峰值 {server['rss_peak_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端同步传播延迟基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=None, help="已运行的Redis端口；不指定时启动临时redis-server")
+    parser.add_argument("--redis-binary", default="redis-server")
+    parser.add_argument("--port", type=int, default=None, help="基准服务器监听端口（默认取空闲端口）")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--devices", type=int, default=3, help="每个用户的设备数（至少2）")
+    parser.add_argument("--rate", type=float, default=2, help="每个用户每秒发布的条数")
+    parser.add_argument("--duration", type=float, default=20, help="发布阶段秒数")
+    parser.add_argument("--drain", type=float, default=3, help="发布结束后等待投递的秒数")
+    parser.add_argument("--settle", type=float, default=1, help="连接建立后开始发布前的等待秒数")
+    parser.add_argument("--content-bytes", type=int, default=256)
+    parser.add_argument("--via", choices=("ws", "http"), default="ws", help="发布方式")
+    parser.add_argument("--protocol", choices=("json", "msgpack"), default="json", help="WebSocket消息编码")
+    parser.add_argument("--concurrency", type=int, default=64, help="登录和建立连接的并发数")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    parser.add_argument("--baseline", default=None, help="用于对比的之前的结果JSON")
+    args = parser.parse_args()
+    if args.devices < 2:
+        parser.error("--devices 至少为2（发布设备之外需要接收设备）")
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    print(f"{args.users} 用户 x {args.devices} 设备, 每用户 {args.rate} 条/s, {args.duration}s, "
+          f"发布方式 {args.via}, 编码 {args.protocol}, 内容 {args.content_bytes}B, 注入RTT {args.rtt_ms}ms")
+    with ExitStack() as stack:
+        host, port = args.redis_host, args.redis_port
+        if port is None:
+            host, port = "127.0.0.1", stack.enter_context(LocalRedis(args.redis_binary)).port
+        if args.rtt_ms:
+            proxy = DelayProxy(host, port, args.rtt_ms).start()
+            host, port = "127.0.0.1", proxy.port
+        server = stack.enter_context(ServerProcess(host, port, port=args.port))
+        metrics = asyncio.run(run(args, server))
+
+    report(metrics)
+    path = write_results("sync_latency", vars(args), metrics, args.output)
+    print(f"结果已写入 {path}")
+    if args.baseline:
+        compare_results(args.baseline, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+分层历史基准
+为 N 个用户各写入 M 条剪贴板历史，对比迁移到磁盘归档前后每个用户占用的Redis内存，
+以及从热数据（Redis）和冷数据（归档）读取历史页、游标遍历完整历史的延迟。
+读取时关闭进程内历史缓存，测量的是两层存储本身。
+
+需要本地运行的Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_tiered_history [--users 20] [--items 1000] [--hot-items 100] [--rtt-ms 0]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import redis
+from loguru import logger
+
+from server.redis_manager import redis_manager
+from shared.models import ClipboardItem, ClipboardType
+from tests.benchmarks.harness import DelayProxy
+
+
+def populate(users, items: int, content_bytes: int):
+    """写入测试历史，每条间隔1秒且都在 archive.hot_seconds 之内（迁移量由 --hot-items 决定）"""
+    start = datetime.now() - timedelta(seconds=items)
+    for user_id in users:
+        batch = [
+            ClipboardItem(
+                type=ClipboardType.TEXT,
+                content=f"{index} " + "x" * content_bytes,
+                size=content_bytes,
+                created_at=start + timedelta(seconds=index),
+                device_id=f"{user_id}-d0",
+                user_id=user_id
+            )
+            for index in range(items)
+        ]
+        for offset in range(0, items, 500):
+            redis_manager.save_clipboard_items(user_id, batch[offset:offset + 500])
+
+
+def used_memory(client) -> int:
+    return client.info('memory')['used_memory']
+
+
+def latency(label: str, users, rounds: int, fn):
+    samples = []
+    for _ in range(rounds):
+        for user_id in users:
+            start = time.perf_counter()
+            fn(user_id)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f"  {label:<22} p50 {statistics.median(samples):7.2f}ms  "
+          f"p99 {samples[min(int(len(samples) * 0.99), len(samples) - 1)]:7.2f}ms  ({len(samples)} 次)")
+
+
+def walk_cursor(user_id: str, limit: int) -> int:
+    """游标遍历用户的完整历史，返回条目数"""
+    count, cursor = 0, None
+    while True:
+        items, cursor = redis_manager.get_clipboard_page(user_id, cursor, limit)
+        count += len(items)
+        if cursor is None:
+            return count
+
+
+def measure_reads(users, args, deep_page: int):
+    latency("page 1", users, args.rounds, lambda user_id: redis_manager.get_user_clipboard_history(user_id, 1, args.per_page))
+    latency(f"page {deep_page}", users, args.rounds,
+            lambda user_id: redis_manager.get_user_clipboard_history(user_id, deep_page, args.per_page))
+    latency(f"游标遍历 ({args.per_page}/页)", users, 1, lambda user_id: walk_cursor(user_id, args.per_page))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分层历史基准")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=1000, help="每个用户的历史条数（不超过 clipboard.max_history）")
+    parser.add_argument("--hot-items", type=int, default=100, help="迁移后每个用户留在Redis中的条数")
+    parser.add_argument("--content-bytes", type=int, default=500)
+    parser.add_argument("--per-page", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5, help="每个用户的读取轮数")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="注入的Redis往返延迟（毫秒）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    host, port = args.redis_host, args.redis_port
+    if args.rtt_ms:
+        proxy = DelayProxy(host, port, args.rtt_ms).start()
+        host, port = "127.0.0.1", proxy.port
+    client = redis.Redis(host=host, port=port, decode_responses=True)
+    client.ping()
+    redis_manager.redis_client = client
+    redis_manager.history_cache.enabled = False
+
+    archive = redis_manager.archive
+    archive.enabled = True
+    archive.hot_max_items = args.hot_items
+    deep_page = args.items // args.per_page  # 迁移后位于归档中的页
+
+    print(f"{args.users} 用户 x {args.items} 条 ({args.content_bytes} 字节), Redis保留 {args.hot_items} 条, "
+          f"注入RTT {args.rtt_ms}ms")
+    users = [f"bench-{uuid.uuid4().hex[:12]}" for _ in range(args.users)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        archive.path = tmpdir
+        try:
+            baseline = used_memory(client)
+            populate(users, args.items, args.content_bytes)
+            before = used_memory(client)
+            print(f"迁移前 Redis内存/用户 {(before - baseline) / args.users / 1024:9.1f}KB")
+            measure_reads(users, args, deep_page)
+
+            start = time.perf_counter()
+            archived = sum(redis_manager.archive_user_history(user_id)["archived"] for user_id in users)
+            elapsed = time.perf_counter() - start
+            after = used_memory(client)
+            disk = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(tmpdir) for name in names)
+            print(f"迁移 {archived} 条 {elapsed * 1000:.0f}ms ({archived / elapsed:.0f} 条/s)")
+            print(f"迁移后 Redis内存/用户 {(after - baseline) / args.users / 1024:9.1f}KB, "
+                  f"归档磁盘/用户 {disk / args.users / 1024:.1f}KB")
+
+            archive._indexes.clear()
+            archive._blocks.clear()
+            latency(f"page {deep_page} (冷缓存)", users, 1,
+                    lambda user_id: redis_manager.get_user_clipboard_history(user_id, deep_page, args.per_page))
+            measure_reads(users, args, deep_page)
+        finally:
+            for user_id in users:
+                redis_manager.clear_user_clipboard_history(user_id)
+                client.delete(f"sync_version:{user_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+JWT 验证缓存微基准
+对比启用/禁用验证缓存时 SecurityMiddleware.authenticate_request 的每秒认证请求数
+
+用法（在项目根目录）:
+    python -m tests.benchmarks.bench_token_cache [--tokens 100] [--requests 200000]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from loguru import logger
+from starlette.requests import Request
+
+from server.security import security_middleware, token_manager
+
+
+def build_request(token: str) -> Request:
+    """构造携带Bearer token的最小请求对象"""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/auth/profile",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    return Request(scope)
+
+
+async def run_round(requests_list, total: int) -> float:
+    """执行一轮认证，返回每秒请求数"""
+    count = len(requests_list)
+    start = time.perf_counter()
+    for i in range(total):
+        payload = await security_middleware.authenticate_request(requests_list[i % count])
+        if payload is None:
+            raise RuntimeError("认证失败，基准无效")
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT验证缓存微基准")
+    parser.add_argument("--tokens", type=int, default=100, help="并发使用的不同token数量（模拟轮询客户端）")
+    parser.add_argument("--requests", type=int, default=200000, help="每轮认证请求数")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    tokens = [
+        token_manager.generate_tokens(f"user-{i}", f"user{i}", f"device-{i}")["access_token"]
+        for i in range(args.tokens)
+    ]
+    requests_list = [build_request(token) for token in tokens]
+    cache_size = token_manager.verify_cache_size or 10000
+
+    # 禁用缓存
+    token_manager.verify_cache_size = 0
+    token_manager._verify_cache.clear()
+    without_cache = asyncio.run(run_round(requests_list, args.requests))
+
+    # 启用缓存
+    token_manager.verify_cache_size = cache_size
+    with_cache = asyncio.run(run_round(requests_list, args.requests))
+
+    print("—— JWT 验证缓存基准 ——")
+    print(f"不同token数     : {args.tokens}")
+    print(f"每轮请求数      : {args.requests}")
+    print(f"无缓存          : {without_cache:,.0f} req/s")
+    print(f"有缓存          : {with_cache:,.0f} req/s")
+    print(f"加速比          : {with_cache / without_cache:.2f}x")
+    print(f"缓存统计        : {token_manager.get_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
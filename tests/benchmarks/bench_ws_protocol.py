@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+WebSocket消息编码基准
+以 clipboard_update 广播消息为负载，对比JSON文本帧与msgpack二进制帧的线上字节数
+和编码/解码CPU耗时；"json+deflate" 为JSON帧经permessage-deflate（原始deflate）后的估算字节数
+
+不需要Redis，用法（在项目根目录）:
+    python -m tests.benchmarks.bench_ws_protocol [--text-size 65536] [--image-size 262144] [--rounds 500]
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+
+from loguru import logger
+
+from shared.ws_protocol import JSONCodec, MsgpackCodec
+
+
+def clipboard_update(content: str, content_type: str) -> dict:
+    return {
+        "type": "clipboard_update",
+        "action": "add",
+        "data": {
+            "clip_id": "3f0c6a8e-7d1b-4c55-9a4e-2b8f1d6e0c9a",
+            "content": content,
+            "content_type": content_type,
+            "created_at": datetime.now(),
+            "device_id": "bench-device"
+        },
+        "source_device": "bench-device",
+        "timestamp": datetime.now().isoformat(),
+        "version": 42
+    }
+
+
+def deflate_size(frame) -> int:
+    data = frame.encode('utf-8') if isinstance(frame, str) else frame
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def frame_size(frame) -> int:
+    return len(frame.encode('utf-8')) if isinstance(frame, str) else len(frame)
+
+
+def timed(fn, rounds: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket消息编码基准")
+    parser.add_argument("--text-size", type=int, default=64 * 1024, help="文本剪切板字符数")
+    parser.add_argument("--image-size", type=int, default=256 * 1024, help="图片剪切板字节数")
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    words = ["剪切板", "同步", "clipboard", "sync", "BeeSyncClip", "设备", "message", "2024"]
+    rng = random.Random(0)
+    text = " ".join(rng.choice(words) + str(rng.randint(0, 9999)) for _ in range(args.text_size // 8))[:args.text_size]
+    # 随机字节模拟已压缩的PNG
+    image = base64.b64encode(os.urandom(args.image_size)).decode('ascii')
+
+    codecs = [("json", JSONCodec()), ("msgpack", MsgpackCodec(compress_threshold=0)),
+              ("msgpack+zlib", MsgpackCodec(compress_threshold=4096))]
+    for label, message in (("text", clipboard_update(text, "text/plain")),
+                           ("image", clipboard_update(image, "image/png"))):
+        print(f"{label}: 内容 {len(message['data']['content'].encode('utf-8')) / 1024:.1f} KiB")
+        for name, codec in codecs:
+            frame = codec.encode(message)
+            encode = timed(lambda: codec.encode(message), args.rounds)
+            decode = timed(lambda: codec.decode(frame), args.rounds)
+            print(f"  {name:<13} 帧 {frame_size(frame) / 1024:8.1f} KiB  "
+                  f"编码 {encode:8.1f}us  解码 {decode:8.1f}us")
+        json_frame = codecs[0][1].encode(message)
+        print(f"  {'json+deflate':<13} 帧 {deflate_size(json_frame) / 1024:8.1f} KiB  "
+              f"压缩 {timed(lambda: deflate_size(json_frame), args.rounds // 10 or 1):8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+端到端基准的公共组件
+临时Redis与服务器子进程的启动和回收、注入往返延迟的TCP代理、服务器进程CPU/RSS采样、延迟百分位统计，
+以及JSON结果的写入和与上一次结果的对比，供各基准复用。
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import psutil
+import redis
+from loguru import logger
+
+
+RESULTS_DIR = "bench-results"
+
+
+def free_port() -> int:
+    """取一个当前空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalRedis:
+    """以子进程启动的临时Redis（不持久化），退出时终止"""
+
+    def __init__(self, binary: str = "redis-server", port: Optional[int] = None):
+        self.binary = shutil.which(binary)
+        self.port = port or free_port()
+        self.process = None
+
+    def __enter__(self):
+        if not self.binary:
+            raise RuntimeError("未找到redis-server，请安装Redis或用 --redis-port 指定已运行的Redis")
+        self.process = subprocess.Popen(
+            [self.binary, "--port", str(self.port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        client = redis.Redis(host="127.0.0.1", port=self.port)
+        for _ in range(100):
+            try:
+                client.ping()
+                return self
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("Redis启动超时")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(5)
+
+
+class DelayProxy:
+    """在后台线程中运行的TCP代理，每个方向注入一半的往返延迟"""
+
+    def __init__(self, target_host: str, target_port: int, rtt_ms: float):
+        self.target_host = target_host
+        self.target_port = target_port
+        self.one_way = rtt_ms / 2000.0
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+    async def _pipe(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if self.one_way:
+                    await asyncio.sleep(self.one_way)
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, client_reader, client_writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        await asyncio.gather(
+            self._pipe(client_reader, upstream_writer),
+            self._pipe(upstream_reader, client_writer)
+        )
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def start(self):
+        thread = threading.Thread(target=self._loop.run_until_complete, args=(self._serve(),), daemon=True)
+        thread.start()
+        self._ready.wait()
+        return self
+
+
+def serve(port: int, redis_host: str, redis_port: int, data_path: str):
+    """
+    子进程：连接指定的Redis，关闭限流后运行服务器
+
+    上传内容和冷数据归档写入 data_path 下的临时目录，不触及工作目录中的 data/；
+    WebSocket帧大小限制与 start_server.sh 的启动参数一致
+    """
+    import uvicorn
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    from server.api.ingest import max_websocket_message_bytes
+    from server.blobs import blob_store
+    from server.modular_server import app
+    from server.redis_manager import redis_manager
+    from server.security import security_middleware
+    from shared.utils import config_manager
+
+    # 数据连接和发布订阅连接都指向基准使用的Redis（WebSocket同步依赖发布订阅）
+    config_manager.set('redis.host', redis_host)
+    config_manager.set('redis.port', redis_port)
+    redis_manager.connect()
+
+    security_middleware.rate_limiter.enabled = False  # 基准测量的是请求路径本身
+    blob_store.path = os.path.join(data_path, "blobs")
+    redis_manager.archive.path = os.path.join(data_path, "archive")
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning",
+                ws_max_size=max_websocket_message_bytes())
+
+
+class ServerProcess:
+    """在spawn子进程中运行的服务器（target 默认为关闭限流的 serve）"""
+
+    def __init__(self, redis_host: str, redis_port: int, port: Optional[int] = None, target=serve,
+                 args: tuple = ()):
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        self.port = port or free_port()
+        self.target = target
+        self.args = args
+        self.process = None
+        self._data_dir = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}"
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def __enter__(self):
+        self._data_dir = tempfile.TemporaryDirectory()
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=self.target,
+            args=(self.port, self.redis_host, self.redis_port, self._data_dir.name, *self.args),
+            daemon=True
+        )
+        self.process.start()
+        for _ in range(300):
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("服务器启动超时")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+        self._data_dir.cleanup()
+
+
+class ResourceSampler:
+    """后台线程定期采样进程的CPU和RSS，统计平均/峰值CPU占用和峰值RSS"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_peak = 0.0
+        self.rss_start = 0
+        self.rss_peak = 0
+        self._cpu_start = 0.0
+        self._cpu_end = 0.0
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _cpu_seconds(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def _run(self):
+        self.process.cpu_percent(None)
+        while not self._stop.wait(self.interval):
+            try:
+                self.cpu_peak = max(self.cpu_peak, self.process.cpu_percent(None))
+                self.rss_peak = max(self.rss_peak, self.process.memory_info().rss)
+            except psutil.Error:
+                return
+
+    def __enter__(self):
+        self.rss_start = self.rss_peak = self.process.memory_info().rss
+        self._cpu_start = self._cpu_seconds()
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+        try:
+            self._cpu_end = self._cpu_seconds()
+        except psutil.Error:
+            self._cpu_end = self._cpu_start
+
+    def summary(self) -> Dict[str, float]:
+        cpu_seconds = self._cpu_end - self._cpu_start
+        return {
+            "cpu_seconds": round(cpu_seconds, 3),
+            "cpu_percent_avg": round(cpu_seconds / self._elapsed * 100, 1) if self._elapsed else 0.0,
+            "cpu_percent_peak": round(self.cpu_peak, 1),
+            "rss_start_mb": round(self.rss_start / 1024 / 1024, 1),
+            "rss_peak_mb": round(self.rss_peak / 1024 / 1024, 1)
+        }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """延迟样本（毫秒）的分布摘要，百分位取最近秩"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(rank(0.50), 3),
+        "p90": round(rank(0.90), 3),
+        "p99": round(rank(0.99), 3),
+        "p999": round(rank(0.999), 3),
+        "max": round(ordered[-1], 3)
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """运行环境（结果对比时确认在同一环境下测量）"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit
+    }
+
+
+def write_results(benchmark: str, config: Dict[str, Any], metrics: Dict[str, Any],
+                  path: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> str:
+    """
+    写入JSON结果，默认路径为 bench-results/<benchmark>-<时间>.json，返回写入的路径
+
+    extra 中的内容（如完整直方图）写在 metrics 之外，不参与 compare_results 的对比
+    """
+    started = datetime.now()
+    if not path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{benchmark}-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    result = {
+        "benchmark": benchmark,
+        "timestamp": started.isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": config,
+        "metrics": metrics,
+        **(extra or {})
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _flatten(metrics: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline_path: str, metrics: Dict[str, Any]):
+    """逐项打印本次指标相对基线结果文件的变化"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = _flatten(json.load(f).get("metrics", {}))
+    current = _flatten(metrics)
+    print(f"对比基线 {baseline_path}:")
+    for name, value in current.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = f"{(value - before) / before * 100:+7.1f}%" if before else "      -"
+        print(f"  {name:<36} {before:>12g} → {value:>12g}  {change}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+asyncio负载生成器
+单进程以协程驱动上万个虚拟用户：共享的HTTP连接池和WebSocket连接工厂，开环（固定到达率）或闭环（思考时间）两种模式，
+内置场景 write-heavy / read-heavy / login-storm / reconnect-storm，按动作输出HDR风格直方图的延迟百分位。
+虚拟用户按轮询共享 --accounts x --devices 个登录会话（login-storm 中每个动作仍是一次完整登录）。
+未指定 --base-url 时启动临时Redis（或用 --redis-port 指定已运行的Redis）和服务器进程，并采样服务器的CPU和RSS。
+结果写入JSON（默认 bench-results/loadgen-<场景>-<时间>.json，含可合并的完整直方图），--baseline 与之前的结果文件对比。
+
+用法（在项目根目录）:
+    python -m tests.loadgen --scenario write-heavy --mode closed --users 10000 --think-time 5 --duration 30
+    python -m tests.loadgen --scenario read-heavy --mode open --rate 2000 --users 10000 --duration 30
+    python -m tests.loadgen --base-url http://127.0.0.1:8000 --scenario login-storm --mode open --rate 50
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from contextlib import ExitStack
+
+from loguru import logger
+
+from tests.benchmarks.harness import (
+    LocalRedis, ResourceSampler, ServerProcess, compare_results, write_results
+)
+from tests.loadgen.client import LoadClient
+from tests.loadgen.runner import (
+    LoadResults, connect_users, create_sessions, create_users, disconnect_users, run_closed_loop, run_open_loop
+)
+from tests.loadgen.scenarios import SCENARIOS
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+
+def raise_file_limit() -> int:
+    """把打开文件数的软限制提高到硬限制（每个连接占用一个文件描述符），返回生效的限制"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+async def run(args, base_url: str, server_pid=None):
+    scenario = SCENARIOS[args.scenario]
+    think_time = scenario.think_time if args.think_time is None else args.think_time
+    results = LoadResults()
+    async with LoadClient(base_url, args.max_connections, args.connect_concurrency, args.timeout) as client:
+        start = time.perf_counter()
+        sessions = await create_sessions(client, args.accounts, args.devices, args.setup_concurrency)
+        users = create_users(sessions, args.users, args.seed)
+        print(f"  登录 {len(sessions)} 个会话 {time.perf_counter() - start:6.2f}s, {len(users)} 个虚拟用户")
+        if args.websockets:
+            start = time.perf_counter()
+            await connect_users(client, users)
+            print(f"  建立 {len(users)} 条WebSocket连接 {time.perf_counter() - start:6.2f}s")
+
+        with ExitStack() as stack:
+            sampler = stack.enter_context(ResourceSampler(server_pid)) if server_pid else None
+            if args.mode == "closed":
+                await run_closed_loop(client, users, scenario, results, args.duration, args.warmup, think_time,
+                                      args.iterations)
+            else:
+                await run_open_loop(client, users, scenario, results, args.rate, args.duration, args.warmup,
+                                    args.arrival, args.seed)
+
+        await disconnect_users(users)
+        if "add" in scenario.mix:
+            # 清理写入的历史（每个账号一次）
+            for session in {session.username: session for session in sessions}.values():
+                await client.request("POST", "/clipboard/clear", session.token, json={})
+
+    metrics = results.metrics()
+    if sampler:
+        metrics["server"] = sampler.summary()
+    return metrics, results.histograms()
+
+
+def format_latency(stats: dict) -> str:
+    if not stats["count"]:
+        return "无样本"
+    return (f"p50 {stats['p50']:8.2f}ms  p90 {stats['p90']:8.2f}ms  p99 {stats['p99']:8.2f}ms  "
+            f"p99.9 {stats['p999']:8.2f}ms  max {stats['max']:8.2f}ms")
+
+
+def report(metrics: dict):
+    print(f"  完成 {metrics['completed']} 次, 失败 {metrics['failed']}, 丢弃 {metrics['dropped']}, "
+          f"{metrics['elapsed_s']:.1f}s, 吞吐 {metrics['throughput']:.1f} 次/s")
+    print(f"  {'全部':<12} {format_latency(metrics['latency_ms'])}")
+    for action, stats in metrics["actions"].items():
+        print(f"  {action:<12} {format_latency(stats['latency_ms'])}  失败 {stats['failed']}")
+    for error, count in list(metrics["errors"].items())[:10]:
+        print(f"  错误 {error}: {count}")
+    if metrics["schedule_lag_ms"]["count"]:
+        # 调度延迟持续偏大说明负载生成器自身已饱和，结果不能代表服务器
+        print(f"  {'调度延迟':<10} {format_latency(metrics['schedule_lag_ms'])}")
+    if "server" in metrics:
+        server = metrics["server"]
+        print(f"  服务器 CPU 平均 {server['cpu_percent_avg']:.1f}% 峰值 {server['cpu_percent_peak']:.1f}%  "
+              f"RSS {server['rss_start_mb']:.1f}MB → 峰值 {server['rss_peak_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio负载生成器")
+    parser.add_argument("--base-url", default=None, help="被测服务器地址；不指定时启动临时服务器进程")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=None, help="已运行的Redis端口；不指定时启动临时redis-server")
+    parser.add_argument("--redis-binary", default="redis-server")
+    parser.add_argument("--port", type=int, default=None, help="临时服务器监听端口（默认取空闲端口）")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="write-heavy")
+    parser.add_argument("--mode", choices=("open", "closed"), default="closed",
+                        help="open: 固定到达率; closed: 每个虚拟用户执行完再思考后继续")
+    parser.add_argument("--users", type=int, default=1000, help="虚拟用户数")
+    parser.add_argument("--accounts", type=int, default=50, help="注册的账号数")
+    parser.add_argument("--devices", type=int, default=2, help="每个账号登录的设备数")
+    parser.add_argument("--rate", type=float, default=500, help="开环模式每秒到达的请求数")
+    parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson", help="开环模式的到达间隔分布")
+    parser.add_argument("--duration", type=float, default=30, help="测量阶段秒数")
+    parser.add_argument("--warmup", type=float, default=5, help="测量前的预热秒数（不计入结果）")
+    parser.add_argument("--iterations", type=int, default=None, help="闭环模式每个虚拟用户执行的次数（指定时忽略时长）")
+    parser.add_argument("--think-time", type=float, default=None, help="闭环模式的平均思考时间（秒），默认取场景设置")
+    parser.add_argument("--websockets", action="store_true", help="每个虚拟用户在运行期间保持一条WebSocket连接")
+    parser.add_argument("--max-connections", type=int, default=1000, help="HTTP连接池大小")
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="同时进行的WebSocket握手数")
+    parser.add_argument("--setup-concurrency", type=int, default=32, help="准备阶段注册和登录的并发数")
+    parser.add_argument("--timeout", type=float, default=30, help="单个请求的超时（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    parser.add_argument("--baseline", default=None, help="用于对比的之前的结果JSON")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    file_limit = raise_file_limit()
+    needed = args.max_connections + (args.users if args.websockets or args.scenario == "reconnect-storm" else 0)
+    if needed > file_limit:
+        print(f"警告: 需要约 {needed} 个文件描述符，当前限制为 {file_limit}")
+    if UVLOOP_AVAILABLE:
+        uvloop.install()
+
+    mode = f"开环 {args.rate} 次/s ({args.arrival})" if args.mode == "open" else "闭环"
+    print(f"场景 {args.scenario}（{SCENARIOS[args.scenario].description}）, {mode}, {args.users} 个虚拟用户, "
+          f"{args.accounts} 账号 x {args.devices} 设备, 事件循环 {'uvloop' if UVLOOP_AVAILABLE else 'asyncio'}")
+    with ExitStack() as stack:
+        if args.base_url:
+            metrics, histograms = asyncio.run(run(args, args.base_url))
+        else:
+            host, port = args.redis_host, args.redis_port
+            if port is None:
+                host, port = "127.0.0.1", stack.enter_context(LocalRedis(args.redis_binary)).port
+            server = stack.enter_context(ServerProcess(host, port, port=args.port))
+            metrics, histograms = asyncio.run(run(args, server.base_url, server.pid))
+
+    report(metrics)
+    path = write_results(f"loadgen-{args.scenario}", vars(args), metrics, args.output, {"histograms": histograms})
+    print(f"结果已写入 {path}")
+    if args.baseline:
+        compare_results(args.baseline, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+负载生成器的共享异步客户端
+所有虚拟用户共用一个HTTP/1.1 keep-alive连接池（连接数有上限，超出的请求在池外排队），
+WebSocket连接由同一个工厂建立，并发握手数受信号量限制，避免上万条连接同时握手压垮监听队列。
+
+HTTP连接池直接基于asyncio流实现：httpx的异步客户端每个请求约消耗3ms CPU，
+且排队请求很多时连接分配的开销随排队数增长，单进程驱动上万虚拟用户时瓶颈会在客户端一侧。
+这里只实现负载场景用到的部分（Content-Length和chunked响应体、连接复用），每个请求的CPU开销低一个数量级。
+"""
+
+import asyncio
+import collections
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+from websockets.asyncio.client import connect
+
+from shared import serialization
+
+
+class RequestFailed(Exception):
+    """请求返回了非预期的状态码"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Response:
+    """HTTP响应（头部名称为小写）"""
+
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self) -> Any:
+        return serialization.loads(self.content)
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    body = bytearray()
+    while True:
+        size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+        if size == 0:
+            # 跳过可能存在的trailer，直到空行
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass
+            return bytes(body)
+        body += await reader.readexactly(size)
+        await reader.readexactly(2)
+
+
+class HTTPPool:
+    """到同一服务器的HTTP/1.1 keep-alive连接池，空闲连接后进先出复用"""
+
+    def __init__(self, host: str, port: int, ssl: bool = False, max_connections: int = 1000):
+        self.host = host
+        self.port = port
+        self.ssl = ssl or None
+        self._host_header = f"Host: {host}:{port}\r\n".encode()
+        self._idle = collections.deque()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def request(self, method: str, target: str, headers: Dict[str, str], body: bytes = b"") -> Response:
+        head = [f"{method} {target} HTTP/1.1\r\n".encode(), self._host_header]
+        for name, value in headers.items():
+            head.append(f"{name}: {value}\r\n".encode())
+        head.append(f"Content-Length: {len(body)}\r\n\r\n".encode())
+        data = b"".join(head) + body
+
+        async with self._slots:
+            while self._idle:
+                reader, writer = self._idle.pop()
+                if reader.at_eof():
+                    writer.close()
+                    continue
+                try:
+                    return await self._exchange(reader, writer, data, method)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # 服务器已关闭空闲的keep-alive连接，换一条连接重试
+                    continue
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            return await self._exchange(reader, writer, data, method)
+
+    async def _exchange(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, data: bytes,
+                        method: str) -> Response:
+        try:
+            writer.write(data)
+            lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            status_code = int(lines[0].split(" ", 2)[1])
+            headers = {}
+            for line in lines[1:]:
+                if line:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+            reusable = headers.get("connection", "").lower() != "close"
+            if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+                content = b""
+            elif "chunked" in headers.get("transfer-encoding", ""):
+                content = await _read_chunked(reader)
+            elif "content-length" in headers:
+                content = await reader.readexactly(int(headers["content-length"]))
+            else:
+                content = await reader.read()
+                reusable = False
+        except BaseException:
+            writer.close()
+            raise
+        if reusable:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return Response(status_code, headers, content)
+
+    async def aclose(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class LoadClient:
+    """虚拟用户共享的HTTP连接池和WebSocket连接工厂"""
+
+    def __init__(self, base_url: str, max_connections: int = 1000, connect_concurrency: int = 200,
+                 timeout: float = 30):
+        url = urlsplit(base_url)
+        secure = url.scheme == "https"
+        self.ws_url = f"{'wss' if secure else 'ws'}://{url.netloc}"
+        self.timeout = timeout
+        self.http = HTTPPool(url.hostname, url.port or (443 if secure else 80), secure, max_connections)
+        self._connect_slots = asyncio.Semaphore(connect_concurrency)
+
+    async def request(self, method: str, path: str, token: Optional[str] = None, expect=(200,),
+                      params: Optional[Dict[str, Any]] = None, json: Any = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        发送请求，状态码不在 expect 中时抛出 RequestFailed
+
+        Raises:
+            RequestFailed: 非预期的状态码
+            OSError / asyncio.TimeoutError / asyncio.IncompleteReadError: 连接错误、超时或响应不完整
+        """
+        headers = dict(headers or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = b""
+        if json is not None:
+            body = serialization.dumps(json)
+            headers["Content-Type"] = "application/json"
+        target = f"{path}?{urlencode(params)}" if params else path
+        response = await asyncio.wait_for(self.http.request(method, target, headers, body), self.timeout)
+        if response.status_code not in expect:
+            raise RequestFailed(response.status_code)
+        return response
+
+    async def login(self, username: str, password: str, device_id: str) -> Dict[str, Any]:
+        """以精简响应登录一台设备，返回登录结果（含 token 和 user_id）"""
+        response = await self.request("POST", "/login", json={
+            "username": username, "password": password, "lean": True, "device_info": {"device_id": device_id}
+        })
+        return response.json()
+
+    async def register(self, username: str, password: str):
+        """注册用户（已存在时服务器返回409，忽略）"""
+        await self.request("POST", "/register", expect=(200, 201, 409),
+                           json={"username": username, "password": password})
+
+    async def websocket(self, user_id: str, device_id: str, token: str):
+        """建立一条同步WebSocket连接（不启用库自带的心跳，心跳由场景按需发送）"""
+        async with self._connect_slots:
+            return await connect(f"{self.ws_url}/ws/{user_id}/{device_id}?token={token}",
+                                 max_size=None, ping_interval=None, open_timeout=self.timeout)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,132 @@
+"""
+HDR风格的延迟直方图
+按2的幂分段、段内线性细分（与HdrHistogram相同的索引方式），在整个量程内保持固定的相对精度：
+记录为O(1)，内存与样本数无关，多个直方图可以直接合并，适合长时间、上万并发的延迟统计。
+数值单位为微秒。
+"""
+
+import math
+from typing import Dict, List, Tuple
+
+
+class LatencyHistogram:
+    """固定相对精度的延迟直方图（默认2位有效数字，量程1µs～1小时）"""
+
+    def __init__(self, highest: int = 3600 * 1000 * 1000, significant_figures: int = 2):
+        self.highest = highest
+        self.significant_figures = significant_figures
+        largest_single_unit = 2 * 10 ** significant_figures
+        sub_bucket_count_magnitude = max(math.ceil(math.log2(largest_single_unit)), 1)
+        self.sub_bucket_half_count_magnitude = sub_bucket_count_magnitude - 1
+        self.sub_bucket_count = 1 << sub_bucket_count_magnitude
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = self.sub_bucket_count - 1
+
+        bucket_count = 1
+        smallest_untrackable = self.sub_bucket_count
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self.sub_bucket_half_count)
+        self.total = 0
+        self.sum = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        bucket_index = (value | self.sub_bucket_mask).bit_length() - (self.sub_bucket_half_count_magnitude + 1)
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self.sub_bucket_half_count_magnitude) + sub_bucket_index - self.sub_bucket_half_count
+
+    def _value_range(self, index: int) -> Tuple[int, int]:
+        """计数槽对应的 (最小值, 最大值)"""
+        bucket_index = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (index & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self.sub_bucket_half_count
+            bucket_index = 0
+        lowest = sub_bucket_index << bucket_index
+        return lowest, lowest + (1 << bucket_index) - 1
+
+    def record(self, value: int, count: int = 1):
+        """记录一个值（超出量程的按量程上限记录）"""
+        value = min(max(int(value), 0), self.highest)
+        self.counts[self._index(value)] += count
+        if self.total == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.total += count
+        self.sum += value * count
+
+    def record_seconds(self, seconds: float):
+        self.record(seconds * 1_000_000)
+
+    def merge(self, other: "LatencyHistogram"):
+        """合并另一个相同配置的直方图"""
+        if other.total == 0:
+            return
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.min = other.min if self.total == 0 else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """百分位对应的值（所在计数槽的最大等价值，与HdrHistogram一致）"""
+        if self.total == 0:
+            return 0
+        target = max(math.ceil(percentile / 100 * self.total), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value_range(index)[1], self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile_distribution(self, percentiles=(50, 75, 90, 95, 99, 99.9, 99.99, 100)) -> List[Tuple[float, int]]:
+        return [(percentile, self.value_at_percentile(percentile)) for percentile in percentiles]
+
+    def summary(self) -> Dict[str, float]:
+        """以毫秒表示的分布摘要"""
+        if self.total == 0:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "mean": round(self.mean / 1000, 3),
+            "min": round(self.min / 1000, 3),
+            "p50": round(self.value_at_percentile(50) / 1000, 3),
+            "p90": round(self.value_at_percentile(90) / 1000, 3),
+            "p99": round(self.value_at_percentile(99) / 1000, 3),
+            "p999": round(self.value_at_percentile(99.9) / 1000, 3),
+            "p9999": round(self.value_at_percentile(99.99) / 1000, 3),
+            "max": round(self.max / 1000, 3)
+        }
+
+    def to_dict(self) -> Dict:
+        """可写入JSON的完整直方图（只保留非零计数槽），from_dict 还原后可与其他结果合并"""
+        return {
+            "highest": self.highest,
+            "significant_figures": self.significant_figures,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum,
+            "counts": {str(index): count for index, count in enumerate(self.counts) if count}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        histogram = cls(data["highest"], data["significant_figures"])
+        for index, count in data["counts"].items():
+            histogram.counts[int(index)] = count
+            histogram.total += count
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.sum = data["sum"]
+        return histogram
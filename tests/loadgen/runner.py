@@ -0,0 +1,201 @@
+"""
+负载执行
+闭环模式：每个虚拟用户一个协程，执行动作后按指数分布的思考时间等待，再执行下一个，吞吐量由服务器响应速度决定。
+开环模式：按固定到达率（泊松或均匀间隔）产生请求，交给空闲的虚拟用户执行，不等待之前的请求完成；
+延迟从计划的到达时间开始计算，生成器自身落后时延迟如实变大（避免协调遗漏），
+计划时间与实际发出时间之差单独记为调度延迟，用来判断瓶颈是否在负载生成器一侧。
+"""
+
+import asyncio
+import collections
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from tests.loadgen.client import LoadClient, RequestFailed
+from tests.loadgen.histogram import LatencyHistogram
+from tests.loadgen.scenarios import ACTIONS, PASSWORD, Scenario, Session, VirtualUser
+
+
+class LoadResults:
+    """按动作分别统计的延迟直方图、成功和失败计数"""
+
+    def __init__(self):
+        self.latency: Dict[str, LatencyHistogram] = collections.defaultdict(LatencyHistogram)
+        self.schedule_lag = LatencyHistogram()
+        self.errors = collections.Counter()  # (动作, 错误) -> 次数
+        self.dropped = 0
+        self.measuring = False
+        self.started = 0.0
+        self.stopped = 0.0
+
+    def start(self):
+        self.measuring = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.measuring = False
+        self.stopped = time.perf_counter()
+
+    def record(self, action: str, seconds: float, error: Optional[str]):
+        if error:
+            self.errors[(action, error)] += 1
+        else:
+            self.latency[action].record_seconds(seconds)
+
+    def metrics(self) -> dict:
+        elapsed = self.stopped - self.started
+        overall = LatencyHistogram()
+        for histogram in self.latency.values():
+            overall.merge(histogram)
+        failed = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "completed": overall.total,
+            "failed": failed,
+            "dropped": self.dropped,
+            "throughput": round(overall.total / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": overall.summary(),
+            "actions": {
+                action: {
+                    "latency_ms": histogram.summary(),
+                    "failed": sum(count for (name, _), count in self.errors.items() if name == action)
+                }
+                for action, histogram in sorted(self.latency.items())
+            },
+            "errors": {f"{action}: {error}": count for (action, error), count in self.errors.most_common()},
+            "schedule_lag_ms": self.schedule_lag.summary()
+        }
+
+    def histograms(self) -> dict:
+        """各动作的完整直方图（LatencyHistogram.from_dict 还原后可与其他运行的结果合并）"""
+        return {action: histogram.to_dict() for action, histogram in sorted(self.latency.items())}
+
+
+async def execute(client: LoadClient, vu: VirtualUser, action: str, intended: float, results: LoadResults,
+                  measured: bool):
+    """执行一个动作并记录从 intended 开始的延迟"""
+    try:
+        await ACTIONS[action](client, vu)
+        error = None
+    except RequestFailed as e:
+        error = str(e)
+    except Exception as e:
+        # 连接错误、超时、WebSocket关闭等按异常类型归类
+        error = type(e).__name__
+    if measured:
+        results.record(action, time.perf_counter() - intended, error)
+
+
+async def create_sessions(client: LoadClient, accounts: int, devices: int, concurrency: int,
+                          prefix: Optional[str] = None, password: str = PASSWORD) -> List[Session]:
+    """
+    注册 accounts 个账号（<prefix>-0 …，已存在的直接使用）并为每个账号登录 devices 台设备，返回所有会话
+
+    不指定 prefix 时使用随机前缀，每次运行都是新账号
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    prefix = prefix or f"loadgen-{uuid.uuid4().hex[:6]}"
+
+    async def one_account(index: int) -> List[Session]:
+        username = f"{prefix}-{index}"
+        async with semaphore:
+            await client.register(username, password)
+        sessions = []
+        for device in range(devices):
+            device_id = f"{username}-d{device}"
+            async with semaphore:
+                result = await client.login(username, password, device_id)
+            sessions.append(Session(username, password, result["user_id"], device_id, result["token"]))
+        return sessions
+
+    return [session for sessions in await asyncio.gather(*(one_account(index) for index in range(accounts)))
+            for session in sessions]
+
+
+def create_users(sessions: List[Session], count: int, seed: int) -> List[VirtualUser]:
+    """按轮询把虚拟用户分配到会话上"""
+    return [VirtualUser(index, sessions[index % len(sessions)], seed) for index in range(count)]
+
+
+async def connect_users(client: LoadClient, users: List[VirtualUser]):
+    """为每个虚拟用户建立WebSocket连接（并发握手数由客户端限制）"""
+    await asyncio.gather(*(vu.connect(client) for vu in users))
+
+
+async def disconnect_users(users: List[VirtualUser]):
+    await asyncio.gather(*(vu.disconnect() for vu in users))
+
+
+async def _closed_loop_user(client: LoadClient, vu: VirtualUser, scenario: Scenario, results: LoadResults,
+                            deadline: float, think_time: float, iterations: Optional[int]):
+    # 错开各虚拟用户的第一次动作，避免所有请求在同一时刻发出
+    if think_time:
+        await asyncio.sleep(vu.rng.random() * think_time)
+    done = 0
+    while time.perf_counter() < deadline and (iterations is None or done < iterations):
+        start = time.perf_counter()
+        await execute(client, vu, scenario.choose(vu.rng), start, results, results.measuring)
+        done += 1
+        if think_time:
+            await asyncio.sleep(min(vu.rng.expovariate(1 / think_time), max(deadline - time.perf_counter(), 0)))
+
+
+async def run_closed_loop(client: LoadClient, users: List[VirtualUser], scenario: Scenario, results: LoadResults,
+                          duration: float, warmup: float, think_time: float, iterations: Optional[int] = None):
+    """
+    闭环运行：所有虚拟用户并发执行到 warmup + duration 秒后停止
+
+    指定 iterations 时每个虚拟用户执行固定次数后结束（不计预热，duration 不再限制）
+    """
+    loop_start = time.perf_counter()
+    deadline = float("inf") if iterations is not None else loop_start + warmup + duration
+    tasks = [asyncio.create_task(_closed_loop_user(client, vu, scenario, results, deadline, think_time, iterations))
+             for vu in users]
+    if warmup and iterations is None:
+        await asyncio.sleep(warmup)
+    results.start()
+    await asyncio.gather(*tasks)
+    results.stop()
+
+
+async def run_open_loop(client: LoadClient, users: List[VirtualUser], scenario: Scenario, results: LoadResults,
+                        rate: float, duration: float, warmup: float, arrival: str = "poisson", seed: int = 0):
+    """
+    开环运行：按 rate 次/秒的到达率产生 warmup + duration 秒的请求
+
+    到达时没有空闲的虚拟用户时这次请求记为丢弃（并发已达到虚拟用户数上限）
+    """
+    rng = random.Random(seed)
+    idle = collections.deque(users)
+    in_flight = set()
+
+    async def one(vu: VirtualUser, intended: float, measured: bool):
+        await execute(client, vu, scenario.choose(vu.rng), intended, results, measured)
+        idle.append(vu)
+
+    start = time.perf_counter()
+    measure_from = start + warmup
+    end = measure_from + duration
+    intended = start
+    while intended < end:
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        measured = intended >= measure_from
+        if measured and not results.measuring:
+            results.start()
+        if measured:
+            results.schedule_lag.record_seconds(time.perf_counter() - intended)
+        if idle:
+            task = asyncio.create_task(one(idle.popleft(), intended, measured))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        elif measured:
+            results.dropped += 1
+        intended += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+    if not results.measuring:
+        results.start()
+    await asyncio.gather(*in_flight)
+    results.stop()
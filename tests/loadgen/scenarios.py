@@ -0,0 +1,154 @@
+"""
+负载场景
+虚拟用户（VirtualUser）是一个轻量对象而不是线程：会话（账号 + 设备token）来自有限的登录池，
+多个虚拟用户可共享同一个会话，登录的pbkdf2开销不会随虚拟用户数增长。
+每个动作是一个协程，成功返回，失败抛出异常；场景按权重随机选择动作。
+"""
+
+import asyncio
+import json
+import random
+from typing import Awaitable, Callable, Dict, Optional
+
+from tests.loadgen.client import LoadClient
+
+
+PASSWORD = "loadgen-password"
+
+
+class Session:
+    """一个已登录的设备会话"""
+
+    __slots__ = ("username", "password", "user_id", "device_id", "token")
+
+    def __init__(self, username: str, password: str, user_id: str, device_id: str, token: str):
+        self.username = username
+        self.password = password
+        self.user_id = user_id
+        self.device_id = device_id
+        self.token = token
+
+
+class VirtualUser:
+    """一个虚拟用户：会话、可选的WebSocket连接（后台读取循环持续消费推送）和兼容列表的ETag"""
+
+    __slots__ = ("index", "session", "rng", "ws", "reader", "pong", "etag", "sequence")
+
+    def __init__(self, index: int, session: Session, seed: int = 0):
+        self.index = index
+        self.session = session
+        self.rng = random.Random(seed * 1_000_003 + index)
+        self.ws = None
+        self.reader = None
+        self.pong: Optional[asyncio.Future] = None
+        self.etag = None
+        self.sequence = 0
+
+    async def connect(self, client: LoadClient):
+        session = self.session
+        self.ws = await client.websocket(session.user_id, session.device_id, session.token)
+        self.reader = asyncio.create_task(self._read(self.ws))
+
+    async def _read(self, ws):
+        """持续读取推送，服务器的发送不会因客户端不读而阻塞"""
+        try:
+            async for frame in ws:
+                if self.pong is not None and not self.pong.done() and isinstance(frame, str) and '"pong"' in frame:
+                    self.pong.set_result(None)
+        except Exception:
+            pass
+        if self.pong is not None and not self.pong.done():
+            self.pong.set_exception(ConnectionError("WebSocket连接已关闭"))
+
+    async def ping(self, timeout: float):
+        """发送应用层心跳并等待 pong"""
+        self.pong = asyncio.get_running_loop().create_future()
+        await self.ws.send(json.dumps({"type": "ping"}))
+        await asyncio.wait_for(self.pong, timeout)
+
+    async def disconnect(self):
+        if self.ws is None:
+            return
+        ws, reader = self.ws, self.reader
+        self.ws = self.reader = None
+        try:
+            await ws.close()
+        except Exception:
+            pass
+        await reader
+
+
+Action = Callable[[LoadClient, VirtualUser], Awaitable[None]]
+
+
+async def add_clipboard(client: LoadClient, vu: VirtualUser):
+    vu.sequence += 1
+    session = vu.session
+    await client.request("POST", "/clipboard/add", session.token, json={
+        "content": f"loadgen {vu.index}-{vu.sequence} {vu.rng.getrandbits(64):016x}",
+        "device_id": session.device_id
+    })
+
+
+async def list_history(client: LoadClient, vu: VirtualUser):
+    await client.request("GET", "/clipboard/list", vu.session.token, params={"limit": 20, "fields": "preview"})
+
+
+async def compat_list(client: LoadClient, vu: VirtualUser):
+    """旧客户端的轮询：带上次的ETag，历史未变化时为304"""
+    headers = {"If-None-Match": vu.etag} if vu.etag else {}
+    response = await client.request("GET", "/get_clipboards", vu.session.token, expect=(200, 304),
+                                    params={"username": vu.session.username, "fields": "preview"}, headers=headers)
+    vu.etag = response.headers.get("etag", vu.etag)
+
+
+async def latest_clipboard(client: LoadClient, vu: VirtualUser):
+    await client.request("GET", "/clipboard/latest", vu.session.token)
+
+
+async def login(client: LoadClient, vu: VirtualUser):
+    session = vu.session
+    await client.login(session.username, session.password, session.device_id)
+
+
+async def reconnect(client: LoadClient, vu: VirtualUser):
+    """断开（如已连接）并重新建立WebSocket连接，以首个心跳往返作为连接可用的时间点"""
+    await vu.disconnect()
+    await vu.connect(client)
+    await vu.ping(client.timeout)
+
+
+ACTIONS: Dict[str, Action] = {
+    "add": add_clipboard,
+    "list": list_history,
+    "compat_list": compat_list,
+    "latest": latest_clipboard,
+    "login": login,
+    "reconnect": reconnect
+}
+
+
+class Scenario:
+    """动作权重和默认思考时间（闭环模式下两次动作之间的平均间隔，秒）"""
+
+    def __init__(self, name: str, description: str, mix: Dict[str, float], think_time: float):
+        self.name = name
+        self.description = description
+        self.mix = mix
+        self.think_time = think_time
+        self._names = list(mix)
+        self._weights = list(mix.values())
+
+    def choose(self, rng: random.Random) -> str:
+        return rng.choices(self._names, self._weights)[0]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario for scenario in (
+        Scenario("write-heavy", "频繁复制：以写入为主，偶尔翻看历史", {"add": 0.8, "list": 0.2}, 1.0),
+        Scenario("read-heavy", "多设备轮询历史：以读取为主，少量写入",
+                 {"list": 0.6, "compat_list": 0.2, "latest": 0.1, "add": 0.1}, 1.0),
+        Scenario("login-storm", "服务重启后所有设备同时重新登录", {"login": 1.0}, 5.0),
+        Scenario("reconnect-storm", "网络抖动后所有设备同时重连WebSocket", {"reconnect": 1.0}, 5.0)
+    )
+}
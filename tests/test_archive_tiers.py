@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+剪贴板历史分层测试
+热数据（Redis）和磁盘归档的合并顺序、跨越两层的游标分页、迁移与删除并发时的一致性，以及归档的保留和压缩。
+使用临时目录中的归档；需要本地运行的Redis（config/settings.yaml）的用例连接不上时跳过。
+
+用法（在项目根目录）:
+    python -m unittest tests.test_archive_tiers -v
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import datetime
+
+from server.archive import ClipboardArchive
+from server.redis_manager import RedisManager, redis_manager
+from shared.models import ClipboardItem, ClipboardType
+
+
+def make_archive() -> ClipboardArchive:
+    archive = ClipboardArchive()
+    archive.path = tempfile.mkdtemp(prefix="archive-test-")
+    archive.enabled = True
+    archive.block_items = 4
+    archive.max_age = 0
+    archive.max_items = 0
+    return archive
+
+
+def make_record(user_id: str, index: int, score: float) -> dict:
+    created_at = datetime.fromtimestamp(score).isoformat()
+    return {
+        "id": f"item-{index:03d}", "type": ClipboardType.TEXT.value, "content": f"content {index}",
+        "metadata": "{}", "size": "9", "created_at": created_at, "updated_at": created_at,
+        "device_id": "device-a", "user_id": user_id
+    }
+
+
+class MergeTiersTest(unittest.TestCase):
+    """两层键的合并"""
+
+    def test_interleaved_newest_first(self):
+        hot = [("h3", 30.0), ("h1", 10.0)]
+        cold = [(20.0, "c2"), (5.0, "c0")]
+        self.assertEqual(RedisManager._merge_tiers(hot, cold, 10),
+                         [(30.0, "h3", True), (20.0, "c2", False), (10.0, "h1", True), (5.0, "c0", False)])
+
+    def test_limit(self):
+        hot = [("h3", 30.0), ("h1", 10.0)]
+        cold = [(20.0, "c2")]
+        self.assertEqual([item_id for _, item_id, _ in RedisManager._merge_tiers(hot, cold, 2)], ["h3", "c2"])
+
+    def test_hot_wins_for_item_in_both_tiers(self):
+        # 迁移过程中条目短暂同时存在于两层
+        merged = RedisManager._merge_tiers([("x", 10.0)], [(10.0, "x"), (5.0, "y")], 10)
+        self.assertEqual(merged, [(10.0, "x", True), (5.0, "y", False)])
+
+    def test_equal_scores_ordered_by_id(self):
+        merged = RedisManager._merge_tiers([("b", 10.0)], [(10.0, "a"), (10.0, "c")], 10)
+        self.assertEqual([item_id for _, item_id, _ in merged], ["c", "b", "a"])
+
+
+class ArchiveRetentionTest(unittest.TestCase):
+    """归档的保留规则和压缩"""
+
+    def setUp(self):
+        self.archive = make_archive()
+        self.user_id = uuid.uuid4().hex
+        self.now = time.time()
+
+    def tearDown(self):
+        shutil.rmtree(self.archive.path, ignore_errors=True)
+
+    def append(self, count: int, age_step: float = 60, first: int = 0):
+        """归档编号从first开始的count条，第i条比现在早 (count - i) * age_step 秒"""
+        records = [(self.now - (count - index) * age_step,
+                    make_record(self.user_id, first + index, self.now - (count - index) * age_step))
+                   for index in range(count)]
+        self.archive.append(self.user_id, records)
+
+    def ids(self) -> list:
+        return [item_id for _, item_id in self.archive.newest_keys(self.user_id, 0, 1000)]
+
+    def test_max_items_keeps_newest(self):
+        self.append(20)
+        self.archive.max_items = 5
+        result = self.archive.prune(self.user_id, self.now)
+        self.assertEqual(result["pruned"], 15)
+        self.assertEqual(self.ids(), [f"item-{index:03d}" for index in range(19, 14, -1)])
+
+    def test_max_age(self):
+        self.append(10, age_step=3600)
+        self.archive.max_age = 3 * 3600 + 1
+        self.assertEqual(self.archive.prune(self.user_id, self.now)["pruned"], 7)
+        self.assertEqual(self.archive.count(self.user_id), 3)
+
+    def test_nothing_to_prune(self):
+        self.append(10)
+        self.archive.max_items = 100
+        self.assertEqual(self.archive.prune(self.user_id, self.now), {"pruned": 0, "compacted": 0})
+
+    def test_compaction_reclaims_segments(self):
+        self.append(40)
+        user_dir = self.archive._user_dir(self.user_id)
+        before = sum(os.path.getsize(os.path.join(user_dir, name)) for name in os.listdir(user_dir))
+
+        self.archive.max_items = 8
+        result = self.archive.prune(self.user_id, self.now)
+        self.assertEqual(result, {"pruned": 32, "compacted": 1})
+        after = sum(os.path.getsize(os.path.join(user_dir, name)) for name in os.listdir(user_dir))
+        self.assertLess(after, before)
+
+        # 压缩后的内容、顺序和后续写入都正常，另一个实例（其他worker）读到相同的结果
+        items = self.archive.get_items(self.user_id, self.ids())
+        self.assertEqual([item.content for item in items], [f"content {index}" for index in range(39, 31, -1)])
+        self.append(2, age_step=1, first=40)
+        other = make_archive()
+        other.path = self.archive.path
+        self.assertEqual(other.count(self.user_id), 10)
+        self.assertEqual(self.archive.count(self.user_id), 10)
+
+    def test_everything_pruned_removes_directory(self):
+        self.append(10, age_step=86400)
+        self.archive.max_age = 1
+        self.archive.prune(self.user_id, self.now)
+        self.assertEqual(self.archive.count(self.user_id), 0)
+        self.assertFalse(os.path.exists(self.archive._user_dir(self.user_id)))
+        self.assertNotIn(self.user_id, self.archive.list_users())
+
+    def test_index_reloaded_incrementally(self):
+        self.append(4)
+        other = make_archive()
+        other.path = self.archive.path
+        self.assertEqual(other.count(self.user_id), 4)
+        self.archive.delete(self.user_id, ["item-000"])
+        self.append(3, first=4)
+        self.assertEqual(other.count(self.user_id), 6)
+        self.assertEqual(other.index_loads, 1)
+
+    def test_uncached_count_skips_index_cache(self):
+        # 管理统计逐个用户计数，不应把索引载入索引缓存
+        self.append(5)
+        other = make_archive()
+        other.path = self.archive.path
+        self.assertEqual(other.count(self.user_id, cache_index=False), 5)
+        self.assertEqual(len(other._indexes), 0)
+        self.append(2, first=5)
+        self.assertEqual(other.count(self.user_id, cache_index=False), 7)
+
+    def test_drop_moves_to_trash_until_purged(self):
+        self.append(5)
+        self.archive.drop(self.user_id)
+        self.assertEqual(self.archive.count(self.user_id), 0)
+        self.assertEqual(self.archive.list_users(), [])
+        self.assertEqual(self.archive.purge_trash(), 1)
+        self.assertEqual(os.listdir(os.path.join(self.archive.path, ".trash")), [])
+
+
+class TieredHistoryTest(unittest.TestCase):
+    """经由RedisManager读写的两层历史"""
+
+    @classmethod
+    def setUpClass(cls):
+        if not redis_manager.is_connected():
+            raise unittest.SkipTest("Redis不可用")
+
+    def setUp(self):
+        self.original_archive = redis_manager.archive
+        self.archive = make_archive()
+        self.archive.hot_seconds = 10 ** 9
+        redis_manager.archive = self.archive
+        self.user_id = uuid.uuid4().hex
+        self.now = time.time()
+
+    def tearDown(self):
+        redis_manager.archive = self.original_archive
+        redis_manager.clear_user_clipboard_history(self.user_id)
+        shutil.rmtree(self.archive.path, ignore_errors=True)
+
+    def save(self, count: int) -> list:
+        """保存count条（编号越大越新），返回从新到旧的ID"""
+        items = [
+            ClipboardItem(type=ClipboardType.TEXT, content=f"content {index}", device_id="device-a",
+                          user_id=self.user_id, created_at=datetime.fromtimestamp(self.now - 1000 + index))
+            for index in range(count)
+        ]
+        results, _ = redis_manager.save_clipboard_items(self.user_id, items)
+        self.assertTrue(all(results))
+        return [item.id for item in reversed(items)]
+
+    def archive_oldest(self, keep_hot: int) -> dict:
+        self.archive.hot_max_items = keep_hot
+        return redis_manager.archive_user_history(self.user_id)
+
+    def read_all_pages(self, limit: int) -> list:
+        ids, cursor = [], None
+        while True:
+            items, cursor = redis_manager.get_clipboard_page(self.user_id, cursor, limit)
+            ids.extend(item.id for item in items)
+            if cursor is None:
+                return ids
+
+    def test_cursor_pages_cross_tier_boundary(self):
+        expected = self.save(23)
+        self.assertEqual(self.archive_oldest(8)["archived"], 15)
+        self.assertEqual(redis_manager.redis_client.zcard(f"clipboard:{self.user_id}"), 8)
+        self.assertEqual(self.archive.count(self.user_id), 15)
+
+        for limit in (1, 5, 8, 10, 23, 50):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.read_all_pages(limit), expected)
+
+    def test_cursor_pages_with_interleaved_tiers(self):
+        # 补传的旧条目让两层时间交错
+        expected = self.save(10)
+        self.archive_oldest(4)
+        late = ClipboardItem(type=ClipboardType.TEXT, content="late", device_id="device-b", user_id=self.user_id,
+                             created_at=datetime.fromtimestamp(self.now - 1000 + 2.5))
+        redis_manager.save_clipboard_items(self.user_id, [late])
+        expected.insert(expected.index(expected[-3]), late.id)
+
+        self.assertEqual(self.read_all_pages(3), expected)
+        history = redis_manager.get_user_clipboard_history(self.user_id, page=2, per_page=4)
+        self.assertEqual([item.id for item in history.items], expected[4:8])
+        self.assertEqual(history.total, 11)
+
+    def test_cursor_page_contents_from_archive(self):
+        self.save(6)
+        self.archive_oldest(2)
+        items, _ = redis_manager.get_clipboard_page(self.user_id, None, 6, with_content=True)
+        self.assertEqual([item.content for item in items], [f"content {index}" for index in range(5, -1, -1)])
+        items, _ = redis_manager.get_clipboard_page(self.user_id, None, 6)
+        self.assertTrue(all(item.content == "" for item in items))
+
+    def test_delete_archived_item(self):
+        expected = self.save(6)
+        self.archive_oldest(2)
+        self.assertTrue(redis_manager.delete_clipboard_item(expected[-1], user_id=self.user_id))
+        self.assertEqual(self.read_all_pages(10), expected[:-1])
+        self.assertIsNone(redis_manager.get_clipboard_item(expected[-1], user_id=self.user_id))
+
+    def test_async_reads_and_delete(self):
+        expected = self.save(6)
+        self.archive_oldest(2)
+        history = asyncio.run(redis_manager.fetch_user_clipboard_history(self.user_id, page=2, per_page=3,
+                                                                         with_content=True))
+        self.assertEqual([item.id for item in history.items], expected[3:6])
+        self.assertEqual(history.total, 6)
+        self.assertTrue(asyncio.run(redis_manager.remove_clipboard_item(expected[-1], self.user_id)))
+        self.assertFalse(asyncio.run(redis_manager.remove_clipboard_item(expected[-1], self.user_id)))
+        self.assertEqual(self.read_all_pages(10), expected[:-1])
+
+    def test_sync_state_counts_archived_items(self):
+        expected = self.save(6)
+        self.archive_oldest(2)
+        watermarks = redis_manager.get_user_sync_state(self.user_id)["watermarks"]
+        self.assertEqual(watermarks["clipboard_total"], 6)
+        self.assertEqual(watermarks["latest_clip_id"], expected[0])
+
+        self.archive_oldest(0)
+        self.assertEqual(redis_manager.redis_client.zcard(f"clipboard:{self.user_id}"), 0)
+        watermarks = redis_manager.get_user_sync_state(self.user_id)["watermarks"]
+        self.assertEqual(watermarks["clipboard_total"], 6)
+        self.assertEqual(watermarks["latest_clip_id"], expected[0])
+
+    def test_delete_during_migration_before_zrem(self):
+        # 条目写入归档后、迁移ZREM之前被删除：迁移的ZREM返回0，从归档撤销
+        expected = self.save(6)
+        victim = expected[-1]
+        append = self.archive.append
+
+        def append_then_delete(user_id, records):
+            count = append(user_id, records)
+            self.assertTrue(redis_manager.delete_clipboard_item(victim, user_id=self.user_id))
+            return count
+
+        self.archive.append = append_then_delete
+        result = self.archive_oldest(2)
+        self.archive.append = append
+
+        self.assertEqual(result["archived"], 3)
+        self.assertFalse(self.archive.contains(self.user_id, victim))
+        self.assertEqual(self.read_all_pages(10), expected[:-1])
+
+    def test_delete_during_migration_after_zrem(self):
+        # 迁移ZREM之后、UNLINK之前被删除：删除的ZREM返回0，从归档删除
+        expected = self.save(6)
+        victim = expected[-1]
+        item_keys = redis_manager._item_keys
+
+        def delete_then_keys(item_ids):
+            self.assertTrue(redis_manager.delete_clipboard_item(victim, user_id=self.user_id))
+            return item_keys(item_ids)
+
+        redis_manager._item_keys = delete_then_keys
+        try:
+            self.archive_oldest(2)
+        finally:
+            del redis_manager._item_keys
+
+        self.assertFalse(self.archive.contains(self.user_id, victim))
+        self.assertFalse(redis_manager.redis_client.exists(f"item:{victim}"))
+        self.assertEqual(self.read_all_pages(10), expected[:-1])
+
+    def test_burst_past_max_history_is_archived(self):
+        # 两批共1200条超过 clipboard.max_history：超出的条目迁移到归档，不被裁剪
+        self.archive.hot_max_items = 200
+        expected = self.save(600)
+        expected = self.save(600) + expected
+        self.assertEqual(redis_manager.redis_client.zcard(f"clipboard:{self.user_id}"), 200)
+        self.assertEqual(self.archive.count(self.user_id), 1000)
+        self.assertEqual(len(set(self.read_all_pages(200))), 1200)
+
+    def test_migration_skipped_while_leased(self):
+        # 其他worker正在迁移同一用户时不并发迁移
+        self.save(6)
+        lease_key = f"archive_lease:{self.user_id}"
+        redis_manager.redis_client.set(lease_key, "other", px=10000)
+        try:
+            self.assertEqual(self.archive_oldest(2), {"archived": 0, "dangling": 0})
+        finally:
+            redis_manager.redis_client.delete(lease_key)
+        self.assertEqual(self.archive_oldest(2)["archived"], 4)
+        self.assertFalse(redis_manager.redis_client.exists(lease_key))
+
+    def test_prune_bumps_sync_version(self):
+        self.save(10)
+        self.archive_oldest(2)
+        version = redis_manager.get_sync_version(self.user_id, 'clipboard')
+        self.archive.max_items = 3
+        self.assertEqual(redis_manager.prune_archived_history(self.user_id)["pruned"], 5)
+        self.assertEqual(redis_manager.get_sync_version(self.user_id, 'clipboard'), version + 1)
+        self.assertEqual(len(self.read_all_pages(10)), 5)
+        self.archive.max_items = 0
+        self.assertEqual(redis_manager.prune_archived_history(self.user_id)["pruned"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
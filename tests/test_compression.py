@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+HTTP响应压缩中间件测试
+直接以ASGI消息驱动 CompressionMiddleware：编码协商、不压缩的情形（Range、206、304、已压缩类型等）
+以及流式响应逐块刷出（每块压缩数据单独解压即可得到该块内容）；请求体解压的输出上限。
+
+用法（在项目根目录）:
+    python -m unittest tests.test_compression -v
+"""
+
+import gzip
+import unittest
+import zlib
+from typing import List, Optional
+
+from server.api.compression import (
+    BROTLI_AVAILABLE, CompressionMiddleware, ZSTD_AVAILABLE, parse_accept_encoding, request_decoder
+)
+
+
+BODY = b'{"clipboards": [' + b'{"content": "hello world"},' * 200 + b'{}]}'
+
+
+def make_app(messages: List[dict]):
+    """依次发送给定ASGI消息的应用"""
+    async def app(scope, receive, send):
+        for message in messages:
+            await send(message)
+    return app
+
+
+def start_message(status: int = 200, content_type: str = "application/json", extra: Optional[list] = None) -> dict:
+    headers = [(b"content-type", content_type.encode())] + (extra or [])
+    return {"type": "http.response.start", "status": status, "headers": headers}
+
+
+def body_message(body: bytes, more_body: bool = False) -> dict:
+    return {"type": "http.response.body", "body": body, "more_body": more_body}
+
+
+class CompressionTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def make_middleware(self, messages: List[dict], preference: Optional[list] = None) -> CompressionMiddleware:
+        middleware = CompressionMiddleware(make_app(messages))
+        middleware.enabled = True
+        middleware.minimum_size = 1024
+        middleware.offload_size = 256 * 1024
+        if preference is not None:
+            middleware.preference = [name for name in preference if name in middleware.encodings]
+        return middleware
+
+    async def run_request(self, middleware: CompressionMiddleware, accept_encoding: str = "gzip",
+                          method: str = "GET") -> List[dict]:
+        """执行一次请求，返回中间件发出的消息"""
+        scope = {
+            "type": "http", "method": method, "path": "/",
+            "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+        }
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent
+
+    @staticmethod
+    def headers_of(message: dict) -> dict:
+        return {name.decode().lower(): value.decode() for name, value in message["headers"]}
+
+
+class NegotiationTest(CompressionTestCase):
+    """Accept-Encoding 协商"""
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding("gzip, br;q=0.5, zstd;q=0, identity"),
+                         {"gzip": 1.0, "br": 0.5, "zstd": 0.0, "identity": 1.0})
+        self.assertEqual(parse_accept_encoding("gzip;q=abc"), {"gzip": 0.0})
+        self.assertEqual(parse_accept_encoding(""), {})
+
+    def test_select_follows_server_preference(self):
+        middleware = self.make_middleware([], ["zstd", "br", "gzip"])
+        expected = "zstd" if ZSTD_AVAILABLE else "br" if BROTLI_AVAILABLE else "gzip"
+        self.assertEqual(middleware.select_encoding("gzip, br, zstd"), expected)
+        self.assertEqual(middleware.select_encoding("gzip"), "gzip")
+
+    def test_select_respects_zero_quality_and_wildcard(self):
+        middleware = self.make_middleware([], ["gzip"])
+        self.assertIsNone(middleware.select_encoding("gzip;q=0"))
+        self.assertIsNone(middleware.select_encoding("identity"))
+        self.assertIsNone(middleware.select_encoding(""))
+        self.assertEqual(middleware.select_encoding("*"), "gzip")
+        self.assertIsNone(middleware.select_encoding("*, gzip;q=0"))
+
+    @unittest.skipUnless(BROTLI_AVAILABLE, "未安装brotli")
+    def test_select_brotli(self):
+        middleware = self.make_middleware([], ["br", "gzip"])
+        self.assertEqual(middleware.select_encoding("gzip, br"), "br")
+        self.assertEqual(middleware.select_encoding("gzip, br;q=0"), "gzip")
+
+    async def test_full_body_compressed(self):
+        middleware = self.make_middleware([start_message(extra=[(b"content-length", str(len(BODY)).encode())]),
+                                           body_message(BODY)], ["gzip"])
+        start, body = await self.run_request(middleware, "gzip, deflate")
+        headers = self.headers_of(start)
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+        self.assertEqual(int(headers["content-length"]), len(body["body"]))
+        self.assertEqual(gzip.decompress(body["body"]), BODY)
+
+    async def test_no_accepted_encoding_passes_through(self):
+        middleware = self.make_middleware([start_message(), body_message(BODY)], ["gzip"])
+        start, body = await self.run_request(middleware, "identity")
+        headers = self.headers_of(start)
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+        self.assertEqual(body["body"], BODY)
+
+    async def test_small_body_not_compressed(self):
+        middleware = self.make_middleware([start_message(), body_message(b'{"success": true}')], ["gzip"])
+        start, body = await self.run_request(middleware)
+        self.assertNotIn("content-encoding", self.headers_of(start))
+        self.assertEqual(body["body"], b'{"success": true}')
+
+    async def test_head_request_untouched(self):
+        middleware = self.make_middleware([start_message(), body_message(BODY)], ["gzip"])
+        start, body = await self.run_request(middleware, method="HEAD")
+        self.assertNotIn("content-encoding", self.headers_of(start))
+        self.assertEqual(body["body"], BODY)
+
+
+class ExclusionTest(CompressionTestCase):
+    """不压缩的响应：原样转发，不添加 Content-Encoding"""
+
+    async def assert_passthrough(self, start: dict):
+        middleware = self.make_middleware([start, body_message(BODY)], ["gzip"])
+        sent_start, body = await self.run_request(middleware)
+        headers = self.headers_of(sent_start)
+        self.assertNotEqual(headers.get("content-encoding"), "gzip")
+        self.assertNotIn("vary", headers)
+        self.assertEqual(body["body"], BODY)
+
+    async def test_range_capable_download(self):
+        await self.assert_passthrough(start_message(content_type="text/plain",
+                                                    extra=[(b"accept-ranges", b"bytes")]))
+
+    async def test_partial_content(self):
+        await self.assert_passthrough(start_message(206, "text/plain",
+                                                    extra=[(b"content-range", b"bytes 0-99/1000")]))
+
+    async def test_not_modified(self):
+        await self.assert_passthrough(start_message(304))
+
+    async def test_already_encoded(self):
+        await self.assert_passthrough(start_message(extra=[(b"content-encoding", b"br")]))
+
+    async def test_excluded_content_types(self):
+        for content_type in ("image/png", "application/zip", "application/octet-stream", "text/event-stream"):
+            with self.subTest(content_type=content_type):
+                await self.assert_passthrough(start_message(content_type=content_type))
+
+    async def test_configured_excluded_types(self):
+        middleware = self.make_middleware([start_message(content_type="application/x-ndjson"),
+                                           body_message(BODY)], ["gzip"])
+        middleware.excluded_types = ["application/x-ndjson"]
+        start, body = await self.run_request(middleware)
+        self.assertNotIn("content-encoding", self.headers_of(start))
+        self.assertEqual(body["body"], BODY)
+
+
+class StreamingTest(CompressionTestCase):
+    """流式响应逐块压缩，每块都同步刷出"""
+
+    async def test_each_chunk_flushed(self):
+        chunks = [b'{"id": %d, "content": "line"}\n' % index for index in range(5)]
+        messages = [start_message(content_type="application/x-ndjson",
+                                  extra=[(b"content-length", b"999")])]
+        messages += [body_message(chunk, more_body=True) for chunk in chunks]
+        messages.append(body_message(b"", more_body=False))
+        middleware = self.make_middleware(messages, ["gzip"])
+
+        sent = await self.run_request(middleware)
+        headers = self.headers_of(sent[0])
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", headers)
+
+        # 每条压缩消息单独送进解压器就能得到对应的原始块（不等后续数据）
+        decoder = zlib.decompressobj(31)
+        bodies = sent[1:]
+        for chunk, message in zip(chunks, bodies):
+            self.assertTrue(message["more_body"])
+            self.assertEqual(decoder.decompress(message["body"]), chunk)
+        self.assertFalse(bodies[-1]["more_body"])
+        self.assertEqual(decoder.decompress(bodies[-1]["body"]), b"")
+        self.assertTrue(decoder.eof)
+
+    async def test_small_first_chunk_still_streamed(self):
+        # 流式响应的第一块很小也要压缩（后续块大小未知）
+        messages = [start_message(), body_message(b"{", more_body=True), body_message(BODY[1:])]
+        middleware = self.make_middleware(messages, ["gzip"])
+        sent = await self.run_request(middleware)
+        self.assertEqual(self.headers_of(sent[0])["content-encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(message["body"] for message in sent[1:])), BODY)
+
+    async def test_streamed_passthrough_for_excluded_type(self):
+        messages = [start_message(content_type="image/png"), body_message(b"a" * 2048, more_body=True),
+                    body_message(b"b" * 2048)]
+        middleware = self.make_middleware(messages, ["gzip"])
+        sent = await self.run_request(middleware)
+        self.assertNotIn("content-encoding", self.headers_of(sent[0]))
+        self.assertEqual([message["body"] for message in sent[1:]], [b"a" * 2048, b"b" * 2048])
+
+
+class RequestDecoderTest(unittest.TestCase):
+    """请求体解压"""
+
+    def test_identity(self):
+        self.assertIsNone(request_decoder(""))
+        self.assertIsNone(request_decoder("identity"))
+
+    def test_unbounded_encodings_rejected(self):
+        for encoding in ("br", "zstd", "compress"):
+            with self.subTest(encoding=encoding):
+                with self.assertRaises(ValueError):
+                    request_decoder(encoding)
+
+    def test_output_bounded_per_chunk(self):
+        # 约1MB压缩后只有约1KB，单次输出仍不超过上限
+        data = b"\0" * (1 << 20)
+        compressed = gzip.compress(data)
+        decoder = request_decoder("gzip")
+        outputs = []
+        for start in range(0, len(compressed), 100):
+            outputs.extend(decoder.decompress(compressed[start:start + 100], 64 * 1024))
+        outputs.append(decoder.flush())
+        self.assertLessEqual(max(len(output) for output in outputs), 64 * 1024)
+        self.assertEqual(b"".join(outputs), data)
+
+    def test_corrupt_body(self):
+        decoder = request_decoder("deflate")
+        with self.assertRaises(ValueError):
+            list(decoder.decompress(b"not compressed at all", 1024))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+存储后端一致性测试
+同一组用例依次运行在内存、SQLite和Redis后端上，保证各后端语义一致。
+Redis用例需要本地运行的Redis（config/settings.yaml），连接不上时跳过。
+
+用法（在项目根目录）:
+    python -m unittest tests.test_storage_conformance -v
+"""
+
+import os
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import datetime, timedelta
+
+from shared.models import ClipboardItem, ClipboardType
+from server.storage import MemoryStorage, SQLiteStorage, StorageBackend
+
+
+class StorageConformance:
+    """各后端共用的用例，子类实现 make_storage"""
+
+    def make_storage(self) -> StorageBackend:
+        raise NotImplementedError
+
+    def setUp(self):
+        self.storage = self.make_storage()
+        self.storage.max_history = 1000
+        self.user_id = str(uuid.uuid4())
+        self.username = f"conformance-{self.user_id[:8]}"
+        self.storage.create_user(self.user_id, self.username, {
+            'id': self.user_id, 'username': self.username, 'is_active': 'True'
+        })
+
+    def tearDown(self):
+        self.storage.delete_user(self.user_id)
+        self.storage.close()
+
+    def make_items(self, count: int, device_id: str = "dev-1"):
+        start = datetime.now() - timedelta(seconds=count)
+        return [
+            ClipboardItem(
+                type=ClipboardType.TEXT,
+                content=f"内容 {index}",
+                metadata={"original_content_type": "text/plain"},
+                size=len(f"内容 {index}".encode('utf-8')),
+                created_at=start + timedelta(seconds=index),
+                device_id=device_id,
+                user_id=self.user_id
+            )
+            for index in range(count)
+        ]
+
+    # ==================== 用户 ====================
+
+    def test_create_and_get_user(self):
+        self.assertEqual(self.storage.get_user_id(self.username), self.user_id)
+        self.assertEqual(self.storage.get_user(self.user_id)['username'], self.username)
+        self.assertGreaterEqual(self.storage.count_users(), 1)
+
+    def test_duplicate_username_rejected(self):
+        other_id = str(uuid.uuid4())
+        self.assertFalse(self.storage.create_user(other_id, self.username, {'id': other_id}))
+        self.assertEqual(self.storage.get_user_id(self.username), self.user_id)
+        self.assertIsNone(self.storage.get_user(other_id))
+
+    def test_missing_user(self):
+        self.assertIsNone(self.storage.get_user(str(uuid.uuid4())))
+        self.assertIsNone(self.storage.get_user_id(f"missing-{uuid.uuid4().hex}"))
+        self.assertFalse(self.storage.delete_user(str(uuid.uuid4())))
+
+    def test_delete_user_cascades(self):
+        self.storage.save_device(self.user_id, f"{self.user_id}-d", {'name': 'laptop'})
+        items = self.make_items(3)
+        self.storage.save_clipboard_items(self.user_id, items)
+
+        self.assertTrue(self.storage.delete_user(self.user_id))
+        self.assertIsNone(self.storage.get_user(self.user_id))
+        self.assertIsNone(self.storage.get_user_id(self.username))
+        self.assertIsNone(self.storage.get_device(f"{self.user_id}-d"))
+        self.assertEqual(self.storage.list_devices(self.user_id), [])
+        self.assertIsNone(self.storage.get_clipboard_item(items[0].id))
+        self.assertEqual(self.storage.get_clipboard_history(self.user_id).total, 0)
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'clipboard'), 0)
+
+    # ==================== 设备与在线状态 ====================
+
+    def test_save_device_merges_and_marks_online(self):
+        device_id = f"{self.user_id}-d"
+        self.storage.save_device(self.user_id, device_id, {'name': 'laptop', 'os_info': 'Linux'})
+        record = self.storage.save_device(self.user_id, device_id, {'name': 'renamed'})
+
+        self.assertEqual(record['name'], 'renamed')
+        self.assertEqual(record['os_info'], 'Linux')
+        self.assertEqual(record['user_id'], self.user_id)
+        self.assertEqual(self.storage.get_device(device_id)['name'], 'renamed')
+        self.assertEqual([device['device_id'] for device in self.storage.list_devices(self.user_id)], [device_id])
+        self.assertIn(device_id, self.storage.get_presence(self.user_id))
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'devices'), 2)
+
+    def test_remove_device(self):
+        device_id = f"{self.user_id}-d"
+        self.storage.save_device(self.user_id, device_id, {'name': 'laptop'})
+        self.assertTrue(self.storage.remove_device(self.user_id, device_id))
+
+        self.assertIsNone(self.storage.get_device(device_id))
+        self.assertEqual(self.storage.list_devices(self.user_id), [])
+        self.assertNotIn(device_id, self.storage.get_presence(self.user_id))
+
+    def test_presence_timeout(self):
+        self.storage.touch_devices(self.user_id, ["a", "b"])
+        self.assertEqual(set(self.storage.get_presence(self.user_id)), {"a", "b"})
+
+        timeout = self.storage.presence_timeout
+        self.storage.presence_timeout = 0.05
+        try:
+            time.sleep(0.1)
+            self.storage.touch_devices(self.user_id, ["b"])
+            self.assertEqual(set(self.storage.get_presence(self.user_id)), {"b"})
+        finally:
+            self.storage.presence_timeout = timeout
+
+    # ==================== 剪贴板历史 ====================
+
+    def test_save_and_page_history(self):
+        items = self.make_items(5)
+        saved, version = self.storage.save_clipboard_items(self.user_id, items)
+        self.assertEqual(saved, [True] * 5)
+        self.assertEqual(version, 1)
+
+        first = self.storage.get_clipboard_history(self.user_id, page=1, per_page=2)
+        self.assertEqual(first.total, 5)
+        self.assertEqual([item.id for item in first.items], [items[4].id, items[3].id])
+        last = self.storage.get_clipboard_history(self.user_id, page=3, per_page=2)
+        self.assertEqual([item.id for item in last.items], [items[0].id])
+        self.assertEqual(self.storage.get_clipboard_history(self.user_id, page=4, per_page=2).items, [])
+
+    def test_item_round_trip(self):
+        item = self.make_items(1)[0]
+        item.metadata["source"] = "conformance"
+        item.checksum = "abc"
+        self.storage.save_clipboard_items(self.user_id, [item])
+
+        loaded = self.storage.get_clipboard_item(item.id)
+        self.assertEqual(loaded.content, item.content)
+        self.assertEqual(loaded.type, ClipboardType.TEXT)
+        self.assertEqual(loaded.metadata, item.metadata)
+        self.assertEqual(loaded.created_at, item.created_at)
+        self.assertEqual(loaded.checksum, "abc")
+        self.assertEqual(loaded.device_id, "dev-1")
+
+    def test_max_history_trims_oldest(self):
+        self.storage.max_history = 3
+        items = self.make_items(5)
+        self.storage.save_clipboard_items(self.user_id, items)
+
+        history = self.storage.get_clipboard_history(self.user_id, per_page=10)
+        self.assertEqual(history.total, 3)
+        self.assertEqual([item.id for item in history.items], [items[4].id, items[3].id, items[2].id])
+        self.assertIsNone(self.storage.get_clipboard_item(items[0].id))
+
+    def test_resave_same_item_does_not_duplicate(self):
+        item = self.make_items(1)[0]
+        self.storage.save_clipboard_items(self.user_id, [item])
+        item.content = "更新后的内容"
+        self.storage.save_clipboard_items(self.user_id, [item])
+
+        history = self.storage.get_clipboard_history(self.user_id)
+        self.assertEqual(history.total, 1)
+        self.assertEqual(history.items[0].content, "更新后的内容")
+
+    def test_delete_item(self):
+        items = self.make_items(2)
+        _, version = self.storage.save_clipboard_items(self.user_id, items)
+
+        self.assertTrue(self.storage.delete_clipboard_item(items[0].id))
+        self.assertFalse(self.storage.delete_clipboard_item(items[0].id))
+        self.assertIsNone(self.storage.get_clipboard_item(items[0].id))
+        self.assertEqual([item.id for item in self.storage.get_clipboard_history(self.user_id).items], [items[1].id])
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'clipboard'), version + 1)
+
+    def test_clear_history(self):
+        items = self.make_items(3)
+        self.storage.save_clipboard_items(self.user_id, items)
+
+        self.assertTrue(self.storage.clear_clipboard(self.user_id))
+        self.assertEqual(self.storage.get_clipboard_history(self.user_id).total, 0)
+        self.assertIsNone(self.storage.get_clipboard_item(items[1].id))
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'clipboard'), 2)
+
+    # ==================== 同步版本号 ====================
+
+    def test_sync_versions_are_per_scope(self):
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'clipboard'), 0)
+        self.assertEqual(self.storage.bump_sync_version(self.user_id, 'clipboard'), 1)
+        self.assertEqual(self.storage.bump_sync_version(self.user_id, 'clipboard'), 2)
+        self.assertEqual(self.storage.bump_sync_version(self.user_id, 'devices'), 1)
+        self.assertEqual(self.storage.get_sync_version(self.user_id, 'clipboard'), 2)
+
+
+class TestMemoryStorage(StorageConformance, unittest.TestCase):
+    def make_storage(self):
+        return MemoryStorage()
+
+
+class TestSQLiteStorage(StorageConformance, unittest.TestCase):
+    def make_storage(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        return SQLiteStorage(os.path.join(self.tmpdir.name, "conformance.db"))
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmpdir.cleanup()
+
+    def test_wal_mode(self):
+        self.assertEqual(self.storage._conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_data_survives_reopen(self):
+        self.storage.save_clipboard_items(self.user_id, self.make_items(2))
+        self.storage.close()
+        self.storage = SQLiteStorage(self.storage.path)
+
+        self.assertEqual(self.storage.get_user_id(self.username), self.user_id)
+        self.assertEqual(self.storage.get_clipboard_history(self.user_id).total, 2)
+
+
+class TestRedisStorage(StorageConformance, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from server.redis_manager import redis_manager
+        if not redis_manager.is_connected():
+            raise unittest.SkipTest("Redis不可用")
+
+    def make_storage(self):
+        from server.storage.redis_backend import RedisStorage
+        return RedisStorage()
+
+    def test_max_history_trims_oldest(self):
+        self.skipTest("RedisManager的历史上限来自配置 clipboard.max_history")
+
+
+if __name__ == "__main__":
+    unittest.main()